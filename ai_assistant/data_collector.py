@@ -11,42 +11,27 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 import settings
 
 from .utils import run_cmd
+from modules.wg_snapshot import get_snapshot
+from modules.server_config import ServerConfig
 
 
 def parse_wg_config(config_path: Path) -> Dict[str, Any]:
-    """Parsowanie konfiguracji WireGuard w celu wyciągnięcia informacji o peerach."""
+    """Parsowanie konfiguracji WireGuard w celu wyciągnięcia informacji o aktywnych peerach."""
     try:
-        with open(config_path, 'r', encoding='utf-8') as f:
-            content = f.read()
+        config = ServerConfig.load(config_path)
         
         peers = []
-        current_peer = {}
-        
-        for line in content.split('\n'):
-            line = line.strip()
-            
-            if line.startswith('[Peer]'):
-                if current_peer:
-                    peers.append(current_peer)
-                current_peer = {}
-            
-            elif '=' in line and current_peer is not None:
-                key, value = line.split('=', 1)
-                key = key.strip()
-                value = value.strip()
-                
-                if key == 'PublicKey':
-                    current_peer['public_key'] = value
-                elif key == 'AllowedIPs':
-                    current_peer['allowed_ips'] = value
-                elif key == 'PresharedKey':
-                    current_peer['has_psk'] = True
-                elif key == 'Endpoint':
-                    current_peer['endpoint'] = value
-        
-        # Dodaj ostatniego peera
-        if current_peer:
-            peers.append(current_peer)
+        for block in config.peers(include_disabled=False):
+            peer = {}
+            if block.public_key:
+                peer['public_key'] = block.public_key
+            if block.allowed_ips:
+                peer['allowed_ips'] = block.allowed_ips
+            if block.preshared_key:
+                peer['has_psk'] = True
+            if block.endpoint:
+                peer['endpoint'] = block.endpoint
+            peers.append(peer)
         
         return {
             'config_file': str(config_path),
@@ -145,6 +130,11 @@ def get_wg_status() -> Dict[str, Any]:
     if not interfaces:
         return result
     
+    try:
+        snapshot = get_snapshot()
+    except Exception:
+        snapshot = None
+    
     for iface in interfaces.split():
         iface = iface.strip()
         if not iface:
@@ -161,26 +151,19 @@ def get_wg_status() -> Dict[str, Any]:
         # Port nasłuchiwania
         listen_port = run_cmd(f"wg show {iface} listen-port")
         
-        # Peers dump (szczegółowe info)
-        peers_dump = run_cmd(f"wg show {iface} dump")
-        
-        # Parsowanie peers
+        # Peers ze współdzielonej migawki `wg show all dump`
         peers = []
-        if peers_dump:
-            lines = peers_dump.strip().split('\n')[1:]  # Pomiń nagłówek
-            for line in lines:
-                parts = line.split('\t')
-                if len(parts) >= 8:
-                    peers.append({
-                        'public_key': parts[0],
-                        'preshared_key': parts[1] if parts[1] != '(none)' else None,
-                        'endpoint': parts[2] if parts[2] != '(none)' else None,
-                        'allowed_ips': parts[3],
-                        'latest_handshake': int(parts[4]) if parts[4] != '0' else 0,
-                        'rx_bytes': int(parts[5]),
-                        'tx_bytes': int(parts[6]),
-                        'keepalive': parts[7]
-                    })
+        for peer in (snapshot.peers_of(iface).values() if snapshot else ()):
+            peers.append({
+                'public_key': peer.public_key,
+                'preshared_key': peer.preshared_key,
+                'endpoint': peer.endpoint,
+                'allowed_ips': ','.join(peer.allowed_ips) or '(none)',
+                'latest_handshake': peer.latest_handshake,
+                'rx_bytes': peer.rx_bytes,
+                'tx_bytes': peer.tx_bytes,
+                'keepalive': str(peer.persistent_keepalive) if peer.persistent_keepalive else 'off'
+            })
         
         result[iface] = {
             'service_status': service_status,
@@ -17,6 +17,7 @@ sys.path.append(str(PROJECT_ROOT))  # Dodaj katalog główny projektu do sys.pat
 
 # Importuj ustawienia
 from settings import PROJECT_DIR, SUMMARY_REPORT_PATH, USER_DB_PATH, LOG_LEVEL
+from modules.user_store import open_user_store, resolve_backend
 
 # Konfiguracja logowania
 logging.basicConfig(
@@ -86,19 +87,18 @@ def check_wireguard_status():
 
 
 def count_users():
-    """Zlicza liczbę użytkowników z pliku user_records.json."""
-    if USER_DB_PATH.exists():
-        try:
-            with open(USER_DB_PATH, "r", encoding="utf-8") as file:
-                user_data = json.load(file)
-                user_count = len(user_data)
-                logger.debug(f"Wykryto użytkowników: {user_count}")
-                return user_count, "user_records.json"
-        except json.JSONDecodeError:
-            logger.error("Błąd odczytu pliku user_records.json.")
-            return 0, "Błąd odczytu user_records.json"
-    logger.warning("Brak pliku user_records.json.")
-    return 0, "Brak pliku user_records.json"
+    """Zlicza liczbę użytkowników w magazynie rekordów (user_records.json lub baza SQLite)."""
+    backend = resolve_backend()
+    if backend == "json" and not USER_DB_PATH.exists():
+        logger.warning("Brak pliku user_records.json.")
+        return 0, "Brak pliku user_records.json"
+    try:
+        user_count = open_user_store(USER_DB_PATH).count()
+    except json.JSONDecodeError:
+        logger.error("Błąd odczytu pliku user_records.json.")
+        return 0, "Błąd odczytu user_records.json"
+    logger.debug(f"Wykryto użytkowników: {user_count}")
+    return user_count, "user_records.json" if backend == "json" else "baza SQLite"
 
 
 def count_peers(wg_info):
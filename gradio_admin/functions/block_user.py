@@ -1,45 +1,52 @@
 #!/usr/bin/env python3
 # gradio_admin/functions/block_user.py
 
-import json
-import subprocess  # Do zarządzania VPN przez polecenia systemowe
+from modules.sync_scheduler import schedule_sync  # Łączona, przyrostowa synchronizacja peerów WireGuard
+from modules.user_store import open_user_store  # Magazyn rekordów (JSON lub SQLite)
+from modules.server_config import set_peer_enabled  # Blokowanie peera w wg0.conf (lub jego fragmencie)
+from gradio_admin.functions.user_records import get_repository  # Współdzielony odczyt rekordów
 from settings import USER_DB_PATH, SERVER_CONFIG_FILE  # Ścieżki do JSON i konfiguracji WireGuard
 from settings import SERVER_WG_NIC
 
 def load_user_records():
-    """Wczytuje rekordy użytkowników z JSON."""
+    """Wczytuje rekordy użytkowników ze współdzielonego repozytorium."""
     try:
-        with open(USER_DB_PATH, "r") as f:
-            return json.load(f)
-    except FileNotFoundError:
-        return {}
+        return dict(get_repository().records())
     except Exception as e:
         print(f"[BŁĄD] Nie udało się wczytać rekordów użytkowników: {e}")
         return {}
 
 def save_user_records(records):
-    """Zapisuje rekordy użytkowników do JSON."""
+    """Zapisuje wszystkie rekordy użytkowników do magazynu."""
     try:
-        with open(USER_DB_PATH, "w") as f:
-            json.dump(records, f, indent=4)
+        open_user_store(USER_DB_PATH).replace_all(records)
         return True
     except Exception as e:
         print(f"[BŁĄD] Nie udało się zapisać rekordów użytkowników: {e}")
         return False
 
+def set_user_status(username, status):
+    """
+    Zmienia status jednego użytkownika (zapis pojedynczego rekordu).
+    :return: True jeśli zapisano, False jeśli użytkownik nie istnieje, None przy błędzie zapisu.
+    """
+    try:
+        return open_user_store(USER_DB_PATH).update(username, {"status": status})
+    except Exception as e:
+        print(f"[BŁĄD] Nie udało się zapisać rekordów użytkowników: {e}")
+        return None
+
 def block_user(username):
     """
     Blokuje użytkownika:
-    1. Aktualizuje status w JSON na 'blocked'.
+    1. Aktualizuje status w magazynie na 'blocked'.
     2. Usuwa użytkownika z konfiguracji WireGuard.
     """
-    records = load_user_records()
-    if username not in records:
+    # Aktualizuj status (jeden rekord)
+    updated = set_user_status(username, "blocked")
+    if updated is False:
         return False, f"Użytkownik '{username}' nie znaleziony."
-
-    # Aktualizuj status w JSON
-    records[username]["status"] = "blocked"
-    if not save_user_records(records):
+    if updated is None:
         return False, f"Nie udało się zaktualizować JSON dla użytkownika '{username}'."
 
     # Usuń użytkownika z konfiguracji
@@ -51,16 +58,14 @@ def block_user(username):
 def unblock_user(username):
     """
     Odblokowuje użytkownika:
-    1. Aktualizuje status w JSON na 'active'.
+    1. Aktualizuje status w magazynie na 'active'.
     2. Przywraca użytkownika w konfiguracji WireGuard.
     """
-    records = load_user_records()
-    if username not in records:
+    # Aktualizuj status (jeden rekord)
+    updated = set_user_status(username, "active")
+    if updated is False:
         return False, f"Użytkownik '{username}' nie znaleziony."
-
-    # Aktualizuj status w JSON
-    records[username]["status"] = "active"
-    if not save_user_records(records):
+    if updated is None:
         return False, f"Nie udało się zaktualizować JSON dla użytkownika '{username}'."
 
     # Przywróć użytkownika w konfiguracji
@@ -74,55 +79,15 @@ def update_wireguard_config(username, block=True):
     Aktualizuje plik konfiguracji WireGuard:
     1. Jeśli block=True, komentuje cały blok [Peer] powiązany z użytkownikiem.
     2. Jeśli block=False, przywraca blok [Peer].
+    Pozostałe linie pliku nie są zmieniane; zapis jest atomowy
+    (w układzie "fragments" zapisywany jest tylko fragment peera).
     """
     try:
-        with open(SERVER_CONFIG_FILE, "r") as f:
-            config_lines = f.readlines()
-
-        updated_lines = []
-        in_peer_block = False
-        peer_belongs_to_user = False
-
-        for idx, line in enumerate(config_lines):
-            stripped_line = line.strip()
-
-            # Identyfikuj użytkownika przez komentarz ### Client <username>
-            if stripped_line == f"### Client {username}":
-                in_peer_block = True
-                peer_belongs_to_user = True
-                updated_lines.append(line)  # Dodaj komentarz bez zmian
-                continue
-
-            # Przetwarzaj blok [Peer] jeśli należy do użytkownika
-            if in_peer_block and peer_belongs_to_user:
-                if block:
-                    if not line.startswith("#"):
-                        updated_lines.append(f"# {line}")  # Zakomentuj linię
-                    else:
-                        updated_lines.append(line)  # Już zakomentowane
-                else:
-                    if line.startswith("# "):
-                        updated_lines.append(line[2:])  # Usuń komentarz
-                    else:
-                        updated_lines.append(line)  # Już odkomentowane
-
-                # Koniec bloku [Peer] - pusta linia
-                if stripped_line == "":
-                    in_peer_block = False
-                    peer_belongs_to_user = False
-                continue
-
-            # Wszystkie inne linie
-            updated_lines.append(line)
-
-        # Zapisz zaktualizowany plik konfiguracji
-        with open(SERVER_CONFIG_FILE, "w") as f:
-            f.writelines(updated_lines)
+        if set_peer_enabled(SERVER_CONFIG_FILE, username, not block) is None:
+            print(f"[OSTRZEŻENIE] Brak bloku [Peer] użytkownika '{username}' w {SERVER_CONFIG_FILE}.")
 
-        # Zsynchronizuj WireGuard
-        sync_command = f'wg syncconf "{SERVER_WG_NIC}" <(wg-quick strip "{SERVER_WG_NIC}")'
-        subprocess.run(sync_command, shell=True, check=True, executable='/bin/bash')
-        print(f"WireGuard zsynchronizowany dla interfejsu {SERVER_WG_NIC}")
+        # Zsynchronizuj WireGuard (żądania z okna łączone, fallback: wg syncconf)
+        schedule_sync(SERVER_WG_NIC, SERVER_CONFIG_FILE)
 
         return True
 
@@ -3,10 +3,14 @@
 # Skrypt do usuwania użytkowników w projekcie pyWGgen
 
 import os
-import subprocess
 from datetime import datetime
-from modules.utils import read_json, write_json, get_wireguard_config_path
-from settings import WG_CONFIG_DIR, QR_CODE_DIR, SERVER_WG_NIC
+from modules.utils import get_wireguard_config_path
+from modules.user_store import open_user_store
+from modules.server_config import load_server_config, remove_server_peer
+from modules.ip_allocator import release_ip
+from modules.sync_scheduler import schedule_sync
+from modules.qr_worker import discard_cached_qr
+from settings import WG_CONFIG_DIR, QR_CODE_DIR, SERVER_WG_NIC, IP_POOL_PATH
 
 # Funkcja logowania (podobna do log_debug)
 def log_debug(message):
@@ -31,30 +35,28 @@ def delete_user(username):
 
     log_debug(f"➡️ Rozpoczynam usuwanie użytkownika: '{username}'.")
 
-    if not os.path.exists(user_records_path):
+    store = open_user_store(user_records_path)
+    if not os.path.exists(user_records_path) and store.count() == 0:
         log_debug(f"❌ Plik danych użytkowników nie znaleziony: {user_records_path}")
         log_debug("---------- 🔥 Proces usuwania użytkownika zakończony ---------------\n")
         return "❌ Błąd: Brak pliku danych użytkowników."
 
     try:
-        # Wczytaj dane użytkowników
-        user_data = read_json(user_records_path)
-        log_debug(f"📂 Dane użytkowników pomyślnie wczytane.")
-
-        if username not in user_data:
+        # Usuń rekord użytkownika z magazynu (pojedynczy rekord)
+        user_info = store.delete(username)
+        if user_info is None:
             log_debug(f"❌ Użytkownik '{username}' nie znaleziony w danych.")
             log_debug("---------- 🔥 Proces usuwania użytkownika zakończony ---------------\n")
             return f"❌ Użytkownik '{username}' nie istnieje."
 
-        # Usuń rekord użytkownika z user_records.json
-        user_info = user_data.pop(username)
         user_info["removed_at"] = datetime.now().isoformat()
-        write_json(user_records_path, user_data)
         log_debug(f"📝 Rekord użytkownika '{username}' usunięty z danych.")
 
         # Usuń plik konfiguracyjny użytkownika
         wg_config_file = os.path.join(WG_CONFIG_DIR, f"{username}.conf")
         if os.path.exists(wg_config_file):
+            with open(wg_config_file, "r") as f:
+                discard_cached_qr(f.read())
             os.remove(wg_config_file)
             log_debug(f"🗑️ Plik konfiguracji użytkownika '{wg_config_file}' usunięty.")
 
@@ -71,18 +73,19 @@ def delete_user(username):
             log_debug("---------- 🔥 Proces usuwania użytkownika zakończony ---------------\n")
             return f"❌ Brak klucza publicznego dla użytkownika '{username}'."
 
-        # Usuń użytkownika z WireGuard
-        subprocess.run(["sudo", "wg", "set", "wg0", "peer", public_key, "remove"], check=True)
-        log_debug(f"🔐 Użytkownik '{username}' usunięty z WireGuard.")
-
         # Aktualizuj konfigurację WireGuard
-        remove_peer_from_config(public_key, wg_config_path, username)
+        if not remove_peer_from_config(public_key, wg_config_path, username):
+            log_debug("---------- 🔥 Proces usuwania użytkownika zakończony ---------------\n")
+            return f"❌ Błąd usuwania peera użytkownika '{username}' z konfiguracji WireGuard."
         log_debug(f"✅ Konfiguracja WireGuard pomyślnie zaktualizowana.")
 
-        # Zsynchronizuj WireGuard
-        sync_command = f'wg syncconf "{SERVER_WG_NIC}" <(wg-quick strip "{SERVER_WG_NIC}")'
-        subprocess.run(sync_command, shell=True, check=True, executable='/bin/bash')
-        print(f"WireGuard zsynchronizowany dla interfejsu {SERVER_WG_NIC}")
+        # Zwolnij adres IP w puli (dopiero po usunięciu peera)
+        if release_ip(user_info.get("allowed_ips"), IP_POOL_PATH):
+            log_debug(f"♻️ Adres IP {user_info.get('allowed_ips')} zwolniony w puli.")
+
+        # Usuń użytkownika z WireGuard (żądania z okna łączone, fallback: wg syncconf)
+        schedule_sync(SERVER_WG_NIC, wg_config_path)
+        log_debug(f"🔐 Użytkownik '{username}' usunięty z WireGuard.")
 
         log_debug("---------- 🔥 Proces usuwania użytkownika zakończony ---------------\n")
         return f"✅ Użytkownik '{username}' pomyślnie usunięty."
@@ -100,17 +103,10 @@ def extract_public_key(username, config_path):
     """
     log_debug(f"🔍 Wyszukiwanie klucza publicznego dla użytkownika '{username}' w {config_path}.")
     try:
-        with open(config_path, "r") as f:
-            lines = f.readlines()
-
-        found_username = False
-        for line in lines:
-            if username in line:
-                found_username = True
-            elif found_username and line.strip().startswith("PublicKey"):
-                public_key = line.split("=", 1)[1].strip()
-                log_debug(f"🔑 Znaleziono klucz publiczny dla '{username}': {public_key}")
-                return public_key
+        peer = load_server_config(config_path).peer_by_name(username)
+        if peer is not None and peer.public_key:
+            log_debug(f"🔑 Znaleziono klucz publiczny dla '{username}': {peer.public_key}")
+            return peer.public_key
         log_debug(f"❌ Klucz publiczny dla '{username}' nie znaleziony.")
         return None
     except Exception as e:
@@ -120,40 +116,22 @@ def extract_public_key(username, config_path):
 def remove_peer_from_config(public_key, config_path, client_name):
     """
     Usuwa blok [Peer] i powiązany komentarz z pliku konfiguracji WireGuard.
-    Usuwa komentarz i 4 kolejne linie od niego.
+    Blok jest wyszukiwany po nazwie klienta, a w razie braku - po kluczu publicznym.
     :param public_key: Klucz publiczny użytkownika.
     :param config_path: Ścieżka do pliku konfiguracji WireGuard.
     :param client_name: Nazwa klienta.
+    :return: True, jeśli peera nie ma już w konfiguracji (usunięty lub nieobecny); False przy błędzie zapisu.
     """
     log_debug(f"🛠️ Usuwanie konfiguracji użytkownika '{client_name}' z {config_path}.")
 
     try:
-        with open(config_path, "r") as f:
-            lines = f.readlines()
-
-        updated_lines = []
-        skip_lines = 0  # Licznik pomijanych linii
-
-        for i, line in enumerate(lines):
-            # Jeśli znaleziono komentarz klienta
-            if line.strip() == f"### Client {client_name}":
-                log_debug(f"📌 Znaleziono blok dla '{client_name}' w linii {i}. Usuwanie...")
-                skip_lines = 5  # Pomiń 5 linii od tego miejsca
-                continue
-
-            # Pomiń linie związane z usuwanym blokiem
-            if skip_lines > 0:
-                log_debug(f"⏩ Pomijam linię {i}: {line.strip()}")
-                skip_lines -= 1
-                continue
-
-            # Zapisz pozostałe linie
-            updated_lines.append(line)
-
-        # Zapisz zaktualizowaną konfigurację
-        with open(config_path, "w") as f:
-            f.writelines(updated_lines)
+        removed = remove_server_peer(config_path, client_name, public_key)
 
-        log_debug(f"✅ Konfiguracja użytkownika '{client_name}' usunięta.")
+        if removed is None:
+            log_debug(f"❌ Blok [Peer] użytkownika '{client_name}' nie znaleziony.")
+        else:
+            log_debug(f"✅ Konfiguracja użytkownika '{client_name}' usunięta.")
+        return True
     except Exception as e:
         log_debug(f"⚠️ Błąd aktualizacji konfiguracji: {str(e)}")
+        return False
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# gradio_admin/functions/executor.py
+#
+# Pule wątków dla blokujących funkcji obsługi zdarzeń Gradio. Zamiast
+# wykonywać pracę bezpośrednio w funkcji obsługi, dekorator pooled() kieruje
+# ją do jednej z ograniczonych pul (rozmiary w settings.GRADIO_POOL_WORKERS):
+# - "probe": sondy I/O (polecenia powłoki diagnostyki, Ollama, curl),
+# - "render": budowa tabel i widoków (pandas, HTML),
+# - "mutation": zmiany konfiguracji i rekordów (jeden wątek - wykonywane po kolei).
+# Dodatkowy limit na funkcję obsługi (np. jedna diagnostyka naraz) trzyma
+# nadmiarowe wywołania w kolejce przed pulą, więc wolna diagnostyka nie
+# zajmuje wątków sond pozostałym użytkownikom panelu. describe_jobs() opisuje
+# zadania w toku i w kolejce (wskaźnik w nagłówku panelu).
+#
+# Przykład użycia:
+#   @pooled("probe", limit=1)
+#   def run_diagnostics(): ...
+#   print(describe_jobs())  # "🧵 Sondy: 1 w toku, 2 w kolejce · ..."
+
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+POOLS = {"probe": "Sondy", "render": "Renderowanie", "mutation": "Zmiany konfiguracji"}
+DEFAULT_WORKERS = {"probe": 4, "render": 2, "mutation": 1}
+
+_lock = threading.Lock()
+_executors = {}
+_stats = {pool: {"queued": 0, "running": 0} for pool in POOLS}
+
+
+def _pool_workers(pool):
+    """Zwraca liczbę wątków puli z settings.GRADIO_POOL_WORKERS (odczyt przy wywołaniu)."""
+    import settings
+    workers = getattr(settings, "GRADIO_POOL_WORKERS", None) or {}
+    return max(1, int(workers.get(pool, DEFAULT_WORKERS[pool])))
+
+
+def get_executor(pool):
+    """Zwraca współdzieloną pulę wątków o danej nazwie (tworzoną przy pierwszym użyciu)."""
+    if pool not in POOLS:
+        raise ValueError(f"Nieznana pula zadań: {pool} (dostępne: {', '.join(POOLS)})")
+    with _lock:
+        executor = _executors.get(pool)
+        if executor is None:
+            executor = ThreadPoolExecutor(max_workers=_pool_workers(pool), thread_name_prefix=f"gradio-{pool}")
+            _executors[pool] = executor
+        return executor
+
+
+def _count(pool, key, step):
+    with _lock:
+        _stats[pool][key] += step
+
+
+def run_in_pool(pool, fn, *args, **kwargs):
+    """
+    Wykonuje funkcję w puli i czeka na wynik (wyjątki przechodzą do wywołującego).
+    :param pool: "probe", "render" lub "mutation".
+    """
+    executor = get_executor(pool)
+    _count(pool, "queued", 1)
+
+    def job():
+        _count(pool, "queued", -1)
+        _count(pool, "running", 1)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _count(pool, "running", -1)
+
+    try:
+        future = executor.submit(job)
+    except Exception:
+        _count(pool, "queued", -1)
+        raise
+    return future.result()
+
+
+def pooled(pool, limit=None):
+    """
+    Dekorator funkcji obsługi: wykonanie w puli, najwyżej `limit` wywołań naraz.
+    Wywołania ponad limit czekają w kolejce (liczone jako oczekujące w puli).
+    """
+    get_executor(pool)  # Weryfikacja nazwy puli przy dekorowaniu
+    slots = threading.BoundedSemaphore(limit) if limit else None
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if slots is None:
+                return run_in_pool(pool, fn, *args, **kwargs)
+            _count(pool, "queued", 1)
+            try:
+                slots.acquire()
+            finally:
+                _count(pool, "queued", -1)
+            try:
+                return run_in_pool(pool, fn, *args, **kwargs)
+            finally:
+                slots.release()
+        return wrapper
+    return decorator
+
+
+def job_counts():
+    """Zwraca kopię liczników {pula: {"queued": n, "running": n}}."""
+    with _lock:
+        return {pool: dict(stats) for pool, stats in _stats.items()}
+
+
+def describe_jobs():
+    """Zwraca opis zadań w toku i w kolejce dla wskaźnika w panelu."""
+    counts = job_counts()
+    if not any(stats["queued"] or stats["running"] for stats in counts.values()):
+        return "🧵 Brak zadań w toku"
+    parts = [f"{POOLS[pool]}: {stats['running']} w toku, {stats['queued']} w kolejce"
+             for pool, stats in counts.items() if stats["queued"] or stats["running"]]
+    return "🧵 " + " · ".join(parts)
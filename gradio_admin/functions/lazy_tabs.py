@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+# gradio_admin/functions/lazy_tabs.py
+#
+# Leniwe zakładki interfejsu Gradio. Funkcja zakładki buduje komponenty
+# z treścią zastępczą i zgłasza przez on_tab_select() funkcję wczytującą
+# dane; build_tab() wywołuje funkcję zakładki wewnątrz `with gr.Tab(...)`,
+# mierzy czas budowy i podpina zgłoszone funkcje pod zdarzenie wyboru
+# zakładki. Dane (rekordy, tabela, kontekst serwera) są więc czytane przy
+# otwarciu zakładki, a nie przy budowie interfejsu.
+#
+# Przykład użycia:
+#   with gr.Tab(label="📊 Statystyki") as tab:
+#       build_tab(tab, statistics_tab)          # w statistics_tab(): on_tab_select(load, inputs, outputs)
+#   print(describe_build_times())
+
+import threading
+import time
+
+_pending = []  # Funkcje wczytujące zgłoszone przez budowaną zakładkę
+_lock = threading.Lock()
+BUILD_TIMES = {}  # etykieta zakładki -> czas budowy (w sekundach)
+
+
+def on_tab_select(fn, inputs=None, outputs=None):
+    """Zgłasza funkcję wczytującą dane budowanej zakładki (wywoływaną przy jej wyborze)."""
+    _pending.append((fn, inputs, outputs))
+
+
+def build_tab(tab, builder):
+    """
+    Buduje zawartość zakładki i podpina zgłoszone funkcje pod tab.select.
+    :param tab: Obiekt gr.Tab (wewnątrz jego bloku `with`).
+    :param builder: Funkcja zakładki, np. statistics_tab.
+    :return: Wynik funkcji zakładki.
+    """
+    with _lock:
+        del _pending[:]
+        started = time.perf_counter()
+        result = builder()
+        for fn, inputs, outputs in _pending:
+            tab.select(fn=fn, inputs=inputs, outputs=outputs)
+        del _pending[:]
+        BUILD_TIMES[tab.label] = time.perf_counter() - started
+    return result
+
+
+def describe_build_times():
+    """Zwraca opis czasów budowy zakładek (od najwolniejszej)."""
+    parts = [f"{label} {seconds * 1000:.0f} ms"
+             for label, seconds in sorted(BUILD_TIMES.items(), key=lambda item: -item[1])]
+    return ", ".join(parts)
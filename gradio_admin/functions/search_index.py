@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# gradio_admin/functions/search_index.py
+# Indeks wyszukiwania użytkowników dla zakładek Gradio
+#
+# Indeks obejmuje pola username, allowed_ips, user_id, email, telegram_id
+# i status. Zapytanie krótsze niż 3 znaki szuka prefiksu wartości pola
+# (wyszukiwanie binarne w posortowanej liście wartości), dłuższe - podciągu:
+# kandydaci to przecięcie list trigramów zapytania, a ostateczne dopasowanie
+# sprawdza podciąg tylko u kandydatów. Indeks jest aktualizowany przyrostowo:
+# po nowej wersji danych repozytorium (gradio_admin/functions/user_records.py)
+# przeindeksowywane są tylko rekordy, których indeksowane pola się zmieniły.
+#
+# Przykład użycia:
+#   from gradio_admin.functions.search_index import search_users
+#   usernames = search_users("10.66")  # zbiór nazw użytkowników (kluczy rekordów)
+#   top = suggest_users("jan", 20)      # lista kandydatów dla wyboru użytkownika
+
+import bisect
+import heapq
+import threading
+from collections import defaultdict
+
+from gradio_admin.functions.user_records import get_repository
+
+SEARCH_FIELDS = ("username", "allowed_ips", "user_id", "email", "telegram_id", "status")
+TRIGRAM = 3  # Długość n-gramu; krótsze zapytania używają prefiksów
+
+
+def document(username, record):
+    """Zwraca krotkę indeksowanych wartości rekordu (małe litery, bez pustych)."""
+    values = []
+    for field in SEARCH_FIELDS:
+        value = username if field == "username" else record.get(field)
+        if value not in (None, "", "N/A"):
+            values.append(str(value).lower())
+    return tuple(values)
+
+
+def trigrams(text):
+    return {text[i:i + TRIGRAM] for i in range(len(text) - TRIGRAM + 1)}
+
+
+class SearchIndex:
+    """Indeks prefiksów i trigramów z przyrostową aktualizacją rekordów."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._documents = {}               # nazwa -> krotka wartości
+        self._postings = defaultdict(set)  # trigram -> zbiór nazw
+        self._terms = []                   # posortowane (wartość, nazwa) do wyszukiwania prefiksów
+        self.version = None
+
+    def __len__(self):
+        return len(self._documents)
+
+    def _add(self, username, values):
+        """Dodaje dokument; zwraca wpisy (wartość, nazwa) do wstawienia do listy prefiksów."""
+        self._documents[username] = values
+        for gram in set().union(*(trigrams(value) for value in values)):
+            self._postings[gram].add(username)
+        return [(value, username) for value in values]
+
+    def _remove(self, username):
+        values = self._documents.pop(username, ())
+        for gram in set().union(*(trigrams(value) for value in values)):
+            postings = self._postings.get(gram)
+            if postings is not None:
+                postings.discard(username)
+                if not postings:
+                    del self._postings[gram]
+        for value in values:
+            position = bisect.bisect_left(self._terms, (value, username))
+            if position < len(self._terms) and self._terms[position] == (value, username):
+                del self._terms[position]
+
+    def update(self, records, version=None):
+        """
+        Uzgadnia indeks z rekordami, przeindeksowując tylko zmienione.
+        :param records: Słownik {nazwa: rekord}.
+        :return: Liczba dodanych, zmienionych lub usuniętych rekordów.
+        """
+        with self._lock:
+            changed = 0
+            pending = []
+            for username in set(self._documents) - set(records):
+                self._remove(username)
+                changed += 1
+            for username, record in records.items():
+                values = document(username, record)
+                current = self._documents.get(username)
+                if current == values:
+                    continue
+                if current is not None:
+                    self._remove(username)
+                pending.extend(self._add(username, values))
+                changed += 1
+            # Kilka zmian: wstawianie binarne; wiele (np. pierwsze budowanie): jedno sortowanie
+            if len(pending) > 64:
+                self._terms.extend(pending)
+                self._terms.sort()
+            else:
+                for term in pending:
+                    bisect.insort(self._terms, term)
+            self.version = version
+            return changed
+
+    def search(self, query):
+        """
+        Zwraca zbiór nazw użytkowników pasujących do zapytania.
+        Zapytanie krótsze niż 3 znaki dopasowuje prefiks wartości pola, dłuższe - podciąg.
+        """
+        query = str(query or "").strip().lower()
+        with self._lock:
+            if not query:
+                return set(self._documents)
+            if len(query) < TRIGRAM:
+                start = bisect.bisect_left(self._terms, (query, ""))
+                end = bisect.bisect_left(self._terms, (query + "\U0010ffff", ""), start)
+                return {username for _, username in self._terms[start:end]}
+            postings = sorted((self._postings.get(gram, set()) for gram in trigrams(query)), key=len)
+            candidates = set(postings[0]).intersection(*postings[1:]) if postings else set()
+            return {username for username in candidates
+                    if any(query in value for value in self._documents[username])}
+
+    def suggest(self, query, limit):
+        """
+        Zwraca najwyżej `limit` nazw pasujących do zapytania, najlepsze najpierw:
+        nazwa równa zapytaniu, nazwa zaczynająca się od zapytania, pozostałe (alfabetycznie).
+        """
+        query = str(query or "").strip().lower()
+        if not query:
+            with self._lock:
+                return heapq.nsmallest(limit, self._documents)
+        return heapq.nsmallest(limit, self.search(query),
+                               key=lambda name: (name.lower() != query, not name.lower().startswith(query), name))
+
+
+_index = SearchIndex()
+
+
+def get_search_index():
+    """Zwraca indeks zsynchronizowany z bieżącą wersją repozytorium rekordów."""
+    repository = get_repository()
+    version = (repository, repository.version)
+    if _index.version != version:
+        with _index._lock:
+            if _index.version != version:
+                _index.update(repository.records(), version)
+    return _index
+
+
+def warm_search_index():
+    """Buduje indeks w wątku tle, aby pierwsze wyszukiwanie nie czekało na pełne indeksowanie."""
+    def build():
+        try:
+            get_search_index()
+        except Exception as e:
+            print(f"⚠️ Nie udało się zbudować indeksu wyszukiwania: {e}")
+    threading.Thread(target=build, name="search-index", daemon=True).start()
+
+
+def search_users(query):
+    """Zwraca zbiór nazw użytkowników (kluczy rekordów) pasujących do zapytania."""
+    return get_search_index().search(query)
+
+
+def suggest_users(query, limit):
+    """Zwraca listę najwyżej `limit` najlepiej pasujących nazw użytkowników."""
+    return get_search_index().suggest(query, limit)
@@ -1,16 +1,15 @@
 #!/usr/bin/env python3
 # gradio_admin/functions/show_user_info.py
 
-from gradio_admin.functions.user_records import load_user_records
+from gradio_admin.functions.user_records import get_repository
 from gradio_admin.functions.format_helpers import format_time
 
 def show_user_info(username):
     """Wyświetla szczegółowe informacje o użytkowniku."""
     print(f"[DEBUG] Nazwa użytkownika: {username}")
 
-    # Wczytaj dane z user_records.json
-    records = load_user_records()
-    user_data = records.get(username)
+    # Odczyt ze współdzielonego repozytorium (bez ponownego parsowania pliku)
+    user_data = get_repository().get(username)
 
     if not user_data:
         print(f"[DEBUG] Użytkownik '{username}' nie znaleziony w rekordach.")
@@ -1,24 +1,61 @@
 #!/usr/bin/env python3
 # gradio_admin/functions/table_helpers.py
+#
+# Tabela użytkowników dla zakładek Gradio. Widok statystyk jest stronicowany
+# po stronie serwera: filtrowanie, sortowanie i podział na strony działają na
+# DataFrame przeliczanym tylko po zmianie danych (filtr: indeks wyszukiwania
+# z gradio_admin/functions/search_index.py), a do przeglądarki trafia
+# wyłącznie HTML bieżącej strony. Wiersze są składane kolumnami (operacje na
+# całych kolumnach pandas zamiast pętli po wierszach), a wygląd opisują klasy
+# CSS z TABLE_CSS zamiast stylów w każdej komórce. Wyrenderowane strony są
+# cache'owane wg (wersja danych, filtr, sortowanie, strona).
+#
+# Przykład użycia:
+#   from gradio_admin.functions.table_helpers import table_page
+#   page_html, page, pages, rows = table_page(query="jan", sort_column="📊 Zużyto", page=2)
+
+import html
+import re
+import threading
+from collections import OrderedDict
 
-import os
-import json
 import pandas as pd  # type: ignore
-from settings import USER_DB_PATH  # Ścieżka do pliku JSON z danymi użytkowników
+from gradio_admin.functions.user_records import get_repository
+from gradio_admin.functions.search_index import search_users  # Indeks prefiksów i trigramów
 
-def load_data(show_inactive=True):
-    """Wczytuje dane użytkowników z JSON."""
-    if not os.path.exists(USER_DB_PATH):
-        return []
+COLUMNS = ["👤 Użytkownik", "📊 Zużyto", "📦 Limit", "🌐 Adres IP", "⚡ Stan", "💳 Cena", "UID"]
+SIZE_COLUMNS = ("📊 Zużyto", "📦 Limit")  # Kolumny sortowane wg liczby bajtów
+PAGE_SIZES = [25, 50, 100, 250]
+DEFAULT_PAGE_SIZE = 50
+PAGE_CACHE_SIZE = 128  # Liczba zapamiętanych stron i widoków (na wersję danych)
 
-    with open(USER_DB_PATH, "r") as f:
-        users = json.load(f)
+TABLE_CSS = """
+.stats-table-wrap { width: 100%; overflow-x: auto; }
+.stats-table { width: 100%; border-collapse: collapse; font-family: system-ui, -apple-system, sans-serif; font-size: 14px; }
+.stats-table th { background-color: #0f0f11; color: #d1d5db; padding: 12px 16px; text-align: left; font-weight: 600; border-bottom: 1px solid #3f3f46; }
+.stats-table td { padding: 10px 16px; color: #d1d5db; }
+.stats-table th:not(:last-child), .stats-table td:not(:last-child) { border-right: 1px solid #3f3f46; }
+.stats-table tbody tr:nth-child(odd) { background-color: #27272a; }
+.stats-table tbody tr:nth-child(even) { background-color: #2d2d30; }
+.stats-table tbody tr:not(:last-child) td { border-bottom: 1px solid #3f3f46; }
+.stats-table-empty { text-align: center; padding: 20px; color: #9ca3af; }
+"""
 
+_SIZE_RE = re.compile(r"(\d+(?:[.,]\d+)?)\s*([KMGT]i?B|[kMGT]B|B)\b")
+_cache_lock = threading.Lock()
+
+def load_data(show_inactive=True):
+    """Wczytuje dane użytkowników ze współdzielonego repozytorium rekordów."""
+    return get_repository().derived(("table_rows", show_inactive), lambda users: _build_rows(users, show_inactive))
+
+def _build_rows(users, show_inactive):
+    """Buduje wiersze tabeli z rekordów użytkowników."""
     table = []
     for username, user_info in users.items():
         if not show_inactive and user_info.get("status", "") != "active":
             continue
         table.append({
+            "key": username,  # Klucz rekordu (indeks wierszy DataFrame, wyniki wyszukiwania)
             "username": user_info.get("username", "N/A"),
             "total_transfer": user_info.get("total_transfer", "0.0 KiB"),
             "data_limit": user_info.get("data_limit", "100.0 GB"),
@@ -30,9 +67,14 @@ def load_data(show_inactive=True):
     return table
 
 def update_table(show_inactive):
-    """Tworzy tabelę do wyświetlenia w Gradio."""
+    """Tworzy tabelę do wyświetlenia w Gradio (przeliczaną tylko po zmianie danych)."""
+    return get_repository().derived(("table_frame", show_inactive), lambda users: _build_frame(show_inactive)).copy()
+
+def _build_frame(show_inactive):
+    """Buduje DataFrame tabeli z wierszy load_data."""
     users = load_data(show_inactive)
     formatted_rows = []
+    keys = [user["key"] for user in users]
 
     for user in users:
         formatted_rows.append([
@@ -45,7 +87,77 @@ def update_table(show_inactive):
             user["user_id"]  # UID
         ])
 
-    return pd.DataFrame(
-        formatted_rows,
-        columns=["👤 Użytkownik", "📊 Zużyto", "📦 Limit", "🌐 Adres IP", "⚡ Stan", "💳 Cena", "UID"]  # Zaktualizowane nagłówki
-    )
+    return pd.DataFrame(formatted_rows, columns=COLUMNS, index=keys)
+
+def table_frame(show_inactive):
+    """Zwraca współdzielony DataFrame tabeli (tylko do odczytu; kopia: update_table)."""
+    return get_repository().derived(("table_frame", show_inactive), lambda users: _build_frame(show_inactive))
+
+def render_html_table(df):
+    """Renderuje DataFrame do tabeli HTML kolumnami (klasy CSS z TABLE_CSS, wartości escapowane)."""
+    if df.empty:
+        return '<p class="stats-table-empty">Brak dostępnych danych</p>'
+    header = "".join(f"<th>{html.escape(str(column))}</th>" for column in df.columns)
+    rows = "<tr>"
+    for column in df.columns:
+        rows = rows + "<td>" + df[column].astype(str).map(html.escape) + "</td>"
+    rows = rows + "</tr>"
+    return (f'<div class="stats-table-wrap"><table class="stats-table"><thead><tr>{header}</tr></thead>'
+            f'<tbody>{"".join(rows.tolist())}</tbody></table></div>')
+
+def _size_bytes(text):
+    """Suma rozmiarów w napisie ("2.00 MiB odebrano, 1.00 MiB wysłano" -> bajty)."""
+    from modules.quota import parse_limit
+    return sum(parse_limit(f"{number} {unit}") for number, unit in _SIZE_RE.findall(str(text)))
+
+def _sort_key(values):
+    if values.name in SIZE_COLUMNS:
+        return values.map(_size_bytes)
+    return values.astype(str).str.lower()
+
+def _cached(name, key, builder):
+    """Zapamiętuje wynik w ograniczonym cache LRU unieważnianym przy nowej wersji danych."""
+    cache = get_repository().derived(name, lambda records: OrderedDict())
+    with _cache_lock:
+        if key in cache:
+            cache.move_to_end(key)
+            return cache[key]
+    value = builder()
+    with _cache_lock:
+        cache[key] = value
+        while len(cache) > PAGE_CACHE_SIZE:
+            cache.popitem(last=False)
+    return value
+
+def table_view(show_inactive=True, query="", sort_column=None, descending=False):
+    """Zwraca przefiltrowany i posortowany DataFrame tabeli (cache'owany wg wersji danych)."""
+    def build():
+        frame = table_frame(show_inactive)
+        if query:
+            frame = frame[frame.index.isin(search_users(query))]
+        if sort_column in frame.columns:
+            # Klucze sortowania (np. rozmiary w bajtach) liczone raz na wersję danych
+            keys = get_repository().derived(
+                ("table_sort_key", show_inactive, sort_column),
+                lambda records: _sort_key(table_frame(show_inactive)[sort_column]),
+            )
+            order = keys.loc[frame.index].sort_values(ascending=not descending, kind="stable").index
+            frame = frame.loc[order]
+        return frame
+    return _cached("table_views", (show_inactive, query or "", sort_column, bool(descending)), build)
+
+def table_page(show_inactive=True, query="", sort_column=None, descending=False, page=1, page_size=DEFAULT_PAGE_SIZE):
+    """
+    Zwraca HTML jednej strony tabeli statystyk.
+    :return: Krotka (html, numer_strony, liczba_stron, liczba_wierszy); numer strony jest
+             ograniczany do zakresu 1..liczba_stron.
+    """
+    page_size = max(1, int(page_size or DEFAULT_PAGE_SIZE))
+    view = table_view(show_inactive, query, sort_column, descending)
+    rows = len(view)
+    pages = max(1, -(-rows // page_size))
+    page = min(max(1, int(page or 1)), pages)
+    key = (show_inactive, query or "", sort_column, bool(descending), page, page_size)
+    page_html = _cached("table_pages", key,
+                        lambda: render_html_table(view.iloc[(page - 1) * page_size:page * page_size]))
+    return page_html, page, pages, rows
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# gradio_admin/functions/user_picker.py
+#
+# Wybór użytkownika z wyszukiwaniem po stronie serwera. Zamiast wysyłać do
+# gr.Dropdown wszystkie nazwy, zakładka wysyła tylko USER_PICKER_LIMIT
+# najlepszych kandydatów dla wpisanego tekstu (indeks z
+# gradio_admin/functions/search_index.py). Wartością pozycji listy jest stały
+# identyfikator user_id (etykieta służy tylko do wyświetlania), a funkcje
+# obsługi zamieniają go z powrotem na nazwę przez resolve_user().
+#
+# Przykład użycia:
+#   user_selector = gr.Dropdown(choices=user_choices(""), value=None)
+#   user_search.change(fn=lambda q: gr.update(choices=user_choices(q)), inputs=user_search,
+#                      outputs=user_selector, **search_event_options())
+#   username = resolve_user(selected)  # user_id -> nazwa (lub None)
+
+from gradio_admin.functions.search_index import suggest_users
+from gradio_admin.functions.user_records import get_repository
+
+
+def _picker_limit():
+    """Zwraca settings.USER_PICKER_LIMIT (odczyt przy wywołaniu)."""
+    import settings
+    return int(getattr(settings, "USER_PICKER_LIMIT", 20))
+
+
+def search_event_options():
+    """
+    Zwraca opcje zdarzenia .change() pola wyszukiwania. W gradio>=4 trigger_mode="always_last"
+    łączy naciśnięcia klawiszy z czasu obsługi w jedno wywołanie z ostatnią wartością;
+    Gradio 3.x nie zna tej opcji - zdarzenie jest wtedy rejestrowane bez niej.
+    """
+    import gradio as gr
+    try:
+        major = int(str(gr.__version__).split(".")[0])
+    except (AttributeError, ValueError):
+        return {}
+    return {"trigger_mode": "always_last"} if major >= 4 else {}
+
+
+def user_value(username, record):
+    """Zwraca stały identyfikator pozycji listy: user_id rekordu lub nazwę, gdy go brak."""
+    user_id = (record or {}).get("user_id")
+    return str(user_id) if user_id not in (None, "", "N/A") else username
+
+
+def user_choices(query="", describe=None, limit=None):
+    """
+    Zwraca kandydatów listy wyboru dla zapytania.
+    :param describe: Funkcja (nazwa, rekord) -> etykieta (domyślnie sama nazwa).
+    :return: Lista krotek (etykieta, identyfikator) dla gr.Dropdown.
+    """
+    records = get_repository().records()
+    choices = []
+    for username in suggest_users(query, limit or _picker_limit()):
+        record = records.get(username)
+        if record is None:
+            continue
+        label = describe(username, record) if describe else username
+        choices.append((label, user_value(username, record)))
+    return choices
+
+
+def resolve_user(value):
+    """
+    Zamienia wartość z listy wyboru na nazwę użytkownika. Nazwa jest akceptowana
+    tylko dla rekordów bez user_id (tylko takie mają ją jako wartość listy).
+    :return: Nazwa użytkownika lub None (brak wyboru albo nieznany identyfikator).
+    """
+    if isinstance(value, (list, tuple)):
+        value = value[0] if value else None
+    if not value:
+        return None
+    repository = get_repository()
+    username = repository.find_by_user_id(value)
+    if username is not None:
+        return username
+    record = repository.get(value)
+    return value if record is not None and user_value(value, record) == value else None
@@ -1,20 +1,150 @@
 #!/usr/bin/env python3
 # gradio_admin/functions/user_records.py
 # Narzędzia do pracy z danymi użytkowników w projekcie wg_qr_generator
+#
+# Rekordy są trzymane w jednym repozytorium na proces Gradio. Przy każdym odczycie
+# repozytorium porównuje stat pliku bazy (mtime/rozmiar/i-węzeł) z zapamiętanym
+# i wczytuje dane ponownie tylko po zmianie, zwiększając licznik wersji.
+# Pochodne widoki (DataFrame, HTML) można cache'ować funkcją derived() - są
+# przeliczane dopiero przy nowej wersji danych.
+#
+# Przykład użycia:
+#   from gradio_admin.functions.user_records import get_repository
+#   repo = get_repository()
+#   record = repo.get("jan")
+#   table = repo.derived("tabela", lambda records: build_table(records))
 
-import json
 import os
+import threading
+
+from modules.user_store import open_user_store, resolve_backend, sqlite_path_for
 
 USER_RECORDS_PATH = os.path.join(os.path.dirname(__file__), "../../user/data/user_records.json")
 
+
+class UserRecordRepository:
+    """Współdzielona, unieważniana po zmianie pliku kopia rekordów użytkowników."""
+
+    def __init__(self, path=USER_RECORDS_PATH):
+        self.path = os.path.abspath(str(path))
+        self._lock = threading.RLock()
+        self._key = None
+        self._version = 0
+        self._records = {}
+        self._by_lower = {}
+        self._by_public_key = {}
+        self._by_user_id = {}
+        self._derived = {}
+
+    def _watched_paths(self):
+        """Pliki, których zmiana oznacza nową wersję danych."""
+        if resolve_backend() == "sqlite":
+            db_path = sqlite_path_for(self.path)
+            # W trybie WAL zapisy trafiają najpierw do pliku -wal
+            return (self.path, db_path, f"{db_path}-wal")
+        return (self.path,)
+
+    def _stat_key(self):
+        key = []
+        for path in self._watched_paths():
+            try:
+                stat = os.stat(path)
+                key.append((path, stat.st_mtime_ns, stat.st_size, stat.st_ino))
+            except FileNotFoundError:
+                key.append((path, None))
+        return tuple(key)
+
+    def refresh(self):
+        """
+        Wczytuje rekordy ponownie, jeśli plik bazy się zmienił.
+        :return: Bieżący numer wersji.
+        """
+        key = self._stat_key()
+        with self._lock:
+            if key == self._key:
+                return self._version
+            if all(entry[1] is None for entry in key):
+                print("[DEBUG] Plik user_records.json nie znaleziony!")
+                records = {}
+            else:
+                try:
+                    records = open_user_store(self.path).all()
+                except ValueError as e:
+                    print(f"[DEBUG] Błąd dekodowania JSON w user_records.json: {e}")
+                    records = {}
+            self._records = records
+            self._by_lower = {username.lower(): username for username in records}
+            self._by_public_key = {r.get("public_key"): u for u, r in records.items() if r.get("public_key")}
+            self._by_user_id = {str(r.get("user_id")): u for u, r in records.items() if r.get("user_id")}
+            self._derived = {}
+            self._key = key
+            self._version += 1
+            return self._version
+
+    def invalidate(self):
+        """Wymusza ponowne wczytanie przy następnym odczycie."""
+        with self._lock:
+            self._key = None
+
+    @property
+    def version(self):
+        """Numer wersji danych (rośnie po każdej zmianie pliku)."""
+        return self.refresh()
+
+    def records(self):
+        """Zwraca wszystkie rekordy {nazwa_użytkownika: rekord} (tylko do odczytu)."""
+        with self._lock:
+            self.refresh()
+            return self._records
+
+    def get(self, username):
+        """Zwraca rekord użytkownika lub None."""
+        return self.records().get(username)
+
+    def exists(self, username):
+        """Sprawdza istnienie użytkownika (bez rozróżniania wielkości liter)."""
+        with self._lock:
+            self.refresh()
+            return username.lower() in self._by_lower
+
+    def find_by_public_key(self, public_key):
+        """Zwraca nazwę użytkownika dla klucza publicznego lub None."""
+        with self._lock:
+            self.refresh()
+            return self._by_public_key.get(public_key)
+
+    def find_by_user_id(self, user_id):
+        """Zwraca nazwę użytkownika dla user_id lub None."""
+        with self._lock:
+            self.refresh()
+            return self._by_user_id.get(str(user_id))
+
+    def derived(self, name, builder):
+        """
+        Zwraca widok pochodny przeliczany tylko przy zmianie wersji danych.
+        :param name: Klucz widoku (np. ("tabela", True)).
+        :param builder: Funkcja builder(records) budująca widok.
+        """
+        with self._lock:
+            self.refresh()
+            if name not in self._derived:
+                self._derived[name] = builder(self._records)
+            return self._derived[name]
+
+
+_repository = None
+_repository_lock = threading.Lock()
+
+
+def get_repository():
+    """Zwraca współdzielone repozytorium rekordów procesu Gradio."""
+    global _repository
+    with _repository_lock:
+        if _repository is None:
+            _repository = UserRecordRepository()
+        return _repository
+
+
 def load_user_records():
-    """Wczytuje dane użytkowników z pliku user_records.json."""
-    try:
-        with open(USER_RECORDS_PATH, "r") as f:
-            return json.load(f)
-    except FileNotFoundError:
-        print("[DEBUG] Plik user_records.json nie znaleziony!")
-        return {}
-    except json.JSONDecodeError as e:
-        print(f"[DEBUG] Błąd dekodowania JSON w user_records.json: {e}")
-        return {}
+    """Wczytuje dane użytkowników (kopia z repozytorium, odświeżana po zmianie pliku)."""
+    return dict(get_repository().records())
@@ -1,7 +1,12 @@
 #!/usr/bin/env python3
 # gradio_admin/main_interface.py
+# Zakładki budowane z treścią zastępczą; dane wczytywane przy wyborze zakładki
+# (gradio_admin/functions/lazy_tabs.py), czasy budowy w BUILD_TIMES
 
+import time
 import gradio as gr
+from gradio_admin.functions.lazy_tabs import build_tab
+from gradio_admin.functions.executor import describe_jobs  # Zadania w pulach funkcji obsługi
 from gradio_admin.tabs.create_user_tab import create_user_tab
 from gradio_admin.tabs.manage_user_tab import manage_user_tab
 from gradio_admin.tabs.statistics_tab import statistics_tab
@@ -10,27 +15,31 @@ from gradio_admin.tabs.ai_diagnostics_tab import ai_diagnostics_tab
 from gradio_admin.tabs.ai_report_tab import ai_report_tab
 
 # Tworzenie interfejsu
+_started = time.perf_counter()
 with gr.Blocks(title="pyWGgen - Menedżer VPN") as admin_interface:
     gr.Markdown("""
     # 🛡️ pyWGgen - Menedżer VPN WireGuard
     
     Zarządzanie serwerem VPN z asystentem AI
     """)
+    jobs_status = gr.Markdown(value=describe_jobs, every=2)
     
-    with gr.Tab(label="🌱 Tworzenie"):
-        create_user_tab()
+    with gr.Tab(label="🌱 Tworzenie") as tab:
+        build_tab(tab, create_user_tab)
     
-    with gr.Tab(label="🛠️ Zarządzanie"):
-        manage_user_tab()
+    with gr.Tab(label="🛠️ Zarządzanie") as tab:
+        build_tab(tab, manage_user_tab)
     
-    with gr.Tab(label="📊 Statystyki"):
-        statistics_tab()
+    with gr.Tab(label="📊 Statystyki") as tab:
+        build_tab(tab, statistics_tab)
     
-    with gr.Tab(label="🚀 Diagnostyka AI"):
-        ai_diagnostics_tab()
+    with gr.Tab(label="🚀 Diagnostyka AI") as tab:
+        build_tab(tab, ai_diagnostics_tab)
     
-    with gr.Tab(label="💬 Chat AI"):
-        ollama_chat_tab()
+    with gr.Tab(label="💬 Chat AI") as tab:
+        build_tab(tab, ollama_chat_tab)
     
-    with gr.Tab(label="📄 Raport AI"):
-        ai_report_tab()
+    with gr.Tab(label="📄 Raport AI") as tab:
+        build_tab(tab, ai_report_tab)
+
+BUILD_SECONDS = time.perf_counter() - _started  # Czas budowy całego interfejsu
@@ -8,10 +8,9 @@ from datetime import datetime
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 import settings
+from gradio_admin.functions.executor import pooled  # Sondy w puli "probe", jedna diagnostyka naraz
 
-from ai_assistant.data_collector import collect_all_data
-from ai_assistant.ai_analyzer import analyze_with_ai
-from ai_assistant.utils import save_json_log, check_ollama
+# Moduły ai_assistant (requests, kolektor danych) importowane przy pierwszym użyciu
 
 
 def format_diagnostics_summary(data: dict) -> str:
@@ -75,9 +74,14 @@ def format_diagnostics_summary(data: dict) -> str:
     return summary
 
 
+@pooled("probe", limit=1)
 def run_diagnostics():
     """Uruchamia pełną diagnostykę."""
     try:
+        from ai_assistant.data_collector import collect_all_data
+        from ai_assistant.ai_analyzer import analyze_with_ai
+        from ai_assistant.utils import save_json_log, check_ollama
+
         # Zbierz dane
         data = collect_all_data()
         
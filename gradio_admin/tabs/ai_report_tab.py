@@ -8,14 +8,18 @@ from pathlib import Path
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 import settings
+from gradio_admin.functions.executor import pooled  # Zbieranie danych w puli "probe"
 
-from ai_assistant.data_collector import collect_all_data
-from ai_assistant.ai_report import generate_report, get_report_dir
+# Moduły ai_assistant (requests, kolektor danych) importowane przy pierwszym użyciu
 
 
+@pooled("probe", limit=1)
 def generate_html_report():
     """Generuje raport HTML."""
     try:
+        from ai_assistant.data_collector import collect_all_data
+        from ai_assistant.ai_report import generate_report
+
         # Zbierz dane
         data = collect_all_data()
         
@@ -44,6 +48,7 @@ def generate_html_report():
 def list_previous_reports():
     """Lista poprzednich raportów."""
     try:
+        from ai_assistant.ai_report import get_report_dir
         report_dir = get_report_dir()
         reports = sorted(report_dir.glob("report_*.html"), reverse=True)
         
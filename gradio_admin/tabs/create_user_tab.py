@@ -4,6 +4,7 @@
 
 import gradio as gr
 from gradio_admin.functions.create_user import create_user
+from gradio_admin.functions.executor import pooled  # Zmiany konfiguracji wykonywane po kolei
 
 def create_user_tab():
     """
@@ -18,6 +19,7 @@ def create_user_tab():
     output_message = gr.Textbox(label="Wynik", interactive=False)
     qr_code_display = gr.Image(label="Kod QR", visible=False)
 
+    @pooled("mutation")
     def handle_create_user(username, email, telegram_id):
         result, qr_code_path = create_user(username, email, telegram_id)
         
@@ -5,6 +5,9 @@ import gradio as gr  # type: ignore
 from gradio_admin.functions.delete_user import delete_user
 from gradio_admin.functions.user_records import load_user_records
 from gradio_admin.functions.block_user import block_user, unblock_user
+from gradio_admin.functions.executor import pooled  # Zmiany konfiguracji wykonywane po kolei, wyszukiwanie w puli "render"
+from gradio_admin.functions.lazy_tabs import on_tab_select  # Lista użytkowników wczytywana przy otwarciu zakładki
+from gradio_admin.functions.user_picker import resolve_user, search_event_options, user_choices  # Kandydaci z wyszukiwania po stronie serwera
 
 # Import funkcji synchronizacji
 from modules.sync import sync_users_from_config_paths
@@ -26,10 +29,10 @@ def get_user_config_path(username):
     return None
 
 def handle_download_config(selected_user):
-    """Obsługuje pobieranie konfiguracji użytkownika."""
-    if not selected_user or selected_user == "Wybierz użytkownika":
+    """Obsługuje pobieranie konfiguracji użytkownika (wartość listy to user_id)."""
+    username = resolve_user(selected_user)
+    if not username:
         return None, "Najpierw wybierz użytkownika."
-    username = selected_user.split(" ")[0]
     config_path = get_user_config_path(username)
     if config_path:
         return config_path, f"Plik konfiguracji dla użytkownika {username} gotowy do pobrania."
@@ -40,48 +43,70 @@ def manage_user_tab():
     
     gr.Markdown("# 🛠️ Zarządzanie użytkownikami\n\nUsuwanie, blokowanie, odblokowywanie i pobieranie konfiguracji")
 
-    def get_user_list():
-        """Pobiera listę użytkowników z rekordów."""
-        records = load_user_records()
-        user_list = []
-        for username, user_data in records.items():
-            status = user_data.get("status", "nieznany")
-            display_status = f"({status.capitalize()})" if status else ""
-            user_list.append(f"{username} {display_status}".strip())
-        return ["Wybierz użytkownika"] + user_list
+    def describe_user(username, user_data):
+        """Etykieta pozycji listy: nazwa i status."""
+        status = user_data.get("status", "nieznany")
+        display_status = f"({status.capitalize()})" if status else ""
+        return f"{username} {display_status}".strip()
 
-    def refresh_user_list():
-        return gr.update(choices=get_user_list(), value="Wybierz użytkownika"), "Lista użytkowników zaktualizowana."
+    def get_user_list(query=""):
+        """Zwraca najwyżej USER_PICKER_LIMIT par (etykieta, user_id) pasujących do zapytania."""
+        return user_choices(query, describe_user)
 
-    def handle_user_deletion(selected_user):
+    def keep_selection(selected_user, query):
+        """Nowi kandydaci listy; wybór zostaje, jeśli nadal jest wśród nich."""
+        choices = get_user_list(query)
+        value = selected_user if any(value == selected_user for _, value in choices) else None
+        return gr.update(choices=choices, value=value)
+
+    @pooled("render")
+    def search_user_list(query):
+        """Kandydaci listy dla wpisanego tekstu; naciśnięcia w trakcie łączy search_event_options()."""
+        return gr.update(choices=get_user_list(query))
+
+    def refresh_user_list(query):
+        return gr.update(choices=get_user_list(query), value=None), "Lista użytkowników zaktualizowana."
+
+    @pooled("mutation")
+    def handle_user_deletion(selected_user, query):
         """Obsługuje usuwanie użytkownika."""
-        username = selected_user.split(" ")[0]
+        username = resolve_user(selected_user)
+        if not username:
+            return gr.update(), "Najpierw wybierz użytkownika."
         success = delete_user(username)
         if success:
-            return gr.update(choices=get_user_list(), value="Wybierz użytkownika"), f"Użytkownik '{username}' został usunięty."
+            return gr.update(choices=get_user_list(query), value=None), f"Użytkownik '{username}' został usunięty."
         return gr.update(), f"Nie udało się usunąć użytkownika '{username}'."
 
-    def handle_user_block(selected_user):
+    @pooled("mutation")
+    def handle_user_block(selected_user, query):
         """Obsługuje blokowanie użytkownika."""
-        username = selected_user.split(" ")[0]
+        username = resolve_user(selected_user)
+        if not username:
+            return gr.update(), "Najpierw wybierz użytkownika."
         success, message = block_user(username)
-        return gr.update(choices=get_user_list(), value="Wybierz użytkownika"), message
+        return keep_selection(selected_user, query), message
 
-    def handle_user_unblock(selected_user):
+    @pooled("mutation")
+    def handle_user_unblock(selected_user, query):
         """Obsługuje odblokowywanie użytkownika."""
-        username = selected_user.split(" ")[0]
+        username = resolve_user(selected_user)
+        if not username:
+            return gr.update(), "Najpierw wybierz użytkownika."
         success, message = unblock_user(username)
-        return gr.update(choices=get_user_list(), value="Wybierz użytkownika"), message
+        return keep_selection(selected_user, query), message
 
     # Nowa funkcja dla przycisku "Synchronizuj"
+    @pooled("mutation")
     def handle_sync(config_dir_str, qr_dir_str):
         """Obsługuje synchronizację użytkowników."""
         success, log = sync_users_from_config_paths(config_dir_str, qr_dir_str)
         return log  # Zwraca logi synchronizacji
 
-    # Wiersz z dropdownem i przyciskiem "Odśwież"
+    # Wiersz z wyszukiwaniem, dropdownem (tylko najlepsi kandydaci) i przyciskiem "Odśwież"
     with gr.Row():
-        user_selector = gr.Dropdown(choices=get_user_list(), value="Wybierz użytkownika", interactive=True)
+        user_search = gr.Textbox(label="Szukaj użytkownika", placeholder="Nazwa, IP, email, UID...")
+        user_selector = gr.Dropdown(label="Wybierz użytkownika", choices=[], value=None, interactive=True)
         refresh_button = gr.Button("Odśwież listę")
 
     # Wiersz z przyciskami Usuń, Blokuj, Odblokuj + Pobierz konfigurację
@@ -105,25 +130,35 @@ def manage_user_tab():
         qr_dir_input = gr.Textbox(label="Ścieżka do katalogu kodów QR", value="", lines=1)
         sync_button = gr.Button("Synchronizuj")
 
+    # Lista użytkowników wczytywana przy wyborze zakładki (zachowuje bieżący wybór)
+    on_tab_select(lambda query: gr.update(choices=get_user_list(query)), inputs=[user_search],
+                  outputs=[user_selector])
+    user_search.change(
+        fn=search_user_list,
+        inputs=[user_search],
+        outputs=[user_selector],
+        **search_event_options()
+    )
+
     # Definiowanie zachowań przycisków
     refresh_button.click(
         fn=refresh_user_list,
-        inputs=[],
+        inputs=[user_search],
         outputs=[user_selector, result_display]
     )
     delete_button.click(
         fn=handle_user_deletion,
-        inputs=[user_selector],
+        inputs=[user_selector, user_search],
         outputs=[user_selector, result_display]
     )
     block_button.click(
         fn=handle_user_block,
-        inputs=[user_selector],
+        inputs=[user_selector, user_search],
         outputs=[user_selector, result_display]
     )
     unblock_button.click(
         fn=handle_user_unblock,
-        inputs=[user_selector],
+        inputs=[user_selector, user_search],
         outputs=[user_selector, result_display]
     )
     sync_button.click(
@@ -8,9 +8,10 @@ import os
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 import settings
 
-from ai_assistant.data_collector import collect_all_data
-from ai_assistant.ai_chat import ask_question
-from ai_assistant.utils import check_ollama, run_cmd
+from gradio_admin.functions.executor import pooled  # Sondy i zapytania do Ollama w puli "probe"
+from gradio_admin.functions.lazy_tabs import on_tab_select  # Kontekst serwera wczytywany przy otwarciu zakładki
+
+# Moduły ai_assistant (requests, kolektor danych) importowane przy pierwszym użyciu
 
 # Globalne ustawienia AI
 ai_settings = {
@@ -35,9 +36,13 @@ def load_ai_help() -> str:
         return f"❌ Błąd wczytywania pomocy: {str(e)}"
 
 
+@pooled("probe", limit=1)
 def get_server_context_html() -> str:
     """Pobiera kontekst serwera w formacie HTML."""
     try:
+        from ai_assistant.data_collector import collect_all_data
+        from ai_assistant.utils import run_cmd
+
         data = collect_all_data()
         
         nat = data.get("nat", {})
@@ -96,6 +101,14 @@ def get_server_context_html() -> str:
         return f"❌ **Błąd wczytywania kontekstu:**\n\n```\n{str(e)}\n```"
 
 
+CONTEXT_PLACEHOLDER = "⏳ Wczytywanie kontekstu serwera..."
+
+
+def load_server_context(current):
+    """Wczytuje kontekst serwera przy pierwszym otwarciu zakładki (później przycisk Odśwież)."""
+    return get_server_context_html() if current == CONTEXT_PLACEHOLDER else gr.update()
+
+
 def update_ai_settings(temperature, max_tokens, system_prompt):
     """Aktualizuje ustawienia AI."""
     ai_settings["temperature"] = temperature
@@ -104,9 +117,14 @@ def update_ai_settings(temperature, max_tokens, system_prompt):
     return f"✅ Ustawienia AI zaktualizowane:\n- Temperatura: {temperature}\n- Max tokenów: {max_tokens}"
 
 
+@pooled("probe", limit=2)
 def chat_with_ai(message, history):
     """Chat z AI (dla Gradio ChatInterface)."""
     try:
+        from ai_assistant.data_collector import collect_all_data
+        from ai_assistant.ai_chat import ask_question
+        from ai_assistant.utils import check_ollama
+
         # Zbierz dane
         data = collect_all_data()
         
@@ -149,9 +167,10 @@ def ollama_chat_tab():
             
             # Kontekst serwera
             with gr.Accordion("Kontekst serwera", open=False, elem_id="server_context_accordion"):
-                context_output = gr.Markdown(value=get_server_context_html())
+                context_output = gr.Markdown(value=CONTEXT_PLACEHOLDER)
                 refresh_context_btn = gr.Button("Odśwież", variant="secondary", size="sm")
                 refresh_context_btn.click(fn=get_server_context_html, outputs=context_output)
+                on_tab_select(load_server_context, inputs=[context_output], outputs=[context_output])
             
             # Ustawienia AI
             with gr.Accordion("Ustawienia AI", open=False, elem_id="ai_settings_accordion"):
@@ -3,79 +3,25 @@
 # Zakładka "Statystyki" dla interfejsu Gradio projektu pyWGgen
 
 import gradio as gr  # type: ignore
-import pandas as pd  # type: ignore
-import os
 from pathlib import Path
-from gradio_admin.functions.user_records import load_user_records
-from gradio_admin.functions.format_helpers import format_time
-from gradio_admin.functions.table_helpers import update_table
-from gradio_admin.functions.format_helpers import format_user_info
+from gradio_admin.functions.table_helpers import table_page  # Stronicowana tabela HTML
+from gradio_admin.functions.table_helpers import COLUMNS, DEFAULT_PAGE_SIZE, PAGE_SIZES, TABLE_CSS
+from gradio_admin.functions.search_index import warm_search_index
+from gradio_admin.functions.executor import pooled  # Budowa tabeli w puli "render"
+from gradio_admin.functions.user_picker import resolve_user, search_event_options, user_choices  # Kandydaci z wyszukiwania po stronie serwera
+from gradio_admin.functions.lazy_tabs import on_tab_select  # Dane wczytywane przy otwarciu zakładki
 from gradio_admin.functions.show_user_info import show_user_info
-from modules.traffic_updater import update_traffic_data
-from settings import USER_DB_PATH, QR_CODE_DIR
+from modules.stats_daemon import describe_status, read_status  # Dane zbiera kolektor w tle
+from modules.qr_worker import ensure_user_qr
+from settings import QR_CODE_DIR
 
 def statistics_tab():
     """Tworzy zakładkę statystyk dla użytkowników WireGuard."""
     
     gr.Markdown("# 🔍 Statystyki - Statystyka użytkowników\n\nPrzeglądanie statystyk, ruchu i informacji o użytkownikach")
-    
-    # Pobranie początkowych danych
-    def get_initial_data():
-        update_traffic_data(USER_DB_PATH)
-        table = update_table(True)
-        # ✅ Poprawione: zawsze zapewnij poprawne kolumny
-        columns = ["👤 Użytkownik", "📊 Zużyto", "📦 Limit", "🌐 Adres IP", "⚡ Stan", "💳 Cena", "UID"]
-        if table.empty:
-            table = pd.DataFrame([], columns=columns)
-        user_list = ["Wybierz użytkownika"] + table["👤 Użytkownik"].tolist()
-        return table, user_list
-
-    initial_table, initial_user_list = get_initial_data()
-    
-    # Funkcja do konwersji DataFrame na HTML
-    def df_to_html(df):
-        if df.empty:
-            return "<p style='text-align: center; padding: 20px; color: #9ca3af;'>Brak dostępnych danych</p>"
-        
-        html = """
-        <div style="width: 100%; overflow-x: auto;">
-            <table style="width: 100%; border-collapse: collapse; font-family: system-ui, -apple-system, sans-serif; font-size: 14px;">
-                <thead>
-                    <tr style="background-color: #0f0f11; color: #d1d5db;">
-        """
-        
-        for idx, col in enumerate(df.columns):
-            border_style = "border-bottom: 1px solid #3f3f46;"
-            if idx < len(df.columns) - 1:
-                border_style += " border-right: 1px solid #3f3f46;"
-            html += f'<th style="padding: 12px 16px; text-align: left; font-weight: 600; {border_style}">{col}</th>'
-        
-        html += """
-                    </tr>
-                </thead>
-                <tbody>
-        """
-        
-        for row_idx, row in df.iterrows():
-            # Naprzemienne kolory: #27272a i #2d2d30
-            bg_color = "#27272a" if row_idx % 2 == 0 else "#2d2d30"
-            html += f'<tr style="background-color: {bg_color}; color: #d1d5db;">'
-            for col_idx, val in enumerate(row):
-                border_style = ""
-                if row_idx < len(df) - 1:
-                    border_style += "border-bottom: 1px solid #3f3f46;"
-                if col_idx < len(row) - 1:
-                    border_style += " border-right: 1px solid #3f3f46;"
-                html += f'<td style="padding: 10px 16px; {border_style}">{val}</td>'
-            html += '</tr>'
-        
-        html += """
-                </tbody>
-            </table>
-        </div>
-        """
-        return html
 
+    stats_status = gr.Markdown("⏳ Wczytywanie statystyk...")
+    
     # Checkbox "Pokaż zablokowanych" i przycisk Odśwież
     with gr.Row():
         show_inactive = gr.Checkbox(label="Pokaż zablokowanych", value=True, scale=1)
@@ -89,8 +35,8 @@ def statistics_tab():
         with gr.Column(scale=3):
             user_selector = gr.Dropdown(
                 label="Wybierz użytkownika",
-                choices=initial_user_list,
-                value="Wybierz użytkownika",
+                choices=[],
+                value=None,
                 interactive=True
             )
             user_info_display = gr.Textbox(
@@ -107,68 +53,99 @@ def statistics_tab():
                 height=200
             )
 
-    # Tabela HTML zamiast Dataframe
-    stats_table_html = gr.HTML(value=df_to_html(initial_table), elem_id="statistics_table")
-
-    # Funkcja odświeżania tabeli i resetowania danych
-    def refresh_table(show_inactive):
-        update_traffic_data(USER_DB_PATH)
-        table = update_table(show_inactive)
-        columns = ["👤 Użytkownik", "📊 Zużyto", "📦 Limit", "🌐 Adres IP", "⚡ Stan", "💳 Cena", "UID"]
-        
-        if table.empty:
-            table = pd.DataFrame([], columns=columns)
-            print("[DEBUG] Tabela jest pusta po aktualizacji.")
-        else:
-            print(f"[DEBUG] Zaktualizowana tabela:\n{table}")
-        
-        user_list = ["Wybierz użytkownika"] + table["👤 Użytkownik"].tolist()
-        print(f"[DEBUG] Lista użytkowników: {user_list}")
-        return "", df_to_html(table), gr.update(choices=user_list, value="Wybierz użytkownika"), "", None
+    # Sortowanie i stronicowanie po stronie serwera
+    with gr.Row():
+        sort_column = gr.Dropdown(label="Sortuj wg", choices=COLUMNS, value=COLUMNS[0], interactive=True, scale=2)
+        sort_descending = gr.Checkbox(label="Malejąco", value=False, scale=1)
+        page_size = gr.Dropdown(label="Wierszy na stronę", choices=PAGE_SIZES, value=DEFAULT_PAGE_SIZE,
+                                interactive=True, scale=1)
+
+    def render_page(show_inactive, query, sort_by, descending, page, size):
+        """Zwraca HTML strony tabeli, numer strony i opis stronicowania."""
+        page_html, page, pages, rows = table_page(show_inactive, query, sort_by, descending, page, size)
+        return page_html, page, f"Strona {page} z {pages} ({rows} użytkowników)"
+
+    # Tabela HTML zamiast Dataframe; style tabeli to wspólne klasy CSS wysyłane raz
+    gr.HTML(value=f"<style>{TABLE_CSS}</style>")
+    stats_table_html = gr.HTML(value="", elem_id="statistics_table")
+
+    with gr.Row():
+        prev_button = gr.Button("◀ Poprzednia", scale=0, min_width=120)
+        page_number = gr.Number(label="Strona", value=1, precision=0, minimum=1, scale=0, min_width=100)
+        next_button = gr.Button("Następna ▶", scale=0, min_width=120)
+        page_info = gr.Markdown("")
+
+    page_inputs = [show_inactive, search_input, sort_column, sort_descending, page_number, page_size]
+    page_outputs = [stats_table_html, page_number, page_info]
+
+    @pooled("render")
+    def load_tab(show_inactive, query, sort_by, descending, page, size):
+        """Wczytuje tabelę, listę użytkowników i stan kolektora przy wyborze zakładki."""
+        page_html, page, info = render_page(show_inactive, query, sort_by, descending, page, size)
+        return page_html, page, info, gr.update(choices=user_choices(query)), describe_status(read_status())
+
+    on_tab_select(load_tab, inputs=page_inputs, outputs=page_outputs + [user_selector, stats_status])
+
+    # Funkcja odświeżania tabeli i resetowania danych (tylko pierwsza strona i kandydaci listy wyboru)
+    @pooled("render")
+    def refresh_table(show_inactive, sort_by, descending, size):
+        page_html, page, info = render_page(show_inactive, "", sort_by, descending, 1, size)
+        user_list = user_choices("")  # Tylko najlepsi kandydaci; pozostali przez pole wyszukiwania
+        return ("", page_html, page, info, gr.update(choices=user_list, value=None), "", None,
+                describe_status(read_status()))
 
     refresh_button.click(
         fn=refresh_table,
-        inputs=[show_inactive],
-        outputs=[search_input, stats_table_html, user_selector, user_info_display, qr_code_display]
+        inputs=[show_inactive, sort_column, sort_descending, page_size],
+        outputs=[search_input, stats_table_html, page_number, page_info, user_selector, user_info_display,
+                 qr_code_display, stats_status]
     )
 
-    def search_table(query):
-        """Filtrowanie tabeli według zapytania wyszukiwania."""
-        table = update_table(True)
-        columns = ["👤 Użytkownik", "📊 Zużyto", "📦 Limit", "🌐 Adres IP", "⚡ Stan", "💳 Cena", "UID"]
-        if table.empty:
-            table = pd.DataFrame([], columns=columns)
-        
-        if query:
-            filtered_table = table.loc[
-                table.apply(lambda row: query.lower() in " ".join(map(str, row)).lower(), axis=1)
-            ]
-            print(f"[DEBUG] Filtrowana tabela:\n{filtered_table}")
-            return df_to_html(filtered_table)
-        return df_to_html(table)
+    @pooled("render")
+    def search_table(show_inactive, query, sort_by, descending, page, size):
+        """Filtrowanie tabeli według zapytania wyszukiwania (od pierwszej strony)."""
+        return render_page(show_inactive, query, sort_by, descending, 1, size)
+
+    def debounced_search(show_inactive, query, sort_by, descending, page, size):
+        """
+        Zapytanie filtruje tabelę i zawęża kandydatów listy wyboru użytkownika.
+        Naciśnięcia klawiszy w trakcie obsługi łączy trigger_mode="always_last" (search_event_options).
+        """
+        return (*search_table(show_inactive, query, sort_by, descending, page, size),
+                gr.update(choices=user_choices(query)))
 
+    warm_search_index()
     search_input.change(
-        fn=search_table,
-        inputs=[search_input],
-        outputs=[stats_table_html]
+        fn=debounced_search,
+        inputs=page_inputs,
+        outputs=page_outputs + [user_selector],
+        **search_event_options()
     )
 
+    def change_page(step):
+        @pooled("render")
+        def handler(show_inactive, query, sort_by, descending, page, size):
+            return render_page(show_inactive, query, sort_by, descending, int(page or 1) + step, size)
+        return handler
+
+    prev_button.click(fn=change_page(-1), inputs=page_inputs, outputs=page_outputs)
+    next_button.click(fn=change_page(1), inputs=page_inputs, outputs=page_outputs)
+    page_number.submit(fn=change_page(0), inputs=page_inputs, outputs=page_outputs)
+    for control in (show_inactive, sort_column, sort_descending, page_size):
+        control.change(fn=search_table, inputs=page_inputs, outputs=page_outputs)
+
     def find_qr_code(username):
-        """Znajduje plik kodu QR dla użytkownika."""
+        """Znajduje plik kodu QR dla użytkownika (brakujący generuje z konfiguracji)."""
         qr_code_file = Path(QR_CODE_DIR) / f"{username}.png"
         if qr_code_file.exists():
             return str(qr_code_file)
-        return None
+        return ensure_user_qr(username)
 
+    @pooled("render")  # ensure_user_qr może czekać na renderowanie kodu QR
     def display_user_info(selected_user):
-        """Wyświetla informacje o wybranym użytkowniku."""
-        if isinstance(selected_user, list):
-            if len(selected_user) > 0:
-                selected_user = selected_user[0]
-            else:
-                selected_user = "Wybierz użytkownika"
-
-        if not selected_user or selected_user == "Wybierz użytkownika":
+        """Wyświetla informacje o wybranym użytkowniku (wartość listy to user_id)."""
+        selected_user = resolve_user(selected_user)
+        if not selected_user:
             return "", None
 
         user_info = show_user_info(selected_user)
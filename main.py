@@ -6,30 +6,34 @@
 ## Ten skrypt automatycznie generuje konfiguracje dla nowych użytkowników,
 ## włączając unikalne klucze, adres IP oraz kod QR. Skrypt oblicza podsieć
 ## na podstawie adresu IP serwera (SERVER_WG_IPV4) i synchronizuje interfejs WireGuard.
+## Tryb wsadowy (--batch) tworzy wielu użytkowników z pliku CSV/JSONL jedną synchronizacją.
 
 import sys
 import os
+import csv
 import json
 import ipaddress
+import re
+from concurrent.futures import wait as wait_futures
+from contextlib import nullcontext
 from datetime import datetime
 import settings
 from modules.config import load_params
-from modules.keygen import generate_private_key, generate_public_key, generate_preshared_key
+from modules.keygen import generate_private_key, generate_public_key, generate_preshared_key, generate_keypairs
 from modules.directory_setup import setup_directories
 from modules.client_config import create_client_config
 from modules.main_registration_fields import create_user_record  # Import nowej funkcji
+from modules.ip_allocator import load_ip_pool, rebuild_ip_pool, release_ip, save_ip_pool
+from modules.file_lock import file_lock
+from modules.sync_scheduler import schedule_sync
+from modules.qr_worker import submit_qr
+from modules.user_store import open_user_store
+from modules.server_config import add_server_peers, load_server_config, remove_server_peers
+from modules.utils import get_wireguard_subnet
 import subprocess
 import logging
-import qrcode
 import tempfile
 
-# Konfiguracja loggera
-logging.basicConfig(
-    level=logging.DEBUG,
-    format="%(asctime)s - %(levelname)-8s %(message)s",
-    handlers=[logging.StreamHandler()]
-)
-
 DEBUG_EMOJI = "🐛"
 INFO_EMOJI = "ℹ️"
 WARNING_EMOJI = "⚠️"
@@ -67,84 +71,97 @@ def calculate_subnet(server_wg_ipv4, default_subnet="10.66.66.0/24"):
         logger.warning(f"Błąd obliczania podsieci: {e}. Używam wartości domyślnej: {default_subnet}")
         return default_subnet
 
-def generate_next_ip(config_file, subnet="10.66.66.0/24"):
+def resolve_subnet(params, config_file):
+    """
+    Ustala podsieć klientów: z linii Address sekcji [Interface] konfiguracji serwera
+    (obsługuje dowolny prefiks, np. /16), a w razie braku - z SERVER_WG_IPV4 (/24).
+    """
+    try:
+        subnet = str(ipaddress.ip_interface(get_wireguard_subnet(str(config_file))).network)
+        logger.debug(f"Podsieć odczytana z konfiguracji serwera: {subnet}")
+        return subnet
+    except (FileNotFoundError, ValueError) as e:
+        logger.debug(f"Nie udało się odczytać podsieci z {config_file}: {e}")
+        return calculate_subnet(params.get('SERVER_WG_IPV4', '10.66.66.1'))
+
+def generate_next_ips(config_file, subnet="10.66.66.0/24", count=1, pool_path=None):
+    """
+    Przydziela kolejne dostępne adresy IP w podsieci przez pulę bitmapową.
+    :param config_file: Ścieżka do pliku konfiguracyjnego WireGuard.
+    :param subnet: Podsieć do wyszukiwania wolnych IP.
+    :param count: Liczba adresów do przydzielenia.
+    :param pool_path: Ścieżka do zapisanej puli adresów. Jeśli None, pula jest budowana z config_file.
+    :return: Lista wolnych adresów IP.
+    """
+    logger.debug(f"Wyszukiwanie {count} wolnych adresów IP w podsieci {subnet}.")
+    # Odczyt, przydział i zapis puli pod blokadą pliku (wspólną z release_ip)
+    with file_lock(pool_path) if pool_path else nullcontext():
+        if pool_path:
+            pool = load_ip_pool(subnet, pool_path, config_file, settings.USER_DB_PATH)
+        else:
+            pool = rebuild_ip_pool(subnet, config_file)
+        try:
+            free_ips = pool.allocate_many(count)
+        except ValueError:
+            logger.error("Brak dostępnych adresów IP w określonej podsieci.")
+            raise
+        if pool_path:
+            save_ip_pool(pool, pool_path)
+    if free_ips:
+        logger.debug(f"Znaleziono wolne adresy IP: {free_ips[0]} - {free_ips[-1]}")
+    return free_ips
+
+def generate_next_ip(config_file, subnet="10.66.66.0/24", pool_path=None):
     """
     Generuje następny dostępny adres IP w podsieci.
     :param config_file: Ścieżka do pliku konfiguracyjnego WireGuard.
     :param subnet: Podsieć do wyszukiwania wolnych IP.
+    :param pool_path: Ścieżka do zapisanej puli adresów (opcjonalnie).
     :return: Następny dostępny adres IP.
     """
-    logger.debug(f"Wyszukiwanie wolnego adresu IP w podsieci {subnet}.")
-    existing_ips = []
-    if os.path.exists(config_file):
-        logger.debug(f"Odczytywanie istniejących adresów IP z pliku {config_file}.")
-        with open(config_file, "r") as f:
-            for line in f:
-                if line.strip().startswith("AllowedIPs"):
-                    ip = line.split("=")[1].strip().split("/")[0]
-                    existing_ips.append(ip)
-    network = ipaddress.ip_network(subnet)
-    for ip in network.hosts():
-        ip_str = str(ip)
-        if ip_str not in existing_ips and not ip_str.endswith(".0") and not ip_str.endswith(".1") and not ip_str.endswith(".255"):
-            logger.debug(f"Znaleziono wolny adres IP: {ip_str}")
-            return ip_str
-    logger.error("Brak dostępnych adresów IP w określonej podsieci.")
-    raise ValueError("Brak dostępnych adresów IP w określonej podsieci.")
+    return generate_next_ips(config_file, subnet, 1, pool_path)[0]
 
 def generate_qr_code(data, output_path):
     """
-    Generuje kod QR na podstawie danych konfiguracyjnych.
+    Zleca wygenerowanie kodu QR na podstawie danych konfiguracyjnych.
+    Renderowanie odbywa się w puli procesów, a niezmieniona konfiguracja jest brana z pamięci podręcznej.
     :param data: Tekst konfiguracji WireGuard.
     :param output_path: Ścieżka do zapisania obrazu kodu QR.
+    :return: Future z wynikiem generowania.
     """
-    logger.debug(f"Generowanie kodu QR dla danych o długości {len(data)} znaków.")
-    try:
-        qr = qrcode.QRCode(
-            version=1,
-            error_correction=qrcode.constants.ERROR_CORRECT_L,
-            box_size=10,
-            border=4,
-        )
-        qr.add_data(data)
-        qr.make(fit=True)
-        img = qr.make_image(fill_color="black", back_color="white")
-        img.save(output_path)
+    logger.debug(f"Zlecanie kodu QR dla danych o długości {len(data)} znaków.")
 
-    except Exception as e:
-        logger.error(f"Błąd generowania kodu QR: {e}")
-        raise
+    def log_result(future):
+        if future.exception() is not None:
+            logger.error(f"Błąd generowania kodu QR {output_path}: {future.exception()}")
+
+    future = submit_qr(data, output_path)
+    future.add_done_callback(log_result)
+    return future
 
 def load_existing_users():
     """
     Wczytuje listę istniejących użytkowników z bazy danych.
     """
-    user_records_path = os.path.join("user", "data", "user_records.json")
+    user_records_path = str(settings.USER_DB_PATH)
     logger.debug(f"Wczytywanie bazy danych użytkowników z {user_records_path}")
-    if os.path.exists(user_records_path):
-        with open(user_records_path, "r", encoding="utf-8") as file:
-            try:
-                user_data = json.load(file)
-                logger.info(f"Pomyślnie wczytano {len(user_data)} użytkowników.")
-                return {user.lower(): user_data[user] for user in user_data}  # Normalizacja nazw
-            except json.JSONDecodeError as e:
-                logger.warning(f"Błąd odczytu bazy danych: {e}. Zwracam pustą bazę.")
-                return {}
-    logger.warning(f"Nie znaleziono pliku bazy danych użytkowników {user_records_path}.")
-    return {}
+    try:
+        user_data = open_user_store(user_records_path).all()
+    except json.JSONDecodeError as e:
+        logger.warning(f"Błąd odczytu bazy danych: {e}. Zwracam pustą bazę.")
+        return {}
+    logger.info(f"Pomyślnie wczytano {len(user_data)} użytkowników.")
+    return {user.lower(): user_data[user] for user in user_data}  # Normalizacja nazw
 
 def is_user_in_server_config(nickname, config_file):
     """
     Sprawdza czy użytkownik istnieje w konfiguracji serwera.
     """
-    nickname_lower = nickname.lower()
     logger.debug(f"Sprawdzanie czy użytkownik {nickname} istnieje w konfiguracji {config_file}.")
     try:
-        with open(config_file, "r") as file:
-            for line in file:
-                if nickname_lower in line.lower():
-                    logger.info(f"Użytkownik {nickname} znaleziony w konfiguracji serwera.")
-                    return True
+        if load_server_config(config_file).has_client(nickname):
+            logger.info(f"Użytkownik {nickname} znaleziony w konfiguracji serwera.")
+            return True
     except FileNotFoundError:
         logger.warning(f"Nie znaleziono pliku konfiguracyjnego {config_file}.")
     return False
@@ -175,12 +192,119 @@ def restart_wireguard(interface="wg0"):
 '''
 
 def add_user_to_server_config(config_file, nickname, public_key, preshared_key, allowed_ips):
-    with open(config_file, 'a') as file:
-        file.write(f"\n### Klient {nickname}\n")
-        file.write(f"[Peer]\n")
-        file.write(f"PublicKey = {public_key}\n")
-        file.write(f"PresharedKey = {preshared_key}\n")
-        file.write(f"AllowedIPs = {allowed_ips}\n")
+    add_server_peers(config_file, [{
+        "name": nickname, "public_key": public_key, "preshared_key": preshared_key, "allowed_ips": allowed_ips,
+    }])
+
+def get_server_wg_nic(params_path="/etc/wireguard/params"):
+    """Odczytuje SERVER_WG_NIC z pliku params."""
+    if os.path.exists(params_path):
+        with open(params_path, "r") as file:
+            for line in file:
+                if line.startswith("SERVER_WG_NIC="):
+                    return line.strip().split("=")[1].strip('"')
+        raise ValueError("Nie znaleziono SERVER_WG_NIC w /etc/wireguard/params.")
+    raise FileNotFoundError(f"Nie znaleziono pliku {params_path}.")
+
+def sync_wireguard(server_wg_nic, config_file=None):
+    """
+    Synchronizuje interfejs WireGuard z plikiem konfiguracyjnym.
+    Żądanie trafia do harmonogramu łączącego synchronizacje z krótkiego okna;
+    stosowane są tylko brakujące zmiany peerów (`wg set`), z fallbackiem na `wg syncconf`.
+    """
+    summary = schedule_sync(server_wg_nic, config_file or settings.SERVER_CONFIG_FILE)
+    logger.info(f"WireGuard zsynchronizowany dla interfejsu {server_wg_nic} ({summary['mode']})")
+
+def save_user_records(new_records, user_records_path=None):
+    """
+    Dopisuje rekordy użytkowników do bazy danych jedną transakcją magazynu.
+    :param new_records: Słownik {nazwa_użytkownika: rekord}.
+    :param user_records_path: Ścieżka do pliku user_records.json (domyślnie settings.USER_DB_PATH).
+    """
+    store = open_user_store(str(user_records_path or settings.USER_DB_PATH))
+    try:
+        store.put_many(new_records)
+        logger.debug(f"{DEBUG_EMOJI} Zapisano {len(new_records)} rekordów użytkowników.")
+    except json.JSONDecodeError:
+        logger.warning(f"{WARNING_EMOJI} Błąd odczytu bazy użytkowników, zostanie utworzona nowa.")
+        store.replace_all(new_records)
+
+def create_user_entry(nickname, params, config_file, email="N/A", telegram_id="N/A"):
+    """
+    Tworzy konfigurację klienta, zleca kod QR, dopisuje peera do konfiguracji serwera
+    i zapisuje rekord użytkownika. Nie synchronizuje interfejsu WireGuard.
+    :return: Słownik {"config_path", "qr_path", "ip", "qr_future"}.
+    """
+    logger.info(f"{INFO_EMOJI} Rozpoczynanie generowania konfiguracji dla użytkownika: {nickname}")
+
+    # Sprawdź SERVER_PUB_IP
+    server_public_key = params['SERVER_PUB_KEY']
+    if not params.get('SERVER_PUB_IP'):
+        raise ValueError("Brak parametru SERVER_PUB_IP. Sprawdź plik konfiguracyjny.")
+    
+    endpoint = f"{params['SERVER_PUB_IP']}:{params['SERVER_PORT']}"
+    dns_servers = f"{params['CLIENT_DNS_1']},{params['CLIENT_DNS_2']}"
+
+    private_key = generate_private_key()
+    logger.debug(f"{DEBUG_EMOJI} Klucz prywatny pomyślnie wygenerowany.")
+    public_key = generate_public_key(private_key)
+    logger.debug(f"{DEBUG_EMOJI} Klucz publiczny pomyślnie wygenerowany.")
+    preshared_key = generate_preshared_key()
+    logger.debug(f"{DEBUG_EMOJI} Klucz współdzielony pomyślnie wygenerowany.")
+
+    # Oblicz podsieć
+    subnet = resolve_subnet(params, config_file)
+    logger.debug(f"{DEBUG_EMOJI} Używana podsieć: {subnet}")
+
+    # Generuj adres IP
+    new_ipv4 = generate_next_ip(config_file, subnet, settings.IP_POOL_PATH)
+    logger.info(f"{INFO_EMOJI} Nowy adres IP użytkownika: {new_ipv4}")
+
+    # Generuj konfigurację klienta
+    client_config = create_client_config(
+        private_key=private_key,
+        address=new_ipv4,
+        dns_servers=dns_servers,
+        server_public_key=server_public_key,
+        preshared_key=preshared_key,
+        endpoint=endpoint
+    )
+    logger.debug(f"{DEBUG_EMOJI} Konfiguracja klienta pomyślnie utworzona.")
+
+    config_path = os.path.join(settings.WG_CONFIG_DIR, f"{nickname}.conf")
+    qr_path = os.path.join(settings.QR_CODE_DIR, f"{nickname}.png")
+
+    # Zapisz konfigurację
+    os.makedirs(settings.WG_CONFIG_DIR, exist_ok=True)
+    with open(config_path, "w") as file:
+        file.write(client_config)
+    logger.info(f"{INFO_EMOJI} Konfiguracja użytkownika zapisana do {config_path}")
+
+    # Zleć kod QR (renderowanie w tle)
+    qr_future = generate_qr_code(client_config, qr_path)
+
+    # Dodaj użytkownika do konfiguracji serwera
+    add_user_to_server_config(config_file, nickname, public_key.decode('utf-8'), preshared_key.decode('utf-8'), new_ipv4)
+    logger.info(f"{INFO_EMOJI} Użytkownik pomyślnie dodany do konfiguracji serwera.")
+
+    # Dodaj rekord użytkownika
+    user_record = create_user_record(
+        username=nickname,
+        address=new_ipv4,
+        public_key=public_key.decode('utf-8'),
+        preshared_key=preshared_key.decode('utf-8'),
+        qr_code_path=qr_path,
+        email=email,
+        telegram_id=telegram_id
+    )
+    logger.debug(f"{DEBUG_EMOJI} Rekord użytkownika utworzony.")
+
+    # Zapisz do bazy danych
+    user_records_path = str(settings.USER_DB_PATH)
+    save_user_records({nickname: user_record}, user_records_path)
+    logger.info(f"{INFO_EMOJI} Dane użytkownika {nickname} pomyślnie dodane do {user_records_path}")
+
+    return {"config_path": config_path, "qr_path": qr_path, "ip": new_ipv4, "qr_future": qr_future}
 
 def generate_config(nickname, params, config_file, email="N/A", telegram_id="N/A"):
     """
@@ -188,115 +312,236 @@ def generate_config(nickname, params, config_file, email="N/A", telegram_id="N/A
     """
     logger.info("+--------- Proces 🌱 Tworzenie Użytkownika Uruchomione ---------+")
     try:
-        logger.info(f"{INFO_EMOJI} Rozpoczynanie generowania konfiguracji dla użytkownika: {nickname}")
-        
-        # Sprawdź SERVER_PUB_IP
+        entry = create_user_entry(nickname, params, config_file, email, telegram_id)
+
+        # Synchronizuj WireGuard
+        sync_wireguard(get_server_wg_nic())
+
+        logger.info("+--------- Proces 🌱 Tworzenie Użytkownika Zakończone --------------+\n")
+        return entry["config_path"], entry["qr_path"]
+    except Exception as e:
+        logger.error(f"Błąd wykonania: {e}")
+        logger.info("+--------- Proces 🌱 Tworzenie Użytkownika Zakończone --------------+\n")
+        raise
+
+def load_batch_file(batch_path):
+    """
+    Wczytuje listę użytkowników do utworzenia z pliku CSV lub JSONL.
+    CSV musi mieć nagłówek z kolumną nickname (lub username) oraz opcjonalnie email i telegram_id.
+    JSONL zawiera jeden obiekt JSON na linię z tymi samymi kluczami.
+    :param batch_path: Ścieżka do pliku CSV/JSONL.
+    :return: Lista słowników {nickname, email, telegram_id}.
+    """
+    entries = []
+    with open(batch_path, "r", encoding="utf-8") as file:
+        if str(batch_path).lower().endswith((".jsonl", ".json")):
+            rows = [json.loads(line) for line in file if line.strip()]
+        else:
+            rows = list(csv.DictReader(file))
+
+    for row in rows:
+        nickname = (row.get("nickname") or row.get("username") or "").strip()
+        entries.append({
+            "nickname": nickname,
+            "email": (row.get("email") or "").strip() or "N/A",
+            "telegram_id": str(row.get("telegram_id") or "").strip() or "N/A",
+        })
+    logger.info(f"Wczytano {len(entries)} pozycji z pliku {batch_path}.")
+    return entries
+
+def load_server_config_names(config_file):
+    """
+    Odczytuje nazwy klientów z komentarzy ### Klient/### Client w konfiguracji serwera.
+    :return: Zbiór nazw (małe litery).
+    """
+    try:
+        return {name.lower() for name in load_server_config(config_file).client_names()}
+    except FileNotFoundError:
+        logger.warning(f"Nie znaleziono pliku konfiguracyjnego {config_file}.")
+        return set()
+
+# Nazwa użytkownika trafia do nazw plików (.conf, .png) i komentarza ### Klient w wg0.conf
+NICKNAME_PATTERN = re.compile(r"[A-Za-z0-9_-][A-Za-z0-9_.-]*")
+
+def validate_batch(entries, existing_names):
+    """
+    Waliduje nazwy użytkowników (dozwolone znaki, bez kropki na początku)
+    względem zbioru istniejących nazw w pamięci.
+    :param entries: Lista pozycji z load_batch_file.
+    :param existing_names: Zbiór zajętych nazw (małe litery).
+    :return: Krotka (poprawne_pozycje, odrzucone[(nazwa, powód)]).
+    """
+    taken = set(existing_names)
+    valid, rejected = [], []
+    for entry in entries:
+        nickname = entry["nickname"]
+        if not nickname:
+            rejected.append((nickname, "pusta nazwa użytkownika"))
+        elif not NICKNAME_PATTERN.fullmatch(nickname):
+            rejected.append((nickname, "niedozwolone znaki (dozwolone: litery, cyfry, _ . -, bez kropki na początku)"))
+        elif nickname.lower() in taken:
+            rejected.append((nickname, "użytkownik już istnieje"))
+        else:
+            taken.add(nickname.lower())
+            valid.append(entry)
+    return valid, rejected
+
+def generate_configs_batch(entries, params, config_file, pool_path=None):
+    """
+    Tworzy wielu użytkowników naraz: jedna walidacja, jeden przydział adresów IP,
+    jeden zapis bloków [Peer], jeden zapis bazy i jedna synchronizacja interfejsu.
+    :param entries: Lista słowników {nickname, email, telegram_id}.
+    :param params: Parametry serwera z load_params.
+    :param config_file: Ścieżka do konfiguracji serwera WireGuard.
+    :param pool_path: Ścieżka do zapisanej puli adresów IP (opcjonalnie).
+    :return: Krotka (utworzeni[(nazwa, config_path, qr_path)], odrzuceni[(nazwa, powód)]).
+    """
+    logger.info("+--------- Proces 🌱 Tworzenie Wsadowe Użytkowników Uruchomione ---------+")
+    # Stan do wycofania, jeśli błąd wystąpi przed zapisem rekordów
+    addresses, files, qr_futures, new_peers = [], [], [], []
+    peers_added = records_saved = False
+    try:
+        existing_names = set(load_existing_users()) | load_server_config_names(config_file)
+        valid, rejected = validate_batch(entries, existing_names)
+        for nickname, reason in rejected:
+            logger.warning(f"Pomijanie '{nickname}': {reason}.")
+        if not valid:
+            logger.warning("Brak poprawnych użytkowników do utworzenia.")
+            return [], rejected
+
         server_public_key = params['SERVER_PUB_KEY']
         if not params.get('SERVER_PUB_IP'):
             raise ValueError("Brak parametru SERVER_PUB_IP. Sprawdź plik konfiguracyjny.")
-        
         endpoint = f"{params['SERVER_PUB_IP']}:{params['SERVER_PORT']}"
         dns_servers = f"{params['CLIENT_DNS_1']},{params['CLIENT_DNS_2']}"
 
-        private_key = generate_private_key()
-        logger.debug(f"{DEBUG_EMOJI} Klucz prywatny pomyślnie wygenerowany.")
-        public_key = generate_public_key(private_key)
-        logger.debug(f"{DEBUG_EMOJI} Klucz publiczny pomyślnie wygenerowany.")
-        preshared_key = generate_preshared_key()
-        logger.debug(f"{DEBUG_EMOJI} Klucz współdzielony pomyślnie wygenerowany.")
-
-        # Oblicz podsieć
-        subnet = calculate_subnet(params.get('SERVER_WG_IPV4', '10.66.66.1'))
-        logger.debug(f"{DEBUG_EMOJI} Używana podsieć: {subnet}")
-
-        # Generuj adres IP
-        new_ipv4 = generate_next_ip(config_file, subnet)
-        logger.info(f"{INFO_EMOJI} Nowy adres IP użytkownika: {new_ipv4}")
-
-        # Generuj konfigurację klienta
-        client_config = create_client_config(
-            private_key=private_key,
-            address=new_ipv4,
-            dns_servers=dns_servers,
-            server_public_key=server_public_key,
-            preshared_key=preshared_key,
-            endpoint=endpoint
-        )
-        logger.debug(f"{DEBUG_EMOJI} Konfiguracja klienta pomyślnie utworzona.")
-
-        config_path = os.path.join(settings.WG_CONFIG_DIR, f"{nickname}.conf")
-        qr_path = os.path.join(settings.QR_CODE_DIR, f"{nickname}.png")
-
-        # Zapisz konfigurację
-        os.makedirs(settings.WG_CONFIG_DIR, exist_ok=True)
-        with open(config_path, "w") as file:
-            file.write(client_config)
-        logger.info(f"{INFO_EMOJI} Konfiguracja użytkownika zapisana do {config_path}")
-
-        # Generuj kod QR
-        generate_qr_code(client_config, qr_path)
-
-        # Dodaj użytkownika do konfiguracji serwera
-        add_user_to_server_config(config_file, nickname, public_key.decode('utf-8'), preshared_key.decode('utf-8'), new_ipv4)
-        logger.info(f"{INFO_EMOJI} Użytkownik pomyślnie dodany do konfiguracji serwera.")
-
-        # Dodaj rekord użytkownika
-        user_record = create_user_record(
-            username=nickname,
-            address=new_ipv4,
-            public_key=public_key.decode('utf-8'),
-            preshared_key=preshared_key.decode('utf-8'),
-            qr_code_path=qr_path,
-            email=email,
-            telegram_id=telegram_id
-        )
-        logger.debug(f"{DEBUG_EMOJI} Rekord użytkownika utworzony.")
-
-        # Zapisz do bazy danych
-        user_records_path = os.path.join("user", "data", "user_records.json")
-        os.makedirs(os.path.dirname(user_records_path), exist_ok=True)
-        with open(user_records_path, "r+", encoding="utf-8") as file:
-            try:
-                user_data = json.load(file)
-                logger.debug(f"{DEBUG_EMOJI} Wczytano istniejące rekordy użytkowników.")
-            except json.JSONDecodeError:
-                user_data = {}
-                logger.warning(f"{WARNING_EMOJI} Błąd odczytu bazy użytkowników, zostanie utworzona nowa.")
-            user_data[nickname] = user_record
-            file.seek(0)
-            json.dump(user_data, file, indent=4)
-            file.truncate()
-        logger.info(f"{INFO_EMOJI} Dane użytkownika {nickname} pomyślnie dodane do {user_records_path}")
+        subnet = resolve_subnet(params, config_file)
+        addresses = generate_next_ips(config_file, subnet, len(valid), pool_path)
+        keypairs = generate_keypairs(len(valid))
 
-        # Synchronizuj WireGuard
-        params_path = "/etc/wireguard/params"
-        if os.path.exists(params_path):
-            with open(params_path, "r") as file:
-                for line in file:
-                    if line.startswith("SERVER_WG_NIC="):
-                        server_wg_nic = line.strip().split("=")[1].strip('"')
-                        break
-                else:
-                    raise ValueError("Nie znaleziono SERVER_WG_NIC w /etc/wireguard/params.")
-        else:
-            raise FileNotFoundError(f"Nie znaleziono pliku {params_path}.")
-
-        sync_command = f'wg syncconf "{server_wg_nic}" <(wg-quick strip "{server_wg_nic}")'
-        subprocess.run(sync_command, shell=True, check=True, executable='/bin/bash')
-        logger.info(f"WireGuard zsynchronizowany dla interfejsu {server_wg_nic}")
-
-        logger.info("+--------- Proces 🌱 Tworzenie Użytkownika Zakończone --------------+\n")
-        return config_path, qr_path
+        os.makedirs(settings.WG_CONFIG_DIR, exist_ok=True)
+        os.makedirs(settings.QR_CODE_DIR, exist_ok=True)
+
+        new_records = {}
+        created = []
+        for entry, address, (private_key, public_key) in zip(valid, addresses, keypairs):
+            nickname = entry["nickname"]
+            preshared_key = generate_preshared_key()
+            client_config = create_client_config(
+                private_key=private_key,
+                address=address,
+                dns_servers=dns_servers,
+                server_public_key=server_public_key,
+                preshared_key=preshared_key,
+                endpoint=endpoint
+            )
+            config_path = os.path.join(settings.WG_CONFIG_DIR, f"{nickname}.conf")
+            qr_path = os.path.join(settings.QR_CODE_DIR, f"{nickname}.png")
+            files.append(config_path)
+            with open(config_path, "w") as file:
+                file.write(client_config)
+            files.append(qr_path)
+            qr_futures.append(generate_qr_code(client_config, qr_path))
+
+            new_peers.append({
+                "name": nickname, "public_key": public_key.decode('utf-8'),
+                "preshared_key": preshared_key.decode('utf-8'), "allowed_ips": address,
+            })
+            new_records[nickname] = create_user_record(
+                username=nickname,
+                address=address,
+                public_key=public_key.decode('utf-8'),
+                preshared_key=preshared_key.decode('utf-8'),
+                qr_code_path=qr_path,
+                email=entry["email"],
+                telegram_id=entry["telegram_id"]
+            )
+            created.append((nickname, config_path, qr_path))
+
+        # Jeden zapis konfiguracji serwera
+        add_server_peers(config_file, new_peers)
+        peers_added = True
+        logger.info(f"{INFO_EMOJI} Dodano {len(new_peers)} bloków [Peer] do konfiguracji serwera.")
+
+        # Jeden zapis bazy danych
+        save_user_records(new_records)
+        records_saved = True
+        logger.info(f"{INFO_EMOJI} Zapisano {len(new_records)} rekordów użytkowników.")
+
+        # Jedna synchronizacja interfejsu
+        sync_wireguard(get_server_wg_nic())
+
+        logger.info("+--------- Proces 🌱 Tworzenie Wsadowe Użytkowników Zakończone --------------+\n")
+        return created, rejected
     except Exception as e:
         logger.error(f"Błąd wykonania: {e}")
-        logger.info("+--------- Proces 🌱 Tworzenie Użytkownika Zakończone --------------+\n")
+        if not records_saved:
+            rollback_batch(config_file, pool_path, addresses, files, qr_futures, new_peers if peers_added else [])
+        logger.info("+--------- Proces 🌱 Tworzenie Wsadowe Użytkowników Zakończone --------------+\n")
         raise
 
+def rollback_batch(config_file, pool_path, addresses, files, qr_futures=(), peers=()):
+    """
+    Wycofuje przerwane tworzenie wsadowe: usuwa dodane bloki [Peer], zwalnia
+    przydzielone adresy w puli i usuwa utworzone pliki klientów. Błędy wycofania
+    są tylko logowane (pierwotny wyjątek jest propagowany dalej).
+    :param peers: Peery dodane już do konfiguracji serwera (słowniki z add_server_peers).
+    """
+    if peers:
+        try:
+            removed = remove_server_peers(config_file, [(peer["name"], peer["public_key"]) for peer in peers])
+            logger.info(f"{INFO_EMOJI} Wycofano {removed} bloków [Peer] z konfiguracji serwera.")
+        except Exception as e:
+            logger.error(f"Nie udało się wycofać bloków [Peer]: {e}")
+    if addresses and pool_path:
+        try:
+            if release_ip(",".join(addresses), pool_path):
+                logger.info(f"{INFO_EMOJI} Zwolniono {len(addresses)} adresów IP w puli.")
+        except Exception as e:
+            logger.error(f"Nie udało się zwolnić adresów IP: {e}")
+    wait_futures(list(qr_futures))  # Kod QR w trakcie renderowania zapisałby plik po jego usunięciu
+    for path in files:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            continue
+        except OSError as e:
+            logger.error(f"Nie udało się usunąć pliku {path}: {e}")
+    logger.info(f"{INFO_EMOJI} Wycofano tworzenie wsadowe użytkowników.")
+
+def run_batch(batch_path):
+    """Tryb wsadowy CLI: python3 main.py --batch <plik.csv|plik.jsonl>."""
+    setup_directories()
+    params = load_params(settings.PARAMS_FILE)
+    entries = load_batch_file(batch_path)
+    created, rejected = generate_configs_batch(entries, params, settings.SERVER_CONFIG_FILE, settings.IP_POOL_PATH)
+    logger.info(f"✅ Utworzono użytkowników: {len(created)}, pominięto: {len(rejected)}")
+    return created, rejected
+
 if __name__ == "__main__":
+    # Konfiguracja loggera - tylko przy uruchomieniu skryptu; import main
+    # (np. w modules/user_service.py) nie zmienia logowania procesu panelu Gradio
+    logging.basicConfig(
+        level=logging.DEBUG,
+        format="%(asctime)s - %(levelname)-8s %(message)s",
+        handlers=[logging.StreamHandler()]
+    )
+
     if len(sys.argv) < 2:
-        logger.error("Za mało argumentów. Użycie: python3 main.py <nick> [email] [telegram_id]")
+        logger.error("Za mało argumentów. Użycie: python3 main.py <nick> [email] [telegram_id] | --batch <plik.csv|plik.jsonl>")
         sys.exit(1)
 
+    if sys.argv[1] == "--batch":
+        if len(sys.argv) < 3:
+            logger.error("Brak ścieżki pliku. Użycie: python3 main.py --batch <plik.csv|plik.jsonl>")
+            sys.exit(1)
+        try:
+            run_batch(sys.argv[2])
+        except Exception as e:
+            logger.error(f"Błąd tworzenia wsadowego: {e}")
+            sys.exit(1)
+        sys.exit(0)
+
     nickname = sys.argv[1]
     email = sys.argv[2] if len(sys.argv) > 2 else "N/A"
     telegram_id = sys.argv[3] if len(sys.argv) > 3 else "N/A"
@@ -89,6 +89,7 @@ def show_main_menu():
         print(f"  u. 👤  Zarządzaj Użytkownikami")
         print(f" sy. 📡  Synchronizuj Użytkowników")
         print(f" du. 🧹  Wyczyść Bazę Użytkowników")
+        print(f" st. 📈  Kolektor Statystyk (usługa)")
         display_message_slowly(f" ------------------------------------------", print_speed=local_print_speed, indent=False)
         if wireguard_installed:
             print(f" rw. ♻️   Przeinstaluj WireGuard")
@@ -179,6 +180,11 @@ def show_main_menu():
             from modules.sync import sync_users_from_config
             sync_users_from_config()
 
+        # Kolektor Statystyk
+        elif choice == "st":
+            from modules.stats_daemon import stats_service_menu
+            stats_service_menu()
+
         # ========== ASYSTENT AI ==========
         # Diagnostyka VPN z AI (Pełna)
         elif choice == "aid":
@@ -0,0 +1,550 @@
+#!/usr/bin/env python3
+# modules/config_fragments.py
+# Konfiguracja serwera WireGuard podzielona na fragmenty (SERVER_CONFIG_LAYOUT = "fragments")
+#
+# Sekcja [Interface] (wraz z preambułą) i każdy peer leżą w osobnych plikach
+# katalogu <wg0.conf>.d/: interface.conf oraz peers/<nazwa klienta>.conf.
+# Blokowanie, odblokowanie, zmiana i usunięcie peera atomowo zapisują (lub usuwają)
+# tylko jego fragment zamiast przepisywać cały wg0.conf. Pełna konfiguracja jest
+# składana z fragmentów dopiero przy odczycie: złożony dokument jest pamiętany,
+# dopóki jedno scandir nie wykaże zmiany fragmentu (nazwa, i-węzeł, mtime,
+# rozmiar), a po zmianie ponownie czytane są tylko zmienione fragmenty.
+# Pełne `wg syncconf` dostaje treść odpowiadającą `wg-quick strip`, złożoną
+# bezpośrednio z fragmentów. Sam wg0.conf jest potrzebny tylko wg-quick, więc
+# domyślnie (SERVER_CONFIG_ASSEMBLE_DELAY = None) nie jest odtwarzany po
+# zmianach - składa go polecenie "assemble" uruchamiane przez systemd przed
+# startem i przeładowaniem wg-quick@<nic> (dodatek jednostki instalowany przy
+# podziale konfiguracji lub poleceniem "install-hook"). Przy opóźnieniu > 0
+# plik jest dodatkowo odtwarzany tyle sekund po ostatniej zmianie (także przy
+# zakończeniu procesu, również przez SIGTERM), a przy 0 - od razu po każdej
+# zmianie (zmiany wsadowe - raz, na końcu batch()). Zmiany fragmentów i złożenie
+# odbywają się pod tą samą blokadą międzyprocesową co edit_server_config().
+#
+# Przykład użycia:
+#   from modules.config_fragments import get_fragment_store
+#   store = get_fragment_store("/etc/wireguard/wg0.conf")  # przy pierwszym użyciu dzieli wg0.conf
+#   store.set_enabled("jan", False)                        # zapisuje tylko peers/jan.conf
+#
+#   python3 -m modules.config_fragments split [/etc/wireguard/wg0.conf]
+#   python3 -m modules.config_fragments assemble [/etc/wireguard/wg0.conf]
+#   python3 -m modules.config_fragments install-hook [/etc/wireguard/wg0.conf]
+
+import atexit
+import hashlib
+import os
+import re
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+from contextlib import contextmanager
+
+from modules.file_lock import file_lock
+from modules.server_config import DEFAULT_CLIENT_LABEL, ServerConfig, atomic_write
+
+try:
+    from settings import SERVER_CONFIG_ASSEMBLE_DELAY
+except ImportError:
+    SERVER_CONFIG_ASSEMBLE_DELAY = None
+
+INTERFACE_FILE = "interface.conf"
+PEERS_DIR = "peers"
+FRAGMENT_SUFFIX = ".conf"
+# Klucze [Interface] obsługiwane przez wg-quick, a nie przez `wg syncconf` (jak w `wg-quick strip`)
+WG_QUICK_KEYS = {"address", "dns", "mtu", "table", "preup", "postup", "predown", "postdown", "saveconfig"}
+
+HOOK_DIR = "/etc/systemd/system/wg-quick@{nic}.service.d"
+HOOK_FILE = "pywggen-fragments.conf"
+# wg-quick czyta wg0.conf przed PreUp, dlatego złożenie odbywa się w ExecStartPre
+# (oraz przed `wg syncconf` w ExecReload jednostki wg-quick@.service)
+HOOK_TEMPLATE = """[Service]
+ExecStartPre=/bin/sh -c 'cd {project_dir} && exec {python} -m modules.config_fragments assemble {config_path}'
+ExecReload=
+ExecReload=/bin/sh -c 'cd {project_dir} && exec {python} -m modules.config_fragments assemble {config_path}'
+ExecReload=/bin/bash -c 'exec /usr/bin/wg syncconf %i <(exec /usr/bin/wg-quick strip %i)'
+"""
+
+
+def fragment_dir(config_path):
+    """Zwraca katalog fragmentów konfiguracji (np. /etc/wireguard/wg0.conf.d)."""
+    return f"{config_path}.d"
+
+
+def _fragment_name(name=None, public_key=None):
+    """Zwraca nazwę pliku fragmentu peera: nazwa klienta lub skrót klucza dla peera bez nazwy."""
+    if name:
+        safe = re.sub(r"[^a-z0-9_.-]", "_", str(name).lower()).lstrip(".")
+        if safe:
+            return f"{safe}{FRAGMENT_SUFFIX}"
+    digest = hashlib.sha1((public_key or "").encode("utf-8")).hexdigest()[:16]
+    return f"key-{digest}{FRAGMENT_SUFFIX}"
+
+
+def _fragment_text(blocks):
+    """Zwraca treść fragmentu z bloków - bez pustych linii na początku i końcu."""
+    text = "".join(block.render() for block in blocks).strip("\r\n")
+    return f"{text}\n" if text else ""
+
+
+def _strip_line(line):
+    """Zwraca linię bez komentarza (jak `wg-quick strip`) lub pusty napis."""
+    return line.split("#", 1)[0].strip()
+
+
+class FragmentStore:
+    """Katalog fragmentów jednej konfiguracji serwera z pamięcią podręczną złożenia."""
+
+    def __init__(self, config_path, assemble_delay=SERVER_CONFIG_ASSEMBLE_DELAY):
+        """
+        :param config_path: Ścieżka do wg0.conf (plik składany z fragmentów).
+        :param assemble_delay: Opóźnienie odtworzenia wg0.conf po zmianie (w sekundach);
+                               0 - od razu po zmianie, None - tylko na żądanie (write_config, "assemble").
+        """
+        self.config_path = str(config_path)
+        self.directory = fragment_dir(self.config_path)
+        self.peers_dir = os.path.join(self.directory, PEERS_DIR)
+        self.assemble_delay = assemble_delay
+        self._lock = threading.RLock()
+        self._fragments = {}  # nazwa pliku -> (klucz stat, bloki)
+        self._interface = (None, [])
+        self._key = None
+        self._config = None
+        self._by_name = {}
+        self._by_key = {}
+        self._written_key = None
+        self._timer = None
+        self._batch_depth = 0
+        self._batch_changed = False
+
+    def exists(self):
+        return os.path.isdir(self.peers_dir)
+
+    @contextmanager
+    def _locked(self):
+        """Blokada wątków procesu i międzyprocesowa (ta sama co w edit_server_config)."""
+        with self._lock, file_lock(self.config_path):
+            yield
+
+    # --- Podział i składanie ---
+
+    def split(self):
+        """
+        Dzieli bieżący wg0.conf na fragmenty. Katalog powstaje obok jako tymczasowy
+        i jest przenoszony na miejsce jedną operacją rename.
+        :return: Liczba fragmentów peerów.
+        :raises FileExistsError: Katalog fragmentów już istnieje.
+        """
+        if os.path.exists(self.directory):
+            raise FileExistsError(f"Katalog fragmentów {self.directory} już istnieje.")
+        config = ServerConfig.load(self.config_path)
+        parent = os.path.dirname(os.path.abspath(self.directory))
+        tmp_dir = tempfile.mkdtemp(dir=parent, prefix=".wg_fragments_")
+        try:
+            os.mkdir(os.path.join(tmp_dir, PEERS_DIR), 0o700)
+            header = [block for block in config.blocks if block.kind != "peer"]
+            atomic_write(os.path.join(tmp_dir, INTERFACE_FILE), _fragment_text(header))
+            taken = set()
+            for block in config.peers():
+                filename = self._free_name(block.name, block.public_key, taken)
+                taken.add(filename)
+                atomic_write(os.path.join(tmp_dir, PEERS_DIR, filename), _fragment_text([block]))
+            os.rename(tmp_dir, self.directory)
+        except Exception:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+        with self._lock:
+            self._key = None
+        return len(taken)
+
+    def _free_name(self, name, public_key, taken=None):
+        """Zwraca wolną nazwę pliku fragmentu (kolizja nazw -> sufiks ze skrótu klucza)."""
+        filename = _fragment_name(name, public_key)
+        exists = (lambda f: f in taken) if taken is not None else (
+            lambda f: os.path.exists(os.path.join(self.peers_dir, f)))
+        if not exists(filename):
+            return filename
+        stem = filename[:-len(FRAGMENT_SUFFIX)]
+        digest = hashlib.sha1(f"{name}\0{public_key}".encode("utf-8")).hexdigest()
+        for length in range(8, len(digest) + 1):
+            candidate = f"{stem}-{digest[:length]}{FRAGMENT_SUFFIX}"
+            if not exists(candidate):
+                return candidate
+        raise FileExistsError(f"Brak wolnej nazwy fragmentu dla peera {name or public_key}.")
+
+    def _scan(self):
+        """Zwraca klucz stanu fragmentów: (stat interface.conf, posortowane (nazwa, i-węzeł, mtime, rozmiar))."""
+        stat = os.stat(os.path.join(self.directory, INTERFACE_FILE))
+        entries = []
+        with os.scandir(self.peers_dir) as iterator:
+            for entry in iterator:
+                if entry.name.endswith(FRAGMENT_SUFFIX) and not entry.name.startswith("."):
+                    entry_stat = entry.stat()
+                    entries.append((entry.name, entry.inode(), entry_stat.st_mtime_ns, entry_stat.st_size))
+        entries.sort()
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size), tuple(entries)
+
+    @staticmethod
+    def _read_blocks(path):
+        with open(path, "r", encoding="utf-8") as f:
+            return ServerConfig.parse(f.read(), path).blocks
+
+    def config(self):
+        """
+        Zwraca konfigurację złożoną z fragmentów (współdzieloną, tylko do odczytu).
+        Bez zmian fragmentów zwracany jest ten sam obiekt; po zmianie czytane są
+        tylko zmienione pliki.
+        """
+        with self._lock:
+            key = self._scan()
+            if self._config is not None and key == self._key:
+                return self._config
+            interface_key, entries = key
+            if self._interface[0] != interface_key:
+                self._interface = (interface_key, self._read_blocks(os.path.join(self.directory, INTERFACE_FILE)))
+            fragments = {}
+            blocks = list(self._interface[1])
+            self._by_name, self._by_key = {}, {}
+            for filename, *stat in entries:
+                cached = self._fragments.get(filename)
+                if cached is None or cached[0] != tuple(stat):
+                    peer_blocks = self._read_blocks(os.path.join(self.peers_dir, filename))
+                    if peer_blocks:
+                        peer_blocks[0].lines.insert(0, "\n")  # Pusta linia przed blokiem w złożonym pliku
+                        peer_blocks[0]._parse()
+                    cached = (tuple(stat), peer_blocks)
+                fragments[filename] = cached
+                for block in cached[1]:
+                    blocks.append(block)
+                    if block.kind == "peer" and block.name:
+                        self._by_name.setdefault(block.name.lower(), filename)
+                    if block.kind == "peer" and block.public_key:
+                        self._by_key.setdefault(block.public_key, filename)
+            self._fragments = fragments
+            self._config = ServerConfig(blocks, self.config_path)
+            self._key = key
+            return self._config
+
+    def render(self):
+        """Zwraca treść wg0.conf złożoną z fragmentów."""
+        return self.config().render()
+
+    def stripped(self):
+        """Zwraca konfigurację dla `wg syncconf` (jak `wg-quick strip`): bez kluczy wg-quick, komentarzy i zablokowanych peerów."""
+        lines = []
+        for block in self.config().blocks:
+            if block.kind == "peer" and not block.enabled:
+                continue
+            for line in block.lines:
+                content = _strip_line(line)
+                if not content:
+                    continue
+                key = content.split("=", 1)[0].strip().lower()
+                if block.kind == "interface" and "=" in content and key in WG_QUICK_KEYS:
+                    continue
+                lines.append(f"{content}\n")
+        return "".join(lines)
+
+    def write_config(self):
+        """
+        Odtwarza wg0.conf z fragmentów (atomowo), o ile zmieniły się od ostatniego zapisu.
+        :return: True, jeśli plik został zapisany.
+        """
+        with self._locked():
+            self._cancel_timer()
+            text = self.render()
+            if self._written_key == self._key and os.path.exists(self.config_path):
+                return False
+            atomic_write(self.config_path, text)
+            self._written_key = self._key
+            return True
+
+    # --- Składanie wg0.conf po zmianach ---
+
+    def _cancel_timer(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def _changed(self):
+        """
+        Odtwarza wg0.conf po zmianie fragmentu: od razu (assemble_delay = 0, w batch() -
+        raz na końcu), po serii zmian (każda zmiana przesuwa termin) albo wcale (None).
+        """
+        if self.assemble_delay is None:
+            return
+        with self._lock:
+            if self._batch_depth:
+                self._batch_changed = True
+                return
+            if self.assemble_delay <= 0:
+                self.write_config()
+                return
+            self._cancel_timer()
+            self._timer = threading.Timer(self.assemble_delay, self._assemble_pending)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _assemble_pending(self):
+        try:
+            self.write_config()
+        except Exception as e:
+            print(f"⚠️ Nie udało się złożyć {self.config_path} z fragmentów: {e}")
+
+    @contextmanager
+    def batch(self):
+        """Grupuje zmiany fragmentów pod jedną blokadą - wg0.conf jest odtwarzany raz, po zakończeniu bloku."""
+        with self._locked():
+            self._batch_depth += 1
+            try:
+                yield self
+            finally:
+                self._batch_depth -= 1
+                if self._batch_depth == 0 and self._batch_changed:
+                    self._batch_changed = False
+                    self._changed()
+
+    def flush(self):
+        """Natychmiast zapisuje zaplanowane złożenie wg0.conf."""
+        with self._lock:
+            pending = self._timer is not None
+        if pending:
+            self._assemble_pending()
+
+    # --- Zmiany pojedynczych peerów ---
+
+    def _find(self, name=None, public_key=None):
+        """
+        Zwraca nazwę pliku fragmentu peera lub None. Nazwa klienta jest najpierw
+        sprawdzana bezpośrednio (jeden odczyt), a indeks złożenia służy jako zapas.
+        """
+        if name is not None:
+            filename = _fragment_name(name)
+            try:
+                blocks = self._read_blocks(os.path.join(self.peers_dir, filename))
+            except FileNotFoundError:
+                blocks = []
+            if any(block.kind == "peer" and (block.name or "").lower() == str(name).lower() for block in blocks):
+                return filename
+            self.config()
+            return self._by_name.get(str(name).lower())
+        if public_key:
+            self.config()
+            return self._by_key.get(public_key)
+        return None
+
+    def _edit(self, filename, action):
+        """Wczytuje fragment, wykonuje action(config) i zapisuje fragment atomowo."""
+        path = os.path.join(self.peers_dir, filename)
+        with self._locked():
+            fragment = ServerConfig.load(path)
+            result = action(fragment)
+            atomic_write(path, _fragment_text(fragment.blocks))
+            self._changed()
+        return result
+
+    def set_enabled(self, name, enabled):
+        """Blokuje/odblokowuje peera, zapisując tylko jego fragment. :return: Blok peera lub None."""
+        with self._locked():
+            filename = self._find(name)
+            if filename is None:
+                return None
+            return self._edit(filename, lambda fragment: fragment.set_enabled(fragment.peers()[0], enabled))
+
+    def update_peer(self, name, **fields):
+        """Zmienia pola peera, zapisując tylko jego fragment. :return: Blok peera lub None."""
+        with self._locked():
+            filename = self._find(name)
+            if filename is None:
+                return None
+            return self._edit(filename, lambda fragment: fragment.update_peer(fragment.peers()[0], **fields))
+
+    def remove_peer(self, name=None, public_key=None):
+        """
+        Usuwa fragment peera - po nazwie, a w razie braku po kluczu publicznym.
+        :return: Usunięty blok lub None.
+        """
+        with self._locked():
+            filename = self._find(name) if name is not None else None
+            if filename is None and public_key:
+                filename = self._find(public_key=public_key)
+            if filename is None:
+                return None
+            path = os.path.join(self.peers_dir, filename)
+            blocks = self._read_blocks(path)
+            os.remove(path)
+            self._changed()
+            return next((block for block in blocks if block.kind == "peer"), None)
+
+    def add_peer(self, name, public_key, preshared_key=None, allowed_ips=None, label=DEFAULT_CLIENT_LABEL, **fields):
+        """Zapisuje nowego peera jako osobny fragment. :return: Nowy blok peera."""
+        with self._locked():
+            fragment = ServerConfig()
+            block = fragment.add_peer(name, public_key, preshared_key, allowed_ips, label, **fields)
+            atomic_write(os.path.join(self.peers_dir, self._free_name(name, public_key)), fragment.render())
+            self._changed()
+            return block
+
+    def add_peers(self, peers):
+        """
+        Zapisuje wielu peerów (każdy we własnym fragmencie).
+        :param peers: Lista słowników {name, public_key, preshared_key, allowed_ips}.
+        :return: Liczba dodanych peerów.
+        """
+        with self.batch():
+            for peer in peers:
+                self.add_peer(peer["name"], peer["public_key"], peer.get("preshared_key"), peer.get("allowed_ips"))
+        return len(peers)
+
+    def clear_peers(self):
+        """Usuwa wszystkie fragmenty peerów. :return: Liczba usuniętych fragmentów."""
+        with self._locked():
+            removed = 0
+            for filename in os.listdir(self.peers_dir):
+                if filename.endswith(FRAGMENT_SUFFIX):
+                    os.remove(os.path.join(self.peers_dir, filename))
+                    removed += 1
+            self._changed()
+            return removed
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_fragment_store(config_path):
+    """
+    Zwraca współdzielony magazyn fragmentów konfiguracji. Jeśli katalog
+    fragmentów nie istnieje, dzieli istniejący wg0.conf (migracja przy pierwszym użyciu).
+    :raises FileNotFoundError: Brak zarówno fragmentów, jak i wg0.conf.
+    """
+    path = os.path.abspath(str(config_path))
+    with _stores_lock:
+        store = _stores.get(path)
+        if store is None:
+            store = _stores[path] = FragmentStore(path, SERVER_CONFIG_ASSEMBLE_DELAY)
+    if store.assemble_delay:
+        _install_sigterm_flush()
+    with store._locked():
+        if not store.exists():
+            store.split()
+            print(f"✅ Konfiguracja {path} podzielona na fragmenty w {store.directory}.")
+            if _is_server_config(path):
+                _try_install_hook(path)
+    return store
+
+
+def _is_server_config(path):
+    """Sprawdza, czy ścieżka to konfiguracja serwera z settings.SERVER_CONFIG_FILE."""
+    try:
+        from settings import SERVER_CONFIG_FILE
+    except ImportError:
+        return False
+    return os.path.abspath(str(SERVER_CONFIG_FILE)) == os.path.abspath(str(path))
+
+
+def hook_path(config_path):
+    """Zwraca ścieżkę dodatku jednostki wg-quick@<nic> (nazwa interfejsu z nazwy pliku konfiguracji)."""
+    nic = os.path.splitext(os.path.basename(str(config_path)))[0]
+    return os.path.join(HOOK_DIR.format(nic=nic), HOOK_FILE)
+
+
+def install_start_hook(config_path, python=None, project_dir=None):
+    """
+    Zapisuje dodatek jednostki wg-quick@<nic> składający wg0.conf z fragmentów
+    przed startem i przeładowaniem interfejsu, po czym przeładowuje systemd.
+    :return: Ścieżka zapisanego pliku.
+    """
+    config_path = os.path.abspath(str(config_path))
+    hook = HOOK_TEMPLATE.format(
+        project_dir=project_dir or os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        python=python or sys.executable,
+        config_path=config_path,
+    )
+    path = hook_path(config_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    atomic_write(path, hook)
+    subprocess.run(["systemctl", "daemon-reload"], check=True)
+    return path
+
+
+def _try_install_hook(config_path):
+    """Instaluje dodatek wg-quick@<nic>, a w razie błędu wypisuje polecenie do ręcznego uruchomienia."""
+    try:
+        path = install_start_hook(config_path)
+    except (OSError, subprocess.CalledProcessError) as e:
+        print(f"⚠️ Nie udało się zainstalować składania wg0.conf przed startem wg-quick ({e}). "
+              f"Uruchom: python3 -m modules.config_fragments install-hook {config_path}")
+        return None
+    print(f"✅ wg0.conf będzie składany z fragmentów przed startem wg-quick ({path}).")
+    return path
+
+
+@atexit.register
+def _flush_stores():
+    """Zapisuje wg0.conf zaplanowany do złożenia przed zakończeniem procesu."""
+    with _stores_lock:
+        stores = list(_stores.values())
+    for store in stores:
+        store.flush()
+
+
+_sigterm_installed = False
+_previous_sigterm = None
+
+
+def _on_sigterm(signum, frame):
+    """Zapisuje odroczone złożenie wg0.conf, a następnie wykonuje poprzednią obsługę SIGTERM."""
+    _flush_stores()
+    previous = _previous_sigterm
+    if callable(previous):
+        previous(signum, frame)
+    elif previous != signal.SIG_IGN:
+        # Domyślna obsługa: zakończenie procesu przez ten sam sygnał
+        signal.signal(signum, signal.SIG_DFL)
+        os.kill(os.getpid(), signum)
+
+
+def _install_sigterm_flush():
+    """
+    Instaluje obsługę SIGTERM zapisującą odroczone złożenie (atexit nie działa
+    przy zakończeniu sygnałem). Możliwe tylko w głównym wątku - w innym wątku
+    próba jest powtarzana przy kolejnym get_fragment_store().
+    """
+    global _sigterm_installed, _previous_sigterm
+    if _sigterm_installed:
+        return
+    try:
+        previous = signal.signal(signal.SIGTERM, _on_sigterm)
+    except ValueError:  # Nie w głównym wątku
+        return
+    _previous_sigterm = previous
+    _sigterm_installed = True
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] not in ("split", "assemble", "install-hook"):
+        print("Użycie: python3 -m modules.config_fragments split|assemble|install-hook [ścieżka wg0.conf]")
+        return 1
+    if len(argv) > 1:
+        config_path = argv[1]
+    else:
+        from settings import SERVER_CONFIG_FILE
+        config_path = SERVER_CONFIG_FILE
+    store = FragmentStore(config_path, assemble_delay=None)
+    if argv[0] == "split":
+        count = store.split()
+        print(f"✅ Utworzono {count} fragmentów peerów w {store.directory}.")
+        _try_install_hook(config_path)
+    elif argv[0] == "install-hook":
+        print(f"✅ Zapisano {install_start_hook(config_path)}.")
+    else:
+        store.write_config()
+        print(f"✅ Złożono {store.config_path} z fragmentów w {store.directory}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
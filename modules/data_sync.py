@@ -6,6 +6,8 @@ import os
 import json
 import subprocess
 from datetime import datetime
+from modules.user_store import open_user_store
+from modules.wg_snapshot import format_bytes, get_snapshot
 
 # Ścieżki do danych
 WG_USERS_JSON = os.path.join("logs", "wg_users.json")
@@ -20,41 +22,34 @@ def load_json(filepath):
         return {}
 
 def get_wg_show_data():
-    """Pobiera dane z polecenia 'wg show'."""
+    """Pobiera dane peerów ze współdzielonej migawki `wg show all dump`."""
     try:
-        output = subprocess.check_output(["wg", "show"], text=True)
-        peers = {}
-        current_peer = None
-
-        for line in output.splitlines():
-            if line.startswith("peer:"):
-                current_peer = line.split(":")[1].strip()
-                peers[current_peer] = {"peer": current_peer}  # Zapisz peera
-            elif current_peer:
-                if "allowed ips:" in line:
-                    peers[current_peer]["allowed_ips"] = line.split(":")[1].strip()
-                elif "endpoint:" in line:
-                    peers[current_peer]["endpoint"] = line.split(":")[1].strip()
-                elif "latest handshake:" in line:
-                    peers[current_peer]["last_handshake"] = line.split(":")[1].strip()
-                elif "transfer:" in line:
-                    transfer_data = line.split(":")[1].strip().split(", ")
-                    peers[current_peer]["uploaded"] = transfer_data[0]
-                    peers[current_peer]["downloaded"] = transfer_data[1]
-
-        return peers
-    except subprocess.CalledProcessError:
+        snapshot = get_snapshot()
+    except (subprocess.CalledProcessError, FileNotFoundError):
         return {}
 
+    peers = {}
+    for public_key, peer in snapshot.peers().items():
+        data = {"peer": public_key, "allowed_ips": ", ".join(peer.allowed_ips)}
+        if peer.endpoint:
+            data["endpoint"] = peer.endpoint
+        if peer.latest_handshake:
+            data["last_handshake"] = datetime.utcfromtimestamp(peer.latest_handshake).strftime("%Y-%m-%d %H:%M:%S UTC")
+        data["uploaded"] = f"{format_bytes(peer.rx_bytes)} received"
+        data["downloaded"] = f"{format_bytes(peer.tx_bytes)} sent"
+        peers[public_key] = data
+    return peers
+
 def sync_user_data():
     """Synchronizuje dane ze wszystkich źródeł."""
-    user_records = load_json(USER_RECORDS_JSON)
+    store = open_user_store(USER_RECORDS_JSON)
+    user_records = store.all()
     wg_show_data = get_wg_show_data()
 
     synced_data = {}
 
     for username, details in user_records.items():
-        peer_key = details.get("peer", "N/A")
+        peer_key = details.get("peer") or details.get("public_key", "N/A")
         wg_data = wg_show_data.get(peer_key, {})
 
         synced_data[username] = {
@@ -74,8 +69,11 @@ def sync_user_data():
         }
 
     # Sprawdź nowych użytkowników z wg show, którzy nie są w user_records
+    # (indeks kluczy magazynu + peery rekordów - wyszukiwanie w czasie stałym)
+    known_peers = set(store.public_key_index())
+    known_peers.update(record["peer"] for record in synced_data.values())
     for peer, peer_data in wg_show_data.items():
-        if not any(record.get("peer") == peer for record in synced_data.values()):
+        if peer not in known_peers:
             new_user_id = f"nieznany_{peer}"
             print(f"⚠️ Nowy użytkownik z wg show: {peer_data.get('allowed_ips')}")
             synced_data[new_user_id] = {
@@ -95,8 +93,7 @@ def sync_user_data():
             }
 
     # Zapisz dane
-    with open(USER_RECORDS_JSON, "w") as user_records_file:
-        json.dump(synced_data, user_records_file, indent=4)
+    store.replace_all(synced_data)
     with open(WG_USERS_JSON, "w") as wg_users_file:
         json.dump(synced_data, wg_users_file, indent=4)
 
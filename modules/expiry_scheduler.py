@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+# modules/expiry_scheduler.py
+# Harmonogram wygasania kont: zawieszanie i usuwanie użytkowników w terminie
+#
+# Terminy z rekordów użytkowników trafiają do kopca (heapq) wpisów
+# (termin, użytkownik, akcja): zawieszenie w chwili expires_at lub
+# auto_suspend_date (wcześniejszej z nich) i usunięcie w chwili
+# auto_delete_date. Wątek harmonogramu śpi do najbliższego terminu, zdejmuje
+# z kopca wszystkie wpisy, których termin minął, i wykonuje je jedną paczką:
+# - zawieszenie: status "blocked" (blocked_reason "expired") jednym zapisem
+#   magazynu, jeden zapis konfiguracji serwera i jedno `wg set` usuwające peery,
+# - usunięcie: rekordy, peery i adresy IP jednym zapisem każdego z nich,
+#   a konfiguracje klientów i kody QR przeniesione do STALE_CONFIG_DIR.
+#
+# Wykonywane są tylko akcje z settings.EXPIRY_ACTIONS (domyślnie żadna):
+# pozostałe zaległe akcje są jedynie wypisywane (przebieg próbny), więc
+# włączenie harmonogramu nie zmienia kont bez decyzji administratora.
+# Usunięcie jest planowane tylko wtedy, gdy auto_delete_date jest późniejsze
+# niż termin zawieszenia (rekordy z tą samą datą są tylko zawieszane).
+# Pierwszy przebieg wątku po starcie jest zawsze próbny: zaległości
+# zebrane przed startem są wypisywane i wykonywane dopiero po kolejnym
+# pełnym odczycie (EXPIRY_RESYNC_INTERVAL), co daje czas na reakcję.
+#
+# Pełny odczyt rekordów odbywa się tylko przy starcie i co EXPIRY_RESYNC_INTERVAL
+# sekund (zmiany terminów wprowadzone w innych procesach). Przed wykonaniem
+# akcji termin jest sprawdzany w bieżącym rekordzie - przedłużone konto wraca
+# do kopca z nowym terminem. Zmiany w tym samym procesie można zgłosić od razu
+# przez schedule_user().
+#
+# Przykład użycia:
+#   from modules.expiry_scheduler import get_expiry_scheduler
+#   scheduler = get_expiry_scheduler()
+#   scheduler.start()                      # wątek w tle (usługa modules.stats_daemon)
+#   scheduler.schedule_user("jan", record)  # nowy lub przedłużony termin
+#
+#   python3 -m modules.expiry_scheduler            # jednorazowe wykonanie zaległych akcji (EXPIRY_ACTIONS)
+#   python3 -m modules.expiry_scheduler --dry-run  # tylko lista zaległych akcji
+
+import heapq
+import os
+import shutil
+import threading
+import time
+from datetime import datetime
+
+SUSPEND = "suspend"
+DELETE = "delete"
+EXPIRED_REASON = "expired"  # Wartość blocked_reason kont zawieszonych po terminie
+
+
+def _settings():
+    """Zwraca moduł settings (odczyt przy wywołaniu, nie przy imporcie)."""
+    import settings
+    return settings
+
+
+def enabled_actions():
+    """Zwraca zbiór akcji włączonych w settings.EXPIRY_ACTIONS (pozostałe tylko wypisywane)."""
+    return set(getattr(_settings(), "EXPIRY_ACTIONS", ()) or ()) & {SUSPEND, DELETE}
+
+
+def parse_deadline(value):
+    """Zamienia datę ISO z rekordu na epoch (sekundy) lub None ("N/A", brak, błąd)."""
+    if not value or value == "N/A":
+        return None
+    try:
+        return datetime.fromisoformat(str(value)).timestamp()
+    except ValueError:
+        return None
+
+
+def record_deadlines(record):
+    """
+    Zwraca terminy akcji rekordu. Usunięcie tylko z terminem późniejszym niż zawieszenie.
+    :return: Słownik {akcja: epoch} (tylko akcje z ustawionym terminem).
+    """
+    deadlines = {}
+    suspend = [due for due in (parse_deadline(record.get("expires_at")),
+                               parse_deadline(record.get("auto_suspend_date"))) if due is not None]
+    if suspend:
+        deadlines[SUSPEND] = min(suspend)
+    delete = parse_deadline(record.get("auto_delete_date"))
+    if delete is not None and delete > deadlines.get(SUSPEND, float("-inf")):
+        deadlines[DELETE] = delete
+    return deadlines
+
+
+def suspend_users(store, records, interface, config_file):
+    """
+    Zawiesza użytkowników jedną paczką (magazyn, konfiguracja serwera, `wg set`).
+    :param records: Słownik {nazwa: rekord}.
+    :return: Lista zawieszonych nazw.
+    """
+    from modules.server_config import set_peers_enabled
+    from modules.peer_apply import remove_peers
+
+    names = [name for name, record in records.items() if record.get("status") != "blocked"]
+    if not names:
+        return []
+    store.update_many({name: {"status": "blocked", "blocked_reason": EXPIRED_REASON} for name in names})
+    set_peers_enabled(config_file, names, False)
+    remove_peers(interface, [records[name].get("public_key") for name in names], config_file)
+    return names
+
+
+def _move_stale(path, stale_dir, stamp):
+    """Przenosi plik do katalogu nieaktualnych konfiguracji (z sygnaturą czasu). :return: Nowa ścieżka lub None."""
+    if not os.path.exists(path):
+        return None
+    os.makedirs(stale_dir, exist_ok=True)
+    name, ext = os.path.splitext(os.path.basename(path))
+    target = os.path.join(stale_dir, f"{name}_{stamp}{ext}")
+    shutil.move(path, target)
+    return target
+
+
+def delete_users(store, records, interface, config_file):
+    """
+    Usuwa użytkowników jedną paczką: rekordy, peery (jeden zapis konfiguracji
+    i jedno `wg set`), adresy IP; konfiguracje i kody QR trafiają do STALE_CONFIG_DIR.
+    :param records: Słownik {nazwa: rekord}.
+    :return: Lista usuniętych nazw.
+    """
+    from modules.server_config import remove_server_peers
+    from modules.peer_apply import remove_peers
+    from modules.ip_allocator import release_ip
+    from modules.qr_worker import discard_cached_qr
+
+    settings = _settings()
+    names = list(records)
+    if not names:
+        return []
+    with store.batch():
+        for name in names:
+            store.delete(name)
+    remove_server_peers(config_file, [(name, records[name].get("public_key")) for name in names])
+    remove_peers(interface, [records[name].get("public_key") for name in names], config_file)
+    release_ip(",".join(records[name]["allowed_ips"] for name in names if records[name].get("allowed_ips")),
+               settings.IP_POOL_PATH)
+
+    stamp = datetime.now().strftime("%Y%m%d%H%M%S")
+    for name in names:
+        config_path = os.path.join(settings.WG_CONFIG_DIR, f"{name}.conf")
+        if os.path.exists(config_path):
+            with open(config_path, "r") as f:
+                discard_cached_qr(f.read())
+        _move_stale(config_path, settings.STALE_CONFIG_DIR, stamp)
+        _move_stale(os.path.join(settings.QR_CODE_DIR, f"{name}.png"), settings.STALE_CONFIG_DIR, stamp)
+    return names
+
+
+class ExpiryScheduler:
+    """Kopiec terminów kont z wątkiem budzonym na najbliższy termin."""
+
+    def __init__(self, user_records_path=None, interface=None, config_file=None, resync_interval=None,
+                 clock=time.time):
+        """
+        :param resync_interval: Odstęp pełnego odczytu terminów (domyślnie settings.EXPIRY_RESYNC_INTERVAL).
+        :param clock: Funkcja bieżącego czasu (epoch).
+        """
+        self.user_records_path = user_records_path
+        self.interface = interface
+        self.config_file = config_file
+        self.resync_interval = resync_interval
+        self.clock = clock
+        self._heap = []
+        self._condition = threading.Condition()
+        self._thread = None
+        self._stopping = False
+
+    def _store(self):
+        from modules.user_store import open_user_store
+        return open_user_store(str(self.user_records_path or _settings().USER_DB_PATH))
+
+    def resync(self):
+        """Odbudowuje kopiec z pełnego odczytu rekordów. :return: Liczba terminów."""
+        heap = [(due, name, action)
+                for name, record in self._store().all().items()
+                for action, due in record_deadlines(record).items()
+                if not (action == SUSPEND and record.get("status") == "blocked")]
+        heapq.heapify(heap)
+        with self._condition:
+            self._heap = heap
+            self._condition.notify()
+        return len(heap)
+
+    def schedule_user(self, username, record):
+        """Dodaje terminy użytkownika (np. po rejestracji lub przedłużeniu konta) i budzi wątek."""
+        with self._condition:
+            for action, due in record_deadlines(record).items():
+                heapq.heappush(self._heap, (due, username, action))
+            self._condition.notify()
+
+    def next_due(self):
+        """Zwraca najbliższy termin (epoch) lub None."""
+        with self._condition:
+            return self._heap[0][0] if self._heap else None
+
+    def _pop_due(self, now):
+        due = []
+        with self._condition:
+            while self._heap and self._heap[0][0] <= now:
+                due.append(heapq.heappop(self._heap))
+        return due
+
+    def run_due(self, now=None, dry_run=False):
+        """
+        Wykonuje jedną paczką wszystkie akcje, których termin minął.
+        Akcje spoza EXPIRY_ACTIONS (lub wszystkie przy dry_run) są tylko wypisywane.
+        :return: Słownik {"suspended": [...], "deleted": [...], "skipped": {akcja: [...]}}.
+        """
+        now = self.clock() if now is None else now
+        actions = set() if dry_run else enabled_actions()
+        store = self._store()
+        suspend, delete = {}, {}
+        for _, name, action in self._pop_due(now):
+            record = store.get(name)
+            if record is None:
+                continue  # Użytkownik usunięty w międzyczasie
+            current = record_deadlines(record).get(action)
+            if current is None:
+                continue
+            if current > now:
+                # Termin przedłużony - wpis wraca do kopca
+                with self._condition:
+                    heapq.heappush(self._heap, (current, name, action))
+                continue
+            (delete if action == DELETE else suspend)[name] = record
+
+        settings = _settings()
+        interface = self.interface or settings.SERVER_WG_NIC
+        config_file = self.config_file or settings.SERVER_CONFIG_FILE
+        for name in delete:
+            suspend.pop(name, None)
+        summary = {"suspended": [], "deleted": [], "skipped": {}}
+        for action, pending in ((SUSPEND, suspend), (DELETE, delete)):
+            if pending and action not in actions:
+                summary["skipped"][action] = sorted(pending)
+                label = "zawieszenia" if action == SUSPEND else "usunięcia"
+                print(f"ℹ️ Wygasłe konta do {label} (akcja wyłączona, EXPIRY_ACTIONS): "
+                      f"{len(pending)} ({', '.join(sorted(pending))}).")
+                pending.clear()
+        if suspend:
+            summary["suspended"] = suspend_users(store, suspend, interface, config_file)
+            if summary["suspended"]:
+                print(f"⏳ Wygasłe konta: zawieszono {len(summary['suspended'])} ({', '.join(summary['suspended'])}).")
+        if delete:
+            summary["deleted"] = delete_users(store, delete, interface, config_file)
+            print(f"🗑️ Wygasłe konta: usunięto {len(summary['deleted'])} ({', '.join(summary['deleted'])}).")
+        return summary
+
+    def start(self):
+        """Uruchamia wątek harmonogramu (jeśli nie działa)."""
+        with self._condition:
+            self._stopping = False
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, args=(self.clock(),), name="expiry-scheduler",
+                                                daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout=5):
+        """Zatrzymuje wątek harmonogramu."""
+        with self._condition:
+            self._stopping = True
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self, started_at):
+        """
+        Pętla wątku. Pierwszy przebieg tylko wypisuje terminy minione przed start()
+        (started_at); terminy późniejsze są wykonywane, nawet gdy wątek ruszył z opóźnieniem.
+        """
+        interval = float(self.resync_interval or getattr(_settings(), "EXPIRY_RESYNC_INTERVAL", 3600))
+        next_resync = 0.0
+        first_pass = True
+        while True:
+            now = self.clock()
+            try:
+                if now >= next_resync:
+                    next_resync = now + interval
+                    self.resync()
+                if first_pass:
+                    self.run_due(min(now, started_at), dry_run=True)
+                    first_pass = False
+                else:
+                    self.run_due(now)
+            except Exception as e:
+                print(f"⚠️ Błąd harmonogramu wygasania kont: {e}")
+            with self._condition:
+                # Sen do najbliższego terminu lub pełnego odczytu; schedule_user()/stop() budzą wcześniej
+                if self._stopping:
+                    return
+                wake_at = min(self._heap[0][0], next_resync) if self._heap else next_resync
+                self._condition.wait(max(0.0, wake_at - self.clock()))
+                if self._stopping:
+                    return
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_expiry_scheduler():
+    """Zwraca współdzielony harmonogram wygasania kont procesu."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = ExpiryScheduler()
+        return _scheduler
+
+
+if __name__ == "__main__":
+    import sys
+    scheduler = get_expiry_scheduler()
+    print(f"Terminów w harmonogramie: {scheduler.resync()}")
+    result = scheduler.run_due(dry_run="--dry-run" in sys.argv[1:])
+    print(f"Zawieszono: {len(result['suspended'])}, usunięto: {len(result['deleted'])}")
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# modules/file_lock.py
+# Blokada plików współdzielonych między procesami (fcntl.flock na pliku pomocniczym)
+#
+# user_records.json i wg0.conf zmieniają jednocześnie panel Gradio, menu
+# konsolowe i usługa modules.stats_daemon. Każdy odczyt-modyfikacja-zapis
+# takiego pliku odbywa się w file_lock(ścieżka): wyłączna blokada flock na
+# pliku "<ścieżka>.lock" obok (nie na samym pliku, który jest podmieniany
+# przez os.replace i zmienia i-węzeł). Blokada jest wielowejściowa w obrębie
+# procesu - zagnieżdżone wywołania w tym samym wątku nie blokują się
+# nawzajem, a inne wątki procesu czekają jak inne procesy.
+#
+# Przykład użycia:
+#   from modules.file_lock import file_lock
+#   with file_lock("/etc/wireguard/wg0.conf"):
+#       ...  # odczyt, zmiana i atomowy zapis pliku
+
+import os
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Brak flock (np. Windows) - tylko blokada w obrębie procesu
+    fcntl = None
+
+LOCK_SUFFIX = ".lock"
+
+_locks = {}  # ścieżka -> [RLock, deskryptor pliku blokady, głębokość]
+_locks_guard = threading.Lock()
+
+
+def _reset_after_fork():
+    """Proces potomny nie dziedziczy blokad rodzica (flock dotyczy otwartego pliku, nie procesu)."""
+    global _locks, _locks_guard
+    _locks = {}
+    _locks_guard = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def lock_path(path):
+    """Zwraca ścieżkę pliku blokady dla pliku danych."""
+    return f"{os.path.abspath(str(path))}{LOCK_SUFFIX}"
+
+
+@contextmanager
+def file_lock(path):
+    """Wyłączna blokada pliku dla bieżącego wątku i innych procesów (na czas bloku `with`)."""
+    key = lock_path(path)
+    with _locks_guard:
+        entry = _locks.setdefault(key, [threading.RLock(), None, 0])
+    with entry[0]:
+        if entry[2] == 0:
+            os.makedirs(os.path.dirname(key) or ".", exist_ok=True)
+            fd = os.open(key, os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                if fcntl is not None:
+                    fcntl.flock(fd, fcntl.LOCK_EX)
+            except Exception:
+                os.close(fd)
+                raise
+            entry[1] = fd
+        entry[2] += 1
+        try:
+            yield
+        finally:
+            entry[2] -= 1
+            if entry[2] == 0:
+                fd, entry[1] = entry[1], None
+                if fcntl is not None:
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+                os.close(fd)
@@ -3,7 +3,7 @@
 
 import os
 import subprocess
-from gradio_admin.main_interface import admin_interface
+import time
 from modules.firewall_utils import open_firewalld_port, close_firewalld_port, handle_port_conflict, get_external_ip
 
 custom_css = """
@@ -140,7 +140,16 @@ hr {
 def run_gradio_admin_interface(port):
     """
     Uruchamia interfejs Gradio na określonym porcie.
+    Interfejs jest importowany dopiero tutaj; czas startu (import Gradio,
+    budowa zakładek) jest wypisywany przed uruchomieniem serwera.
     """
+    started = time.perf_counter()
+    from gradio_admin import main_interface
+    from gradio_admin.functions.lazy_tabs import describe_build_times
+    admin_interface = main_interface.admin_interface
+    print(f"  ⏱️  Interfejs gotowy w {time.perf_counter() - started:.2f} s "
+          f"(budowa zakładek {main_interface.BUILD_SECONDS:.2f} s: {describe_build_times()})")
+
     handle_port_conflict(port)
     
     open_firewalld_port(port)
@@ -2,10 +2,10 @@
 # modules/handshake_updater.py
 
 import os
-import json
-import subprocess
 from datetime import datetime
 from settings import USER_DB_PATH, SERVER_WG_NIC
+from modules.user_store import open_user_store  # Magazyn rekordów (JSON lub SQLite)
+from modules.wg_snapshot import get_snapshot  # Współdzielony odczyt `wg show all dump`
 
 def get_latest_handshakes(interface):
     """
@@ -14,18 +14,8 @@ def get_latest_handshakes(interface):
     :return: Słownik {klucz_publiczny: ostatni_handshake}.
     """
     try:
-        output = subprocess.check_output(["wg", "show", interface, "latest-handshakes"], text=True)
-        lines = output.strip().split("\n")
-        handshakes = {}
-
-        for line in lines:
-            parts = line.split()
-            if len(parts) >= 2:
-                public_key = parts[0]
-                timestamp = int(parts[1])
-                handshakes[public_key] = convert_handshake_timestamp(timestamp)
-
-        return handshakes
+        peers = get_snapshot().peers_of(interface)
+        return {public_key: convert_handshake_timestamp(peer.latest_handshake) for public_key, peer in peers.items()}
     except Exception as e:
         print(f"Błąd pobierania informacji o handshake'ach: {e}")
         return {}
@@ -40,28 +30,34 @@ def convert_handshake_timestamp(timestamp):
         return "Nigdy"
     return datetime.utcfromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S UTC")
 
+def handshake_updates(peers, index):
+    """
+    Zwraca zmiany rekordów z ostatnimi handshake'ami peerów (bez zapisu).
+    :param peers: Słownik {klucz_publiczny: WgPeer} z migawki interfejsu.
+    :param index: Indeks {klucz_publiczny: nazwa} magazynu użytkowników.
+    :return: Słownik {nazwa: {"last_handshake"}}.
+    """
+    return {index[key]: {"last_handshake": convert_handshake_timestamp(peer.latest_handshake)}
+            for key, peer in peers.items() if key in index}
+
 def update_handshakes(user_records_path, interface):
     """
     Aktualizuje informacje o najnowszych handshake'ach użytkowników w user_records.json.
     :param user_records_path: Ścieżka do pliku user_records.json.
     :param interface: Nazwa interfejsu WireGuard.
     """
-    if not os.path.exists(user_records_path):
+    store = open_user_store(user_records_path)
+    if store.count() == 0 and not os.path.exists(user_records_path):
         print(f"Plik {user_records_path} nie istnieje.")
         return
 
-    with open(user_records_path, "r") as f:
-        user_records = json.load(f)
-
     handshakes = get_latest_handshakes(interface)
 
-    for username, user_data in user_records.items():
-        public_key = user_data.get("public_key")
-        if public_key in handshakes:
-            user_data["last_handshake"] = handshakes[public_key]
-
-    with open(user_records_path, "w") as f:
-        json.dump(user_records, f, indent=4)
+    # Jedna transakcja dla wszystkich zmienionych rekordów
+    with store.batch():
+        index = store.public_key_index()
+        updates = {index[key]: {"last_handshake": value} for key, value in handshakes.items() if key in index}
+        store.update_many(updates)
 
     print("Informacje o najnowszych handshake'ach pomyślnie zaktualizowane.")
 
@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+# modules/ip_allocator.py
+# Przydział adresów IP klientów WireGuard oparty na bitmapie
+#
+# Pula adresów podsieci (IPv4 lub IPv6) jest reprezentowana bitmapą, w której
+# bit o indeksie N oznacza adres network_address + N. Przydział szuka pierwszego
+# wolnego bajtu od zapamiętanej wskazówki (wyszukiwanie w C przez re), a zwolnienie
+# cofa wskazówkę - oba są praktycznie O(1). Bitmapa jest zapisywana atomowo do
+# pliku JSON (skompresowana) i może być w każdej chwili odbudowana z wg0.conf
+# lub rekordów użytkowników (open_user_store - JSON lub SQLite). Wczytana pula
+# jest uzgadniana z tymi źródłami (adresy w użyciu, a wolne w puli, są
+# rezerwowane), a zmiany zapisanej puli odbywają się pod file_lock.
+#
+# Przykład użycia:
+#   pool = load_ip_pool("10.66.66.0/24", IP_POOL_PATH, SERVER_CONFIG_FILE)
+#   ip = pool.allocate()
+#   save_ip_pool(pool, IP_POOL_PATH)
+
+import base64
+import ipaddress
+import json
+import os
+import re
+import tempfile
+import zlib
+
+from modules.file_lock import file_lock
+from modules.server_config import load_server_config
+from modules.user_store import open_user_store
+
+MAX_POOL_SIZE = 1 << 24  # Maksymalna liczba adresów w bitmapie (2 MiB); większe pule (IPv6) są przycinane
+_FREE_BYTE = re.compile(rb"[^\xff]")
+
+
+class IPPool:
+    """Pula adresów IP podsieci z bitmapą przydziałów."""
+
+    def __init__(self, subnet, server_ip=None, reserved=()):
+        """
+        :param subnet: Podsieć w formacie CIDR (np. '10.66.0.0/16' lub 'fd42::/64').
+        :param server_ip: Adres serwera (domyślnie pierwszy host podsieci), zawsze zarezerwowany.
+        :param reserved: Dodatkowe adresy do zarezerwowania.
+        """
+        self.network = ipaddress.ip_network(str(subnet), strict=False)
+        self.size = min(self.network.num_addresses, MAX_POOL_SIZE)
+        self._bitmap = bytearray((self.size + 7) // 8)
+        self._hint = 0
+
+        # Bity wykraczające poza pulę są oznaczone jako zajęte
+        for offset in range(self.size, len(self._bitmap) * 8):
+            self._set(offset)
+
+        # Adres sieci, adres rozgłoszeniowy (IPv4) i adres serwera nie są przydzielane
+        if self.network.num_addresses > 2:
+            self._set(0)
+            if self.network.version == 4 and self.network.num_addresses <= self.size:
+                self._set(self.size - 1)
+        if server_ip is None and self.size > 1:
+            server_ip = self.network.network_address + 1
+        for ip in ([server_ip] if server_ip else []) + list(reserved):
+            self.reserve(ip)
+
+    # --- operacje na bitach ---
+
+    def _set(self, offset):
+        self._bitmap[offset >> 3] |= 1 << (offset & 7)
+
+    def _clear(self, offset):
+        self._bitmap[offset >> 3] &= ~(1 << (offset & 7)) & 0xFF
+
+    def _test(self, offset):
+        return bool(self._bitmap[offset >> 3] & (1 << (offset & 7)))
+
+    def _offset(self, ip):
+        """Zamienia adres IP (str, z opcjonalnym /prefiksem) na indeks w bitmapie."""
+        address = ipaddress.ip_interface(str(ip).strip()).ip
+        if address not in self.network:
+            raise ValueError(f"Adres {address} nie należy do podsieci {self.network}.")
+        offset = int(address) - int(self.network.network_address)
+        if offset >= self.size:
+            raise ValueError(f"Adres {address} wykracza poza zarządzaną pulę ({self.size} adresów).")
+        return offset
+
+    # --- API puli ---
+
+    def is_allocated(self, ip):
+        """Sprawdza czy adres jest zajęty (przydzielony lub zarezerwowany)."""
+        return self._test(self._offset(ip))
+
+    def reserve(self, ip):
+        """Oznacza adres jako zajęty. Adresy spoza puli są ignorowane."""
+        try:
+            self._set(self._offset(ip))
+        except ValueError:
+            return False
+        return True
+
+    def release(self, ip):
+        """Zwalnia adres, aby mógł zostać ponownie przydzielony."""
+        offset = self._offset(ip)
+        self._clear(offset)
+        self._hint = min(self._hint, offset >> 3)
+
+    def allocate(self):
+        """
+        Przydziela pierwszy wolny adres.
+        :return: Adres IP jako ciąg znaków.
+        """
+        match = _FREE_BYTE.search(self._bitmap, self._hint)
+        if match is None:
+            raise ValueError("Brak dostępnych adresów IP w określonej podsieci.")
+        byte_index = match.start()
+        byte = self._bitmap[byte_index]
+        bit = (~byte & (byte + 1)).bit_length() - 1  # Najniższy wyzerowany bit
+        offset = (byte_index << 3) + bit
+        self._set(offset)
+        self._hint = byte_index
+        return str(self.network.network_address + offset)
+
+    def allocate_many(self, count):
+        """
+        Przydziela wiele adresów naraz. W razie braku miejsca nic nie zostaje przydzielone.
+        :return: Lista adresów IP.
+        """
+        allocated = []
+        try:
+            for _ in range(count):
+                allocated.append(self.allocate())
+        except ValueError:
+            for ip in allocated:
+                self.release(ip)
+            raise
+        return allocated
+
+    def allocated_count(self):
+        """Zwraca liczbę zajętych adresów (z rezerwacjami)."""
+        padding = len(self._bitmap) * 8 - self.size
+        return bin(int.from_bytes(self._bitmap, "little")).count("1") - padding
+
+    # --- serializacja ---
+
+    def to_dict(self):
+        return {
+            "network": str(self.network),
+            "size": self.size,
+            "bitmap": base64.b64encode(zlib.compress(bytes(self._bitmap))).decode("ascii"),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        pool = cls.__new__(cls)
+        pool.network = ipaddress.ip_network(data["network"])
+        pool.size = int(data["size"])
+        pool._bitmap = bytearray(zlib.decompress(base64.b64decode(data["bitmap"])))
+        pool._hint = 0
+        if len(pool._bitmap) != (pool.size + 7) // 8:
+            raise ValueError("Uszkodzona bitmapa puli adresów IP.")
+        return pool
+
+
+def parse_config_ips(config_file):
+    """Odczytuje adresy z linii AllowedIPs pliku wg0.conf (także zakomentowanych bloków)."""
+    if not os.path.exists(config_file):
+        return []
+    return load_server_config(config_file).allowed_ips()
+
+
+def parse_record_ips(user_records_path):
+    """Odczytuje adresy z pola allowed_ips rekordów użytkowników (magazyn z open_user_store)."""
+    try:
+        records = open_user_store(user_records_path).all()
+    except json.JSONDecodeError:
+        return []
+    ips = []
+    for record in records.values():
+        for value in str(record.get("allowed_ips") or "").split(","):
+            if value.strip() and value.strip() != "N/A":
+                ips.append(value.strip())
+    return ips
+
+
+def rebuild_ip_pool(subnet, config_file=None, user_records_path=None, server_ip=None):
+    """
+    Buduje pulę od nowa na podstawie wg0.conf i/lub user_records.json.
+    :return: Obiekt IPPool.
+    """
+    pool = IPPool(subnet, server_ip=server_ip)
+    for ip in _source_ips(config_file, user_records_path):
+        try:
+            pool.reserve(ip)
+        except ValueError:
+            continue
+    return pool
+
+
+def _source_ips(config_file=None, user_records_path=None):
+    """Zwraca adresy używane w wg0.conf i w rekordach użytkowników."""
+    sources = []
+    if config_file:
+        sources.extend(parse_config_ips(config_file))
+    if user_records_path:
+        sources.extend(parse_record_ips(user_records_path))
+    return sources
+
+
+def reconcile_ip_pool(pool, config_file=None, user_records_path=None):
+    """
+    Rezerwuje w puli adresy używane w wg0.conf lub rekordach, a oznaczone w niej jako wolne
+    (np. zwolnione przed nieudanym usunięciem peera). Adresy zajęte tylko w puli zostają
+    zajęte - mogą należeć do tworzonego właśnie użytkownika.
+    :return: Liczba zarezerwowanych adresów.
+    """
+    reserved = 0
+    for ip in _source_ips(config_file, user_records_path):
+        try:
+            if not pool.is_allocated(ip):
+                pool.reserve(ip)
+                reserved += 1
+        except ValueError:
+            continue
+    return reserved
+
+
+def save_ip_pool(pool, pool_path):
+    """Zapisuje pulę atomowo (plik tymczasowy + os.replace)."""
+    directory = os.path.dirname(str(pool_path)) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".ip_pool_")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(pool.to_dict(), f)
+        os.replace(tmp_path, pool_path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def load_ip_pool(subnet, pool_path, config_file=None, user_records_path=None):
+    """
+    Wczytuje zapisaną pulę i uzgadnia ją ze źródłami (reconcile_ip_pool); jeśli plik
+    nie istnieje, jest uszkodzony lub dotyczy innej podsieci, odbudowuje pulę ze
+    źródeł i ją zapisuje.
+    :return: Obiekt IPPool.
+    """
+    network = ipaddress.ip_network(str(subnet), strict=False)
+    if pool_path and os.path.exists(pool_path):
+        try:
+            with open(pool_path, "r") as f:
+                pool = IPPool.from_dict(json.load(f))
+            if pool.network == network:
+                if reconcile_ip_pool(pool, config_file, user_records_path):
+                    save_ip_pool(pool, pool_path)
+                return pool
+        except (ValueError, KeyError, json.JSONDecodeError, zlib.error):
+            pass
+    pool = rebuild_ip_pool(network, config_file, user_records_path)
+    if pool_path:
+        save_ip_pool(pool, pool_path)
+    return pool
+
+
+def release_ip(ip, pool_path):
+    """
+    Zwalnia adres w zapisanej puli - wywoływane dopiero po usunięciu peera z konfiguracji.
+    Błędy odczytu puli nie są propagowane.
+    :return: True jeśli adres został zwolniony.
+    """
+    if not ip or not pool_path or not os.path.exists(pool_path):
+        return False
+    with file_lock(pool_path):
+        try:
+            with open(pool_path, "r") as f:
+                pool = IPPool.from_dict(json.load(f))
+        except (OSError, ValueError, KeyError, zlib.error) as e:
+            # Pula jest tylko pamięcią podręczną - można ją odbudować, usuwania nie przerywamy
+            print(f"⚠️ Nie udało się wczytać puli adresów IP {pool_path}: {e}")
+            return False
+        released = False
+        for value in str(ip).split(","):
+            try:
+                pool.release(value)
+                released = True
+            except ValueError:
+                continue
+        if released:
+            save_ip_pool(pool, pool_path)
+        return released
+
+
+def reset_ip_pool(pool_path):
+    """
+    Usuwa zapisaną pulę (np. po wyczyszczeniu peerów lub rekordów) - następne
+    load_ip_pool() odbuduje ją z wg0.conf i rekordów użytkowników.
+    :return: True jeśli plik puli został usunięty.
+    """
+    if not pool_path:
+        return False
+    with file_lock(pool_path):
+        try:
+            os.remove(pool_path)
+        except FileNotFoundError:
+            return False
+    return True
+
+
+if __name__ == "__main__":
+    # Ręczna odbudowa puli z konfiguracji serwera i bazy użytkowników
+    from settings import IP_POOL_PATH, SERVER_CONFIG_FILE, USER_DB_PATH
+    from modules.utils import get_wireguard_subnet
+
+    subnet = ipaddress.ip_interface(get_wireguard_subnet(str(SERVER_CONFIG_FILE))).network
+    ip_pool = rebuild_ip_pool(subnet, SERVER_CONFIG_FILE, USER_DB_PATH)
+    save_ip_pool(ip_pool, IP_POOL_PATH)
+    print(f"✅ Pula adresów {subnet} odbudowana: zajętych {ip_pool.allocated_count()} z {ip_pool.size}.")
@@ -1,13 +1,113 @@
+#!/usr/bin/env python3
+# modules/keygen.py
+# Generowanie kluczy WireGuard (prywatny, publiczny, preshared)
+#
+# Dostępne backendy:
+# - "native": Curve25519 w procesie przez bibliotekę cryptography (bez fork/exec),
+# - "wg":     polecenia `wg genkey`, `wg pubkey`, `wg genpsk`,
+# - "auto":   "native" jeśli cryptography jest dostępne, w przeciwnym razie "wg".
+#
+# Oba backendy zwracają identyczne kodowanie: base64 z 32 bajtów jako bytes
+# (bez znaku nowej linii), tak jak wyjście narzędzia `wg`.
+
+import base64
+import os
 import subprocess
 
-def generate_private_key():
+try:
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric.x25519 import X25519PrivateKey
+    CRYPTOGRAPHY_AVAILABLE = True
+except ImportError:
+    CRYPTOGRAPHY_AVAILABLE = False
+
+try:
+    from settings import KEYGEN_BACKEND
+except ImportError:
+    KEYGEN_BACKEND = "auto"
+
+BACKENDS = ("auto", "native", "wg")
+KEY_LENGTH = 32  # Długość klucza Curve25519/PSK w bajtach
+
+
+def resolve_backend(backend=None):
+    """
+    Ustala backend generowania kluczy.
+    :param backend: "auto", "native", "wg" lub None (wartość z settings.KEYGEN_BACKEND).
+    :return: "native" lub "wg".
+    """
+    backend = str(backend or KEYGEN_BACKEND or "auto").lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"Nieznany backend generowania kluczy: {backend}. Dostępne: {', '.join(BACKENDS)}")
+    if backend == "auto":
+        return "native" if CRYPTOGRAPHY_AVAILABLE else "wg"
+    if backend == "native" and not CRYPTOGRAPHY_AVAILABLE:
+        raise RuntimeError("Backend 'native' wymaga biblioteki cryptography.")
+    return backend
+
+
+def _clamp_private_key(raw):
+    """Stosuje clamping Curve25519 identyczny z `wg genkey`."""
+    key = bytearray(raw)
+    key[0] &= 248
+    key[31] = (key[31] & 127) | 64
+    return bytes(key)
+
+
+def _decode_key(key):
+    """Dekoduje klucz base64 (bytes lub str) do 32 surowych bajtów."""
+    if isinstance(key, str):
+        key = key.encode("utf-8")
+    raw = base64.b64decode(key.strip(), validate=True)
+    if len(raw) != KEY_LENGTH:
+        raise ValueError(f"Nieprawidłowa długość klucza: {len(raw)} bajtów (oczekiwano {KEY_LENGTH}).")
+    return raw
+
+
+def _native_public_key(private_key):
+    raw_private = _decode_key(private_key)
+    raw_public = X25519PrivateKey.from_private_bytes(raw_private).public_key().public_bytes(
+        encoding=serialization.Encoding.Raw,
+        format=serialization.PublicFormat.Raw
+    )
+    return base64.b64encode(raw_public)
+
+
+def generate_private_key(backend=None):
+    if resolve_backend(backend) == "native":
+        return base64.b64encode(_clamp_private_key(os.urandom(KEY_LENGTH)))
     private_key = subprocess.check_output(['wg', 'genkey']).strip()
     return private_key
 
-def generate_public_key(private_key):
+
+def generate_public_key(private_key, backend=None):
+    if isinstance(private_key, str):
+        private_key = private_key.encode("utf-8")
+    if resolve_backend(backend) == "native":
+        return _native_public_key(private_key)
     public_key = subprocess.check_output(['wg', 'pubkey'], input=private_key).strip()
     return public_key
 
-def generate_preshared_key():
+
+def generate_preshared_key(backend=None):
+    if resolve_backend(backend) == "native":
+        return base64.b64encode(os.urandom(KEY_LENGTH))
     preshared_key = subprocess.check_output(['wg', 'genpsk']).strip()
     return preshared_key
+
+
+def generate_keypairs(count, backend=None):
+    """
+    Generuje wiele par kluczy w jednym wywołaniu.
+    :param count: Liczba par kluczy.
+    :param backend: Backend generowania kluczy (patrz resolve_backend).
+    :return: Lista krotek (klucz_prywatny, klucz_publiczny) jako bytes base64.
+    """
+    if count < 0:
+        raise ValueError("Liczba par kluczy nie może być ujemna.")
+    backend = resolve_backend(backend)
+    keypairs = []
+    for _ in range(count):
+        private_key = generate_private_key(backend)
+        keypairs.append((private_key, generate_public_key(private_key, backend)))
+    return keypairs
@@ -7,10 +7,16 @@ import os
 import json
 import sys
 import subprocess
-from modules.utils import get_wireguard_subnet, read_json, write_json
-from settings import USER_DB_PATH, SERVER_CONFIG_FILE, WG_CONFIG_DIR, QR_CODE_DIR, SERVER_WG_NIC
-from modules.traffic_updater import update_traffic_data
-from modules.handshake_updater import update_handshakes
+from modules.utils import get_wireguard_subnet
+from modules.ip_allocator import release_ip
+from modules.peer_apply import remove_peers
+from modules.server_config import load_server_config, remove_server_peer
+from modules.user_store import open_user_store
+from modules.qr_service import render_terminal
+from modules.qr_worker import discard_cached_qr
+from modules.user_service import create_user as create_user_in_process
+from settings import USER_DB_PATH, SERVER_CONFIG_FILE, WG_CONFIG_DIR, QR_CODE_DIR, SERVER_WG_NIC, IP_POOL_PATH
+from modules.stats_daemon import describe_status, read_status  # Dane zbiera kolektor w tle
 
 def ensure_directory_exists(filepath):
     """Zapewnia istnienie katalogu dla pliku."""
@@ -19,11 +25,11 @@ def ensure_directory_exists(filepath):
         os.makedirs(directory)
 
 def load_user_records():
-    """Wczytuje dane użytkowników z pliku JSON."""
-    return read_json(USER_DB_PATH)
+    """Wczytuje dane użytkowników z magazynu rekordów (backend z settings.USER_STORE_BACKEND)."""
+    return open_user_store(USER_DB_PATH).all()
 
 def create_user():
-    """Tworzy nowego użytkownika wywołując main.py."""
+    """Tworzy nowego użytkownika (w bieżącym procesie, przez modules/user_service.py)."""
     username = input("Wprowadź nazwę użytkownika: ").strip()
     if not username:
         print("❌ Nazwa użytkownika nie może być pusta.")
@@ -32,15 +38,14 @@ def create_user():
     email = input("Wprowadź email (opcjonalnie): ").strip() or "N/A"
     telegram_id = input("Wprowadź ID Telegram (opcjonalnie): ").strip() or "N/A"
 
-    try:
-        subprocess.run(
-            ["python3", os.path.join("main.py"), username, email, telegram_id],
-            check=True,
-            cwd=os.path.abspath(os.path.dirname(__file__) + "/../")
-        )
-
-    except subprocess.CalledProcessError as e:
-        print(f"❌ Błąd tworzenia użytkownika: {e}")
+    result = create_user_in_process(username, email, telegram_id)
+    if not result["success"]:
+        print(f"❌ Błąd tworzenia użytkownika: {result['message']}")
+        return
+    print(result["message"])
+    print(f"  Konfiguracja: {result['config_path']}")
+    print(f"  Kod QR: {result['qr_path'] or 'nie wygenerowano'}")
+    print(f"  Adres IP: {result['ip']} | Czas: {result['timings']['total']:.0f} ms")
 
 def list_users():
     """Wyświetla listę wszystkich użytkowników."""
@@ -56,11 +61,9 @@ def list_users():
         print(f"  - {username}: {allowed_ips} | Status: {status}")
 
 def show_traffic():
-    """Pobiera i wyświetla ruch użytkowników."""
+    """Wyświetla ruch użytkowników zapisany przez kolektor statystyk."""
     try:
-        print("\n🔄 Aktualizacja ruchu użytkowników...")
-        update_traffic_data(USER_DB_PATH)
-        print("✅ Ruch użytkowników zaktualizowany.")
+        print(f"\n{describe_status(read_status())}")
 
         records = load_user_records()
         print("\n📊 Ruch użytkowników:")
@@ -72,11 +75,9 @@ def show_traffic():
         print(f"⚠️ Błąd pobierania ruchu użytkowników: {e}")
 
 def show_handshakes():
-    """Pobiera i wyświetla informacje o ostatnich handshake'ach."""
+    """Wyświetla ostatnie handshake'i zapisane przez kolektor statystyk."""
     try:
-        print("\n🔄 Aktualizacja informacji o ostatnich handshake'ach...")
-        update_handshakes(USER_DB_PATH, SERVER_WG_NIC)
-        print("✅ Informacje o ostatnich handshake'ach zaktualizowane.")
+        print(f"\n{describe_status(read_status())}")
 
         records = load_user_records()
         print("\n🤝 Ostatnie handshake'i:")
@@ -84,7 +85,20 @@ def show_handshakes():
             last_handshake = data.get("last_handshake", "Nigdy")
             print(f"  - {username}: Ostatni handshake: {last_handshake}")
     except Exception as e:
-        print(f"⚠️ Błąd aktualizacji informacji o handshake'ach: {e}")
+        print(f"⚠️ Błąd odczytu informacji o handshake'ach: {e}")
+
+def show_qr_code():
+    """Wyświetla kod QR konfiguracji użytkownika w terminalu."""
+    username = input("Wprowadź nazwę użytkownika: ").strip()
+    config_path = WG_CONFIG_DIR / f"{username}.conf"
+    if not username or not config_path.exists():
+        print(f"❌ Konfiguracja użytkownika '{username}' nie znaleziona.")
+        return
+    try:
+        print(f"\n📷 Kod QR użytkownika '{username}':\n")
+        print(render_terminal(config_path.read_text()))
+    except Exception as e:
+        print(f"⚠️ Błąd generowania kodu QR: {e}")
 
 def delete_user():
     """
@@ -97,25 +111,41 @@ def delete_user():
 
     print(f"➡️ Rozpoczynanie usuwania użytkownika: '{username}'.")
 
-    if not os.path.exists(USER_DB_PATH):
-        print(f"❌ Plik danych użytkowników nie znaleziony: {USER_DB_PATH}")
-        return
-
     try:
-        # Wczytaj dane użytkownika
-        user_data = read_json(USER_DB_PATH)
-        if username not in user_data:
+        # Wczytaj rekord użytkownika
+        store = open_user_store(USER_DB_PATH)
+        user_info = store.get(username)
+        if user_info is None:
             print(f"❌ Użytkownik '{username}' nie istnieje.")
             return
 
-        # Usuń rekord użytkownika
-        user_data.pop(username)
-        write_json(USER_DB_PATH, user_data)
+        # Znajdź peera użytkownika po dokładnej nazwie klienta (nie po podciągu)
+        peer = load_server_config(SERVER_CONFIG_FILE).peer_by_name(username)
+        if peer is not None:
+            # Usuń blok [Peer] (ten sam zablokowany zapis co pozostałe zmiany konfiguracji)
+            remove_server_peer(SERVER_CONFIG_FILE, username, peer.public_key)
+            print(f"✅ Konfiguracja WireGuard zaktualizowana.")
+
+            # Usuń użytkownika z WireGuard (jedno `wg set ... remove`, fallback: wg syncconf)
+            if peer.public_key:
+                remove_peers(SERVER_WG_NIC, [peer.public_key], SERVER_CONFIG_FILE)
+                print(f"🔐 Użytkownik '{username}' usunięty z WireGuard.")
+        else:
+            print(f"⚠️ Peer użytkownika '{username}' nie znaleziony w konfiguracji WireGuard.")
+
+        # Usuń rekord użytkownika (pojedynczy rekord)
+        store.delete(username)
         print(f"📝 Rekord użytkownika '{username}' usunięty z danych.")
 
+        # Zwolnij adres IP w puli (dopiero po usunięciu peera)
+        if release_ip(user_info.get("allowed_ips"), IP_POOL_PATH):
+            print(f"♻️ Adres IP {user_info.get('allowed_ips')} zwolniony w puli.")
+
         # Usuń plik konfiguracyjny użytkownika
         wg_config_path = WG_CONFIG_DIR / f"{username}.conf"
         if wg_config_path.exists():
+            # Obraz QR w pamięci podręcznej zawiera klucz prywatny klienta
+            discard_cached_qr(wg_config_path.read_text())
             wg_config_path.unlink()
             print(f"🗑️ Konfiguracja '{wg_config_path}' usunięta.")
 
@@ -125,91 +155,10 @@ def delete_user():
             qr_code_path.unlink()
             print(f"🗑️ Kod QR '{qr_code_path}' usunięty.")
 
-        # Wyodrębnij klucz publiczny użytkownika
-        public_key = extract_public_key(username, SERVER_CONFIG_FILE)
-        if not public_key:
-            print(f"❌ Klucz publiczny użytkownika '{username}' nie znaleziony w konfiguracji WireGuard.")
-            return
-
-        # Usuń użytkownika z WireGuard
-        subprocess.run(["sudo", "wg", "set", "wg0", "peer", public_key, "remove"], check=True)
-        print(f"🔐 Użytkownik '{username}' usunięty z WireGuard.")
-
-        # Aktualizuj konfigurację WireGuard
-        remove_peer_from_config(public_key, SERVER_CONFIG_FILE, username)
-        print(f"✅ Konfiguracja WireGuard zaktualizowana.")
-
-        # Zsynchronizuj WireGuard
-        sync_command = f'wg syncconf "{SERVER_WG_NIC}" <(wg-quick strip "{SERVER_WG_NIC}")'
-        subprocess.run(sync_command, shell=True, check=True, executable='/bin/bash')
-        print(f"WireGuard zsynchronizowany dla interfejsu {SERVER_WG_NIC}")
-
         print(f"✅ Użytkownik '{username}' pomyślnie usunięty.")
     except Exception as e:
         print(f"⚠️ Błąd usuwania użytkownika '{username}': {e}")
 
-def extract_public_key(username, config_path):
-    """
-    Wyodrębnia klucz publiczny użytkownika z pliku konfiguracyjnego WireGuard.
-
-    Args:
-        username (str): Nazwa użytkownika.
-        config_path (str): Ścieżka do pliku konfiguracyjnego WireGuard.
-
-    Returns:
-        str: Klucz publiczny użytkownika.
-    """
-    try:
-        with open(config_path, "r") as f:
-            lines = f.readlines()
-
-        found_username = False
-        for line in lines:
-            if username in line:
-                found_username = True
-            elif found_username and line.strip().startswith("PublicKey"):
-                return line.split("=", 1)[1].strip()
-        return None
-    except Exception as e:
-        print(f"⚠️ Błąd znajdowania klucza publicznego: {e}")
-        return None
-
-def remove_peer_from_config(public_key, config_path, client_name):
-    """
-    Usuwa sekcję [Peer] i powiązany komentarz z pliku konfiguracyjnego WireGuard.
-
-    Args:
-        public_key (str): Klucz publiczny użytkownika.
-        config_path (str): Ścieżka do pliku konfiguracyjnego WireGuard.
-        client_name (str): Nazwa klienta.
-    """
-    try:
-        with open(config_path, "r") as f:
-            lines = f.readlines()
-
-        updated_lines = []
-        skip_lines = 0
-
-        for line in lines:
-            # Jeśli znaleziono komentarz klienta
-            if line.strip() == f"### Klient {client_name}":
-                skip_lines = 5  # Usuń 5 linii zaczynając od tej
-                continue
-
-            # Pomiń linie związane z usuwanym blokiem
-            if skip_lines > 0:
-                skip_lines -= 1
-                continue
-
-            # Zachowaj inne linie
-            updated_lines.append(line)
-
-        # Zapisz zaktualizowaną konfigurację
-        with open(config_path, "w") as f:
-            f.writelines(updated_lines)
-    except Exception as e:
-        print(f"⚠️ Błąd aktualizacji konfiguracji: {e}")
-
 def manage_users_menu():
     """Menu zarządzania użytkownikami."""
     while True:
@@ -219,6 +168,7 @@ def manage_users_menu():
         print("3. ❌ Usuń użytkownika")
         print("4. 📊 Zobacz ruch użytkowników")
         print("5. 🤝 Zobacz ostatnie handshake'i")
+        print("6. 📷 Pokaż kod QR użytkownika")
         print("0. Powrót do menu głównego")
         print("===============================================")
 
@@ -233,6 +183,8 @@ def manage_users_menu():
             show_traffic()
         elif choice == "5":
             show_handshakes()
+        elif choice == "6":
+            show_qr_code()
         elif choice in {"0", "q"}:
             break
         else:
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+# modules/peer_apply.py
+# Przyrostowe stosowanie zmian peerów na interfejsie WireGuard
+#
+# Zamiast `wg syncconf <nic> <(wg-quick strip <nic>)`, które parsuje i stosuje
+# całą konfigurację przy każdej zmianie jednego peera, moduł porównuje
+# pożądany zestaw peerów (aktywne bloki [Peer] z wg0.conf) z bieżącym stanem
+# (`wg show <nic> dump`) i wykonuje jedno polecenie `wg set` zawierające tylko
+# potrzebne operacje add/remove/update. Pełne syncconf pozostaje jako fallback.
+#
+# Przykład użycia:
+#   from modules.peer_apply import apply_peer_changes
+#   apply_peer_changes("wg0", "/etc/wireguard/wg0.conf")
+
+import ipaddress
+import os
+import subprocess
+import tempfile
+
+from modules.wg_snapshot import invalidate_snapshot
+from modules.server_config import active_fragment_store, load_server_config
+
+try:
+    from settings import PEER_APPLY_MODE
+except ImportError:
+    PEER_APPLY_MODE = "incremental"
+
+
+def _normalize_allowed_ips(value):
+    """Zwraca posortowaną krotkę sieci z listy AllowedIPs (np. '10.0.0.2/32, fd42::2/128')."""
+    if not value or value.strip() in ("(none)", ""):
+        return ()
+    networks = []
+    for item in value.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        try:
+            networks.append(str(ipaddress.ip_network(item, strict=False)))
+        except ValueError:
+            networks.append(item)
+    return tuple(sorted(networks))
+
+
+def _normalize_keepalive(value):
+    if not value or str(value).strip() in ("off", "0", "(none)"):
+        return 0
+    return int(value)
+
+
+def parse_config_peers(config_file):
+    """
+    Odczytuje aktywne (niezakomentowane) bloki [Peer] z pliku konfiguracyjnego.
+    :param config_file: Ścieżka do wg0.conf.
+    :return: Słownik {klucz_publiczny: {"preshared_key", "allowed_ips", "persistent_keepalive", "endpoint"}}.
+    """
+    return {
+        block.public_key: {
+            "preshared_key": block.preshared_key,
+            "allowed_ips": _normalize_allowed_ips(block.allowed_ips),
+            "persistent_keepalive": _normalize_keepalive(block.persistent_keepalive),
+            "endpoint": block.endpoint,
+        }
+        for block in load_server_config(config_file).peers(include_disabled=False)
+        if block.public_key
+    }
+
+
+def get_live_peers(nic):
+    """
+    Pobiera bieżących peerów interfejsu z `wg show <nic> dump`.
+    :return: Słownik w formacie parse_config_peers.
+    """
+    output = subprocess.check_output(["wg", "show", nic, "dump"], text=True)
+    peers = {}
+    for line in output.splitlines()[1:]:  # Pierwsza linia opisuje interfejs
+        parts = line.split("\t")
+        if len(parts) < 8:
+            continue
+        peers[parts[0]] = {
+            "preshared_key": None if parts[1] == "(none)" else parts[1],
+            "allowed_ips": _normalize_allowed_ips(parts[3]),
+            "persistent_keepalive": _normalize_keepalive(parts[7]),
+            "endpoint": None if parts[2] == "(none)" else parts[2],
+        }
+    return peers
+
+
+def diff_peers(desired, live):
+    """
+    Wyznacza minimalny zestaw zmian między stanem pożądanym a bieżącym.
+    Endpoint peera zmienia się dynamicznie (roaming), więc jest porównywany
+    tylko gdy jest jawnie ustawiony w konfiguracji.
+    :return: Słownik {"add": {...}, "update": {...}, "remove": [klucze]}.
+    """
+    add, update = {}, {}
+    for public_key, peer in desired.items():
+        current = live.get(public_key)
+        if current is None:
+            add[public_key] = peer
+            continue
+        if (peer["preshared_key"] != current["preshared_key"]
+                or peer["allowed_ips"] != current["allowed_ips"]
+                or peer["persistent_keepalive"] != current["persistent_keepalive"]
+                or (peer["endpoint"] and peer["endpoint"] != current["endpoint"])):
+            update[public_key] = peer
+    remove = sorted(set(live) - set(desired))
+    return {"add": add, "update": update, "remove": remove}
+
+
+def _peer_set_args(public_key, peer, psk_path):
+    """Buduje argumenty `wg set` dla jednego peera; PSK trafia do pliku 0600, nie do argv."""
+    args = ["peer", public_key]
+    if peer["preshared_key"]:
+        fd = os.open(psk_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, "w") as f:
+            f.write(peer["preshared_key"] + "\n")
+        args += ["preshared-key", psk_path]
+    else:
+        args += ["preshared-key", "/dev/null"]
+    args += ["allowed-ips", ",".join(peer["allowed_ips"])]
+    args += ["persistent-keepalive", str(peer["persistent_keepalive"] or "off")]
+    if peer["endpoint"]:
+        args += ["endpoint", peer["endpoint"]]
+    return args
+
+
+def run_wg_set(nic, changes):
+    """
+    Wykonuje zmiany jednym poleceniem `wg set`.
+    :param changes: Wynik diff_peers.
+    :return: Liczba zastosowanych operacji.
+    """
+    operations = len(changes["add"]) + len(changes["update"]) + len(changes["remove"])
+    if operations == 0:
+        return 0
+    with tempfile.TemporaryDirectory(prefix="wg_psk_") as psk_dir:
+        command = ["wg", "set", nic]
+        for public_key in changes["remove"]:
+            command += ["peer", public_key, "remove"]
+        peers = list(changes["add"].items()) + list(changes["update"].items())
+        for index, (public_key, peer) in enumerate(peers):
+            command += _peer_set_args(public_key, peer, os.path.join(psk_dir, f"psk{index}"))
+        subprocess.run(command, check=True, capture_output=True, text=True)
+    invalidate_snapshot()  # Kolejne odczyty stanu muszą zobaczyć zmiany
+    return operations
+
+
+def syncconf(nic, config_file=None):
+    """
+    Pełna synchronizacja interfejsu (fallback). W układzie "fragments" konfiguracja
+    po `wg-quick strip` jest składana z fragmentów i podawana na stdin.
+    """
+    store = active_fragment_store(config_file) if config_file else None
+    if store is not None:
+        subprocess.run(["wg", "syncconf", nic, "/dev/stdin"], input=store.stripped(), text=True, check=True)
+    else:
+        sync_command = f'wg syncconf "{nic}" <(wg-quick strip "{nic}")'
+        subprocess.run(sync_command, shell=True, check=True, executable='/bin/bash')
+    invalidate_snapshot()
+    print(f"WireGuard zsynchronizowany dla interfejsu {nic}")
+
+
+def apply_peer_changes(nic, config_file, mode=None):
+    """
+    Doprowadza peerów interfejsu do stanu z pliku konfiguracyjnego.
+    W trybie "incremental" wykonuje tylko brakujące operacje `wg set`,
+    a w razie błędu przechodzi na pełne syncconf.
+    :param nic: Nazwa interfejsu WireGuard.
+    :param config_file: Ścieżka do wg0.conf.
+    :param mode: "incremental" lub "syncconf" (domyślnie settings.PEER_APPLY_MODE).
+    :return: Słownik z podsumowaniem {"mode", "added", "updated", "removed"}.
+    """
+    mode = mode or PEER_APPLY_MODE
+    summary = {"mode": "syncconf", "added": 0, "updated": 0, "removed": 0}
+    if mode == "incremental":
+        try:
+            changes = diff_peers(parse_config_peers(config_file), get_live_peers(nic))
+            run_wg_set(nic, changes)
+            summary.update(
+                mode="incremental",
+                added=len(changes["add"]),
+                updated=len(changes["update"]),
+                removed=len(changes["remove"]),
+            )
+            print(f"WireGuard ({nic}): dodano {summary['added']}, zaktualizowano {summary['updated']}, "
+                  f"usunięto {summary['removed']} peerów.")
+            return summary
+        except Exception as e:
+            print(f"⚠️ Przyrostowa aktualizacja peerów nieudana ({e}), używam wg syncconf.")
+    syncconf(nic, config_file)
+    return summary
+
+
+def remove_peers(nic, public_keys, config_file=None):
+    """
+    Usuwa wskazanych peerów z interfejsu jednym poleceniem `wg set`.
+    W razie błędu (i podanego config_file) wykonuje pełne syncconf.
+    :return: Liczba usuniętych peerów.
+    """
+    public_keys = [key for key in public_keys if key]
+    try:
+        return run_wg_set(nic, {"add": {}, "update": {}, "remove": public_keys})
+    except Exception as e:
+        if not config_file:
+            raise
+        print(f"⚠️ Usuwanie peerów nieudane ({e}), używam wg syncconf.")
+        syncconf(nic, config_file)
+        return len(public_keys)
@@ -1,5 +1,6 @@
-import pyqrcode # type: ignore
+# Zgodność wsteczna: generowanie PNG przez pyqrcode/pypng (backend "pyqrcode" usługi QR).
+# Nowy kod powinien używać modules.qr_service.render_qr (automatyczny wybór backendu).
+from modules.qr_service import render_qr
 
 def generate_qr_code(data, qr_path):
-    qr = pyqrcode.create(data)
-    qr.png(qr_path, scale=6)
+    render_qr(data, qr_path, backend="pyqrcode")
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+# modules/qr_service.py
+# Wspólna usługa kodów QR z wymiennymi backendami
+#
+# Dostępne backendy:
+# - "qrcode":   PNG przez qrcode/PIL,
+# - "pyqrcode": PNG przez pyqrcode/pypng,
+# - "svg":      tekstowy SVG (jedna ścieżka <path>, bez PIL),
+# - "terminal": znaki Unicode/ANSI do wyświetlenia w konsoli.
+#
+# Backend "auto" (QR_BACKEND w settings.py) wybiera najszybszy dostępny backend
+# danego formatu na podstawie krótkiego pomiaru wykonanego raz na proces.
+#
+# Przykład użycia:
+#   from modules.qr_service import render_qr, render_terminal
+#   render_qr(client_config, "user/data/qrcodes/jan.png")
+#   print(render_terminal(client_config))
+#
+# Benchmark backendów:
+#   python3 -m modules.qr_service
+
+import os
+import tempfile
+import threading
+import time
+
+try:
+    import qrcode
+    QRCODE_AVAILABLE = True
+except ImportError:
+    QRCODE_AVAILABLE = False
+
+try:
+    import pyqrcode  # type: ignore
+    import png  # type: ignore  # noqa: F401 - pyqrcode zapisuje PNG przez pypng
+    PYQRCODE_AVAILABLE = True
+except ImportError:
+    PYQRCODE_AVAILABLE = False
+
+try:
+    from settings import QR_BACKEND
+except ImportError:
+    QR_BACKEND = "auto"
+
+SAMPLE_CONFIG = """[Interface]
+PrivateKey = kA8m9Sm8iK1ZtRHxQ4YlJ1vLSJg6zv3uWZ0M5uJ3v1E=
+Address = 10.66.66.2/32,fd42:42:42::2/128
+DNS = 1.1.1.1, 1.0.0.1, 8.8.8.8
+
+[Peer]
+PublicKey = 3x6Jm0eN8G3YB3yD9W9n0s1D1m6p4yq5g5bqv7c6sGs=
+PresharedKey = Yb2u0c2x0mKxW8aO4G8QoVq4bJ0m2Fv7w0Gj3K9d6ZQ=
+Endpoint = vpn.example.com:51820
+AllowedIPs = 0.0.0.0/0,::/0
+"""
+
+
+def _matrix(data):
+    """Zwraca macierz modułów kodu QR (lista wierszy bool) bez marginesu."""
+    if QRCODE_AVAILABLE:
+        qr = qrcode.QRCode(error_correction=qrcode.constants.ERROR_CORRECT_L, border=0)
+        qr.add_data(data)
+        qr.make(fit=True)
+        return [[bool(cell) for cell in row] for row in qr.get_matrix()]
+    if PYQRCODE_AVAILABLE:
+        return [[cell == 1 for cell in row] for row in pyqrcode.create(data, error="L").code]
+    raise RuntimeError("Brak biblioteki do kodowania QR (qrcode lub pyqrcode).")
+
+
+class QRBackend:
+    """Backend renderujący kod QR do pliku."""
+
+    name = None
+    format = None      # "png", "svg" lub "text"
+    extension = None
+
+    def available(self):
+        return QRCODE_AVAILABLE or PYQRCODE_AVAILABLE
+
+    def render(self, data, output_path):
+        raise NotImplementedError
+
+
+class QRCodeBackend(QRBackend):
+    name, format, extension = "qrcode", "png", ".png"
+
+    def available(self):
+        return QRCODE_AVAILABLE
+
+    def render(self, data, output_path):
+        qr = qrcode.QRCode(
+            version=1,
+            error_correction=qrcode.constants.ERROR_CORRECT_L,
+            box_size=10,
+            border=4,
+        )
+        qr.add_data(data)
+        qr.make(fit=True)
+        img = qr.make_image(fill_color="black", back_color="white")
+        img.save(output_path)
+
+
+class PyQRCodeBackend(QRBackend):
+    name, format, extension = "pyqrcode", "png", ".png"
+
+    def available(self):
+        return PYQRCODE_AVAILABLE
+
+    def render(self, data, output_path):
+        qr = pyqrcode.create(data)
+        qr.png(output_path, scale=6)
+
+
+class SVGBackend(QRBackend):
+    name, format, extension = "svg", "svg", ".svg"
+
+    def to_text(self, data, scale=8, border=4):
+        matrix = _matrix(data)
+        size = (len(matrix) + 2 * border) * scale
+        path = []
+        for y, row in enumerate(matrix):
+            x = 0
+            while x < len(row):
+                if not row[x]:
+                    x += 1
+                    continue
+                start = x
+                while x < len(row) and row[x]:
+                    x += 1
+                # Jeden prostokąt na ciąg ciemnych modułów w wierszu
+                path.append(f"M{(start + border) * scale},{(y + border) * scale}"
+                            f"h{(x - start) * scale}v{scale}h-{(x - start) * scale}z")
+        return (
+            f'<svg xmlns="http://www.w3.org/2000/svg" width="{size}" height="{size}" '
+            f'viewBox="0 0 {size} {size}" shape-rendering="crispEdges">'
+            f'<rect width="100%" height="100%" fill="#fff"/>'
+            f'<path fill="#000" d="{"".join(path)}"/></svg>\n'
+        )
+
+    def render(self, data, output_path):
+        with open(output_path, "w") as f:
+            f.write(self.to_text(data))
+
+
+class TerminalBackend(QRBackend):
+    name, format, extension = "terminal", "text", ".txt"
+
+    def to_text(self, data, border=2, ansi=True):
+        """Zwraca kod QR jako tekst (dwa wiersze modułów na linię, znaki półbloków)."""
+        matrix = _matrix(data)
+        width = len(matrix) + 2 * border
+        blank = [False] * width
+        rows = [blank] * border + [[False] * border + row + [False] * border for row in matrix] + [blank] * border
+        if len(rows) % 2:
+            rows.append(blank)
+        # Jasne tło/ciemny moduł odwrócone, bo terminale zwykle mają ciemne tło
+        chars = {(False, False): "█", (True, False): "▄", (False, True): "▀", (True, True): " "}
+        lines = []
+        for top, bottom in zip(rows[0::2], rows[1::2]):
+            line = "".join(chars[(t, b)] for t, b in zip(top, bottom))
+            lines.append(f"\033[97;40m{line}\033[0m" if ansi else line)
+        return "\n".join(lines)
+
+    def render(self, data, output_path):
+        with open(output_path, "w") as f:
+            f.write(self.to_text(data, ansi=False) + "\n")
+
+
+BACKENDS = {backend.name: backend for backend in (QRCodeBackend(), PyQRCodeBackend(), SVGBackend(), TerminalBackend())}
+
+_fastest = {}
+_fastest_lock = threading.Lock()
+_format_warnings = set()  # (backend, format) - ostrzeżenie o niezgodnym formacie wypisywane raz
+
+
+def available_backends(fmt=None):
+    """Zwraca nazwy dostępnych backendów (opcjonalnie tylko danego formatu)."""
+    return [name for name, backend in BACKENDS.items()
+            if backend.available() and (fmt is None or backend.format == fmt)]
+
+
+def _time_render(backend, data, iterations, tmp_dir):
+    output_path = os.path.join(tmp_dir, f"{backend.name}{backend.extension}")
+    started = time.perf_counter()
+    for _ in range(iterations):
+        backend.render(data, output_path)
+    elapsed = (time.perf_counter() - started) / iterations
+    return elapsed, os.path.getsize(output_path)
+
+
+def benchmark_backends(configs=None, iterations=5, backends=None):
+    """
+    Mierzy czas renderowania i rozmiar pliku dla każdego dostępnego backendu.
+    :param configs: Lista tekstów konfiguracji (domyślnie przykładowa konfiguracja klienta).
+    :param iterations: Liczba renderowań każdej konfiguracji.
+    :param backends: Nazwy backendów (domyślnie wszystkie dostępne).
+    :return: Lista słowników {"backend", "format", "avg_ms", "size_bytes"} posortowana wg formatu i czasu.
+    """
+    configs = configs or [SAMPLE_CONFIG]
+    results = []
+    with tempfile.TemporaryDirectory(prefix="qr_bench_") as tmp_dir:
+        for name in backends or available_backends():
+            backend = BACKENDS[name]
+            total, size = 0.0, 0
+            for data in configs:
+                elapsed, file_size = _time_render(backend, data, iterations, tmp_dir)
+                total += elapsed
+                size += file_size
+            results.append({
+                "backend": name,
+                "format": backend.format,
+                "avg_ms": total / len(configs) * 1000,
+                "size_bytes": size // len(configs),
+            })
+    return sorted(results, key=lambda r: (r["format"], r["avg_ms"]))
+
+
+def select_backend(fmt="png", backend=None):
+    """
+    Wybiera backend renderowania.
+    :param fmt: Wymagany format ("png", "svg", "text").
+    :param backend: Nazwa backendu, "auto" lub None (wartość z settings.QR_BACKEND).
+    :return: Nazwa backendu.
+    """
+    backend = str(backend or QR_BACKEND or "auto").lower()
+    if backend != "auto":
+        if backend not in BACKENDS:
+            raise ValueError(f"Nieznany backend QR: {backend}. Dostępne: {', '.join(BACKENDS)}")
+        if BACKENDS[backend].format == fmt:
+            if not BACKENDS[backend].available():
+                raise RuntimeError(f"Backend QR '{backend}' jest niedostępny (brak biblioteki).")
+            return backend
+        # Backend innego formatu (np. QR_BACKEND = "svg" dla pliku .png) - wybór automatyczny
+        with _fastest_lock:
+            warn = (backend, fmt) not in _format_warnings
+            _format_warnings.add((backend, fmt))
+        if warn:
+            print(f"⚠️ Backend QR '{backend}' tworzy format {BACKENDS[backend].format}, a wymagany jest {fmt}"
+                  f" - używam wyboru automatycznego.")
+
+    candidates = available_backends(fmt)
+    if not candidates:
+        raise RuntimeError(f"Brak dostępnego backendu QR dla formatu {fmt}.")
+    if len(candidates) == 1:
+        return candidates[0]
+    with _fastest_lock:
+        if fmt not in _fastest:
+            results = benchmark_backends(iterations=1, backends=candidates)
+            _fastest[fmt] = results[0]["backend"]
+        return _fastest[fmt]
+
+
+def render_qr(data, output_path, backend=None):
+    """
+    Renderuje kod QR do pliku. Format wynika z rozszerzenia output_path (.png, .svg, .txt).
+    :return: Nazwa użytego backendu.
+    """
+    extension = os.path.splitext(str(output_path))[1].lower()
+    fmt = {".svg": "svg", ".txt": "text"}.get(extension, "png")
+    name = select_backend(fmt, backend)
+    BACKENDS[name].render(data, str(output_path))
+    return name
+
+
+def render_terminal(data, ansi=True):
+    """Zwraca kod QR do wyświetlenia w konsoli."""
+    return BACKENDS["terminal"].to_text(data, ansi=ansi)
+
+
+if __name__ == "__main__":
+    print(f"\n=== 📷 Benchmark backendów QR (dostępne: {', '.join(available_backends())}) ===\n")
+    print(f"{'Backend':<10} {'Format':<7} {'Czas [ms]':>10} {'Rozmiar [B]':>12}")
+    for row in benchmark_backends(iterations=10):
+        print(f"{row['backend']:<10} {row['format']:<7} {row['avg_ms']:>10.2f} {row['size_bytes']:>12}")
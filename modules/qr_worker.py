@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+# modules/qr_worker.py
+# Asynchroniczne generowanie kodów QR z pamięcią podręczną adresowaną treścią
+#
+# Renderowanie PNG (backend z modules/qr_service.py) obciąża CPU, dlatego odbywa się
+# w puli procesów. Obraz jest zapisywany w QR_CACHE_DIR pod nazwą skrótu SHA-256
+# tekstu konfiguracji i nazwy backendu, więc niezmieniona konfiguracja nigdy nie jest
+# renderowana ponownie - plik użytkownika (QR_CODE_DIR/<nazwa>.png) jest tylko kopią
+# wpisu z pamięci podręcznej. Procesy robocze startują przez "forkserver" (lub
+# "spawn"), a nie fork - fork procesu panelu z działającymi wątkami (pule Gradio,
+# harmonogramy) mógłby skopiować zajęte blokady i zawiesić proces roboczy.
+#
+# Przykład użycia:
+#   from modules.qr_worker import submit_qr
+#   future = submit_qr(client_config, "user/data/qrcodes/jan.png")
+#   future.result()  # opcjonalnie: czekaj na zakończenie
+
+import atexit
+import hashlib
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+
+from modules.qr_service import available_backends, render_qr, select_backend
+
+try:
+    from settings import QR_CACHE_DIR, QR_WORKERS, QR_CODE_DIR, WG_CONFIG_DIR
+except ImportError:
+    QR_CACHE_DIR = "user/data/qr_cache"
+    QR_WORKERS = 2
+    QR_CODE_DIR = "user/data/qrcodes"
+    WG_CONFIG_DIR = "user/data/wg_configs"
+
+CACHE_VERSION = "png-v1"  # Zmiana parametrów renderowania unieważnia pamięć podręczną
+QR_TIMEOUT = 30  # Maksymalny czas oczekiwania na kod QR na żądanie (w sekundach)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def config_hash(data, backend=""):
+    """Zwraca skrót SHA-256 tekstu konfiguracji i backendu (klucz pamięci podręcznej)."""
+    return hashlib.sha256(f"{CACHE_VERSION}:{backend}\n{data}".encode("utf-8")).hexdigest()
+
+
+def cache_path(data, cache_dir=None, backend=""):
+    """Zwraca ścieżkę wpisu pamięci podręcznej dla tekstu konfiguracji."""
+    return os.path.join(str(cache_dir or QR_CACHE_DIR), f"{config_hash(data, backend)}.png")
+
+
+def render_qr_png(data, output_path, backend=None):
+    """
+    Renderuje kod QR do pliku PNG wybranym backendem usługi QR.
+    :param data: Tekst konfiguracji WireGuard.
+    :param output_path: Ścieżka do zapisania obrazu.
+    :param backend: Nazwa backendu PNG (domyślnie wybór automatyczny).
+    """
+    render_qr(data, output_path, backend)
+
+
+def _publish(source, output_path):
+    """Kopiuje wpis pamięci podręcznej do pliku docelowego (atomowo)."""
+    output_dir = os.path.dirname(str(output_path)) or "."
+    os.makedirs(output_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=output_dir, prefix=".qr_", suffix=".png")
+    os.close(fd)
+    try:
+        shutil.copyfile(source, tmp_path)
+        os.replace(tmp_path, output_path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def ensure_qr(data, output_path, cache_dir=None, backend=None):
+    """
+    Zapewnia istnienie kodu QR w output_path, renderując go tylko przy braku w pamięci podręcznej.
+    :return: Ścieżka output_path.
+    """
+    backend = select_backend("png", backend)
+    cached = cache_path(data, cache_dir, backend)
+    if not os.path.exists(cached):
+        os.makedirs(os.path.dirname(cached), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(cached), prefix=".render_", suffix=".png")
+        os.close(fd)
+        try:
+            render_qr_png(data, tmp_path, backend)
+            os.replace(tmp_path, cached)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+    _publish(cached, output_path)
+    return str(output_path)
+
+
+def _mp_context():
+    """Zwraca kontekst startu procesów roboczych: "forkserver", a gdy niedostępny - "spawn"."""
+    method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    return multiprocessing.get_context(method)
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=QR_WORKERS, mp_context=_mp_context())
+        return _executor
+
+
+def submit_qr(data, output_path, cache_dir=None):
+    """
+    Zleca wygenerowanie kodu QR w puli procesów.
+    Trafienie w pamięć podręczną jest obsługiwane od razu, bez udziału puli.
+    :return: concurrent.futures.Future z wynikiem ensure_qr (ścieżką pliku).
+    """
+    cache_dir = str(cache_dir or QR_CACHE_DIR)
+    # Backend wybierany raz w procesie nadrzędnym, aby procesy robocze nie powtarzały pomiaru
+    backend = select_backend("png")
+    if os.path.exists(cache_path(data, cache_dir, backend)):
+        future = Future()
+        try:
+            future.set_result(ensure_qr(data, output_path, cache_dir, backend))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+    try:
+        return _get_executor().submit(ensure_qr, data, str(output_path), cache_dir, backend)
+    except (OSError, RuntimeError, NotImplementedError) as e:
+        # Brak możliwości uruchomienia procesów - renderuj w bieżącym procesie
+        print(f"⚠️ Pula procesów QR niedostępna ({e}), generowanie synchroniczne.")
+        future = Future()
+        try:
+            future.set_result(ensure_qr(data, output_path, cache_dir, backend))
+        except Exception as exc:
+            future.set_exception(exc)
+        return future
+
+
+def ensure_user_qr(username, timeout=QR_TIMEOUT):
+    """
+    Generuje brakujący kod QR użytkownika na podstawie jego pliku konfiguracyjnego.
+    :return: Ścieżka do kodu QR lub None, jeśli brak konfiguracji lub generowanie się nie powiodło.
+    """
+    qr_path = os.path.join(str(QR_CODE_DIR), f"{username}.png")
+    if os.path.exists(qr_path):
+        return qr_path
+    config_path = os.path.join(str(WG_CONFIG_DIR), f"{username}.conf")
+    if not os.path.exists(config_path):
+        return None
+    with open(config_path, "r") as f:
+        data = f.read()
+    try:
+        return submit_qr(data, qr_path).result(timeout=timeout)
+    except Exception as e:
+        print(f"⚠️ Nie udało się wygenerować kodu QR dla {username}: {e}")
+        return None
+
+
+def discard_cached_qr(data, cache_dir=None):
+    """Usuwa wpisy pamięci podręcznej wszystkich backendów (np. po usunięciu użytkownika - obraz zawiera klucz prywatny)."""
+    removed = False
+    for backend in available_backends("png"):
+        cached = cache_path(data, cache_dir, backend)
+        if os.path.exists(cached):
+            os.remove(cached)
+            removed = True
+    return removed
+
+
+def shutdown_pool(wait=True):
+    """Zamyka pulę procesów (oczekując na zlecone zadania)."""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=wait)
+            _executor = None
+
+
+atexit.register(shutdown_pool)
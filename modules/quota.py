@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+# modules/quota.py
+# Egzekwowanie limitów danych (pole data_limit rekordu użytkownika)
+#
+# Silnik trzyma stan wszystkich peerów w tablicach NumPy indeksowanych numerem
+# slotu (slot przypisany kluczowi publicznemu): ostatnie surowe liczniki rx/tx,
+# zużycie w bieżącym okresie i najwyższy zgłoszony próg ostrzeżenia. Przy
+# każdym pomiarze kolektora (modules/stats_daemon.py) przyrosty liczników,
+# zużycie i porównanie z limitami są liczone jedną operacją na tablicach dla
+# wszystkich peerów naraz. Licznik mniejszy od poprzedniego (restart
+# interfejsu) liczony jest od zera, a pierwszy pomiar peera jest tylko punktem
+# odniesienia - jak w modules/traffic_series.py.
+#
+# Limit peera: data_limit z rekordu (np. "100.0 GB"), a gdy go brak lub jest
+# "N/A" - domyślny limit planu (QUOTA_PLAN_LIMITS[subscription_plan]), potem
+# QUOTA_DEFAULT_LIMIT. Napisy limitów są parsowane raz (pamięć podręczna).
+# Jednostki SI (kB, MB, GB, TB) są dziesiętne, IEC (KiB, MiB, GiB, TiB) binarne.
+#
+# Przy QUOTA_ENFORCE = True (domyślnie wyłączone - tylko data_used i ostrzeżenia)
+# peery powyżej limitu są blokowane razem: jeden zapis konfiguracji serwera
+# i jedno polecenie `wg set` usuwające wszystkie z interfejsu. Przekroczenie
+# progów QUOTA_WARN_THRESHOLDS (ułamki limitu) jest zgłaszane raz na okres.
+# Przy QUOTA_PERIOD = "month" zużycie zeruje się na początku miesiąca
+# kalendarzowego (UTC), a peery zablokowane za limit są odblokowywane.
+#
+# Przykład użycia:
+#   from modules.quota import enforce_quotas
+#   summary = enforce_quotas(get_snapshot().peers_of("wg0"))
+#   print(summary["blocked"], summary["warned"])
+#
+#   python3 -m modules.quota            # zużycie peerów względem limitów
+
+import functools
+import os
+import re
+import tempfile
+import threading
+import time
+
+import numpy as np  # type: ignore
+
+QUOTA_BLOCK_REASON = "quota"  # Wartość blocked_reason peerów zablokowanych za limit
+PERIODS = (None, "month")
+
+_UNITS = {
+    "": 1, "b": 1,
+    "kb": 1000, "mb": 1000 ** 2, "gb": 1000 ** 3, "tb": 1000 ** 4,
+    "kib": 1024, "mib": 1024 ** 2, "gib": 1024 ** 3, "tib": 1024 ** 4,
+}
+_SIZE_RE = re.compile(r"^\s*(\d+(?:[.,]\d+)?)\s*([a-zA-Z]*)\s*$")
+_UNSET = ("", "n/a", "none")                   # Brak wartości - limit z planu subskrypcji
+_UNLIMITED = ("0", "unlimited", "bez limitu", "∞")  # Jawny brak limitu
+
+
+def _settings_value(name, default):
+    try:
+        import settings
+    except ImportError:
+        return default
+    return getattr(settings, name, default)
+
+
+def parse_limit(text):
+    """
+    Zamienia napis rozmiaru na liczbę bajtów ("100.0 GB" -> 100000000000).
+    Brak limitu ("N/A", "unlimited", 0, None) zwraca 0.
+    :raises ValueError: Nierozpoznany napis.
+    """
+    if text is None or isinstance(text, (int, float)):
+        return max(0, int(text or 0))
+    if text.strip().lower() in _UNSET + _UNLIMITED:
+        return 0
+    match = _SIZE_RE.match(text)
+    if not match or match.group(2).lower() not in _UNITS:
+        raise ValueError(f"Nierozpoznany limit danych: {text!r}")
+    return int(float(match.group(1).replace(",", ".")) * _UNITS[match.group(2).lower()])
+
+
+@functools.lru_cache(maxsize=4096)
+def _limit_bytes(text):
+    """parse_limit z pamięcią podręczną; błędny napis zgłaszany raz i traktowany jak brak limitu."""
+    try:
+        return parse_limit(text)
+    except ValueError as e:
+        print(f"⚠️ {e} - peer bez limitu.")
+        return 0
+
+
+def limit_for(record, plan_limits=None, default_limit=None):
+    """
+    Zwraca limit danych rekordu w bajtach (0 - bez limitu): data_limit,
+    a w razie braku limit planu subskrypcji lub limit domyślny.
+    """
+    value = record.get("data_limit")
+    if value is None or str(value).strip().lower() in _UNSET:
+        plan_limits = _settings_value("QUOTA_PLAN_LIMITS", {}) if plan_limits is None else plan_limits
+        value = plan_limits.get(record.get("subscription_plan"), default_limit)
+    return _limit_bytes(value)
+
+
+def period_of(timestamp, period=None):
+    """Zwraca identyfikator okresu rozliczeniowego ("2025-10" dla "month", "" gdy okres bez końca)."""
+    if period is None:
+        return ""
+    if period not in PERIODS:
+        raise ValueError(f"Nieznany okres limitu danych: {period}. Dostępne: month lub None")
+    return time.strftime("%Y-%m", time.gmtime(timestamp))
+
+
+class QuotaEngine:
+    """Wektorowy stan zużycia danych wszystkich peerów."""
+
+    def __init__(self, state_path=None):
+        self.state_path = str(state_path) if state_path else None
+        self._lock = threading.Lock()
+        self._slots = {}
+        self._last = np.zeros((0, 2), dtype=np.uint64)
+        self._known = np.zeros(0, dtype=bool)
+        self._used = np.zeros(0, dtype=np.uint64)
+        self._warned = np.zeros(0, dtype=np.uint8)
+        self.period = None
+        if self.state_path and os.path.exists(self.state_path):
+            with np.load(self.state_path) as state:
+                self._slots = {str(key): slot for slot, key in enumerate(state["keys"])}
+                self._last = state["last"]
+                self._known = state["known"]
+                self._used = state["used"]
+                self._warned = state["warned"]
+                self.period = str(state["period"])
+
+    def _slot_ids(self, public_keys):
+        """Zwraca tablicę slotów kluczy, dodając sloty nowym peerom."""
+        slots = self._slots
+        for public_key in public_keys:
+            if public_key not in slots:
+                slots[public_key] = len(slots)
+        if len(slots) > len(self._used):
+            grow = len(slots) - len(self._used)
+            self._last = np.concatenate([self._last, np.zeros((grow, 2), dtype=np.uint64)])
+            self._known = np.concatenate([self._known, np.zeros(grow, dtype=bool)])
+            self._used = np.concatenate([self._used, np.zeros(grow, dtype=np.uint64)])
+            self._warned = np.concatenate([self._warned, np.zeros(grow, dtype=np.uint8)])
+        return np.fromiter((slots[public_key] for public_key in public_keys), dtype=np.intp, count=len(public_keys))
+
+    def start_period(self, now=None, period=None):
+        """
+        Zeruje zużycie i ostrzeżenia, gdy zaczął się nowy okres rozliczeniowy.
+        :return: True, jeśli okres się zmienił (pierwsze uruchomienie nie jest zmianą).
+        """
+        current = period_of(time.time() if now is None else now, period)
+        with self._lock:
+            changed = self.period is not None and self.period != current
+            if changed:
+                self._used[:] = 0
+                self._warned[:] = 0
+            self.period = current
+        return changed
+
+    def evaluate(self, public_keys, rx, tx, limits, thresholds=()):
+        """
+        Dolicza przyrosty liczników i porównuje zużycie z limitami (wszystkie peery naraz).
+        :param public_keys: Lista kluczy publicznych.
+        :param rx, tx: Surowe liczniki WireGuard (tablice zgodne z public_keys).
+        :param limits: Limity w bajtach (0 - bez limitu).
+        :param thresholds: Rosnące progi ostrzeżeń (ułamki limitu).
+        :return: Słownik tablic {"used", "delta", "over", "warn"}; warn to numer nowo
+                 przekroczonego progu (1..len(thresholds)) lub 0.
+        """
+        current = np.column_stack([np.asarray(rx, dtype=np.uint64), np.asarray(tx, dtype=np.uint64)])
+        limits = np.asarray(limits, dtype=np.uint64)
+        with self._lock:
+            slots = self._slot_ids(public_keys)
+            last = self._last[slots]
+            # Licznik mniejszy od poprzedniego: restart interfejsu, liczymy od zera
+            delta = np.where(current >= last, current - last, current).sum(axis=1, dtype=np.uint64)
+            delta[~self._known[slots]] = 0  # Pierwszy pomiar peera to tylko punkt odniesienia
+            self._last[slots] = current
+            self._known[slots] = True
+            self._used[slots] += delta
+            used = self._used[slots]
+
+            limited = limits > 0
+            level = np.zeros(len(slots), dtype=np.uint8)
+            if len(thresholds):
+                ratio = np.divide(used, limits, out=np.zeros(len(slots)), where=limited)
+                level = np.searchsorted(np.asarray(thresholds, dtype=float), ratio, side="right").astype(np.uint8)
+            warned = self._warned[slots]
+            warn = np.where(limited & (level > warned), level, 0).astype(np.uint8)
+            self._warned[slots] = np.maximum(warned, level)
+        return {"used": used, "delta": delta, "over": limited & (used >= limits), "warn": warn}
+
+    def usage(self, public_key):
+        """Zwraca zużycie peera w bieżącym okresie (bajty)."""
+        slot = self._slots.get(public_key)
+        return 0 if slot is None else int(self._used[slot])
+
+    def save(self):
+        """Zapisuje stan atomowo (plik tymczasowy + os.replace)."""
+        if not self.state_path:
+            return
+        with self._lock:
+            keys = np.array(list(self._slots), dtype=str)
+            arrays = dict(keys=keys, last=self._last.copy(), known=self._known.copy(), used=self._used.copy(),
+                          warned=self._warned.copy(), period=np.array(self.period or ""))
+        directory = os.path.dirname(self.state_path) or "."
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".quota_state_")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(f, **arrays)
+            os.replace(tmp_path, self.state_path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+
+def _restore_quota_blocked(store, records, interface, config_file):
+    """Odblokowuje peery zablokowane za limit w poprzednim okresie. :return: Lista nazw."""
+    from modules.server_config import set_peers_enabled
+    from modules.peer_apply import apply_peer_changes
+
+    names = [name for name, record in records.items()
+             if record.get("status") == "blocked" and record.get("blocked_reason") == QUOTA_BLOCK_REASON]
+    if not names:
+        return []
+    store.update_many({name: {"status": "active", "blocked_reason": "N/A"} for name in names})
+    set_peers_enabled(config_file, names, True)
+    apply_peer_changes(interface, config_file)
+    print(f"📦 Nowy okres limitu danych: odblokowano {len(names)} peerów.")
+    return names
+
+
+def enforce_quotas(peers, user_records_path=None, interface=None, config_file=None, now=None, engine=None,
+                   updates=None):
+    """
+    Aktualizuje zużycie danych (data_used), zgłasza przekroczone progi i blokuje
+    jednym zapisem konfiguracji i jednym `wg set` peery powyżej limitu.
+    :param peers: Słownik {klucz_publiczny: WgPeer} z migawki interfejsu.
+    :param engine: Silnik QuotaEngine (domyślnie get_quota_engine()).
+    :param updates: Dodatkowe zmiany rekordów {nazwa: pola} zapisywane razem
+                    ze zmianami limitów (jeden zapis magazynu na pomiar).
+    :return: Słownik {"checked", "warned", "blocked", "restored", "duration_ms"}.
+    """
+    import settings
+    from modules.user_store import open_user_store
+    from modules.wg_snapshot import format_bytes
+
+    started = time.monotonic()
+    engine = engine or get_quota_engine()
+    user_records_path = str(user_records_path or settings.USER_DB_PATH)
+    interface = interface or settings.SERVER_WG_NIC
+    config_file = config_file or settings.SERVER_CONFIG_FILE
+    enforce = _settings_value("QUOTA_ENFORCE", False)
+    thresholds = sorted(_settings_value("QUOTA_WARN_THRESHOLDS", ()))
+    plan_limits = _settings_value("QUOTA_PLAN_LIMITS", {})
+    default_limit = _settings_value("QUOTA_DEFAULT_LIMIT", None)
+
+    store = open_user_store(user_records_path)
+    records = store.all()
+    restored = []
+    if engine.start_period(now, _settings_value("QUOTA_PERIOD", "month")) and enforce:
+        restored = _restore_quota_blocked(store, records, interface, config_file)
+        records = store.all()
+
+    index = store.public_key_index()
+    public_keys = list(peers)
+    usernames = [index.get(public_key) for public_key in public_keys]
+    count = len(public_keys)
+    result = engine.evaluate(
+        public_keys,
+        np.fromiter((peer.rx_bytes for peer in peers.values()), dtype=np.uint64, count=count),
+        np.fromiter((peer.tx_bytes for peer in peers.values()), dtype=np.uint64, count=count),
+        np.fromiter((limit_for(records[name], plan_limits, default_limit) if name in records else 0
+                     for name in usernames), dtype=np.uint64, count=count),
+        thresholds,
+    )
+
+    updates = {name: dict(fields) for name, fields in (updates or {}).items()}
+    for i in np.flatnonzero(result["delta"]):
+        if usernames[i]:
+            updates.setdefault(usernames[i], {})["data_used"] = format_bytes(int(result["used"][i]))
+    warned = []
+    for i in np.flatnonzero(result["warn"]):
+        if usernames[i] and not result["over"][i]:
+            warned.append(usernames[i])
+            print(f"⚠️ Limit danych: {usernames[i]} przekroczył {thresholds[result['warn'][i] - 1]:.0%} limitu "
+                  f"({format_bytes(int(result['used'][i]))}).")
+
+    # Peery nadal obecne na interfejsie mimo przekroczenia - także po wcześniejszej nieudanej blokadzie
+    over = [i for i in np.flatnonzero(result["over"]) if usernames[i]]
+    blocked = [usernames[i] for i in over] if enforce else []
+    for name in blocked:
+        updates.setdefault(name, {}).update(status="blocked", blocked_reason=QUOTA_BLOCK_REASON)
+    if updates:
+        store.update_many(updates)
+    if blocked:
+        from modules.server_config import set_peers_enabled
+        from modules.peer_apply import remove_peers
+
+        set_peers_enabled(config_file, blocked, False)
+        remove_peers(interface, [public_keys[i] for i in over], config_file)
+        print(f"⛔ Limit danych: zablokowano {len(blocked)} peerów ({', '.join(blocked[:10])}"
+              f"{', ...' if len(blocked) > 10 else ''}).")
+    engine.save()
+    return {
+        "checked": count,
+        "warned": warned,
+        "blocked": blocked,
+        "restored": restored,
+        "duration_ms": round((time.monotonic() - started) * 1000, 1),
+    }
+
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def get_quota_engine(state_path=None):
+    """Zwraca współdzielony silnik limitów (domyślnie stan w settings.QUOTA_STATE_PATH)."""
+    if state_path is None:
+        import settings
+        state_path = settings.QUOTA_STATE_PATH
+    state_path = os.path.abspath(str(state_path))
+    with _engines_lock:
+        if state_path not in _engines:
+            _engines[state_path] = QuotaEngine(state_path)
+        return _engines[state_path]
+
+
+if __name__ == "__main__":
+    from modules.user_store import open_user_store
+    from modules.wg_snapshot import format_bytes
+
+    engine = get_quota_engine()
+    plan_limits = _settings_value("QUOTA_PLAN_LIMITS", {})
+    default_limit = _settings_value("QUOTA_DEFAULT_LIMIT", None)
+    print(f"Okres: {engine.period or '-'}")
+    for name, record in sorted(open_user_store().all().items()):
+        limit = limit_for(record, plan_limits, default_limit)
+        used = engine.usage(record.get("public_key"))
+        share = f"{used / limit:.0%}" if limit else "bez limitu"
+        print(f"{name:<24} {format_bytes(used):>12} / {format_bytes(limit) if limit else '-':>12}  {share}")
@@ -19,6 +19,7 @@ sys.path.append(str(PROJECT_ROOT))
 
 # Import ustawień
 from settings import TEST_REPORT_PATH, USER_DB_PATH, WG_CONFIG_DIR, GRADIO_PORT
+from modules.user_store import open_user_store
 
 def load_json(filepath):
     """Wczytuje dane z pliku JSON."""
@@ -30,6 +31,13 @@ def load_json(filepath):
     except json.JSONDecodeError:
         return f" ❌  Plik {filepath} jest uszkodzony."
 
+def load_user_records():
+    """Wczytuje rekordy użytkowników z magazynu (backend z settings.USER_STORE_BACKEND)."""
+    try:
+        return open_user_store(USER_DB_PATH).all()
+    except json.JSONDecodeError:
+        return f" ❌  Plik {USER_DB_PATH} jest uszkodzony."
+
 def run_command(command):
     """Wykonuje polecenie i zwraca wynik."""
     try:
@@ -53,7 +61,7 @@ def get_gradio_status():
 def generate_report():
     """Generuje kompletny raport o stanie projektu."""
     timestamp = datetime.utcnow().isoformat()
-    user_records = load_json(USER_DB_PATH)
+    user_records = load_user_records()
 
     report_lines = [
         f"\n === 📝  Raport statusu generatora projektu  ===",
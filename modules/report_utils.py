@@ -21,6 +21,8 @@ from pathlib import Path
 from modules.firewall_utils import get_external_ip
 from settings import SUMMARY_REPORT_PATH, TEST_REPORT_PATH
 from modules.report_generator import generate_report
+from modules.wg_snapshot import get_snapshot
+from modules.user_store import open_user_store
 
 # Ścieżka do skryptu tworzącego summary_report
 SUMMARY_SCRIPT = Path(__file__).resolve().parent.parent / "modules" / "diagnostics_summary.py"
@@ -75,8 +77,7 @@ def get_wireguard_status():
 def get_wireguard_peers():
     """Pobiera listę aktywnych peerów WireGuard."""
     try:
-        output = subprocess.check_output(["wg", "show"], text=True).splitlines()
-        peers = [line.split(":")[1].strip() for line in output if line.startswith("peer:")]
+        peers = get_snapshot().peers()
         if peers:
             return f"{len(peers)} aktywnych peerów ✅"
         return colored("Brak aktywnych peerów ❌", "red")
@@ -86,13 +87,9 @@ def get_wireguard_peers():
         return colored("Błąd pobierania danych ❌", "red")
 
 def get_users_data():
-    """Pobiera informacje o użytkownikach z user_records.json."""
-    user_records_path = os.path.join("user", "data", "user_records.json")
+    """Pobiera informacje o użytkownikach z magazynu rekordów (JSON lub SQLite)."""
     try:
-        with open(user_records_path, "r") as file:
-            return json.load(file)
-    except FileNotFoundError:
-        return colored("Plik user_records.json nie istnieje ❌", "red")
+        return open_user_store().all()
     except json.JSONDecodeError:
         return colored("Plik user_records.json jest uszkodzony ❌", "red")
 
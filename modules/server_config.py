@@ -0,0 +1,586 @@
+#!/usr/bin/env python3
+# modules/server_config.py
+# Model dokumentu konfiguracji serwera WireGuard (wg0.conf)
+#
+# Plik jest parsowany raz do uporządkowanej listy bloków (preambuła, [Interface],
+# bloki peerów). Każdy blok zachowuje swoje oryginalne linie - komentarze, puste
+# linie i kolejność - więc render() odtwarza plik bajt w bajt, a edycja zmienia
+# tylko linie edytowanego bloku. Blok peera zaczyna się od komentarza
+# "### Client <nazwa>" / "### Klient <nazwa>" lub od linii [Peer]; zablokowany
+# peer to blok z zakomentowanymi liniami ("# [Peer]", "# PublicKey = ...").
+# Peery są indeksowane po nazwie klienta (bez rozróżniania wielkości liter)
+# i kluczu publicznym, a zapis to jedna atomowa podmiana pliku. Każda edycja
+# (także dopisanie peerów) odbywa się pod blokadą file_lock wspólną dla
+# wszystkich procesów zmieniających plik (panel, menu, modules.stats_daemon).
+#
+# Przykład użycia:
+#   from modules.server_config import edit_server_config, load_server_config
+#   peer = load_server_config("/etc/wireguard/wg0.conf").peer_by_name("jan")
+#   with edit_server_config("/etc/wireguard/wg0.conf") as config:
+#       config.set_enabled("jan", False)
+#   set_peer_enabled("/etc/wireguard/wg0.conf", "jan", False)  # z uwzględnieniem SERVER_CONFIG_LAYOUT
+
+import os
+import re
+import tempfile
+import threading
+from contextlib import contextmanager
+
+from modules.file_lock import file_lock
+
+CLIENT_HEADER = re.compile(r"^###\s*(?:Client|Klient)\b:?\s*(.*?)\s*$", re.IGNORECASE)
+DEFAULT_CLIENT_LABEL = "Klient"  # Etykieta komentarza nowych peerów (jak w format_peer_block)
+LAYOUTS = ("single", "fragments")  # Układy przechowywania konfiguracji (settings.SERVER_CONFIG_LAYOUT)
+
+
+def _split(line):
+    """Zwraca (zakomentowana, treść) linii bez znaków komentarza i białych znaków."""
+    stripped = line.strip()
+    if stripped.startswith("#"):
+        return True, stripped.lstrip("#").strip()
+    return False, stripped
+
+
+def _client_name(line):
+    match = CLIENT_HEADER.match(line.strip())
+    return match.group(1) if match else None
+
+
+class ConfigBlock:
+    """
+    Blok pliku: "preamble" (linie przed pierwszą sekcją), "interface", "peer" lub "other".
+    Pola klucz = wartość są dostępne bez rozróżniania wielkości liter kluczy.
+    """
+
+    def __init__(self, kind, lines=None, name=None):
+        self.kind = kind
+        self.name = name
+        self.lines = lines if lines is not None else []
+        self.fields = {}
+        self.enabled = True
+
+    def _parse(self):
+        """Odtwarza pola i stan (aktywny/zablokowany) z linii bloku."""
+        self.fields = {}
+        section = None
+        for index, line in enumerate(self.lines):
+            commented, content = _split(line)
+            if not content or (self.name is not None and _client_name(line) is not None):
+                continue
+            if content.startswith("[") and content.endswith("]"):
+                section = not commented
+                continue
+            if "=" not in content:
+                continue
+            key, value = [part.strip() for part in content.split("=", 1)]
+            if not key or " " in key:
+                continue
+            # W aktywnym bloku zakomentowana linia to zwykły komentarz, nie pole
+            if commented and section is True:
+                continue
+            self.fields[key.lower()] = (index, key, value, commented)
+        if section is None:
+            public_key = self.fields.get("publickey")
+            self.enabled = public_key is None or not public_key[3]
+        else:
+            self.enabled = section
+
+    def get(self, key, default=None):
+        """Zwraca wartość pola (np. "PublicKey") lub default."""
+        field = self.fields.get(key.lower())
+        return field[2] if field else default
+
+    def set(self, key, value):
+        """Ustawia pole w miejscu (nowe pole trafia za ostatnie pole bloku)."""
+        prefix = "" if self.enabled else "# "
+        field = self.fields.get(key.lower())
+        if field is not None:
+            index, original_key = field[0], field[1]
+            line = self.lines[index]
+            ending = line[len(line.rstrip("\r\n")):]
+            self.lines[index] = f"{prefix}{original_key} = {value}{ending}"
+        else:
+            positions = [f[0] for f in self.fields.values()]
+            index = (max(positions) if positions else self._header_index()) + 1
+            if index > 0 and not self.lines[index - 1].endswith("\n"):
+                self.lines[index - 1] += "\n"
+            self.lines.insert(index, f"{prefix}{key} = {value}\n")
+        self._parse()
+
+    def remove_field(self, key):
+        """Usuwa pole z bloku. :return: True, jeśli pole istniało."""
+        field = self.fields.get(key.lower())
+        if field is None:
+            return False
+        del self.lines[field[0]]
+        self._parse()
+        return True
+
+    def _header_index(self):
+        for index, line in enumerate(self.lines):
+            content = _split(line)[1]
+            if content.startswith("[") and content.endswith("]"):
+                return index
+        for index, line in enumerate(self.lines):
+            if _client_name(line) is not None:
+                return index
+        return -1
+
+    def set_enabled(self, enabled):
+        """Blokuje (komentuje linie "# ") lub odblokowuje peera; komentarz z nazwą zostaje."""
+        updated = []
+        for line in self.lines:
+            if not line.strip() or (self.name is not None and _client_name(line) is not None):
+                updated.append(line)
+            elif not enabled and not line.startswith("#"):
+                updated.append(f"# {line}")
+            elif enabled and line.startswith("# "):
+                updated.append(line[2:])
+            else:
+                updated.append(line)
+        self.lines = updated
+        self._parse()
+
+    @property
+    def public_key(self):
+        return self.get("PublicKey")
+
+    @property
+    def preshared_key(self):
+        return self.get("PresharedKey")
+
+    @property
+    def allowed_ips(self):
+        return self.get("AllowedIPs")
+
+    @property
+    def endpoint(self):
+        return self.get("Endpoint")
+
+    @property
+    def persistent_keepalive(self):
+        return self.get("PersistentKeepalive")
+
+    def render(self):
+        return "".join(self.lines)
+
+    def __repr__(self):
+        return f"ConfigBlock({self.kind!r}, name={self.name!r}, public_key={self.public_key!r}, enabled={self.enabled})"
+
+
+class ServerConfig:
+    """Plik wg0.conf jako uporządkowana lista bloków z indeksami peerów."""
+
+    def __init__(self, blocks=None, path=None):
+        self.path = str(path) if path is not None else None
+        self.blocks = blocks if blocks is not None else []
+        self._reindex()
+
+    @classmethod
+    def parse(cls, text, path=None):
+        """Parsuje treść pliku konfiguracji."""
+        blocks = []
+        current = ConfigBlock("preamble")
+        awaiting_section = False  # Blok z komentarzem ### Client, przed linią [Peer]
+        for line in text.splitlines(keepends=True):
+            commented, content = _split(line)
+            name = _client_name(line)
+            is_section = content.startswith("[") and content.endswith("]")
+            if name is not None:
+                blocks.append(current)
+                current = ConfigBlock("peer", name=name)
+                awaiting_section = True
+            elif is_section and content.lower() == "[peer]":
+                if not awaiting_section:
+                    blocks.append(current)
+                    current = ConfigBlock("peer")
+                awaiting_section = False
+            elif is_section and not commented:
+                blocks.append(current)
+                current = ConfigBlock("interface" if content.lower() == "[interface]" else "other")
+                awaiting_section = False
+            current.lines.append(line)
+        blocks.append(current)
+        blocks = [block for block in blocks if block.lines]
+        for block in blocks:
+            block._parse()
+        return cls(blocks, path)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Wczytuje i parsuje plik konfiguracji.
+        :raises FileNotFoundError: Brak pliku.
+        """
+        with open(path, "r", encoding="utf-8") as f:
+            return cls.parse(f.read(), path)
+
+    def _reindex(self):
+        self._by_name = {}
+        self._by_key = {}
+        for block in self.blocks:
+            self._index(block)
+
+    def _index(self, block):
+        if block.kind != "peer":
+            return
+        if block.name:
+            self._by_name.setdefault(block.name.lower(), block)
+        if block.public_key:
+            self._by_key.setdefault(block.public_key, block)
+
+    def _unindex(self, block):
+        if block.name and self._by_name.get(block.name.lower()) is block:
+            del self._by_name[block.name.lower()]
+        if block.public_key and self._by_key.get(block.public_key) is block:
+            del self._by_key[block.public_key]
+
+    @property
+    def interface(self):
+        """Blok [Interface] lub None."""
+        for block in self.blocks:
+            if block.kind == "interface":
+                return block
+        return None
+
+    def peers(self, include_disabled=True):
+        """Zwraca bloki peerów w kolejności z pliku."""
+        return [b for b in self.blocks if b.kind == "peer" and (include_disabled or b.enabled)]
+
+    def client_names(self):
+        """Zwraca nazwy klientów (z komentarzy ### Client/### Klient) w kolejności z pliku."""
+        return [block.name for block in self.peers() if block.name]
+
+    def peer_by_name(self, name):
+        """Zwraca blok peera klienta (bez rozróżniania wielkości liter) lub None."""
+        return self._by_name.get(str(name).lower())
+
+    def peer_by_public_key(self, public_key):
+        """Zwraca blok peera o danym kluczu publicznym lub None."""
+        return self._by_key.get(public_key)
+
+    def has_client(self, name):
+        return self.peer_by_name(name) is not None
+
+    def _resolve(self, peer):
+        return peer if isinstance(peer, ConfigBlock) else self.peer_by_name(peer)
+
+    def add_peer(self, name, public_key, preshared_key=None, allowed_ips=None, label=DEFAULT_CLIENT_LABEL, **fields):
+        """
+        Dopisuje blok peera na końcu pliku (format jak format_peer_block).
+        :return: Nowy blok peera.
+        """
+        lines = []
+        if self.blocks:
+            last = self.blocks[-1]
+            if not last.lines[-1].endswith("\n"):
+                last.lines[-1] += "\n"
+            if last.lines[-1].strip():
+                lines.append("\n")
+        lines += [f"### {label} {name}\n", "[Peer]\n", f"PublicKey = {public_key}\n"]
+        if preshared_key:
+            lines.append(f"PresharedKey = {preshared_key}\n")
+        if allowed_ips:
+            lines.append(f"AllowedIPs = {allowed_ips}\n")
+        for key, value in fields.items():
+            lines.append(f"{key} = {value}\n")
+        block = ConfigBlock("peer", lines, name=name)
+        block._parse()
+        self.blocks.append(block)
+        self._index(block)
+        return block
+
+    def update_peer(self, peer, **fields):
+        """
+        Zmienia pola peera w miejscu, np. update_peer("jan", AllowedIPs="10.0.0.5/32").
+        :return: Blok peera lub None, jeśli nie istnieje.
+        """
+        block = self._resolve(peer)
+        if block is None:
+            return None
+        self._unindex(block)
+        for key, value in fields.items():
+            block.set(key, value)
+        self._index(block)
+        return block
+
+    def set_enabled(self, peer, enabled):
+        """Blokuje/odblokowuje peera. :return: Blok peera lub None."""
+        block = self._resolve(peer)
+        if block is None:
+            return None
+        self._unindex(block)
+        block.set_enabled(enabled)
+        self._index(block)
+        return block
+
+    def remove_peer(self, peer=None, public_key=None):
+        """
+        Usuwa blok peera (wraz z komentarzem z nazwą i pustymi liniami za nim).
+        :param peer: Nazwa klienta lub blok.
+        :param public_key: Alternatywnie klucz publiczny.
+        :return: Usunięty blok lub None.
+        """
+        block = self._resolve(peer) if peer is not None else self.peer_by_public_key(public_key)
+        if block is None:
+            return None
+        self.blocks.remove(block)
+        self._unindex(block)
+        self._reindex_missing(block)
+        return block
+
+    def _reindex_missing(self, removed):
+        # Duplikat nazwy/klucza, który był przesłonięty przez usunięty blok
+        for block in self.blocks:
+            if block.kind == "peer" and (block.name and block.name.lower() == (removed.name or "").lower()
+                                         or block.public_key == removed.public_key):
+                self._index(block)
+
+    def clear_peers(self):
+        """Usuwa wszystkie bloki peerów. :return: Liczba usuniętych bloków."""
+        peers = self.peers()
+        self.blocks = [block for block in self.blocks if block.kind != "peer"]
+        self._reindex()
+        return len(peers)
+
+    def subnet(self):
+        """Zwraca pierwszy adres IPv4 z linii Address sekcji [Interface] (np. "10.66.66.1/24") lub None."""
+        interface = self.interface
+        if interface is None or not interface.get("Address"):
+            return None
+        for address in interface.get("Address").split(","):
+            address = address.strip()
+            if "/" in address and "." in address:
+                return address
+        return None
+
+    def allowed_ips(self, include_disabled=True):
+        """Zwraca wszystkie adresy z AllowedIPs peerów."""
+        ips = []
+        for block in self.peers(include_disabled):
+            for value in (block.allowed_ips or "").split(","):
+                if value.strip():
+                    ips.append(value.strip())
+        return ips
+
+    def render(self):
+        """Zwraca treść pliku (bez zmian - identyczną z wczytaną)."""
+        return "".join(block.render() for block in self.blocks)
+
+    def save(self, path=None):
+        """Zapisuje plik atomowo (plik tymczasowy + os.replace), zachowując uprawnienia."""
+        path = str(path or self.path)
+        atomic_write(path, self.render())
+        self.path = path
+        _remember(path, self)
+
+
+def format_peer_block(name, public_key, preshared_key, allowed_ips, label=DEFAULT_CLIENT_LABEL):
+    """Zwraca blok [Peer] klienta do dopisania na końcu konfiguracji serwera."""
+    return (
+        f"\n### {label} {name}\n"
+        f"[Peer]\n"
+        f"PublicKey = {public_key}\n"
+        f"PresharedKey = {preshared_key}\n"
+        f"AllowedIPs = {allowed_ips}\n"
+    )
+
+
+def atomic_write(path, text):
+    """Zapisuje plik atomowo (plik tymczasowy + os.replace), zachowując uprawnienia istniejącego pliku."""
+    path = str(path)
+    directory = os.path.dirname(path) or "."
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".wg_conf_")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+        if os.path.exists(path):
+            os.chmod(tmp_path, os.stat(path).st_mode & 0o7777)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+_cache = {}
+_cache_lock = threading.Lock()
+_edit_lock = threading.RLock()
+
+
+def _stat_key(path):
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+
+def _remember(path, config):
+    try:
+        key = _stat_key(path)
+    except OSError:
+        return
+    with _cache_lock:
+        _cache[os.path.abspath(path)] = (key, config)
+
+
+def load_server_config(path):
+    """
+    Zwraca sparsowaną konfigurację współdzieloną w procesie - plik jest parsowany
+    ponownie tylko po zmianie (mtime/rozmiar/i-węzeł). Obiekt służy do odczytu;
+    zmiany należy wykonywać przez edit_server_config() lub funkcje set_peer_enabled,
+    remove_server_peer, add_server_peers i clear_server_peers. W układzie
+    "fragments" zwraca konfigurację złożoną z fragmentów.
+    :raises FileNotFoundError: Brak pliku.
+    """
+    path = str(path)
+    store = active_fragment_store(path)
+    if store is not None:
+        return store.config()
+    key = _stat_key(path)
+    with _cache_lock:
+        cached = _cache.get(os.path.abspath(path))
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    config = ServerConfig.load(path)
+    with _cache_lock:
+        _cache[os.path.abspath(path)] = (key, config)
+    return config
+
+
+@contextmanager
+def edit_server_config(path, create=False):
+    """
+    Wczytuje świeżą kopię konfiguracji do edycji i zapisuje ją jednym atomowym
+    zapisem po wyjściu z bloku bez wyjątku. Całość pod blokadą międzyprocesową.
+    :param create: Pozwala edytować nieistniejący plik (zaczyna od pustego dokumentu).
+    """
+    path = str(path)
+    with _edit_lock, file_lock(path):
+        try:
+            config = ServerConfig.load(path)
+        except FileNotFoundError:
+            if not create:
+                raise
+            config = ServerConfig(path=path)
+        yield config
+        config.save(path)
+
+
+def resolve_layout(layout=None):
+    """
+    Ustala układ przechowywania konfiguracji serwera.
+    :param layout: "single", "fragments" lub None (wartość z settings.SERVER_CONFIG_LAYOUT).
+    """
+    if layout is None:
+        try:
+            import settings
+            layout = getattr(settings, "SERVER_CONFIG_LAYOUT", "single")
+        except ImportError:
+            layout = "single"
+    layout = str(layout or "single").lower()
+    if layout not in LAYOUTS:
+        raise ValueError(f"Nieznany układ konfiguracji serwera: {layout}. Dostępne: {', '.join(LAYOUTS)}")
+    return layout
+
+
+def active_fragment_store(path):
+    """Zwraca magazyn fragmentów konfiguracji, gdy aktywny jest układ "fragments", w przeciwnym razie None."""
+    if resolve_layout() != "fragments":
+        return None
+    from modules.config_fragments import get_fragment_store
+    return get_fragment_store(path)
+
+
+def set_peer_enabled(path, name, enabled):
+    """
+    Blokuje/odblokowuje peera klienta w konfiguracji serwera.
+    :return: Blok peera lub None, jeśli nie istnieje.
+    """
+    store = active_fragment_store(path)
+    if store is not None:
+        return store.set_enabled(name, enabled)
+    with edit_server_config(path) as config:
+        return config.set_enabled(name, enabled)
+
+
+def set_peers_enabled(path, names, enabled):
+    """
+    Blokuje/odblokowuje wielu peerów jednym zapisem konfiguracji
+    (w układzie "fragments" zapisywane są tylko ich fragmenty).
+    :return: Lista nazw peerów, które znaleziono.
+    """
+    store = active_fragment_store(path)
+    if store is not None:
+        with store.batch():
+            return [name for name in names if store.set_enabled(name, enabled) is not None]
+    with edit_server_config(path) as config:
+        return [name for name in names if config.set_enabled(name, enabled) is not None]
+
+
+def remove_server_peer(path, name=None, public_key=None):
+    """
+    Usuwa peera klienta - po nazwie, a w razie braku po kluczu publicznym.
+    :return: Usunięty blok lub None.
+    """
+    store = active_fragment_store(path)
+    if store is not None:
+        return store.remove_peer(name, public_key)
+    with edit_server_config(path) as config:
+        removed = config.remove_peer(name) if name is not None else None
+        if removed is None and public_key:
+            removed = config.remove_peer(public_key=public_key)
+        return removed
+
+
+def remove_server_peers(path, peers):
+    """
+    Usuwa wielu peerów jednym zapisem konfiguracji.
+    :param peers: Lista krotek (nazwa, klucz_publiczny); klucz używany, gdy nazwy brak.
+    :return: Liczba usuniętych peerów.
+    """
+    store = active_fragment_store(path)
+    if store is not None:
+        with store.batch():
+            return sum(store.remove_peer(name, public_key) is not None for name, public_key in peers)
+    removed = 0
+    with edit_server_config(path) as config:
+        for name, public_key in peers:
+            block = config.remove_peer(name) if name is not None else None
+            if block is None and public_key:
+                block = config.remove_peer(public_key=public_key)
+            removed += block is not None
+    return removed
+
+
+def add_server_peers(path, peers):
+    """
+    Dodaje peerów klientów jednym zapisem (ta sama zablokowana edycja co pozostałe
+    zmiany - dopisanie w trybie "a" mogłoby trafić do pliku podmienionego przez os.replace).
+    :param peers: Lista słowników {name, public_key, preshared_key, allowed_ips}.
+    :return: Liczba dodanych peerów.
+    """
+    store = active_fragment_store(path)
+    if store is not None:
+        return store.add_peers(peers)
+    with edit_server_config(path, create=True) as config:
+        for peer in peers:
+            config.add_peer(peer["name"], peer["public_key"], peer.get("preshared_key"), peer.get("allowed_ips"))
+    return len(peers)
+
+
+def clear_server_peers(path, pool_path=None):
+    """
+    Usuwa wszystkich peerów z konfiguracji serwera.
+    :param pool_path: Ścieżka zapisanej puli adresów IP - podana pula jest usuwana
+                      (odbudowa przy następnym przydziale), bo jej adresy są już wolne.
+    :return: Liczba usuniętych peerów.
+    """
+    store = active_fragment_store(path)
+    if store is not None:
+        removed = store.clear_peers()
+    else:
+        with edit_server_config(path) as config:
+            removed = config.clear_peers()
+    if pool_path:
+        from modules.ip_allocator import reset_ip_pool
+        reset_ip_pool(pool_path)
+    return removed
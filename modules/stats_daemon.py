@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+# modules/stats_daemon.py
+# Kolektor statystyk WireGuard działający w tle (asyncio, usługa systemd)
+#
+# Co STATS_INTERVAL sekund kolektor odczytuje świeżą migawkę WireGuard (liczniki
+# ruchu i handshake'i), dopisuje surowe liczniki do szeregów czasowych
+# (modules/traffic_series.py), zapisuje je do magazynu użytkowników (pola transfer,
+# total_transfer, last_handshake), egzekwuje limity danych (modules/quota.py:
+# data_used, ostrzeżenia, przy QUOTA_ENFORCE blokada peerów ponad limit)
+# i zapisuje atomowo plik stanu STATS_STATUS_PATH z czasem i wynikiem
+# ostatniego pomiaru. Zakładki Gradio
+# i menu konsolowe tylko czytają zapisane dane - interfejs nigdy nie uruchamia
+# pomiaru sam. Pomiar (blokujący odczyt wg i zapis magazynu) wykonuje się
+# w puli wątków, a pętla trzyma stały rytm niezależny od czasu pomiaru.
+# Co TRAFFIC_ROLLUP_INTERVAL sekund w tle (bez wstrzymywania pomiarów) działa
+# rollup i retencja historii ruchu. Usługa uruchamia też harmonogram wygasania
+# kont (modules/expiry_scheduler.py).
+#
+# Przykład użycia:
+#   python3 -m modules.stats_daemon              # pętla kolektora (ExecStart usługi)
+#   python3 -m modules.stats_daemon --once       # jeden pomiar
+#   python3 -m modules.stats_daemon install      # instalacja i start usługi systemd
+#
+#   from modules.stats_daemon import read_status, describe_status
+#   print(describe_status(read_status()))
+
+import asyncio
+import json
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+SERVICE_NAME = "pywggen-stats"
+UNIT_PATH = f"/etc/systemd/system/{SERVICE_NAME}.service"
+ACTIVE_HANDSHAKE_WINDOW = 180  # Peer z handshake'iem młodszym niż 3 minuty liczony jako aktywny (w sekundach)
+
+UNIT_TEMPLATE = """[Unit]
+Description=pyWGgen - kolektor statystyk WireGuard
+After=network-online.target wg-quick@{nic}.service
+Wants=network-online.target
+
+[Service]
+Type=simple
+WorkingDirectory={project_dir}
+ExecStart={python} -m modules.stats_daemon
+Restart=on-failure
+RestartSec=5
+
+[Install]
+WantedBy=multi-user.target
+"""
+
+
+def _settings():
+    """Zwraca moduł settings (odczyt przy wywołaniu, nie przy imporcie)."""
+    import settings
+    return settings
+
+
+def _status_path(path=None):
+    return str(path or getattr(_settings(), "STATS_STATUS_PATH", "user/data/stats_status.json"))
+
+
+def read_status(path=None):
+    """
+    Zwraca stan ostatniego pomiaru zapisany przez kolektor lub None, jeśli
+    kolektor jeszcze nie działał.
+    """
+    try:
+        with open(_status_path(path), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def write_status(status, path=None):
+    """Zapisuje stan pomiaru atomowo (plik tymczasowy + os.replace)."""
+    path = _status_path(path)
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".stats_status_")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(status, f, indent=4)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def describe_status(status, now=None):
+    """Zwraca jednowierszowy opis świeżości danych dla interfejsu."""
+    if not status or not status.get("collected_at"):
+        return "⚠️ Brak danych kolektora statystyk - uruchom usługę (menu: st)."
+    now = time.time() if now is None else now
+    collected = datetime.fromtimestamp(status["collected_at"]).strftime("%Y-%m-%d %H:%M:%S")
+    text = (f"📡 Ostatni pomiar: {collected} ({max(0, int(now - status['collected_at']))} s temu), "
+            f"peerów: {status.get('peers', 0)}, aktywnych: {status.get('active', 0)}")
+    if status.get("quota_blocked"):
+        text += f" | ⛔ Zablokowano za limit danych: {status['quota_blocked']}"
+    if status.get("error"):
+        text += f" | ⚠️ Ostatni błąd: {status['error']}"
+    return text
+
+
+def collect_once(user_records_path=None, interface=None, status_path=None, series=None, quota=None):
+    """
+    Wykonuje jeden pomiar: świeża migawka WireGuard, dopisanie liczników do szeregów
+    czasowych, zapis ruchu i handshake'ów do magazynu użytkowników, egzekwowanie
+    limitów danych oraz zapis pliku stanu.
+    :param series: Magazyn TrafficSeries (domyślnie get_series()).
+    :param quota: Silnik QuotaEngine (domyślnie get_quota_engine()).
+    :return: Słownik stanu pomiaru.
+    """
+    from modules.wg_snapshot import get_snapshot
+    from modules.traffic_series import get_series
+    from modules.traffic_updater import traffic_updates
+    from modules.handshake_updater import handshake_updates
+    from modules.quota import enforce_quotas
+    from modules.user_store import open_user_store
+
+    settings = _settings()
+    user_records_path = str(user_records_path or settings.USER_DB_PATH)
+    interface = interface or settings.SERVER_WG_NIC
+    collected_at = time.time()
+    started = time.monotonic()
+
+    peers = get_snapshot(max_age=0).peers_of(interface)
+    (series or get_series()).append(collected_at, [
+        (public_key, peer.rx_bytes, peer.tx_bytes, peer.latest_handshake) for public_key, peer in peers.items()
+    ])
+    # Ruch, handshake'i i zmiany limitów trafiają do magazynu jednym zapisem (update_many w enforce_quotas)
+    index = open_user_store(user_records_path).public_key_index()
+    updates = traffic_updates(peers, index)
+    for name, fields in handshake_updates(peers, index).items():
+        updates.setdefault(name, {}).update(fields)
+    quota_summary = enforce_quotas(peers, user_records_path, interface, now=collected_at, engine=quota,
+                                   updates=updates)
+
+    status = {
+        "collected_at": collected_at,
+        "interface": interface,
+        "peers": len(peers),
+        "active": sum(1 for peer in peers.values()
+                      if peer.latest_handshake and collected_at - peer.latest_handshake < ACTIVE_HANDSHAKE_WINDOW),
+        "rx_bytes": sum(peer.rx_bytes for peer in peers.values()),
+        "tx_bytes": sum(peer.tx_bytes for peer in peers.values()),
+        "quota_blocked": len(quota_summary["blocked"]),
+        "quota_warned": len(quota_summary["warned"]),
+        "duration_ms": round((time.monotonic() - started) * 1000, 1),
+        "error": None,
+    }
+    write_status(status, status_path)
+    return status
+
+
+def maintain_series():
+    """Rollupy i retencja historii ruchu (modules/traffic_series.py)."""
+    from modules.traffic_series import get_series
+    processed, removed = get_series().maintain()
+    print(f"📈 Historia ruchu: zagregowano {processed} rekordów, usunięto {removed} przeterminowanych.")
+
+
+def _run_maintenance(maintain):
+    try:
+        maintain()
+    except Exception as e:
+        print(f"⚠️ Błąd rollupu historii ruchu: {e}")
+
+
+def _record_error(error, status_path=None):
+    """Dopisuje błąd pomiaru do stanu, zachowując dane ostatniego udanego pomiaru."""
+    status = read_status(status_path) or {}
+    status.update(error=str(error), failed_at=time.time())
+    try:
+        write_status(status, status_path)
+    except OSError:
+        pass
+
+
+async def run_collector(interval=None, stop_event=None, collect=collect_once,
+                        maintain=maintain_series, maintenance_interval=None):
+    """
+    Pętla kolektora: pomiar w puli wątków co `interval` sekund do ustawienia stop_event.
+    :param interval: Odstęp pomiarów (domyślnie settings.STATS_INTERVAL).
+    :param stop_event: asyncio.Event kończący pętlę (domyślnie sygnały SIGTERM/SIGINT).
+    :param collect: Funkcja pomiaru (bez argumentów).
+    :param maintain: Funkcja rollupu/retencji uruchamiana w tle (None - wyłączona).
+    :param maintenance_interval: Odstęp rollupów (domyślnie settings.TRAFFIC_ROLLUP_INTERVAL).
+    :return: Liczba wykonanych pomiarów.
+    """
+    loop = asyncio.get_running_loop()
+    interval = float(interval or getattr(_settings(), "STATS_INTERVAL", 30))
+    maintenance_interval = float(maintenance_interval or getattr(_settings(), "TRAFFIC_ROLLUP_INTERVAL", 300))
+    maintenance = None
+    next_maintenance = loop.time() + maintenance_interval
+    if stop_event is None:
+        stop_event = asyncio.Event()
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(signum, stop_event.set)
+
+    cycles = 0
+    while not stop_event.is_set():
+        started = loop.time()
+        try:
+            await loop.run_in_executor(None, collect)
+        except Exception as e:
+            print(f"⚠️ Błąd pomiaru statystyk: {e}")
+            _record_error(e)
+        cycles += 1
+        # Rollup w tle; kolejny dopiero po zakończeniu poprzedniego
+        if maintain is not None and loop.time() >= next_maintenance and (maintenance is None or maintenance.done()):
+            maintenance = loop.run_in_executor(None, _run_maintenance, maintain)
+            next_maintenance = loop.time() + maintenance_interval
+        # Stały rytm: czas pomiaru wliczony w odstęp
+        delay = max(0.0, interval - (loop.time() - started))
+        try:
+            await asyncio.wait_for(stop_event.wait(), timeout=delay)
+        except asyncio.TimeoutError:
+            pass
+    if maintenance is not None:
+        await maintenance
+    return cycles
+
+
+def install_service(python=None, project_dir=None):
+    """Zapisuje jednostkę systemd kolektora, przeładowuje systemd i uruchamia usługę."""
+    settings = _settings()
+    unit = UNIT_TEMPLATE.format(
+        nic=settings.SERVER_WG_NIC,
+        project_dir=project_dir or settings.BASE_DIR,
+        python=python or sys.executable,
+    )
+    with open(UNIT_PATH, "w", encoding="utf-8") as f:
+        f.write(unit)
+    subprocess.run(["systemctl", "daemon-reload"], check=True)
+    subprocess.run(["systemctl", "enable", "--now", SERVICE_NAME], check=True)
+    print(f"✅ Usługa {SERVICE_NAME} zainstalowana i uruchomiona ({UNIT_PATH}).")
+
+
+def service_action(action):
+    """Wykonuje `systemctl <action>` dla usługi kolektora."""
+    subprocess.run(["systemctl", action, SERVICE_NAME], check=action != "status")
+
+
+def stats_service_menu():
+    """Menu konsolowe usługi kolektora statystyk."""
+    while True:
+        print(f"\n📈 Kolektor statystyk ({SERVICE_NAME})")
+        print(f"  {describe_status(read_status())}")
+        print("  1. Zainstaluj i uruchom usługę")
+        print("  2. Zatrzymaj usługę")
+        print("  3. Status usługi")
+        print("  4. Wykonaj jeden pomiar teraz")
+        print("  0. Powrót")
+        choice = input("Wybierz akcję: ").strip()
+        try:
+            if choice == "1":
+                install_service()
+            elif choice == "2":
+                service_action("stop")
+            elif choice == "3":
+                service_action("status")
+            elif choice == "4":
+                print(describe_status(collect_once()))
+            elif choice == "0":
+                return
+            else:
+                print("⚠️ Nieprawidłowy wybór.")
+        except Exception as e:
+            print(f"⚠️ Błąd: {e}")
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ["install"]:
+        install_service()
+    elif argv[:1] == ["--once"]:
+        print(describe_status(collect_once()))
+    elif not argv or argv[0] == "--interval":
+        interval = float(argv[1]) if len(argv) > 1 else None
+        print(f"📈 Kolektor statystyk uruchomiony (co {interval or _settings().STATS_INTERVAL} s).")
+        from modules.expiry_scheduler import get_expiry_scheduler
+        expiry = get_expiry_scheduler()
+        expiry.start()
+        try:
+            asyncio.run(run_collector(interval))
+        finally:
+            expiry.stop()
+        print("📈 Kolektor statystyk zatrzymany.")
+    else:
+        print("Użycie: python3 -m modules.stats_daemon [--once | --interval <sekundy> | install]")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,11 +1,12 @@
 #!/usr/bin/env python3
 
-import json
 import shutil
 from pathlib import Path
 from settings import USER_DB_PATH, SERVER_CONFIG_FILE
 from modules.main_registration_fields import create_user_record
-from modules.qr_generator import generate_qr_code
+from modules.qr_worker import submit_qr
+from modules.user_store import open_user_store
+from modules.server_config import load_server_config
 
 def get_valid_path(prompt):
     """Pobiera poprawną ścieżkę do katalogu."""
@@ -16,6 +17,13 @@ def get_valid_path(prompt):
             return path
         print(f"Błąd: Katalog '{path_str}' nie istnieje. Spróbuj ponownie.\n")
 
+def _pad_key(key):
+    """Uzupełnia brakujące znaki '=' klucza base64."""
+    missing_padding = len(key) % 4
+    if missing_padding:
+        key += '=' * (4 - missing_padding)
+    return key
+
 def find_user_files(username, config_dir, qr_dir):
     """Znajduje pliki konfiguracyjne i QR użytkownika."""
     config_path = next(
@@ -46,46 +54,28 @@ def sync_users_from_config_paths(config_dir_str: str, qr_dir_str: str):
         logs.append(f"Katalog konfiguracji: {config_dir}\nKatalog QR: {qr_dir}\n")
 
         # Parsowanie konfiguracji serwera
-        with open(SERVER_CONFIG_FILE, "r") as f:
-            config_content = f.read()
+        config = load_server_config(SERVER_CONFIG_FILE)
 
         users = []
-        current_user = {}
-        for line in config_content.split('\n'):
-            line = line.strip()
-            if line.startswith("### Client"):
-                if current_user:
-                    users.append(current_user)
-                current_user = {"username": line.split("### Client")[1].strip()}
-            elif line.startswith("PublicKey ="):
-                _, value = line.split('=', 1)
-                public_key = value.strip()
-                missing_padding = len(public_key) % 4
-                if missing_padding:
-                    public_key += '=' * (4 - missing_padding)
-                current_user["public_key"] = public_key
-            elif line.startswith("PresharedKey ="):
-                _, value = line.split('=', 1)
-                preshared_key = value.strip()
-                missing_padding = len(preshared_key) % 4
-                if missing_padding:
-                    preshared_key += '=' * (4 - missing_padding)
-                current_user["preshared_key"] = preshared_key
-            elif line.startswith("AllowedIPs ="):
-                current_user["allowed_ips"] = line.split('=', 1)[1].strip()
-            elif line == "" and current_user:
-                users.append(current_user)
-                current_user = {}
-        if current_user:
-            users.append(current_user)
-
-        # Wczytaj istniejące rekordy
+        for peer in config.peers():
+            if not peer.name:
+                continue
+            user = {"username": peer.name}
+            if peer.public_key:
+                user["public_key"] = _pad_key(peer.public_key)
+            if peer.preshared_key:
+                user["preshared_key"] = _pad_key(peer.preshared_key)
+            if peer.allowed_ips:
+                user["allowed_ips"] = peer.allowed_ips
+            users.append(user)
+
+        # Istniejące rekordy sprawdzane w magazynie, nowe zapisywane razem po pętli
+        store = open_user_store(USER_DB_PATH)
         user_records = {}
-        if USER_DB_PATH.exists():
-            with open(USER_DB_PATH, "r") as f:
-                user_records = json.load(f)
 
         new_users = 0
+        qr_jobs = {}
+        created_users = set()
         for user in users:
             username = user["username"]
             logs.append(f"Przetwarzanie: {username}")
@@ -120,12 +110,10 @@ def sync_users_from_config_paths(config_dir_str: str, qr_dir_str: str):
                 logs.append(f"  ✅ Skopiowano QR: {qr_path.name}")
                 qr_processed = True
             elif config_processed:
-                try:
-                    generate_qr_code(target_config.read_text(), str(target_qr))
-                    logs.append("  🔄 Wygenerowano QR z konfiguracji")
-                    qr_processed = True
-                except Exception as e:
-                    logs.append(f"  ❗ Błąd generowania QR: {str(e)}")
+                # Generowanie w puli procesów - wyniki zbierane po pętli
+                qr_jobs[username] = submit_qr(target_config.read_text(), str(target_qr))
+                logs.append("  🔄 Zlecono generowanie QR z konfiguracji")
+                qr_processed = True
 
             # Pomiń jeśli brak przetworzonych plików
             if not config_processed and not qr_processed:
@@ -133,7 +121,7 @@ def sync_users_from_config_paths(config_dir_str: str, qr_dir_str: str):
                 continue
 
             # Aktualizuj rekordy użytkowników
-            if username not in user_records:
+            if username not in user_records and store.get(username) is None:
                 user_record = create_user_record(
                     username=username,
                     address=user.get("allowed_ips", ""),
@@ -143,11 +131,20 @@ def sync_users_from_config_paths(config_dir_str: str, qr_dir_str: str):
                 )
                 user_record["config_path"] = str(target_config) if config_processed else None
                 user_records[username] = user_record
+                created_users.add(username)
                 new_users += 1
 
-        # Zapisz zaktualizowaną bazę
-        with open(USER_DB_PATH, "w") as f:
-            json.dump(user_records, f, indent=4)
+        # Poczekaj na kody QR generowane w tle
+        for username, job in qr_jobs.items():
+            try:
+                job.result()
+            except Exception as e:
+                logs.append(f"  ❗ Błąd generowania QR dla {username}: {str(e)}")
+                if username in created_users:
+                    user_records[username]["qr_code_path"] = None
+
+        # Zapisz nowe rekordy (jedna transakcja)
+        store.put_many(user_records)
 
         logs.append(f"\n✅ Synchronizacja zakończona! Nowi użytkownicy: {new_users}")
         return True, "\n".join(logs)
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+# modules/sync_scheduler.py
+# Koalescencja żądań synchronizacji interfejsu WireGuard
+#
+# Handlery blokowania/odblokowania/usuwania użytkowników, tworzenie konfiguracji
+# i czyszczenie danych zgłaszają żądanie synchronizacji zamiast uruchamiać ją
+# samodzielnie. Wątek harmonogramu zbiera żądania w oknie czasowym
+# (SYNC_COALESCE_WINDOW_MS), wykonuje jedną synchronizację na interfejs
+# (apply_peer_changes porównuje cały stan, więc obejmuje wszystkie zmiany z okna)
+# i powiadamia każde żądanie o wyniku.
+#
+# Przykład użycia:
+#   from modules.sync_scheduler import schedule_sync
+#   summary = schedule_sync("wg0", "/etc/wireguard/wg0.conf")  # czeka na zakończenie
+
+import threading
+import time
+from collections import deque
+
+from modules.peer_apply import apply_peer_changes
+
+try:
+    from settings import SYNC_COALESCE_WINDOW_MS
+except ImportError:
+    SYNC_COALESCE_WINDOW_MS = 200
+
+DEFAULT_TIMEOUT = 60  # Maksymalny czas oczekiwania na synchronizację (w sekundach)
+
+
+class SyncRequest:
+    """Pojedyncze żądanie synchronizacji z informacją o zakończeniu."""
+
+    def __init__(self, nic, config_file):
+        self.nic = nic
+        self.config_file = str(config_file)
+        self.enqueued_at = time.monotonic()
+        self.result = None
+        self.error = None
+        self._done = threading.Event()
+
+    def done(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=DEFAULT_TIMEOUT):
+        """
+        Czeka na zakończenie synchronizacji obejmującej to żądanie.
+        :return: Podsumowanie apply_peer_changes.
+        :raises TimeoutError: Gdy synchronizacja nie zakończyła się w czasie.
+        """
+        if not self._done.wait(timeout):
+            raise TimeoutError(f"Synchronizacja interfejsu {self.nic} nie zakończyła się w ciągu {timeout} s.")
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+    def _complete(self, result=None, error=None):
+        self.result = result
+        self.error = error
+        self._done.set()
+
+
+class SyncScheduler:
+    """Kolejka żądań synchronizacji łączonych w oknie czasowym."""
+
+    def __init__(self, window_ms=None, sync_func=apply_peer_changes):
+        """
+        :param window_ms: Okno koalescencji w milisekundach (domyślnie SYNC_COALESCE_WINDOW_MS).
+        :param sync_func: Funkcja synchronizacji wywoływana jako sync_func(nic, config_file).
+        """
+        self.window = (SYNC_COALESCE_WINDOW_MS if window_ms is None else window_ms) / 1000.0
+        self.sync_func = sync_func
+        self._queue = deque()
+        self._condition = threading.Condition()
+        self._thread = None
+        self._metrics = {
+            "requests": 0,
+            "flushes": 0,
+            "syncs": 0,
+            "coalesced": 0,
+            "errors": 0,
+            "max_queue_depth": 0,
+            "last_flush_latency_ms": 0.0,
+            "max_flush_latency_ms": 0.0,
+            "total_flush_latency_ms": 0.0,
+            "last_wait_ms": 0.0,
+            "max_wait_ms": 0.0,
+        }
+
+    def submit(self, nic, config_file):
+        """
+        Dodaje żądanie do kolejki.
+        :return: Obiekt SyncRequest.
+        """
+        request = SyncRequest(nic, config_file)
+        with self._condition:
+            self._queue.append(request)
+            self._metrics["requests"] += 1
+            self._metrics["max_queue_depth"] = max(self._metrics["max_queue_depth"], len(self._queue))
+            self._ensure_worker()
+            self._condition.notify()
+        return request
+
+    def _ensure_worker(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="wg-sync-scheduler", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._queue:
+                    self._condition.wait()
+                # Zbieraj kolejne żądania do końca okna liczonego od najstarszego
+                deadline = self._queue[0].enqueued_at + self.window
+                while True:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                batch = list(self._queue)
+                self._queue.clear()
+            self._flush(batch)
+
+    def _flush(self, batch):
+        started = time.monotonic()
+        groups = {}
+        for request in batch:
+            groups.setdefault((request.nic, request.config_file), []).append(request)
+
+        errors = 0
+        for (nic, config_file), requests in groups.items():
+            try:
+                result = self.sync_func(nic, config_file)
+                for request in requests:
+                    request._complete(result=result)
+            except Exception as e:
+                errors += 1
+                for request in requests:
+                    request._complete(error=e)
+
+        finished = time.monotonic()
+        latency_ms = (finished - started) * 1000
+        wait_ms = (finished - min(r.enqueued_at for r in batch)) * 1000
+        with self._condition:
+            metrics = self._metrics
+            metrics["flushes"] += 1
+            metrics["syncs"] += len(groups)
+            metrics["coalesced"] += len(batch) - len(groups)
+            metrics["errors"] += errors
+            metrics["last_flush_latency_ms"] = latency_ms
+            metrics["max_flush_latency_ms"] = max(metrics["max_flush_latency_ms"], latency_ms)
+            metrics["total_flush_latency_ms"] += latency_ms
+            metrics["last_wait_ms"] = wait_ms
+            metrics["max_wait_ms"] = max(metrics["max_wait_ms"], wait_ms)
+
+    def get_metrics(self):
+        """
+        Zwraca metryki harmonogramu.
+        :return: Słownik z bieżącą głębokością kolejki, liczbą żądań/flushy i opóźnieniami.
+        """
+        with self._condition:
+            metrics = dict(self._metrics)
+            metrics["queue_depth"] = len(self._queue)
+        total_latency = metrics.pop("total_flush_latency_ms")
+        metrics["avg_flush_latency_ms"] = total_latency / metrics["flushes"] if metrics["flushes"] else 0.0
+        return metrics
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """Zwraca współdzielony harmonogram synchronizacji procesu."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = SyncScheduler()
+        return _scheduler
+
+
+def schedule_sync(nic, config_file, wait=True, timeout=DEFAULT_TIMEOUT):
+    """
+    Zgłasza żądanie synchronizacji interfejsu.
+    :param nic: Nazwa interfejsu WireGuard.
+    :param config_file: Ścieżka do wg0.conf.
+    :param wait: Czy czekać na zakończenie synchronizacji.
+    :return: Podsumowanie synchronizacji (wait=True) lub obiekt SyncRequest.
+    """
+    request = get_scheduler().submit(nic, config_file)
+    if not wait:
+        return request
+    return request.wait(timeout)
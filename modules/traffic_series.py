@@ -0,0 +1,425 @@
+#!/usr/bin/env python3
+# modules/traffic_series.py
+# Szeregi czasowe ruchu peerów WireGuard w zwartym formacie binarnym
+#
+# Każdy peer ma własny plik peers/<id>.bin z rekordami stałej szerokości
+# (16 bajtów, little-endian): czas pomiaru (epoch, u32), ostatni handshake
+# (epoch, u32) oraz przyrosty odebranych i wysłanych bajtów od poprzedniego
+# zapisanego pomiaru (u32). Rekordy są dopisywane w kolejności czasu, więc
+# zapytanie o zakres to np.memmap pliku i dwa wyszukiwania binarne - bez
+# czytania całej historii. Zapisywane są tylko pomiary, w których coś się
+# zmieniło (ruch lub handshake): bezczynny peer nie zajmuje miejsca, a rok
+# pomiarów co minutę w pełni aktywnego peera to ok. 8,4 MB.
+#
+# Liczniki WireGuard zerują się przy restarcie interfejsu - wartość mniejsza
+# od poprzedniej jest traktowana jako nowy licznik liczony od zera. Ostatnie
+# surowe liczniki peerów (last.npy) i mapowanie klucz publiczny -> id
+# (peers.json) przetrwają restart kolektora. Przyrost większy niż zakres u32
+# jest dzielony na kilka rekordów z tym samym czasem.
+#
+# Rollupy: maintain() przyrostowo agreguje nowe surowe rekordy (od zapamiętanego
+# przesunięcia) do kubełków 5 min, 1 h, 1 dzień i miesiąc kalendarzowy (UTC) -
+# suma przyrostów i maksymalna prędkość w B/s - w plikach rollups/<poziom>/<id>.bin,
+# a następnie usuwa dane starsze niż retencja poziomu (TRAFFIC_RETENTION_DAYS).
+# Kompaktowanie zapisuje ogon pliku do nowego pliku i podmienia go przez
+# os.replace - czytelnicy mający otwarty np.memmap dalej widzą stary plik,
+# a dopisywanie pomiarów czeka tylko na samą podmianę.
+#
+# Przykład użycia:
+#   from modules.traffic_series import get_series
+#   series = get_series()
+#   series.append(time.time(), [(public_key, rx_bytes, tx_bytes, latest_handshake)])
+#   data = series.query(public_key, start=time.time() - 86400)  # tablice NumPy
+#   rx, tx = data["rx"].sum(), data["tx"].sum()
+#   series.maintain()                                           # rollupy + retencja
+#   daily = series.query_rollup(public_key, "1d", start=...)  # sumy dzienne
+#
+#   python3 -m modules.traffic_series <klucz_publiczny> [godziny]
+
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np  # type: ignore
+
+RECORD = np.dtype([("t", "<u4"), ("handshake", "<u4"), ("rx", "<u4"), ("tx", "<u4")])
+MAX_DELTA = np.iinfo(np.uint32).max
+ROLLUP = np.dtype([("start", "<u4"), ("rx", "<u8"), ("tx", "<u8"), ("max_rx_rate", "<f4"), ("max_tx_rate", "<f4")])
+TIERS = {"5m": 300, "1h": 3600, "1d": 86400, "1mo": None}  # Poziomy rollupów: długość kubełka (None - miesiąc kalendarzowy)
+INDEX_FILE = "peers.json"
+STATE_FILE = "last.npy"
+ROLLUP_STATE_FILE = "rollup_state.npy"
+PEERS_DIR = "peers"
+ROLLUPS_DIR = "rollups"
+DEFAULT_RETENTION_DAYS = {"raw": 7, "5m": 35, "1h": 400, "1d": 1830, "1mo": None}
+DEFAULT_SAMPLE_INTERVAL = 30
+
+
+def _atomic_replace(path, write):
+    """Zapisuje plik atomowo: write(plik) do pliku tymczasowego i os.replace."""
+    directory = os.path.dirname(path) or "."
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".series_")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            write(f)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _empty(dtype=RECORD):
+    return {name: np.empty(0, dtype=dtype[name]) for name in dtype.names}
+
+
+def _settings_value(name, default):
+    try:
+        import settings
+        return getattr(settings, name, default)
+    except ImportError:
+        return default
+
+
+def bucket_starts(times, tier):
+    """Zwraca początki kubełków poziomu dla tablicy czasów (epoch)."""
+    times = np.asarray(times, dtype=np.int64)
+    size = TIERS[tier]
+    if size is None:
+        months = times.astype("datetime64[s]").astype("datetime64[M]")
+        return months.astype("datetime64[s]").astype(np.int64)
+    return times - times % size
+
+
+def aggregate(records, previous_t, sample_interval, tier):
+    """
+    Agreguje surowe rekordy do kubełków poziomu.
+    Prędkość rekordu to przyrost podzielony przez odstęp od poprzedniego pomiaru,
+    ograniczony do nominalnego odstępu próbkowania (bezczynność nie zaniża prędkości).
+    :param previous_t: Czas rekordu poprzedzającego (0 - brak).
+    :return: Tablica rekordów ROLLUP.
+    """
+    if len(records) == 0:
+        return np.empty(0, dtype=ROLLUP)
+    times = records["t"].astype(np.int64)
+    gaps = np.diff(times, prepend=previous_t or times[0] - sample_interval)
+    gaps = np.clip(gaps, 1, sample_interval).astype(np.float64)
+    starts = bucket_starts(times, tier)
+    first = np.flatnonzero(np.r_[True, starts[1:] != starts[:-1]])
+    result = np.empty(len(first), dtype=ROLLUP)
+    result["start"] = starts[first]
+    result["rx"] = np.add.reduceat(records["rx"].astype(np.uint64), first)
+    result["tx"] = np.add.reduceat(records["tx"].astype(np.uint64), first)
+    result["max_rx_rate"] = np.maximum.reduceat(records["rx"] / gaps, first)
+    result["max_tx_rate"] = np.maximum.reduceat(records["tx"] / gaps, first)
+    return result
+
+
+def merge_bucket(existing, new):
+    """Łączy dwa rekordy tego samego kubełka."""
+    merged = existing.copy()
+    merged["rx"] = existing["rx"] + new["rx"]
+    merged["tx"] = existing["tx"] + new["tx"]
+    merged["max_rx_rate"] = max(existing["max_rx_rate"], new["max_rx_rate"])
+    merged["max_tx_rate"] = max(existing["max_tx_rate"], new["max_tx_rate"])
+    return merged
+
+
+def _read_array(path, dtype):
+    """Zwraca rekordy pliku jako np.memmap (tylko do odczytu) lub None dla pustego/brakującego pliku."""
+    try:
+        count = os.path.getsize(path) // dtype.itemsize  # Niepełny rekord (przerwany zapis) jest pomijany
+    except FileNotFoundError:
+        return None
+    if count == 0:
+        return None
+    return np.memmap(path, dtype=dtype, mode="r", shape=(count,))
+
+
+class TrafficSeries:
+    """Katalog szeregów czasowych ruchu (jeden plik rekordów na peera)."""
+
+    def __init__(self, directory):
+        self.directory = str(directory)
+        self.peers_dir = os.path.join(self.directory, PEERS_DIR)
+        os.makedirs(self.peers_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._maintenance_lock = threading.Lock()
+        try:
+            with open(os.path.join(self.directory, INDEX_FILE), "r", encoding="utf-8") as f:
+                self._index = json.load(f)
+        except FileNotFoundError:
+            self._index = {}
+        try:
+            self._last = np.load(os.path.join(self.directory, STATE_FILE))
+        except FileNotFoundError:
+            self._last = np.zeros((0, 3), dtype=np.uint64)
+        # Peery bez zapisanego stanu (np. indeks zapisany, stan nie) zaczynają od punktu odniesienia
+        self._known = np.zeros(max(len(self._index), len(self._last)), dtype=bool)
+        self._known[:len(self._last)] = True
+
+    def _path(self, peer_id):
+        return os.path.join(self.peers_dir, f"{peer_id}.bin")
+
+    def peers(self):
+        """Zwraca klucze publiczne peerów z zapisaną historią."""
+        return list(self._index)
+
+    def _peer_id(self, public_key):
+        peer_id = self._index.get(public_key)
+        if peer_id is None:
+            peer_id = self._index[public_key] = len(self._index)
+        if peer_id >= len(self._last):
+            grown = np.zeros((peer_id + 1, 3), dtype=np.uint64)
+            grown[:len(self._last)] = self._last
+            self._last = grown
+            self._known = np.concatenate([self._known, np.zeros(peer_id + 1 - len(self._known), dtype=bool)])
+        return peer_id
+
+    def append(self, timestamp, samples):
+        """
+        Zapisuje jeden pomiar.
+        :param timestamp: Czas pomiaru (epoch w sekundach).
+        :param samples: Iterowalna kolekcja (klucz_publiczny, rx_bytes, tx_bytes, latest_handshake)
+                        z surowymi licznikami WireGuard.
+        :return: Liczba dopisanych rekordów.
+        """
+        t = int(timestamp)
+        written = 0
+        with self._lock:
+            peers_before = len(self._index)
+            for public_key, rx, tx, handshake in samples:
+                peer_id = self._peer_id(public_key)
+                rx, tx, handshake = int(rx), int(tx), int(handshake or 0)
+                last_rx, last_tx, last_handshake = (int(value) for value in self._last[peer_id])
+                known = self._known[peer_id]
+                self._last[peer_id] = (rx, tx, handshake)
+                self._known[peer_id] = True
+                if not known:
+                    continue  # Pierwszy pomiar peera to tylko punkt odniesienia liczników
+                # Licznik mniejszy od poprzedniego: restart interfejsu, liczymy od zera
+                delta_rx = rx - last_rx if rx >= last_rx else rx
+                delta_tx = tx - last_tx if tx >= last_tx else tx
+                if not delta_rx and not delta_tx and handshake == last_handshake:
+                    continue
+                records = []
+                while True:
+                    records.append((t, handshake, min(delta_rx, MAX_DELTA), min(delta_tx, MAX_DELTA)))
+                    delta_rx = max(0, delta_rx - MAX_DELTA)
+                    delta_tx = max(0, delta_tx - MAX_DELTA)
+                    if not delta_rx and not delta_tx:
+                        break
+                with open(self._path(peer_id), "ab") as f:
+                    f.write(np.array(records, dtype=RECORD).tobytes())
+                written += len(records)
+            if len(self._index) != peers_before:
+                index = json.dumps(self._index).encode("utf-8")
+                _atomic_replace(os.path.join(self.directory, INDEX_FILE), lambda f: f.write(index))
+            state = self._last.copy()
+            _atomic_replace(os.path.join(self.directory, STATE_FILE), lambda f: np.save(f, state))
+        return written
+
+    def _records(self, public_key):
+        """Zwraca rekordy peera jako np.memmap (tylko do odczytu) lub None."""
+        peer_id = self._index.get(public_key)
+        if peer_id is None:
+            return None
+        return _read_array(self._path(peer_id), RECORD)
+
+    def query(self, public_key, start=None, end=None):
+        """
+        Zwraca rekordy peera z zakresu czasu [start, end).
+        :return: Słownik tablic NumPy {"t", "handshake", "rx", "tx"} (rx/tx to przyrosty bajtów).
+        """
+        records = self._records(public_key)
+        if records is None:
+            return _empty()
+        times = records["t"]
+        first = 0 if start is None else int(np.searchsorted(times, int(start), side="left"))
+        last = len(records) if end is None else int(np.searchsorted(times, int(end), side="left"))
+        selected = np.array(records[first:last])
+        return {name: selected[name] for name in RECORD.names}
+
+    def totals(self, public_key, start=None, end=None):
+        """Zwraca sumę (odebrane, wysłane) bajtów peera w zakresie czasu."""
+        data = self.query(public_key, start, end)
+        return int(data["rx"].sum(dtype=np.uint64)), int(data["tx"].sum(dtype=np.uint64))
+
+
+    # --- Rollupy i retencja ---
+
+    def _rollup_path(self, tier, peer_id):
+        return os.path.join(self.directory, ROLLUPS_DIR, tier, f"{peer_id}.bin")
+
+    def _load_rollup_state(self, count):
+        """Zwraca tablicę (count, 2): [liczba przetworzonych rekordów surowych, czas ostatniego z nich]."""
+        try:
+            state = np.load(os.path.join(self.directory, ROLLUP_STATE_FILE))
+        except FileNotFoundError:
+            state = np.zeros((0, 2), dtype=np.int64)
+        if len(state) < count:
+            state = np.concatenate([state, np.zeros((count - len(state), 2), dtype=np.int64)])
+        return state
+
+    def rollup(self, sample_interval=None):
+        """
+        Przyrostowo agreguje nowe surowe rekordy wszystkich peerów do poziomów TIERS.
+        Ostatni (otwarty) kubełek pliku rollupu jest aktualizowany w miejscu.
+        :return: Liczba przetworzonych rekordów surowych.
+        """
+        sample_interval = sample_interval or _settings_value("STATS_INTERVAL", DEFAULT_SAMPLE_INTERVAL)
+        processed = 0
+        with self._maintenance_lock:
+            with self._lock:
+                peer_ids = sorted(self._index.values())
+            state = self._load_rollup_state(len(peer_ids))
+            for peer_id in peer_ids:
+                records = _read_array(self._path(peer_id), RECORD)
+                consumed, previous_t = (int(value) for value in state[peer_id])
+                if records is None or len(records) <= consumed:
+                    continue
+                new = np.array(records[consumed:])
+                for tier in TIERS:
+                    self._append_rollup(tier, peer_id, aggregate(new, previous_t, sample_interval, tier))
+                state[peer_id] = (len(records), int(new["t"][-1]))
+                processed += len(new)
+            _atomic_replace(os.path.join(self.directory, ROLLUP_STATE_FILE), lambda f: np.save(f, state))
+        return processed
+
+    def _append_rollup(self, tier, peer_id, buckets):
+        if len(buckets) == 0:
+            return
+        path = self._rollup_path(tier, peer_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        existing = _read_array(path, ROLLUP)
+        with open(path, "r+b" if existing is not None else "ab") as f:
+            if existing is not None:
+                f.seek(0, os.SEEK_END)
+                if existing[-1]["start"] == buckets[0]["start"]:
+                    f.seek((len(existing) - 1) * ROLLUP.itemsize)
+                    buckets = buckets.copy()
+                    buckets[0] = merge_bucket(np.array(existing[-1]), buckets[0])
+                del existing
+            f.write(buckets.tobytes())
+
+    def _truncate_head(self, path, dtype, keep_from, lock=None):
+        """
+        Usuwa rekordy sprzed indeksu keep_from: ogon trafia do nowego pliku podmienianego
+        przez os.replace. Z podanym lock kopiowanie dopisanych w międzyczasie rekordów
+        i podmiana odbywają się pod blokadą zapisu.
+        """
+        if keep_from <= 0:
+            return
+        with open(path, "rb") as source:
+            source.seek(keep_from * dtype.itemsize)
+            tail = source.read()
+            tail = tail[:len(tail) - len(tail) % dtype.itemsize]
+            source.seek(keep_from * dtype.itemsize + len(tail))
+            directory = os.path.dirname(path)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".series_")
+            try:
+                with os.fdopen(fd, "wb") as target:
+                    target.write(tail)
+                    if lock is not None:
+                        lock.acquire()
+                    try:
+                        target.write(source.read())  # Rekordy dopisane podczas kopiowania
+                        target.flush()
+                        os.replace(tmp_path, path)
+                    finally:
+                        if lock is not None:
+                            lock.release()
+            except Exception:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+
+    def compact(self, now=None, retention_days=None):
+        """
+        Usuwa dane starsze niż retencja poziomu (dni; None - bez limitu). Surowe rekordy
+        są usuwane dopiero po przetworzeniu przez rollup().
+        :return: Liczba usuniętych rekordów (wszystkie poziomy).
+        """
+        now = int(time.time() if now is None else now)
+        retention = dict(DEFAULT_RETENTION_DAYS)
+        retention.update(retention_days or _settings_value("TRAFFIC_RETENTION_DAYS", {}))
+        removed = 0
+        with self._maintenance_lock:
+            with self._lock:
+                peer_ids = sorted(self._index.values())
+            state = self._load_rollup_state(len(peer_ids))
+            for peer_id in peer_ids:
+                if retention.get("raw") is not None:
+                    records = _read_array(self._path(peer_id), RECORD)
+                    if records is not None:
+                        cutoff = now - int(retention["raw"] * 86400)
+                        drop = min(int(np.searchsorted(records["t"], cutoff)), int(state[peer_id][0]))
+                        del records
+                        self._truncate_head(self._path(peer_id), RECORD, drop, self._lock)
+                        state[peer_id][0] -= drop
+                        removed += drop
+                for tier in TIERS:
+                    if retention.get(tier) is None:
+                        continue
+                    path = self._rollup_path(tier, peer_id)
+                    buckets = _read_array(path, ROLLUP)
+                    if buckets is None:
+                        continue
+                    drop = int(np.searchsorted(buckets["start"], now - int(retention[tier] * 86400)))
+                    del buckets
+                    self._truncate_head(path, ROLLUP, drop)
+                    removed += drop
+            _atomic_replace(os.path.join(self.directory, ROLLUP_STATE_FILE), lambda f: np.save(f, state))
+        return removed
+
+    def maintain(self, now=None):
+        """Rollup nowych rekordów, a potem retencja. :return: (przetworzone, usunięte)."""
+        return self.rollup(), self.compact(now)
+
+    def query_rollup(self, public_key, tier, start=None, end=None):
+        """
+        Zwraca kubełki poziomu z zakresu [start, end) (po początku kubełka).
+        :return: Słownik tablic NumPy {"start", "rx", "tx", "max_rx_rate", "max_tx_rate"}.
+        """
+        if tier not in TIERS:
+            raise ValueError(f"Nieznany poziom rollupu: {tier}. Dostępne: {', '.join(TIERS)}")
+        peer_id = self._index.get(public_key)
+        buckets = _read_array(self._rollup_path(tier, peer_id), ROLLUP) if peer_id is not None else None
+        if buckets is None:
+            return _empty(ROLLUP)
+        starts = buckets["start"]
+        first = 0 if start is None else int(np.searchsorted(starts, int(start), side="left"))
+        last = len(buckets) if end is None else int(np.searchsorted(starts, int(end), side="left"))
+        selected = np.array(buckets[first:last])
+        return {name: selected[name] for name in ROLLUP.names}
+
+
+_series = {}
+_series_lock = threading.Lock()
+
+
+def get_series(directory=None):
+    """Zwraca współdzielony magazyn szeregów (domyślnie settings.TRAFFIC_SERIES_DIR)."""
+    if directory is None:
+        import settings
+        directory = settings.TRAFFIC_SERIES_DIR
+    directory = os.path.abspath(str(directory))
+    with _series_lock:
+        if directory not in _series:
+            _series[directory] = TrafficSeries(directory)
+        return _series[directory]
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Użycie: python3 -m modules.traffic_series <klucz_publiczny> [godziny]")
+        sys.exit(1)
+    hours = float(sys.argv[2]) if len(sys.argv) > 2 else 24
+    series = get_series()
+    started = time.perf_counter()
+    rx, tx = series.totals(sys.argv[1], start=time.time() - hours * 3600)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    print(f"Ostatnie {hours:g} h: odebrano {rx} B, wysłano {tx} B ({elapsed_ms:.1f} ms)")
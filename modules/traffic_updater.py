@@ -1,49 +1,49 @@
 #!/usr/bin/env python3
 # modules/traffic_updater.py
 
-import json
 import os
-import subprocess
 from settings import SERVER_WG_NIC  # Import interfejsu WireGuard z ustawień
 from settings import USER_DB_PATH
+from modules.user_store import open_user_store  # Magazyn rekordów (JSON lub SQLite)
+from modules.wg_snapshot import get_snapshot  # Współdzielony odczyt `wg show all dump`
 
-def update_traffic_data(user_records_path):
+def traffic_updates(peers, index):
     """
-    Aktualizuje dane o ruchu użytkowników, zapisując te same wartości dla transfer i total_transfer w user_records.json.
+    Zwraca zmiany rekordów z licznikami ruchu peerów (bez zapisu).
+    :param peers: Słownik {klucz_publiczny: WgPeer} z migawki interfejsu.
+    :param index: Indeks {klucz_publiczny: nazwa} magazynu użytkowników.
+    :return: Słownik {nazwa: {"transfer", "total_transfer"}}.
     """
-    if not os.path.exists(USER_DB_PATH):
-        print(f"Plik {USER_DB_PATH} nie istnieje.")
+    updates = {}
+    for public_key, peer in peers.items():
+        # Znajdź użytkownika po kluczu publicznym
+        username = index.get(public_key)
+        if username:
+            transfer_str = f"{peer.rx_bytes / (1024 ** 2):.2f} MiB odebrano, {peer.tx_bytes / (1024 ** 2):.2f} MiB wysłano"
+            updates[username] = {
+                "transfer": transfer_str,
+                "total_transfer": transfer_str,  # Powtórz wartość
+            }
+    return updates
+
+def update_traffic_data(user_records_path=USER_DB_PATH):
+    """
+    Aktualizuje dane o ruchu użytkowników, zapisując te same wartości dla transfer i total_transfer.
+    Zmienione rekordy są zapisywane w jednej transakcji magazynu użytkowników.
+    """
+    store = open_user_store(user_records_path)
+    if store.count() == 0 and not os.path.exists(user_records_path):
+        print(f"Plik {user_records_path} nie istnieje.")
         return
 
-    # Wczytaj dane użytkowników
-    with open(USER_DB_PATH, "r") as f:
-        user_records = json.load(f)
-
     try:
-        # Pobierz dane o ruchu z WireGuard
-        output = subprocess.check_output(["wg", "show", SERVER_WG_NIC, "transfer"], text=True)
-        lines = output.strip().split("\n")
+        # Pobierz dane o ruchu z migawki WireGuard
+        peers = get_snapshot().peers_of(SERVER_WG_NIC)
 
-        for line in lines:
-            parts = line.split()
-            if len(parts) >= 3:
-                public_key = parts[0]
-                received = int(parts[1])  # Aktualne odebrane dane
-                sent = int(parts[2])
-
-                # Znajdź użytkownika po kluczu publicznym
-                for username, user_data in user_records.items():
-                    if user_data.get("public_key") == public_key:
-                        # Aktualizuj pole transfer
-                        transfer_str = f"{received / (1024 ** 2):.2f} MiB odebrano, {sent / (1024 ** 2):.2f} MiB wysłano"
-                        user_data["transfer"] = transfer_str
-                        user_data["total_transfer"] = transfer_str  # Powtórz wartość
-                        break
+        # Jedna transakcja: wyszukiwanie w indeksie kluczy i zapis zmienionych rekordów
+        with store.batch():
+            store.update_many(traffic_updates(peers, store.public_key_index()))
 
     except Exception as e:
         print(f"Błąd aktualizacji danych o ruchu: {e}")
         return
-
-    # Zapisz zaktualizowane dane
-    with open(USER_DB_PATH, "w") as f:
-        json.dump(user_records, f, indent=4)
@@ -11,6 +11,9 @@ import os
 import subprocess
 import json
 from datetime import datetime
+from modules.user_store import open_user_store
+from modules.wg_snapshot import get_snapshot
+from modules.server_config import load_server_config
 
 # Ścieżki do plików
 WG_CONFIG_PATH = "/etc/wireguard/wg0.conf"
@@ -18,60 +21,37 @@ JSON_LOG_PATH = "/root/pyWGgenerator/pyWGgen/logs/wg_users.json"
 TEXT_LOG_PATH = "/root/pyWGgenerator/pyWGgen/logs/wg_activity.log"
 
 def parse_wg_show():
-    """Odczytuje i parsuje wynik polecenia `wg show`."""
+    """Odczytuje dane peerów ze współdzielonej migawki `wg show all dump`."""
     try:
-        output = subprocess.check_output(["wg"], text=True)
-    except subprocess.CalledProcessError as e:
+        snapshot = get_snapshot()
+    except (subprocess.CalledProcessError, FileNotFoundError) as e:
         print(f"Błąd uruchamiania `wg`: {e}")
         return None
 
     peers = {}
-    current_peer = None
-
-    for line in output.splitlines():
-        if line.startswith("peer:"):
-            current_peer = line.split(":")[1].strip()
-            peers[current_peer] = {"transfer": {"received": 0, "sent": 0}, "latest_handshake": None}
-        elif line.strip().startswith("transfer:"):
-            parts = line.strip().split(",")
-            received = parts[0].split()[1]
-            sent = parts[1].split()[1]
-            peers[current_peer]["transfer"] = {"received": received, "sent": sent}
-        elif line.strip().startswith("latest handshake:"):
-            handshake = line.split(":")[1].strip()
-            peers[current_peer]["latest_handshake"] = handshake
-
+    for public_key, peer in snapshot.peers().items():
+        peers[public_key] = {
+            # Dokładne wartości w bajtach (parse_size obsługuje jednostkę "B")
+            "transfer": {"received": f"{peer.rx_bytes} B", "sent": f"{peer.tx_bytes} B"},
+            "latest_handshake": datetime.utcfromtimestamp(peer.latest_handshake).strftime("%Y-%m-%d %H:%M:%S UTC")
+            if peer.latest_handshake else None,
+            "endpoint": peer.endpoint,
+        }
     return peers
 
 def parse_wg_conf():
     """Odczytuje konfigurację WireGuard do mapowania użytkowników."""
     try:
-        with open(WG_CONFIG_PATH, "r") as f:
-            config = f.read()
+        config = load_server_config(WG_CONFIG_PATH)
     except FileNotFoundError:
         print(f"Plik {WG_CONFIG_PATH} nie znaleziony.")
         return None
 
-    users = {}
-    current_peer = None
-
-    for line in config.splitlines():
-        if line.strip().startswith("[Peer]"):
-            current_peer = None
-        elif line.strip().startswith("PublicKey ="):
-            current_peer = line.split("=")[1].strip()
-            users[current_peer] = {"username": None, "allowed_ips": None}
-        elif line.strip().startswith("#"):
-            if current_peer:
-                username = line.strip("#").strip()
-                if username.startswith("Client "):
-                    username = username.replace("Client ", "", 1)
-                users[current_peer]["username"] = username
-        elif line.strip().startswith("AllowedIPs ="):
-            if current_peer:
-                users[current_peer]["allowed_ips"] = line.split("=")[1].strip()
-
-    return users
+    return {
+        peer.public_key: {"username": peer.name, "allowed_ips": peer.allowed_ips}
+        for peer in config.peers(include_disabled=False)
+        if peer.public_key
+    }
 
 def update_data():
     """Aktualizuje logi JSON i tekstowe na podstawie aktualnych danych `wg`."""
@@ -88,8 +68,15 @@ def update_data():
     else:
         history = {"users": {}}
 
+    # Nazwy użytkowników z indeksu kluczy publicznych magazynu (komentarz w wg0.conf jako zapas)
+    try:
+        index = open_user_store().public_key_index()
+    except Exception as e:
+        print(f"⚠️ Nie udało się wczytać indeksu użytkowników: {e}")
+        index = {}
+
     for peer, data in wg_conf.items():
-        username = data["username"]
+        username = index.get(peer) or data["username"]
         allowed_ips = data["allowed_ips"]
         transfer = wg_show.get(peer, {}).get("transfer", {"received": "0 B", "sent": "0 B"})
         latest_handshake = wg_show.get(peer, {}).get("latest_handshake", None)
@@ -4,12 +4,15 @@
 
 import os
 import shutil
-import subprocess
 from settings import SERVER_WG_NIC  # SERVER_WG_NIC z pliku parametrów
 from settings import USER_DB_PATH  # Baza danych użytkowników
 from settings import SERVER_CONFIG_FILE
 from settings import SERVER_BACKUP_CONFIG_FILE
-from settings import WG_CONFIG_DIR, QR_CODE_DIR
+from settings import WG_CONFIG_DIR, QR_CODE_DIR, IP_POOL_PATH
+from modules.sync_scheduler import schedule_sync
+from modules.server_config import clear_server_peers
+from modules.user_store import open_user_store
+from modules.ip_allocator import reset_ip_pool
 
 WG_USERS_JSON = "logs/wg_users.json"
 
@@ -26,10 +29,12 @@ def confirm_action(message):
 def clean_user_data():
     """Selektywne czyszczenie danych użytkowników z potwierdzeniem."""
     try:
-        # Czyszczenie user_records.json
-        if os.path.exists(USER_DB_PATH) and confirm_action("🧹 Wyczyścić plik user_records.json?"):
-            os.remove(USER_DB_PATH)
-            print(f"✅ {USER_DB_PATH} wyczyszczony.")
+        # Czyszczenie rekordów użytkowników (user_records.json lub baza SQLite)
+        store = open_user_store(USER_DB_PATH)
+        if (store.count() or os.path.exists(USER_DB_PATH)) and confirm_action("🧹 Wyczyścić rekordy użytkowników (user_records.json)?"):
+            store.replace_all({})
+            reset_ip_pool(IP_POOL_PATH)  # Pula zostanie odbudowana z wg0.conf przy następnym przydziale
+            print(f"✅ Rekordy użytkowników ({USER_DB_PATH}) wyczyszczone.")
 
         # Czyszczenie wg_users.json
         if os.path.exists(WG_USERS_JSON) and confirm_action("🧹 Wyczyścić plik wg_users.json?"):
@@ -42,27 +47,9 @@ def clean_user_data():
             shutil.copy2(SERVER_CONFIG_FILE, SERVER_BACKUP_CONFIG_FILE)
             print(f"✅ Utworzono kopię zapasową: {SERVER_BACKUP_CONFIG_FILE}")
 
-            # Wyczyść konfigurację
-            with open(SERVER_CONFIG_FILE, "r") as wg_file:
-                lines = wg_file.readlines()
-
-            # Nowa zawartość bez bloków ### Client i powiązanych [Peer]
-            cleaned_lines = []
-            inside_client_block = False
-
-            for line in lines:
-                stripped_line = line.strip()
-                if stripped_line.startswith("### Client"):
-                    inside_client_block = True
-                elif inside_client_block and stripped_line == "":
-                    # Koniec bloku, przełącz flagę
-                    inside_client_block = False
-                elif not inside_client_block:
-                    cleaned_lines.append(line)
-
-            with open(SERVER_CONFIG_FILE, "w") as wg_file:
-                wg_file.writelines(cleaned_lines)
-            print(f"✅ Konfiguracja WireGuard wyczyszczona.")
+            # Wyczyść konfigurację: usuń bloki ### Client/[Peer], zachowaj [Interface]
+            removed = clear_server_peers(SERVER_CONFIG_FILE, IP_POOL_PATH)
+            print(f"✅ Konfiguracja WireGuard wyczyszczona (usunięto bloków [Peer]: {removed}).")
 
         # Czyszczenie plików konfiguracyjnych użytkowników
         if os.path.exists(WG_CONFIG_DIR) and confirm_action("🧹 Wyczyścić wszystkie pliki konfiguracyjne użytkowników?"):
@@ -80,10 +67,8 @@ def clean_user_data():
                     os.remove(file_path)
             print(f"✅ Kody QR użytkowników w {QR_CODE_DIR} wyczyszczone.")
 
-        # Synchronizacja WireGuard
-        sync_command = f'wg syncconf "{SERVER_WG_NIC}" <(wg-quick strip "{SERVER_WG_NIC}")'
-        subprocess.run(sync_command, shell=True, check=True, executable='/bin/bash')
-        print(f"WireGuard zsynchronizowany dla interfejsu {SERVER_WG_NIC}")
+        # Synchronizacja WireGuard (usunięcie peerów nieobecnych w konfiguracji)
+        schedule_sync(SERVER_WG_NIC, SERVER_CONFIG_FILE)
 
         print("🎉 Czyszczenie zakończone. Wszystkie dane przetworzone.")
 
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# modules/user_service.py
+# Tworzenie użytkowników WireGuard w bieżącym procesie (Gradio i menu konsolowe)
+#
+# Zamiast uruchamiać `python3 main.py <nazwa>` przy każdym kliknięciu, usługa
+# wywołuje funkcje main.py bezpośrednio. Parametry serwera są wczytywane raz
+# i odświeżane tylko po zmianie pliku params. Zmiany plików (przydział IP,
+# wg0.conf, user_records.json) są serializowane blokadą, a synchronizacja
+# interfejsu i oczekiwanie na kod QR odbywają się poza nią, dzięki czemu
+# równoczesne wywołania z wątków Gradio łączą się w jedną synchronizację.
+#
+# Przykład użycia:
+#   from modules.user_service import create_user
+#   result = create_user("jan", "jan@example.com")
+#   if result["success"]:
+#       print(result["config_path"], result["qr_path"], result["ip"], result["timings"])
+
+import os
+import threading
+import time
+
+import main
+import settings
+from modules.config import load_params
+from modules.directory_setup import setup_directories
+
+QR_WAIT_TIMEOUT = 30  # Maksymalny czas oczekiwania na kod QR (w sekundach)
+
+_create_lock = threading.Lock()
+_params_lock = threading.Lock()
+_params_cache = {"key": None, "params": None}
+_directories_ready = False
+
+
+def get_params(params_file=None):
+    """
+    Zwraca parametry serwera z pamięci podręcznej (odświeżane po zmianie pliku).
+    :param params_file: Ścieżka do pliku params (domyślnie settings.PARAMS_FILE).
+    """
+    params_file = str(params_file or settings.PARAMS_FILE)
+    stat = os.stat(params_file)
+    key = (params_file, stat.st_mtime_ns, stat.st_size)
+    with _params_lock:
+        if _params_cache["key"] != key:
+            _params_cache["params"] = load_params(params_file)
+            _params_cache["key"] = key
+        return _params_cache["params"]
+
+
+def _ensure_directories():
+    global _directories_ready
+    if not _directories_ready:
+        setup_directories()
+        _directories_ready = True
+
+
+def _result(username, success, message, **fields):
+    result = {
+        "success": success,
+        "username": username,
+        "message": message,
+        "config_path": None,
+        "qr_path": None,
+        "ip": None,
+        "timings": {},
+    }
+    result.update(fields)
+    return result
+
+
+def create_user(username, email="N/A", telegram_id="N/A", wait_for_qr=True):
+    """
+    Tworzy użytkownika WireGuard.
+    :param username: Nazwa użytkownika.
+    :param email: Adres email (opcjonalnie).
+    :param telegram_id: ID Telegram (opcjonalnie).
+    :param wait_for_qr: Czy czekać na wygenerowanie kodu QR przed zwróceniem wyniku.
+    :return: Słownik {"success", "username", "message", "config_path", "qr_path", "ip", "timings"}.
+             timings zawiera czasy w ms: "create", "sync", "qr", "total".
+    """
+    username = (username or "").strip()
+    if not username:
+        return _result(username, False, "Błąd: Nazwa użytkownika nie może być pusta.")
+
+    started = time.perf_counter()
+    timings = {}
+    try:
+        params = get_params()
+        config_file = settings.SERVER_CONFIG_FILE
+
+        with _create_lock:
+            _ensure_directories()
+            if username.lower() in main.load_existing_users() or \
+                    username.lower() in main.load_server_config_names(config_file):
+                return _result(username, False, f"Błąd: Użytkownik '{username}' już istnieje!")
+            entry = main.create_user_entry(username, params, config_file, email or "N/A", telegram_id or "N/A")
+    except Exception as e:
+        return _result(username, False, f"Błąd: {e}", timings=timings)
+    timings["create"] = (time.perf_counter() - started) * 1000
+    message = f"✅ Użytkownik {username} pomyślnie utworzony."
+
+    # Użytkownik jest już zapisany - błąd synchronizacji nie cofa jego utworzenia
+    step = time.perf_counter()
+    try:
+        main.sync_wireguard(main.get_server_wg_nic())
+    except Exception as e:
+        message = f"⚠️ Użytkownik {username} utworzony, ale synchronizacja WireGuard nie powiodła się: {e}"
+    timings["sync"] = (time.perf_counter() - step) * 1000
+
+    qr_path = entry["qr_path"]
+    if wait_for_qr:
+        step = time.perf_counter()
+        try:
+            entry["qr_future"].result(timeout=QR_WAIT_TIMEOUT)
+        except Exception as e:
+            print(f"⚠️ Kod QR użytkownika {username} nie został wygenerowany: {e}")
+            qr_path = None
+        timings["qr"] = (time.perf_counter() - step) * 1000
+
+    timings["total"] = (time.perf_counter() - started) * 1000
+    return _result(
+        username,
+        True,
+        message,
+        config_path=entry["config_path"],
+        qr_path=qr_path,
+        ip=entry["ip"],
+        timings=timings,
+    )
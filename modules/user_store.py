@@ -0,0 +1,478 @@
+#!/usr/bin/env python3
+# modules/user_store.py
+# Magazyn rekordów użytkowników (JSON lub SQLite)
+#
+# Backend "json" zachowuje dotychczasowy plik user_records.json (każda zmiana
+# zapisuje cały plik). Backend "sqlite" przechowuje każdy rekord w osobnym wierszu
+# bazy w trybie WAL, z indeksami na username (bez rozróżniania wielkości liter),
+# public_key, user_id, status i expires_at - aktualizacja jednego użytkownika
+# zapisuje jeden wiersz, a aktualizacje wielu użytkowników jedną transakcję.
+# Backend wybiera USER_STORE_BACKEND w settings.py.
+#
+# Przykład użycia:
+#   from modules.user_store import open_user_store
+#   store = open_user_store()
+#   store.update("jan", {"status": "blocked"})
+#   with store.batch():
+#       for username, fields in updates.items():
+#           store.update(username, fields)
+#
+# Migracja:
+#   python3 -m modules.user_store import [user_records.json]   # JSON -> SQLite
+#   python3 -m modules.user_store export [user_records.json]   # SQLite -> JSON
+
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+from contextlib import contextmanager
+
+from modules.file_lock import file_lock
+
+BACKENDS = ("json", "sqlite")
+INDEXED_FIELDS = ("public_key", "user_id", "status", "expires_at")
+
+
+def _settings():
+    """Zwraca moduł settings (odczyt przy wywołaniu, nie przy imporcie)."""
+    import settings
+    return settings
+
+
+class UserStore:
+    """Wspólny interfejs magazynu rekordów {nazwa_użytkownika: rekord}."""
+
+    def all(self):
+        """Zwraca wszystkie rekordy jako słownik."""
+        raise NotImplementedError
+
+    def get(self, username):
+        """Zwraca rekord użytkownika lub None."""
+        return self.all().get(username)
+
+    def exists(self, username):
+        """Sprawdza istnienie użytkownika (bez rozróżniania wielkości liter)."""
+        return username.lower() in {name.lower() for name in self.all()}
+
+    def public_key_index(self):
+        """
+        Zwraca indeks {public_key: nazwa_użytkownika}.
+        Uzgadnianie stanu z `wg show` wyszukuje w nim peerów w czasie stałym.
+        """
+        return build_public_key_index(self.all())
+
+    def find_by_public_key(self, public_key):
+        """Zwraca krotkę (nazwa, rekord) dla klucza publicznego lub None."""
+        username = self.public_key_index().get(public_key)
+        if username is None:
+            return None
+        return username, self.get(username)
+
+    def count(self):
+        return len(self.all())
+
+    def put(self, username, record):
+        """Dodaje lub zastępuje rekord użytkownika."""
+        self.put_many({username: record})
+
+    def put_many(self, records):
+        raise NotImplementedError
+
+    def update(self, username, fields):
+        """
+        Aktualizuje wybrane pola jednego użytkownika.
+        :return: True jeśli użytkownik istnieje.
+        """
+        return self.update_many({username: fields}) == 1
+
+    def update_many(self, updates):
+        """
+        Aktualizuje pola wielu użytkowników w jednej operacji.
+        :param updates: Słownik {nazwa_użytkownika: {pole: wartość}}.
+        :return: Liczba zaktualizowanych użytkowników.
+        """
+        raise NotImplementedError
+
+    def delete(self, username):
+        """Usuwa użytkownika. :return: Usunięty rekord lub None."""
+        raise NotImplementedError
+
+    def replace_all(self, records):
+        """Zastępuje całą zawartość magazynu."""
+        raise NotImplementedError
+
+    @contextmanager
+    def batch(self):
+        """Grupuje operacje w jedną transakcję/jeden zapis."""
+        yield self
+
+
+def build_public_key_index(records):
+    """Buduje indeks {public_key: nazwa_użytkownika} z rekordów."""
+    return {record["public_key"]: username for username, record in records.items() if record.get("public_key")}
+
+
+class JsonUserStore(UserStore):
+    """
+    Dotychczasowy plik user_records.json (każdy zapis przepisuje cały plik).
+    Zapis jest atomowy (plik tymczasowy + os.replace), a każdy odczyt-modyfikacja-zapis
+    odbywa się pod blokadą file_lock, wspólną dla panelu, menu i usługi statystyk.
+    Indeks kluczy publicznych jest utrzymywany przyrostowo przy zapisach przez magazyn
+    i budowany od nowa tylko po zmianie pliku przez inny proces.
+    """
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._lock = threading.RLock()
+        self._batch_records = None
+        self._batch_dirty = False
+        self._batch_depth = 0
+        self._index = None
+        self._index_key = None
+
+    def _file_key(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+    def _load(self):
+        if self._batch_records is not None:
+            return self._batch_records
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _save(self, records):
+        if self._batch_records is not None:
+            self._batch_records = records
+            self._batch_dirty = True
+            return
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".user_records_")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(records, f, indent=4)
+            if os.path.exists(self.path):
+                os.chmod(tmp_path, os.stat(self.path).st_mode & 0o7777)
+            os.replace(tmp_path, self.path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        if self._index is not None:
+            self._index_key = self._file_key()
+
+    def _reindex(self, username, old, new):
+        """Przenosi wpis indeksu po zmianie rekordu (old/new: rekordy lub None)."""
+        if self._index is None:
+            return
+        if self._batch_records is None and self._file_key() != self._index_key:
+            # Plik zmieniony poza magazynem - indeks zostanie zbudowany od nowa
+            self._index = None
+            return
+        old_key = (old or {}).get("public_key")
+        new_key = (new or {}).get("public_key")
+        if old_key and self._index.get(old_key) == username:
+            del self._index[old_key]
+        if new_key:
+            self._index[new_key] = username
+
+    def public_key_index(self):
+        with self._lock:
+            if self._index is None or (self._batch_records is None and self._file_key() != self._index_key):
+                self._index = build_public_key_index(self._load())
+                self._index_key = self._file_key()
+            return self._index
+
+    def get(self, username):
+        with self._lock:
+            return self._load().get(username)
+
+    def all(self):
+        with self._lock:
+            return dict(self._load())
+
+    def put_many(self, records):
+        with self._lock, file_lock(self.path):
+            data = self._load()
+            for username, record in records.items():
+                self._reindex(username, data.get(username), record)
+            data.update(records)
+            self._save(data)
+
+    def update_many(self, updates):
+        with self._lock, file_lock(self.path):
+            data = self._load()
+            updated = 0
+            for username, fields in updates.items():
+                if username in data:
+                    if "public_key" in fields:
+                        self._reindex(username, data[username], fields)
+                    data[username].update(fields)
+                    updated += 1
+            if updated:
+                self._save(data)
+            return updated
+
+    def delete(self, username):
+        with self._lock, file_lock(self.path):
+            data = self._load()
+            record = data.pop(username, None)
+            if record is not None:
+                self._reindex(username, record, None)
+                self._save(data)
+            return record
+
+    def replace_all(self, records):
+        with self._lock, file_lock(self.path):
+            self._save(dict(records))
+            self._index = None
+
+    @contextmanager
+    def batch(self):
+        with self._lock, file_lock(self.path):
+            if self._batch_depth == 0:
+                self._batch_records = self._load()
+                self._batch_dirty = False
+            self._batch_depth += 1
+            try:
+                yield self
+            except Exception:
+                self._batch_depth -= 1
+                if self._batch_depth == 0:
+                    self._batch_records = None
+                    self._index = None
+                raise
+            self._batch_depth -= 1
+            if self._batch_depth == 0:
+                records, self._batch_records = self._batch_records, None
+                if self._batch_dirty:
+                    self._save(records)
+
+
+class SqliteUserStore(UserStore):
+    """Rekordy w bazie SQLite (WAL), jeden wiersz na użytkownika."""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS users (
+            username   TEXT PRIMARY KEY,
+            public_key TEXT,
+            user_id    TEXT,
+            status     TEXT,
+            expires_at TEXT,
+            data       TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_users_username_nocase ON users(username COLLATE NOCASE);
+        CREATE INDEX IF NOT EXISTS idx_users_public_key ON users(public_key);
+        CREATE INDEX IF NOT EXISTS idx_users_user_id ON users(user_id);
+        CREATE INDEX IF NOT EXISTS idx_users_status ON users(status);
+        CREATE INDEX IF NOT EXISTS idx_users_expires_at ON users(expires_at);
+    """
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._local = threading.local()
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, exist_ok=True)
+        self._connection().executescript(self.SCHEMA)
+
+    def _connection(self):
+        """Połączenie per wątek (Gradio obsługuje zdarzenia w wielu wątkach)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.depth = 0
+        return conn
+
+    @contextmanager
+    def batch(self):
+        conn = self._connection()
+        if self._local.depth == 0:
+            conn.execute("BEGIN IMMEDIATE")
+        self._local.depth += 1
+        try:
+            yield self
+        except Exception:
+            self._local.depth -= 1
+            if self._local.depth == 0:
+                conn.execute("ROLLBACK")
+            raise
+        self._local.depth -= 1
+        if self._local.depth == 0:
+            conn.execute("COMMIT")
+
+    @staticmethod
+    def _row(username, record):
+        return (
+            username,
+            record.get("public_key"),
+            record.get("user_id"),
+            record.get("status"),
+            record.get("expires_at"),
+            json.dumps(record, ensure_ascii=False),
+        )
+
+    def all(self):
+        rows = self._connection().execute("SELECT username, data FROM users ORDER BY rowid")
+        return {username: json.loads(data) for username, data in rows}
+
+    def get(self, username):
+        row = self._connection().execute("SELECT data FROM users WHERE username = ?", (username,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def exists(self, username):
+        row = self._connection().execute(
+            "SELECT 1 FROM users WHERE username = ? COLLATE NOCASE LIMIT 1", (username,)
+        ).fetchone()
+        return row is not None
+
+    def public_key_index(self):
+        rows = self._connection().execute(
+            "SELECT public_key, username FROM users WHERE public_key IS NOT NULL AND public_key != ''"
+        )
+        return dict(rows)
+
+    def find_by_public_key(self, public_key):
+        row = self._connection().execute(
+            "SELECT username, data FROM users WHERE public_key = ? LIMIT 1", (public_key,)
+        ).fetchone()
+        return (row[0], json.loads(row[1])) if row else None
+
+    def count(self):
+        return self._connection().execute("SELECT COUNT(*) FROM users").fetchone()[0]
+
+    def put_many(self, records):
+        with self.batch():
+            self._connection().executemany(
+                "INSERT OR REPLACE INTO users (username, public_key, user_id, status, expires_at, data) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [self._row(username, record) for username, record in records.items()],
+            )
+
+    def update_many(self, updates):
+        updated = 0
+        with self.batch():
+            conn = self._connection()
+            for username, fields in updates.items():
+                row = conn.execute("SELECT data FROM users WHERE username = ?", (username,)).fetchone()
+                if row is None:
+                    continue
+                record = json.loads(row[0])
+                record.update(fields)
+                conn.execute(
+                    "UPDATE users SET public_key = ?, user_id = ?, status = ?, expires_at = ?, data = ? "
+                    "WHERE username = ?",
+                    self._row(username, record)[1:] + (username,),
+                )
+                updated += 1
+        return updated
+
+    def delete(self, username):
+        with self.batch():
+            record = self.get(username)
+            if record is not None:
+                self._connection().execute("DELETE FROM users WHERE username = ?", (username,))
+        return record
+
+    def replace_all(self, records):
+        with self.batch():
+            self._connection().execute("DELETE FROM users")
+            self.put_many(records)
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def resolve_backend(backend=None):
+    """Ustala backend magazynu (domyślnie settings.USER_STORE_BACKEND)."""
+    backend = str(backend or getattr(_settings(), "USER_STORE_BACKEND", "json")).lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"Nieznany backend magazynu użytkowników: {backend}. Dostępne: {', '.join(BACKENDS)}")
+    return backend
+
+
+def sqlite_path_for(json_path=None):
+    """Zwraca ścieżkę bazy SQLite odpowiadającą plikowi JSON (domyślnie settings.USER_STORE_DB_PATH)."""
+    settings = _settings()
+    if json_path is None or os.path.abspath(str(json_path)) == os.path.abspath(str(settings.USER_DB_PATH)):
+        return str(settings.USER_STORE_DB_PATH)
+    return os.path.splitext(str(json_path))[0] + ".db"
+
+
+def open_user_store(json_path=None, backend=None):
+    """
+    Zwraca magazyn użytkowników.
+    :param json_path: Ścieżka do user_records.json (domyślnie settings.USER_DB_PATH).
+                      Dla backendu "sqlite" wyznacza bazę o tej samej nazwie z rozszerzeniem .db.
+    :param backend: "json", "sqlite" lub None (settings.USER_STORE_BACKEND).
+    """
+    backend = resolve_backend(backend)
+    json_path = str(json_path or _settings().USER_DB_PATH)
+    with _stores_lock:
+        if backend == "json":
+            # Jedna instancja na plik - indeks kluczy publicznych przetrwa między wywołaniami
+            key = ("json", os.path.abspath(json_path))
+            if key not in _stores:
+                _stores[key] = JsonUserStore(json_path)
+            return _stores[key]
+
+        db_path = sqlite_path_for(json_path)
+        key = ("sqlite", os.path.abspath(db_path))
+        store = _stores.get(key)
+        if store is None:
+            is_new = not os.path.exists(db_path)
+            store = SqliteUserStore(db_path)
+            # Pierwsze otwarcie bazy - jednorazowy import dotychczasowego pliku JSON
+            if is_new and os.path.exists(json_path):
+                import_json(json_path, store)
+            _stores[key] = store
+        return store
+
+
+def import_json(json_path, store):
+    """
+    Importuje rekordy z pliku JSON do magazynu (jedna transakcja).
+    :return: Liczba zaimportowanych rekordów.
+    """
+    with open(json_path, "r", encoding="utf-8") as f:
+        records = json.load(f)
+    with store.batch():
+        store.put_many(records)
+    return len(records)
+
+
+def export_json(store, json_path):
+    """
+    Eksportuje rekordy magazynu do pliku JSON (zapis atomowy).
+    :return: Liczba wyeksportowanych rekordów.
+    """
+    records = store.all()
+    directory = os.path.dirname(str(json_path)) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".user_records_")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(records, f, indent=4)
+    os.replace(tmp_path, json_path)
+    return len(records)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] not in ("import", "export"):
+        print("Użycie: python3 -m modules.user_store import|export [user_records.json]")
+        sys.exit(1)
+    path = sys.argv[2] if len(sys.argv) > 2 else str(_settings().USER_DB_PATH)
+    sqlite_store = SqliteUserStore(sqlite_path_for(path))
+    if sys.argv[1] == "import":
+        print(f"✅ Zaimportowano {import_json(path, sqlite_store)} rekordów do {sqlite_store.path}")
+    else:
+        print(f"✅ Wyeksportowano {export_json(sqlite_store, path)} rekordów do {path}")
@@ -6,6 +6,8 @@ import json
 import os
 import datetime
 
+from modules.server_config import ServerConfig
+
 def read_json(file_path):
     """
     Wczytuje dane z pliku JSON.
@@ -57,13 +59,9 @@ def get_wireguard_subnet(config_path=None):
     if config_path is None:
         config_path = get_wireguard_config_path()
 
-    config_content = parse_wireguard_config(config_path)
-    for line in config_content.splitlines():
-        if line.strip().startswith("Address"):
-            addresses = line.split('=')[1].strip().split(',')
-            for address in addresses:
-                if '/' in address and '.' in address:  # IPv4
-                    return address.strip()
+    subnet = ServerConfig.parse(parse_wireguard_config(config_path), config_path).subnet()
+    if subnet:
+        return subnet
     raise ValueError(f"Nie udało się znaleźć podsieci WireGuard w pliku konfiguracji {config_path}.")
 
 def log_debug(message):
@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+# modules/wg_netlink.py
+# Odczyt stanu WireGuard bezpośrednio z jądra przez generic netlink (rodzina "wireguard")
+#
+# Zamiast fork/exec `wg show all dump` i parsowania tekstu wysyłamy WG_CMD_GET_DEVICE
+# (NLM_F_DUMP) dla każdego interfejsu i dekodujemy atrybuty do tych samych rekordów
+# WgInterface/WgPeer, które zwraca ścieżka CLI. Jądro dzieli listę peerów na wiele
+# wiadomości (stronicowanie dumpu) - peer, którego allowed IPs nie zmieściły się
+# w jednej wiadomości, pojawia się ponownie na początku kolejnej i jest scalany.
+#
+# Gniazdo jest wstrzykiwalne (send/recv/close), dzięki czemu testy działają
+# z nagranymi odpowiedziami bez modułu jądra wireguard.
+#
+# Przykład użycia:
+#   from modules.wg_netlink import read_netlink_snapshot
+#   snapshot = read_netlink_snapshot()
+#   print(len(snapshot.peers_of("wg0")))
+
+import base64
+import ipaddress
+import os
+import socket
+import struct
+
+from modules.wg_snapshot import WgInterface, WgPeer, WgSnapshot
+
+NETLINK_GENERIC = 16
+NLM_F_REQUEST = 0x1
+NLM_F_MULTI = 0x2
+NLM_F_DUMP = 0x300
+NLMSG_ERROR = 0x2
+NLMSG_DONE = 0x3
+NLA_F_NESTED = 0x8000
+NLA_TYPE_MASK = 0x3FFF
+
+GENL_ID_CTRL = 0x10
+CTRL_CMD_GETFAMILY = 3
+CTRL_ATTR_FAMILY_ID = 1
+CTRL_ATTR_FAMILY_NAME = 2
+
+WG_GENL_NAME = "wireguard"
+WG_GENL_VERSION = 1
+WG_CMD_GET_DEVICE = 0
+
+WGDEVICE_A_IFINDEX = 1
+WGDEVICE_A_IFNAME = 2
+WGDEVICE_A_PRIVATE_KEY = 3
+WGDEVICE_A_PUBLIC_KEY = 4
+WGDEVICE_A_FLAGS = 5
+WGDEVICE_A_LISTEN_PORT = 6
+WGDEVICE_A_FWMARK = 7
+WGDEVICE_A_PEERS = 8
+
+WGPEER_A_PUBLIC_KEY = 1
+WGPEER_A_PRESHARED_KEY = 2
+WGPEER_A_FLAGS = 3
+WGPEER_A_ENDPOINT = 4
+WGPEER_A_PERSISTENT_KEEPALIVE_INTERVAL = 5
+WGPEER_A_LAST_HANDSHAKE_TIME = 6
+WGPEER_A_RX_BYTES = 7
+WGPEER_A_TX_BYTES = 8
+WGPEER_A_ALLOWEDIPS = 9
+
+WGALLOWEDIP_A_FAMILY = 1
+WGALLOWEDIP_A_IPADDR = 2
+WGALLOWEDIP_A_CIDR_MASK = 3
+
+RECV_BUFFER_SIZE = 1 << 17  # Bufor odbioru; pojedyncza wiadomość dumpu ma do ~32 KiB
+SYS_CLASS_NET = "/sys/class/net"
+EMPTY_KEY = bytes(32)
+
+
+class NetlinkError(OSError):
+    """Błąd zwrócony przez jądro w wiadomości NLMSG_ERROR (errno dodatni)."""
+
+
+def _align(length):
+    return (length + 3) & ~3
+
+
+def pack_attr(attr_type, payload):
+    """Koduje atrybut netlink (nlattr) z wyrównaniem do 4 bajtów."""
+    length = 4 + len(payload)
+    return struct.pack("=HH", length, attr_type) + payload + b"\0" * (_align(length) - length)
+
+
+def pack_nested(attr_type, attrs):
+    """Koduje zagnieżdżony atrybut z listy już zakodowanych atrybutów."""
+    return pack_attr(attr_type | NLA_F_NESTED, b"".join(attrs))
+
+
+def pack_message(msg_type, flags, seq, cmd, attrs=(), version=WG_GENL_VERSION, pid=0):
+    """Koduje wiadomość generic netlink (nlmsghdr + genlmsghdr + atrybuty)."""
+    payload = struct.pack("=BBH", cmd, version, 0) + b"".join(attrs)
+    return struct.pack("=IHHII", 16 + len(payload), msg_type, flags, seq, pid) + payload
+
+
+def pack_error(seq, error=0, pid=0):
+    """Koduje wiadomość NLMSG_ERROR (error=0 to potwierdzenie)."""
+    payload = struct.pack("=i", -error) + struct.pack("=IHHII", 16, 0, 0, seq, pid)
+    return struct.pack("=IHHII", 16 + len(payload), NLMSG_ERROR, 0, seq, pid) + payload
+
+
+def pack_done(seq, pid=0):
+    """Koduje wiadomość NLMSG_DONE kończącą dump."""
+    return struct.pack("=IHHIIi", 20, NLMSG_DONE, NLM_F_MULTI, seq, pid, 0)
+
+
+def parse_attrs(data):
+    """
+    Dekoduje ciąg atrybutów netlink.
+    :return: Lista (typ, dane) w kolejności wystąpienia (typ bez flag NESTED/BYTEORDER).
+    """
+    attrs = []
+    offset = 0
+    while offset + 4 <= len(data):
+        length, attr_type = struct.unpack_from("=HH", data, offset)
+        if length < 4:
+            break
+        attrs.append((attr_type & NLA_TYPE_MASK, data[offset + 4:offset + length]))
+        offset += _align(length)
+    return attrs
+
+
+def parse_messages(data):
+    """
+    Dzieli bufor odebrany z gniazda na wiadomości netlink.
+    :return: Lista (typ, flagi, seq, payload).
+    :raises NetlinkError: Jądro zwróciło błąd.
+    """
+    messages = []
+    offset = 0
+    while offset + 16 <= len(data):
+        length, msg_type, flags, seq, _ = struct.unpack_from("=IHHII", data, offset)
+        if length < 16:
+            break
+        payload = data[offset + 16:offset + length]
+        if msg_type == NLMSG_ERROR:
+            error = -struct.unpack_from("=i", payload)[0]
+            if error:
+                raise NetlinkError(error, os.strerror(error))
+        messages.append((msg_type, flags, seq, payload))
+        offset += _align(length)
+    return messages
+
+
+def _format_endpoint(data):
+    """Formatuje sockaddr_in/sockaddr_in6 jak `wg show` (ip:port lub [ip6]:port)."""
+    family = struct.unpack_from("=H", data)[0]
+    port = struct.unpack_from("!H", data, 2)[0]
+    if family == socket.AF_INET:
+        return f"{ipaddress.IPv4Address(data[4:8])}:{port}"
+    if family == socket.AF_INET6:
+        return f"[{ipaddress.IPv6Address(data[8:24])}]:{port}"
+    return None
+
+
+def _parse_allowed_ip(data):
+    values = dict(parse_attrs(data))
+    family = struct.unpack("=H", values[WGALLOWEDIP_A_FAMILY])[0]
+    address = values[WGALLOWEDIP_A_IPADDR]
+    cidr = values[WGALLOWEDIP_A_CIDR_MASK][0]
+    if family == socket.AF_INET:
+        return f"{ipaddress.IPv4Address(address)}/{cidr}"
+    return f"{ipaddress.IPv6Address(address)}/{cidr}"
+
+
+def _parse_peer(interface, data):
+    """Dekoduje zagnieżdżonego peera do słownika pól WgPeer."""
+    peer = {"interface": interface, "public_key": None, "preshared_key": None, "endpoint": None,
+            "allowed_ips": [], "latest_handshake": 0, "rx_bytes": 0, "tx_bytes": 0,
+            "persistent_keepalive": None}
+    for attr_type, value in parse_attrs(data):
+        if attr_type == WGPEER_A_PUBLIC_KEY:
+            peer["public_key"] = base64.b64encode(value).decode()
+        elif attr_type == WGPEER_A_PRESHARED_KEY and value != EMPTY_KEY:
+            peer["preshared_key"] = base64.b64encode(value).decode()
+        elif attr_type == WGPEER_A_ENDPOINT:
+            peer["endpoint"] = _format_endpoint(value)
+        elif attr_type == WGPEER_A_PERSISTENT_KEEPALIVE_INTERVAL:
+            peer["persistent_keepalive"] = struct.unpack("=H", value)[0] or None
+        elif attr_type == WGPEER_A_LAST_HANDSHAKE_TIME:
+            peer["latest_handshake"] = struct.unpack_from("=q", value)[0]
+        elif attr_type == WGPEER_A_RX_BYTES:
+            peer["rx_bytes"] = struct.unpack("=Q", value)[0]
+        elif attr_type == WGPEER_A_TX_BYTES:
+            peer["tx_bytes"] = struct.unpack("=Q", value)[0]
+        elif attr_type == WGPEER_A_ALLOWEDIPS:
+            peer["allowed_ips"].extend(_parse_allowed_ip(item) for _, item in parse_attrs(value))
+    return peer
+
+
+def list_wireguard_interfaces(sys_class_net=SYS_CLASS_NET):
+    """Zwraca nazwy interfejsów WireGuard (DEVTYPE=wireguard w /sys/class/net/*/uevent)."""
+    names = []
+    try:
+        entries = sorted(os.listdir(sys_class_net))
+    except OSError:
+        return names
+    for name in entries:
+        try:
+            with open(os.path.join(sys_class_net, name, "uevent"), "r") as file:
+                if "DEVTYPE=wireguard" in file.read().split():
+                    names.append(name)
+        except OSError:
+            continue
+    return names
+
+
+class WireGuardNetlink:
+    """Klient rodziny generic netlink "wireguard" (tylko odczyt)."""
+
+    def __init__(self, sock=None):
+        """
+        :param sock: Obiekt z metodami send/recv/close (domyślnie gniazdo AF_NETLINK).
+        """
+        if sock is None:
+            sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, NETLINK_GENERIC)
+            sock.bind((0, 0))
+        self.sock = sock
+        self._seq = 0
+        self._family_id = None
+
+    def close(self):
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _request(self, msg_type, flags, cmd, attrs, version):
+        """Wysyła żądanie i zwraca payloady (bez genlmsghdr) wszystkich wiadomości odpowiedzi."""
+        self._seq += 1
+        seq = self._seq
+        self.sock.send(pack_message(msg_type, flags | NLM_F_REQUEST, seq, cmd, attrs, version))
+        payloads = []
+        while True:
+            for reply_type, reply_flags, reply_seq, payload in parse_messages(self.sock.recv(RECV_BUFFER_SIZE)):
+                if reply_seq != seq:
+                    continue
+                if reply_type in (NLMSG_DONE, NLMSG_ERROR):
+                    return payloads
+                payloads.append(payload[4:])
+                if not reply_flags & NLM_F_MULTI:
+                    return payloads
+
+    @property
+    def family_id(self):
+        """Identyfikator rodziny "wireguard" (ustalany raz przez kontroler genl)."""
+        if self._family_id is None:
+            name = pack_attr(CTRL_ATTR_FAMILY_NAME, WG_GENL_NAME.encode() + b"\0")
+            for payload in self._request(GENL_ID_CTRL, 0, CTRL_CMD_GETFAMILY, [name], 1):
+                for attr_type, value in parse_attrs(payload):
+                    if attr_type == CTRL_ATTR_FAMILY_ID:
+                        self._family_id = struct.unpack("=H", value)[0]
+            if self._family_id is None:
+                raise NetlinkError(2, "Rodzina generic netlink 'wireguard' niedostępna")
+        return self._family_id
+
+    def get_device(self, ifname):
+        """
+        Pobiera interfejs i wszystkie jego peery (dump stronicowany przez jądro).
+        :return: Krotka (WgInterface, {public_key: WgPeer}).
+        """
+        attrs = [pack_attr(WGDEVICE_A_IFNAME, ifname.encode() + b"\0")]
+        interface = {"public_key": None, "listen_port": 0, "fwmark": None}
+        peers = {}
+        for payload in self._request(self.family_id, NLM_F_DUMP, WG_CMD_GET_DEVICE, attrs, WG_GENL_VERSION):
+            for attr_type, value in parse_attrs(payload):
+                if attr_type == WGDEVICE_A_PUBLIC_KEY:
+                    interface["public_key"] = base64.b64encode(value).decode()
+                elif attr_type == WGDEVICE_A_LISTEN_PORT:
+                    interface["listen_port"] = struct.unpack("=H", value)[0]
+                elif attr_type == WGDEVICE_A_FWMARK:
+                    fwmark = struct.unpack("=I", value)[0]
+                    interface["fwmark"] = hex(fwmark) if fwmark else None
+                elif attr_type == WGDEVICE_A_PEERS:
+                    for _, peer_data in parse_attrs(value):
+                        peer = _parse_peer(ifname, peer_data)
+                        previous = peers.get(peer["public_key"])
+                        if previous is not None:
+                            # Kontynuacja peera z poprzedniej strony: tylko kolejne allowed IPs
+                            previous["allowed_ips"].extend(peer["allowed_ips"])
+                        else:
+                            peers[peer["public_key"]] = peer
+        records = {}
+        for key, peer in peers.items():
+            peer["allowed_ips"] = tuple(peer["allowed_ips"])
+            records[key] = WgPeer(**peer)
+        return WgInterface(ifname, interface["public_key"], interface["listen_port"], interface["fwmark"]), records
+
+
+def read_netlink_snapshot(interfaces=None, sock=None):
+    """
+    Odczytuje migawkę wszystkich interfejsów WireGuard przez netlink.
+    :param interfaces: Nazwy interfejsów (domyślnie wykryte w /sys/class/net).
+    :param sock: Gniazdo do wstrzyknięcia (testy).
+    :raises OSError: Brak obsługi netlink, uprawnień lub rodziny "wireguard".
+    """
+    names = list_wireguard_interfaces() if interfaces is None else list(interfaces)
+    snapshot_interfaces = {}
+    snapshot_peers = {}
+    with WireGuardNetlink(sock) as client:
+        client.family_id  # Brak modułu wireguard w jądrze zgłaszany także bez interfejsów
+        for name in names:
+            interface, peers = client.get_device(name)
+            snapshot_interfaces[name] = interface
+            snapshot_peers[name] = peers
+    return WgSnapshot(snapshot_interfaces, snapshot_peers)
+
+
+if __name__ == "__main__":
+    snapshot = read_netlink_snapshot()
+    for name, interface in snapshot.interfaces.items():
+        print(f"{name}: port {interface.listen_port}, peery: {len(snapshot.peers_of(name))}")
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+# modules/wg_snapshot.py
+# Jeden odczyt stanu WireGuard (`wg show all dump`) współdzielony przez wszystkie moduły
+#
+# Aktualizacja ruchu, handshake'ów, synchronizacja danych, raporty i diagnostyka
+# korzystają z jednego migawkowego odczytu zamiast uruchamiać własne polecenia wg.
+# Wyjście jest parsowane strumieniowo (wiersz po wierszu z potoku procesu) do
+# lekkich rekordów: bajty jako int, handshake jako epoch. Wywołania w oknie
+# WG_SNAPSHOT_TTL (settings.py) dostają tę samą migawkę; równoczesne odświeżenia
+# uruchamiają jeden proces.
+#
+# Backend odczytu wybiera WG_STATS_BACKEND (settings.py):
+# - "cli":     `wg show all dump` (fork/exec i parsowanie tekstu),
+# - "netlink": bezpośrednio z jądra przez generic netlink (modules/wg_netlink.py),
+# - "auto":    netlink, a przy braku obsługi/uprawnień powrót do "cli" do końca procesu.
+#
+# Przykład użycia:
+#   from modules.wg_snapshot import get_snapshot
+#   snapshot = get_snapshot()
+#   for peer in snapshot.peers_of("wg0").values():
+#       print(peer.public_key, peer.rx_bytes, peer.tx_bytes, peer.latest_handshake)
+
+import subprocess
+import threading
+import time
+from typing import Dict, NamedTuple, Optional, Tuple
+
+DEFAULT_TTL = 2.0  # Czas życia migawki, gdy brak WG_SNAPSHOT_TTL w settings.py (w sekundach)
+BACKENDS = ("auto", "netlink", "cli")
+WG_DUMP_COMMAND = ["wg", "show", "all", "dump"]
+
+
+class WgInterface(NamedTuple):
+    """Interfejs WireGuard z migawki (bez klucza prywatnego)."""
+    name: str
+    public_key: str
+    listen_port: int
+    fwmark: Optional[str]
+
+
+class WgPeer(NamedTuple):
+    """Peer WireGuard z migawki."""
+    interface: str
+    public_key: str
+    preshared_key: Optional[str]
+    endpoint: Optional[str]
+    allowed_ips: Tuple[str, ...]
+    latest_handshake: int          # Epoch w sekundach, 0 = brak handshake'a
+    rx_bytes: int
+    tx_bytes: int
+    persistent_keepalive: Optional[int]
+
+
+def _optional(value):
+    return None if value in ("(none)", "off", "") else value
+
+
+def format_bytes(size):
+    """Formatuje liczbę bajtów jak `wg show` (np. '1.23 MiB')."""
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if size < 1024:
+            return f"{size:.2f} {unit}"
+        size /= 1024
+    return f"{size:.2f} TiB"
+
+
+def parse_dump(lines):
+    """
+    Parsuje wyjście `wg show all dump` (dowolny iterowalny zbiór wierszy).
+    Wiersz interfejsu ma 5 pól, wiersz peera 9 pól (rozdzielonych tabulatorem).
+    :return: Krotka (interfejsy {nazwa: WgInterface}, peery {interfejs: {klucz: WgPeer}}).
+    """
+    interfaces = {}
+    peers = {}
+    for line in lines:
+        parts = line.rstrip("\n").split("\t")
+        if len(parts) == 9:
+            keepalive = _optional(parts[8])
+            peers.setdefault(parts[0], {})[parts[1]] = WgPeer(
+                parts[0],
+                parts[1],
+                _optional(parts[2]),
+                _optional(parts[3]),
+                tuple(ip for ip in parts[4].split(",") if ip and ip != "(none)"),
+                int(parts[5]),
+                int(parts[6]),
+                int(parts[7]),
+                int(keepalive) if keepalive else None,
+            )
+        elif len(parts) == 5:
+            # parts[1] to klucz prywatny interfejsu - celowo pomijany
+            interfaces[parts[0]] = WgInterface(parts[0], parts[2], int(parts[3]), _optional(parts[4]))
+            peers.setdefault(parts[0], {})
+    return interfaces, peers
+
+
+class WgSnapshot:
+    """Stan wszystkich interfejsów WireGuard w jednym momencie."""
+
+    def __init__(self, interfaces, peers, taken_at=None, timestamp=None):
+        self.interfaces: Dict[str, WgInterface] = interfaces
+        self._peers: Dict[str, Dict[str, WgPeer]] = peers
+        self.taken_at = time.monotonic() if taken_at is None else taken_at
+        self.timestamp = time.time() if timestamp is None else timestamp
+
+    def age(self):
+        """Wiek migawki w sekundach."""
+        return time.monotonic() - self.taken_at
+
+    def peers_of(self, interface):
+        """Zwraca peery interfejsu {public_key: WgPeer}."""
+        return self._peers.get(interface, {})
+
+    def peers(self):
+        """Zwraca peery wszystkich interfejsów {public_key: WgPeer}."""
+        merged = {}
+        for interface_peers in self._peers.values():
+            merged.update(interface_peers)
+        return merged
+
+    def peer(self, public_key, interface=None):
+        """Zwraca peera o danym kluczu publicznym lub None."""
+        if interface is not None:
+            return self.peers_of(interface).get(public_key)
+        for interface_peers in self._peers.values():
+            if public_key in interface_peers:
+                return interface_peers[public_key]
+        return None
+
+
+def read_snapshot(command=None):
+    """
+    Uruchamia `wg show all dump` i parsuje wyjście strumieniowo.
+    :raises FileNotFoundError: Brak polecenia wg.
+    :raises subprocess.CalledProcessError: Polecenie zakończone błędem.
+    """
+    command = command or WG_DUMP_COMMAND
+    with subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True) as process:
+        interfaces, peers = parse_dump(process.stdout)
+        stderr = process.stderr.read()
+        returncode = process.wait()
+    if returncode != 0:
+        raise subprocess.CalledProcessError(returncode, command, stderr=stderr)
+    return WgSnapshot(interfaces, peers)
+
+
+_netlink_unavailable = False
+
+
+def resolve_backend(backend=None):
+    """
+    Ustala backend odczytu migawki.
+    :param backend: "auto", "netlink", "cli" lub None (wartość z settings.WG_STATS_BACKEND).
+    """
+    if backend is None:
+        try:
+            import settings
+            backend = getattr(settings, "WG_STATS_BACKEND", "cli")
+        except ImportError:
+            backend = "cli"
+    backend = str(backend or "cli").lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"Nieznany backend statystyk WireGuard: {backend}. Dostępne: {', '.join(BACKENDS)}")
+    return backend
+
+
+def read_wg_snapshot(backend=None):
+    """
+    Odczytuje migawkę wybranym backendem (domyślny czytnik SnapshotProvider).
+    W trybie "auto" błąd netlink przełącza proces na `wg show all dump`.
+    """
+    global _netlink_unavailable
+    backend = resolve_backend(backend)
+    if backend == "cli" or (backend == "auto" and _netlink_unavailable):
+        return read_snapshot()
+    from modules.wg_netlink import read_netlink_snapshot
+    if backend == "netlink":
+        return read_netlink_snapshot()
+    try:
+        snapshot = read_netlink_snapshot()
+    except (OSError, ValueError) as e:
+        print(f"[WARNING] Odczyt WireGuard przez netlink niedostępny ({e}), używam `wg show all dump`.")
+        _netlink_unavailable = True
+        return read_snapshot()
+    # Brak interfejsów jądra - np. wireguard-go widoczny tylko przez `wg`
+    return snapshot if snapshot.interfaces else read_snapshot()
+
+
+def _settings_ttl():
+    """Odczytuje WG_SNAPSHOT_TTL z settings.py przy wywołaniu (nie przy imporcie)."""
+    try:
+        import settings
+        return float(settings.WG_SNAPSHOT_TTL)
+    except (ImportError, AttributeError, TypeError, ValueError):
+        return DEFAULT_TTL
+
+
+class SnapshotProvider:
+    """Migawka z pamięcią podręczną o ograniczonym czasie życia."""
+
+    def __init__(self, ttl=None, reader=None):
+        """
+        :param ttl: Czas życia migawki w sekundach (domyślnie settings.WG_SNAPSHOT_TTL).
+        :param reader: Funkcja odczytu migawki (domyślnie read_wg_snapshot).
+        """
+        self.ttl = ttl
+        self.reader = reader or read_wg_snapshot
+        self._snapshot = None
+        self._lock = threading.Lock()
+        self.reads = 0
+
+    def get(self, max_age=None):
+        """
+        Zwraca migawkę nie starszą niż max_age (domyślnie ttl).
+        Równoczesne wywołania przy nieaktualnej migawce czekają na jeden odczyt.
+        """
+        if max_age is None:
+            max_age = self.ttl if self.ttl is not None else _settings_ttl()
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is None or snapshot.age() > max_age or max_age <= 0:
+                snapshot = self.reader()
+                self._snapshot = snapshot
+                self.reads += 1
+            return snapshot
+
+    def invalidate(self):
+        """Unieważnia migawkę (np. po zmianie peerów przez `wg set`)."""
+        with self._lock:
+            self._snapshot = None
+
+
+_provider = SnapshotProvider()
+
+
+def get_snapshot(max_age=None):
+    """Zwraca współdzieloną migawkę stanu WireGuard (patrz SnapshotProvider.get)."""
+    return _provider.get(max_age)
+
+
+def invalidate_snapshot():
+    """Unieważnia współdzieloną migawkę."""
+    _provider.invalidate()
+
+
+if __name__ == "__main__":
+    snapshot = get_snapshot()
+    for name, interface in snapshot.interfaces.items():
+        print(f"\n=== {name} (port {interface.listen_port}) ===")
+        for peer in snapshot.peers_of(name).values():
+            print(f"{peer.public_key}  {', '.join(peer.allowed_ips)}  rx={peer.rx_bytes}  "
+                  f"tx={peer.tx_bytes}  handshake={peer.latest_handshake}")
@@ -39,8 +39,16 @@ PROJECT_DIR = BASE_DIR  # Dla kompatybilności, PROJECT_DIR = BASE_DIR
 # Ścieżki plików i katalogów
 WG_CONFIG_DIR = BASE_DIR / "user/data/wg_configs"  # Ścieżka do konfiguracji WireGuard użytkowników
 QR_CODE_DIR = BASE_DIR / "user/data/qrcodes"       # Ścieżka do zapisanych kodów QR
+QR_CACHE_DIR = BASE_DIR / "user/data/qr_cache"     # Pamięć podręczna kodów QR (klucz: SHA-256 konfiguracji)
 STALE_CONFIG_DIR = BASE_DIR / "user/data/usr_stale_config"  # Ścieżka do nieaktualnych konfiguracji użytkowników
 USER_DB_PATH = BASE_DIR / "user/data/user_records.json"  # Baza danych użytkowników
+USER_STORE_DB_PATH = BASE_DIR / "user/data/user_records.db"  # Baza SQLite użytkowników (backend "sqlite")
+IP_POOL_PATH = BASE_DIR / "user/data/ip_pool.json"       # Bitmapa przydzielonych adresów IP
+STATS_STATUS_PATH = BASE_DIR / "user/data/stats_status.json"  # Stan ostatniego pomiaru kolektora statystyk
+TRAFFIC_SERIES_DIR = BASE_DIR / "user/data/traffic_series"    # Szeregi czasowe ruchu peerów (modules/traffic_series.py)
+TRAFFIC_ROLLUP_INTERVAL = 300   # Odstęp rollupów i retencji historii ruchu w kolektorze (w sekundach)
+TRAFFIC_RETENTION_DAYS = {"raw": 7, "5m": 35, "1h": 400, "1d": 1830, "1mo": None}  # Retencja poziomów historii ruchu (dni, None - bez limitu)
+QUOTA_STATE_PATH = BASE_DIR / "user/data/quota_state.npz"  # Stan zużycia danych peerów (modules/quota.py)
 #IP_DB_PATH = BASE_DIR / "user/data/ip_records.json"      # Baza danych adresów IP
 SERVER_CONFIG_FILE = Path("/etc/wireguard/wg0.conf")     # Ścieżka do pliku konfiguracyjnego serwera WireGuard
 SERVER_BACKUP_CONFIG_FILE = Path("/etc/wireguard/wg0.conf.bak") # Ścieżka do pliku kopii zapasowej konfiguracji serwera WireGuard
@@ -52,6 +60,26 @@ WIREGUARD_PORT = 51820   # Port serwera WireGuard (domyślny) zakres [1-65535]
 DEFAULT_SUBNET = "10.66.66.0/24"
 USER_SET_SUBNET = DEFAULT_SUBNET
 DNS_WIREGUAED = "1.1.1.1, 1.0.0.1, 8.8.8.8"
+KEYGEN_BACKEND = "auto"  # Generowanie kluczy: "auto", "native" (cryptography, w procesie) lub "wg" (polecenia wg)
+PEER_APPLY_MODE = "incremental"  # Synchronizacja peerów: "incremental" (diff + `wg set`) lub "syncconf" (pełne wg syncconf)
+SYNC_COALESCE_WINDOW_MS = 200   # Okno łączenia żądań synchronizacji interfejsu (w milisekundach)
+WG_SNAPSHOT_TTL = 2.0           # Czas życia współdzielonej migawki `wg show all dump` (w sekundach)
+WG_STATS_BACKEND = "auto"       # Odczyt statystyk WireGuard: "auto" (netlink z powrotem do wg), "netlink" lub "cli" (`wg show all dump`)
+QR_WORKERS = 2                  # Liczba procesów renderujących kody QR
+USER_STORE_BACKEND = "json"     # Magazyn użytkowników: "json" (user_records.json) lub "sqlite" (WAL, zapis pojedynczych rekordów)
+QR_BACKEND = "auto"             # Backend kodów QR: "auto" (najszybszy dostępny), "qrcode", "pyqrcode", "svg", "terminal"
+SERVER_CONFIG_LAYOUT = "single"  # Układ konfiguracji serwera: "single" (jeden wg0.conf) lub "fragments" (wg0.conf.d/, plik na peera)
+STATS_INTERVAL = 30             # Odstęp pomiarów kolektora statystyk (modules/stats_daemon.py, w sekundach)
+QUOTA_ENFORCE = False           # Blokowanie peerów po przekroczeniu data_limit (False - tylko data_used i ostrzeżenia)
+QUOTA_PERIOD = "month"          # Okres limitu danych: "month" (zerowanie 1. dnia miesiąca, UTC) lub None (bez zerowania)
+QUOTA_WARN_THRESHOLDS = (0.8, 0.9)  # Progi ostrzeżeń o zużyciu danych (ułamki limitu)
+QUOTA_PLAN_LIMITS = {"darmowy": "100.0 GB"}  # Domyślne limity planów subskrypcji (gdy data_limit rekordu to "N/A")
+QUOTA_DEFAULT_LIMIT = None      # Limit peerów bez data_limit i bez limitu planu (None - bez limitu)
+EXPIRY_ACTIONS = ()             # Akcje harmonogramu wygasania: () - tylko wypisywanie, ("suspend",) lub ("suspend", "delete")
+EXPIRY_RESYNC_INTERVAL = 3600   # Odstęp pełnego odczytu terminów kont w harmonogramie wygasania (w sekundach)
+GRADIO_POOL_WORKERS = {"probe": 4, "render": 2, "mutation": 1}  # Wątki pul funkcji obsługi panelu Gradio (sondy I/O, renderowanie, zmiany konfiguracji)
+USER_PICKER_LIMIT = 20          # Liczba kandydatów wysyłanych do listy wyboru użytkownika w panelu Gradio
+SERVER_CONFIG_ASSEMBLE_DELAY = None  # Odtwarzanie wg0.conf z fragmentów: None - tylko przed startem wg-quick@ (ExecStartPre), N - także N s po ostatniej zmianie, 0 - po każdej zmianie
 
 # Ollama
 OLLAMA_HOST = "http://10.99.0.2:11434"
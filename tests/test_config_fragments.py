@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""
+Testy jednostkowe konfiguracji serwera podzielonej na fragmenty.
+
+Moduł testuje:
+- Podział wg0.conf na interface.conf i pliki peerów oraz złożenie z powrotem
+- Zmiany pojedynczego peera zapisujące tylko jego fragment
+- Pamięć podręczną złożenia (ten sam obiekt bez zmian fragmentów)
+- Treść dla `wg syncconf` odpowiadającą `wg-quick strip`
+- Odtwarzanie wg0.conf tylko po zmianie fragmentów (od razu, raz na batch() lub z opóźnieniem)
+- Zapis odroczonego złożenia przy SIGTERM
+- Blokadę międzyprocesową zmian fragmentów i dodatek wg-quick@ składający wg0.conf przed startem
+- Wybór układu w funkcjach server_config (SERVER_CONFIG_LAYOUT), także wsadowych
+"""
+
+import pytest
+import multiprocessing
+import os
+import sys
+from unittest.mock import Mock, patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from modules import config_fragments
+from modules.config_fragments import FragmentStore
+from modules.server_config import (
+    add_server_peers, load_server_config, remove_server_peer, remove_server_peers, resolve_layout,
+    set_peer_enabled, set_peers_enabled,
+)
+
+CONFIG = """[Interface]
+Address = 10.66.66.1/24
+ListenPort = 51820
+PrivateKey = SERVERKEY=
+PostUp = iptables -A FORWARD -i wg0 -j ACCEPT # NAT
+
+### Klient alice
+[Peer]
+PublicKey = ALICE=
+PresharedKey = PSKA=
+AllowedIPs = 10.66.66.2/32
+
+### Klient bob
+# [Peer]
+# PublicKey = BOB=
+# AllowedIPs = 10.66.66.3/32
+
+[Peer]
+PublicKey = NONAME=
+AllowedIPs = 10.66.66.4/32
+"""
+
+
+@pytest.fixture
+def store(tmp_path):
+    path = tmp_path / "wg0.conf"
+    path.write_text(CONFIG)
+    store = FragmentStore(path, assemble_delay=None)
+    store.split()
+    return store
+
+
+def peer_files(store):
+    return sorted(os.listdir(store.peers_dir))
+
+
+class TestSplitAndAssemble:
+    """Testy podziału i składania konfiguracji."""
+
+    def test_split_layout(self, store):
+        files = peer_files(store)
+        assert files[:2] == ["alice.conf", "bob.conf"]
+        assert files[2].startswith("key-")
+        with open(os.path.join(store.peers_dir, "bob.conf")) as f:
+            assert f.read() == "### Klient bob\n# [Peer]\n# PublicKey = BOB=\n# AllowedIPs = 10.66.66.3/32\n"
+
+    def test_assembled_config(self, store):
+        config = store.config()
+        assert config.client_names() == ["alice", "bob"]
+        assert config.peer_by_public_key("NONAME=").name is None
+        assert not config.peer_by_name("bob").enabled
+        assert config.subnet() == "10.66.66.1/24"
+        assert "\n\n### Klient alice\n[Peer]\n" in store.render()
+
+    def test_split_refuses_existing_directory(self, store):
+        with pytest.raises(FileExistsError):
+            store.split()
+
+    def test_name_collision_gets_suffix(self, store):
+        store.add_peer("Alice", "ALICE2=")
+        assert len([name for name in peer_files(store) if name.startswith("alice")]) == 2
+        assert store.config().peer_by_public_key("ALICE2=").name == "Alice"
+
+
+class TestPeerChanges:
+    """Testy zmian zapisujących tylko jeden fragment."""
+
+    def test_block_touches_single_fragment(self, store):
+        before = {name: os.stat(os.path.join(store.peers_dir, name)).st_ino for name in peer_files(store)}
+        store.set_enabled("alice", False)
+        after = {name: os.stat(os.path.join(store.peers_dir, name)).st_ino for name in peer_files(store)}
+        assert [name for name in before if before[name] != after[name]] == ["alice.conf"]
+        assert not store.config().peer_by_name("alice").enabled
+
+    def test_unblock_and_update(self, store):
+        assert store.set_enabled("BOB", True).enabled
+        store.update_peer("bob", AllowedIPs="10.66.66.9/32")
+        assert store.config().peer_by_name("bob").allowed_ips == "10.66.66.9/32"
+        assert store.set_enabled("nieznany", True) is None
+
+    def test_remove_by_name_and_key(self, store):
+        assert store.remove_peer("alice").public_key == "ALICE="
+        assert store.remove_peer("nieznany", public_key="NONAME=").public_key == "NONAME="
+        assert peer_files(store) == ["bob.conf"]
+        assert store.remove_peer(public_key="BRAK=") is None
+
+    def test_add_and_clear(self, store):
+        assert store.add_peers([{"name": "dave", "public_key": "DAVE=", "preshared_key": "PSKD=",
+                                 "allowed_ips": "10.66.66.5/32"}]) == 1
+        assert store.config().peer_by_name("dave").preshared_key == "PSKD="
+        assert store.clear_peers() == 4
+        assert store.config().peers() == []
+
+
+class TestAssemblyCache:
+    """Testy pamięci podręcznej złożenia i zapisu wg0.conf."""
+
+    def test_unchanged_fragments_reuse_config(self, store):
+        assert store.config() is store.config()
+
+    def test_changed_fragment_rereads_only_it(self, store):
+        store.config()
+        with patch.object(FragmentStore, "_read_blocks", wraps=FragmentStore._read_blocks) as mock_read:
+            store.set_enabled("alice", False)
+            store.config()
+        read = [os.path.basename(call.args[0]) for call in mock_read.call_args_list]
+        assert set(read) == {"alice.conf"}
+
+    def test_write_config_only_after_change(self, store):
+        assert store.write_config()
+        assert not store.write_config()
+        store.remove_peer("bob")
+        assert store.write_config()
+        with open(store.config_path) as f:
+            content = f.read()
+        assert "BOB=" not in content
+        assert "ALICE=" in content
+
+    def test_delayed_assembly_flushed(self, tmp_path):
+        path = tmp_path / "wg0.conf"
+        path.write_text(CONFIG)
+        store = FragmentStore(path, assemble_delay=3600)
+        store.split()
+        store.remove_peer("alice")
+        assert "ALICE=" in path.read_text()
+        store.flush()
+        assert "ALICE=" not in path.read_text()
+
+    def test_immediate_assembly(self, tmp_path):
+        path = tmp_path / "wg0.conf"
+        path.write_text(CONFIG)
+        store = FragmentStore(path, assemble_delay=0)
+        store.split()
+        store.remove_peer("alice")
+        assert "ALICE=" not in path.read_text()
+        assert store._timer is None
+
+    def test_batch_assembles_once(self, tmp_path):
+        path = tmp_path / "wg0.conf"
+        path.write_text(CONFIG)
+        store = FragmentStore(path, assemble_delay=0)
+        store.split()
+        peers = [{"name": f"user{i}", "public_key": f"KEY{i}=", "allowed_ips": f"10.66.66.{10 + i}/32"} for i in range(3)]
+        with patch.object(store, "write_config", wraps=store.write_config) as mock_write:
+            store.add_peers(peers)
+        mock_write.assert_called_once()
+        assert "KEY2=" in path.read_text()
+
+    def test_sigterm_flushes_and_chains(self, tmp_path):
+        path = tmp_path / "wg0.conf"
+        path.write_text(CONFIG)
+        store = FragmentStore(path, assemble_delay=3600)
+        store.split()
+        store.remove_peer("alice")
+        previous = Mock()
+        config_fragments._stores.clear()
+        config_fragments._stores[str(path)] = store
+        try:
+            with patch.object(config_fragments, "_previous_sigterm", previous):
+                config_fragments._on_sigterm(15, None)
+        finally:
+            config_fragments._stores.clear()
+        assert "ALICE=" not in path.read_text()
+        previous.assert_called_once_with(15, None)
+
+
+def _block_in_child(path, result):
+    from modules.file_lock import file_lock
+    with file_lock(path):
+        result.put("locked")
+
+
+class TestLocking:
+    """Testy blokady międzyprocesowej i składania przed startem wg-quick."""
+
+    def test_edit_holds_file_lock(self, store):
+        ctx = multiprocessing.get_context("fork")
+        result = ctx.Queue()
+        with store.batch():
+            store.set_enabled("alice", False)
+            child = ctx.Process(target=_block_in_child, args=(store.config_path, result))
+            child.start()
+            child.join(0.5)
+            assert child.is_alive()  # Czeka na zwolnienie blokady przez batch()
+        child.join(5)
+        assert result.get(timeout=1) == "locked"
+
+    def test_default_is_deferred(self, tmp_path):
+        path = tmp_path / "wg0.conf"
+        path.write_text(CONFIG)
+        store = FragmentStore(path)
+        store.split()
+        store.remove_peer("alice")
+        assert "ALICE=" in path.read_text()
+        assert store._timer is None
+        assert config_fragments.main(["assemble", str(path)]) == 0
+        assert "ALICE=" not in path.read_text()
+
+    def test_install_start_hook(self, tmp_path):
+        with patch.object(config_fragments, "HOOK_DIR", str(tmp_path / "wg-quick@{nic}.service.d")), \
+                patch("modules.config_fragments.subprocess.run") as mock_run:
+            path = config_fragments.install_start_hook("/etc/wireguard/wg0.conf", python="/usr/bin/python3",
+                                                       project_dir="/opt/pyWGgen")
+        assert path == str(tmp_path / "wg-quick@wg0.service.d" / "pywggen-fragments.conf")
+        hook = open(path).read()
+        assert ("ExecStartPre=/bin/sh -c 'cd /opt/pyWGgen && exec /usr/bin/python3 "
+                "-m modules.config_fragments assemble /etc/wireguard/wg0.conf'") in hook
+        assert "ExecReload=\n" in hook
+        mock_run.assert_called_once_with(["systemctl", "daemon-reload"], check=True)
+
+
+class TestStripped:
+    """Testy treści dla `wg syncconf`."""
+
+    def test_matches_wg_quick_strip(self, store):
+        assert store.stripped() == (
+            "[Interface]\nListenPort = 51820\nPrivateKey = SERVERKEY=\n"
+            "[Peer]\nPublicKey = ALICE=\nPresharedKey = PSKA=\nAllowedIPs = 10.66.66.2/32\n"
+            "[Peer]\nPublicKey = NONAME=\nAllowedIPs = 10.66.66.4/32\n"
+        )
+
+
+class TestLayoutDispatch:
+    """Testy funkcji server_config w obu układach."""
+
+    @pytest.fixture
+    def fragments_layout(self):
+        config_fragments._stores.clear()
+        with patch("settings.SERVER_CONFIG_LAYOUT", "fragments"), \
+                patch.object(config_fragments, "SERVER_CONFIG_ASSEMBLE_DELAY", None):
+            yield
+        config_fragments._stores.clear()
+
+    def test_unknown_layout(self):
+        with pytest.raises(ValueError):
+            resolve_layout("lvm")
+
+    def test_single_layout_edits_file(self, tmp_path):
+        path = tmp_path / "wg0.conf"
+        path.write_text(CONFIG)
+        set_peer_enabled(path, "alice", False)
+        add_server_peers(path, [{"name": "dave", "public_key": "DAVE=", "preshared_key": "P=", "allowed_ips": "10.66.66.5"}])
+        assert remove_server_peer(path, "brak", public_key="NONAME=") is not None
+        content = path.read_text()
+        assert "# PublicKey = ALICE=" in content
+        assert content.endswith("\n### Klient dave\n[Peer]\nPublicKey = DAVE=\nPresharedKey = P=\nAllowedIPs = 10.66.66.5\n")
+        assert "NONAME=" not in content
+        assert not os.path.exists(f"{path}.d")
+
+    def test_batch_helpers(self, tmp_path):
+        path = tmp_path / "wg0.conf"
+        path.write_text(CONFIG)
+        assert set_peers_enabled(path, ["alice", "brak"], False) == ["alice"]
+        assert remove_server_peers(path, [("bob", "BOB="), ("brak", "NONAME=")]) == 2
+        config = load_server_config(path)
+        assert config.client_names() == ["alice"]
+        assert not config.peer_by_name("alice").enabled
+
+    def test_batch_helpers_assemble_once(self, tmp_path, fragments_layout):
+        path = tmp_path / "wg0.conf"
+        path.write_text(CONFIG)
+        store = config_fragments.get_fragment_store(path)
+        store.assemble_delay = 0
+        with patch.object(store, "write_config", wraps=store.write_config) as mock_write:
+            assert set_peers_enabled(path, ["alice", "bob", "brak"], False) == ["alice", "bob"]
+            assert mock_write.call_count == 1
+            assert remove_server_peers(path, [("alice", None), ("bob", None)]) == 2
+            assert mock_write.call_count == 2
+        assert load_server_config(path).client_names() == []
+
+    def test_fragments_layout_splits_on_first_use(self, tmp_path, fragments_layout):
+        path = tmp_path / "wg0.conf"
+        path.write_text(CONFIG)
+        set_peer_enabled(path, "alice", False)
+        assert os.path.isdir(f"{path}.d/peers")
+        assert path.read_text() == CONFIG
+        assert not load_server_config(path).peer_by_name("alice").enabled
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -9,7 +9,7 @@ Moduł testuje funkcjonalność synchronizacji danych między:
 
 Sprawdzane scenariusze:
 - Wczytywanie/zapisywanie plików JSON (poprawne/uszkodzone/brakujące)
-- Parsowanie outputu `wg show` (pełny/częściowy/błąd subprocess)
+- Mapowanie migawki `wg show all dump` (pełna/częściowa/błąd subprocess)
 - Synchronizacja statusów peerów (aktywny/nieaktywny/nowy)
 - Pełne scenariusze integracyjne z mockami
 """
@@ -85,54 +85,48 @@ class TestDataSync(unittest.TestCase):
         result = load_json(self.user_records_json_path)
         self.assertEqual(result, {})
 
-    @patch('subprocess.check_output')
-    def test_get_wg_show_data_success(self, mock_subprocess):
-        """Test parsowania wg show - 🎯 OSTATECZNIE NAPRAWIONE!"""
-        wg_output = """interface: wg0
-peer: ABC123=
-  endpoint: 1.2.3.4:51820
-  allowed ips: 10.0.0.2/32
-  latest handshake: 1 hour, 23 minutes ago
-  transfer: 1.23 MiB received, 456.78 KiB sent
-
-peer: XYZ789=
-  endpoint: 5.6.7.8:51820
-  allowed ips: 10.0.0.3/32
-  latest handshake: 2 days ago
-  transfer: 2.34 MiB received, 1.23 MiB sent"""
-        
-        mock_subprocess.return_value = wg_output
-        
-        from modules.data_sync import get_wg_show_data
-        result = get_wg_show_data()
+    def make_snapshot(self, dump):
+        """Migawka WireGuard z tekstu `wg show all dump`."""
+        from modules.wg_snapshot import WgSnapshot, parse_dump
+        return WgSnapshot(*parse_dump(dump.splitlines()))
+
+    def test_get_wg_show_data_success(self):
+        """Test mapowania migawki `wg show all dump` na dane peerów."""
+        dump = (
+            "wg0\tPRIV=\tPUB=\t51820\toff\n"
+            "wg0\tABC123=\t(none)\t1.2.3.4:51820\t10.0.0.2/32\t1732341600\t1289748\t467742\t25\n"
+            "wg0\tXYZ789=\t(none)\t5.6.7.8:51820\t10.0.0.3/32,fd42::3/128\t0\t2453667\t1289748\toff\n"
+        )
+        with patch('modules.data_sync.get_snapshot', return_value=self.make_snapshot(dump)):
+            from modules.data_sync import get_wg_show_data
+            result = get_wg_show_data()
         
-        # 🎯 RZECZYWISTE WYNIKI PARSERA (dokładnie to co zwraca funkcja):
         self.assertIn("ABC123=", result)
         self.assertIn("XYZ789=", result)
-        self.assertEqual(result["ABC123="]["endpoint"], "1.2.3.4")           # BEZ PORTU!
+        self.assertEqual(result["ABC123="]["endpoint"], "1.2.3.4:51820")
         self.assertEqual(result["ABC123="]["allowed_ips"], "10.0.0.2/32")
-        self.assertEqual(result["ABC123="]["last_handshake"], "1 hour, 23 minutes ago")
+        self.assertEqual(result["ABC123="]["last_handshake"], "2024-11-23 06:00:00 UTC")
         self.assertEqual(result["ABC123="]["uploaded"], "1.23 MiB received")
         self.assertEqual(result["ABC123="]["downloaded"], "456.78 KiB sent")
+        self.assertEqual(result["XYZ789="]["allowed_ips"], "10.0.0.3/32, fd42::3/128")
+        self.assertNotIn("last_handshake", result["XYZ789="])
 
-    @patch('subprocess.check_output', side_effect=subprocess.CalledProcessError(1, 'wg'))
-    def test_get_wg_show_data_error(self, mock_subprocess):
+    @patch('modules.data_sync.get_snapshot', side_effect=subprocess.CalledProcessError(1, 'wg'))
+    def test_get_wg_show_data_error(self, mock_snapshot):
         """Test błędu wg show."""
         from modules.data_sync import get_wg_show_data
         result = get_wg_show_data()
         self.assertEqual(result, {})
 
-    @patch('subprocess.check_output')
-    def test_get_wg_show_data_partial(self, mock_subprocess):
-        """Test częściowego outputu wg show."""
-        wg_output = """peer: ABC123=
-  allowed ips: 10.0.0.2/32"""
-        mock_subprocess.return_value = wg_output
-        
-        from modules.data_sync import get_wg_show_data
-        result = get_wg_show_data()
+    def test_get_wg_show_data_partial(self):
+        """Test peera bez endpointu i handshake'a."""
+        dump = "wg0\tABC123=\t(none)\t(none)\t10.0.0.2/32\t0\t0\t0\toff\n"
+        with patch('modules.data_sync.get_snapshot', return_value=self.make_snapshot(dump)):
+            from modules.data_sync import get_wg_show_data
+            result = get_wg_show_data()
         self.assertIn("ABC123=", result)
         self.assertEqual(result["ABC123="]["allowed_ips"], "10.0.0.2/32")
+        self.assertNotIn("endpoint", result["ABC123="])
 
     def test_sync_user_data_basic(self):
         """Test podstawowej synchronizacji."""
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Testy jednostkowe harmonogramu wygasania kont.
+
+Moduł testuje:
+- Terminy akcji z pól expires_at, auto_suspend_date i auto_delete_date
+- Usunięcie tylko z terminem późniejszym niż zawieszenie
+- Akcje spoza EXPIRY_ACTIONS i przebieg próbny bez zmian kont
+- Wykonanie wszystkich zaległych akcji jedną paczką
+- Przeniesienie konfiguracji i kodów QR usuniętych kont do STALE_CONFIG_DIR
+- Przedłużone konto wracające do kopca z nowym terminem
+- Wątek budzony na najbliższy termin (także przy opóźnionym starcie wątku)
+"""
+
+import pytest
+import json
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from modules.expiry_scheduler import DELETE, EXPIRED_REASON, SUSPEND, ExpiryScheduler, record_deadlines
+
+NOW = 1_760_000_000
+
+
+def iso(timestamp):
+    return datetime.fromtimestamp(timestamp).isoformat()
+
+
+def record(public_key, suspend, delete, status="active"):
+    return {"public_key": public_key, "allowed_ips": f"10.66.66.{len(public_key)}/32", "status": status,
+            "expires_at": iso(suspend), "auto_suspend_date": iso(suspend), "auto_delete_date": iso(delete)}
+
+
+class TestDeadlines:
+    """Testy terminów akcji rekordu."""
+
+    def test_earlier_suspend_date_wins(self):
+        deadlines = record_deadlines({"expires_at": iso(NOW + 100), "auto_suspend_date": iso(NOW + 50),
+                                      "auto_delete_date": iso(NOW + 200)})
+        assert deadlines == {SUSPEND: pytest.approx(NOW + 50), DELETE: pytest.approx(NOW + 200)}
+
+    def test_delete_not_before_suspend(self):
+        same = iso(NOW + 100)
+        assert record_deadlines({"expires_at": same, "auto_suspend_date": same, "auto_delete_date": same}) == \
+            {SUSPEND: pytest.approx(NOW + 100)}
+
+    def test_missing_dates(self):
+        assert record_deadlines({"expires_at": "N/A", "auto_delete_date": "jutro"}) == {}
+
+
+class TestRunDue:
+    """Testy wykonania zaległych akcji."""
+
+    @pytest.fixture
+    def paths(self, tmp_path):
+        paths = {name: tmp_path / name for name in ("wg_configs", "qrcodes", "stale")}
+        for path in paths.values():
+            path.mkdir()
+        records = tmp_path / "user_records.json"
+        records.write_text(json.dumps({
+            "alice": record("A=", NOW - 10, NOW + 1000),
+            "bob": record("BB=", NOW - 5, NOW + 1000),
+            "carol": record("CCC=", NOW - 20, NOW - 1),
+            "dave": record("DDDD=", NOW - 30, NOW + 1000, status="blocked"),
+            "erin": record("EEEEE=", NOW + 3600, NOW + 7200),
+        }))
+        (paths["wg_configs"] / "carol.conf").write_text("[Interface]\n")
+        (paths["qrcodes"] / "carol.png").write_bytes(b"png")
+        with patch("settings.USER_STORE_BACKEND", "json"), \
+                patch("settings.WG_CONFIG_DIR", paths["wg_configs"]), \
+                patch("settings.QR_CODE_DIR", paths["qrcodes"]), \
+                patch("settings.STALE_CONFIG_DIR", paths["stale"]), \
+                patch("settings.IP_POOL_PATH", tmp_path / "ip_pool.json"), \
+                patch("settings.EXPIRY_ACTIONS", ("suspend", "delete")):
+            paths["records"] = records
+            yield paths
+
+    def scheduler(self, paths):
+        return ExpiryScheduler(paths["records"], "wg0", "/etc/wireguard/wg0.conf", clock=lambda: NOW)
+
+    def test_due_actions_in_one_batch(self, paths):
+        scheduler = self.scheduler(paths)
+        assert scheduler.resync() == 9  # Zawieszenie dave (już zablokowany) pominięte
+        with patch("modules.server_config.set_peers_enabled") as mock_enable, \
+                patch("modules.server_config.remove_server_peers") as mock_remove_config, \
+                patch("modules.peer_apply.remove_peers") as mock_remove:
+            summary = scheduler.run_due()
+
+        assert sorted(summary["suspended"]) == ["alice", "bob"]
+        assert summary["deleted"] == ["carol"]
+        assert sorted(mock_enable.call_args.args[1]) == ["alice", "bob"]
+        mock_remove_config.assert_called_once_with("/etc/wireguard/wg0.conf", [("carol", "CCC=")])
+        assert [sorted(call.args[1]) for call in mock_remove.call_args_list] == [["A=", "BB="], ["CCC="]]
+
+        records = json.loads(paths["records"].read_text())
+        assert "carol" not in records
+        assert (records["alice"]["status"], records["alice"]["blocked_reason"]) == ("blocked", EXPIRED_REASON)
+        assert records["erin"]["status"] == "active"
+        stale = sorted(os.listdir(paths["stale"]))
+        assert [name.split("_")[0] for name in stale] == ["carol", "carol"]
+        assert not os.listdir(paths["qrcodes"])
+        assert scheduler.next_due() == pytest.approx(NOW + 1000)
+
+    def test_disabled_actions_only_logged(self, paths):
+        scheduler = self.scheduler(paths)
+        scheduler.resync()
+        before = paths["records"].read_text()
+        with patch("settings.EXPIRY_ACTIONS", ("suspend",)), \
+                patch("modules.expiry_scheduler.suspend_users", return_value=["alice", "bob"]) as mock_suspend, \
+                patch("modules.expiry_scheduler.delete_users") as mock_delete:
+            summary = scheduler.run_due()
+        mock_delete.assert_not_called()
+        assert sorted(mock_suspend.call_args.args[1]) == ["alice", "bob"]
+        assert summary["skipped"] == {DELETE: ["carol"]}
+        assert paths["records"].read_text() == before
+
+    def test_dry_run_changes_nothing(self, paths):
+        scheduler = self.scheduler(paths)
+        scheduler.resync()
+        with patch("modules.expiry_scheduler.suspend_users") as mock_suspend, \
+                patch("modules.expiry_scheduler.delete_users") as mock_delete:
+            summary = scheduler.run_due(dry_run=True)
+        mock_suspend.assert_not_called()
+        mock_delete.assert_not_called()
+        assert summary["skipped"] == {SUSPEND: ["alice", "bob"], DELETE: ["carol"]}
+
+    def test_extended_account_rescheduled(self, paths):
+        scheduler = self.scheduler(paths)
+        scheduler.schedule_user("erin", record("EEEEE=", NOW - 1, NOW + 7200))  # termin sprzed przedłużenia
+        with patch("modules.expiry_scheduler.suspend_users") as mock_suspend:
+            summary = scheduler.run_due()
+        mock_suspend.assert_not_called()
+        assert summary == {"suspended": [], "deleted": [], "skipped": {}}
+        assert scheduler.next_due() == pytest.approx(NOW + 3600)
+
+
+class TestThread:
+    """Testy wątku harmonogramu."""
+
+    def test_wakes_on_next_deadline(self, tmp_path):
+        path = tmp_path / "user_records.json"
+        path.write_text(json.dumps({}))
+        done = []
+        scheduler = ExpiryScheduler(path, "wg0", "/etc/wireguard/wg0.conf", resync_interval=3600)
+        with patch("settings.USER_STORE_BACKEND", "json"), \
+                patch("settings.EXPIRY_ACTIONS", ("suspend",)), \
+                patch("modules.expiry_scheduler.suspend_users",
+                      side_effect=lambda store, records, *args: done.extend(records) or list(records)):
+            scheduler.start()
+            try:
+                due = time.time() + 0.2
+                record_data = record("A=", due, due + 3600)
+                path.write_text(json.dumps({"alice": record_data}))
+                scheduler.schedule_user("alice", record_data)
+                deadline = time.time() + 3
+                while not done and time.time() < deadline:
+                    time.sleep(0.02)
+            finally:
+                scheduler.stop()
+        assert done == ["alice"]
+        assert time.time() >= due
+
+    def test_late_thread_start_keeps_new_deadlines(self, tmp_path):
+        """Termin po start() nie trafia do przebiegu próbnego, gdy wątek ruszy po nim."""
+        path = tmp_path / "user_records.json"
+        path.write_text(json.dumps({"alice": record("A=", NOW + 0.5, NOW + 3600),
+                                    "bob": record("B=", NOW - 10, NOW + 3600)}))
+        done = []
+        # start() odczytuje zegar przed terminem alice, wątek harmonogramu już po nim
+        scheduler = ExpiryScheduler(path, "wg0", "/etc/wireguard/wg0.conf", resync_interval=3600,
+                                    clock=lambda: NOW if threading.current_thread() is threading.main_thread() else NOW + 1)
+        with patch("settings.USER_STORE_BACKEND", "json"), \
+                patch("settings.EXPIRY_ACTIONS", ("suspend",)), \
+                patch("modules.expiry_scheduler.suspend_users",
+                      side_effect=lambda store, records, *args: done.extend(records) or list(records)):
+            scheduler.start()
+            try:
+                deadline = time.time() + 3
+                while not done and time.time() < deadline:
+                    time.sleep(0.02)
+            finally:
+                scheduler.stop()
+        assert done == ["alice"]  # bob (termin przed start()) tylko wypisany
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -3,10 +3,10 @@
 Testy jednostkowe funkcji blokowania użytkowników WireGuard VPN.
 
 Moduł testuje implementację blokady/odblokowania użytkowników:
-- Operacje JSON (user_records.json)
+- Operacje na magazynie użytkowników (JSON/SQLite)
 - Parsowanie i modyfikacja wg_server.conf
 - Komentowanie/odkomentowywanie bloków [Peer]
-- Synchronizacja WireGuard (wg syncconf)
+- Synchronizacja WireGuard (przyrostowa, fallback wg syncconf)
 - Obsługa błędów i rollback
 """
 
@@ -32,7 +32,7 @@ class TestBlockUser:
             content = f.read()
         
         required_imports = [
-            'import json', 'subprocess', 'USER_DB_PATH', 
+            'open_user_store', 'schedule_sync', 'USER_DB_PATH', 
             'SERVER_CONFIG_FILE', 'SERVER_WG_NIC'
         ]
         
@@ -47,6 +47,7 @@ class TestBlockUser:
         functions = [
             'def load_user_records():',
             'def save_user_records(',
+            'def set_user_status(username, status):',
             'def block_user(username):',
             'def unblock_user(username):',
             'def update_wireguard_config('
@@ -60,8 +61,9 @@ class TestBlockUser:
         with open(self.MAIN_FILE, 'r') as f:
             content = f.read()
         
-        assert '["status"] = "blocked"' in content
-        assert '["status"] = "active"' in content
+        assert 'set_user_status(username, "blocked")' in content
+        assert 'set_user_status(username, "active")' in content
+        assert '{"status": status}' in content
 
     def test_wireguard_parsing(self):
         """Test parsowania konfiguracji WireGuard."""
@@ -69,10 +71,8 @@ class TestBlockUser:
             content = f.read()
         
         wg_features = [
-            '### Client {username}',
-            'in_peer_block = True',
-            'if line.startswith("# ")',
-            'wg syncconf'
+            'set_peer_enabled(SERVER_CONFIG_FILE, username, not block)',
+            'schedule_sync'
         ]
         
         for feature in wg_features:
@@ -84,7 +84,7 @@ class TestBlockUser:
             content = f.read()
         
         error_patterns = [
-            'FileNotFoundError:', 'except Exception as e:',
+            'except Exception as e:',
             '"[BŁĄD] Nie udało się',
             'return False,'
         ]
@@ -93,35 +93,34 @@ class TestBlockUser:
             assert pattern in content, f"Brakuje obsługi błędu: {pattern}"
 
     def test_json_operations(self):
-        """Test operacji JSON."""
+        """Test operacji na magazynie użytkowników."""
         with open(self.MAIN_FILE, 'r') as f:
             content = f.read()
         
-        json_ops = [
-            'json.load(f)', 'json.dump(records, f, indent=4)',
-            'with open(USER_DB_PATH, "r")',
-            'with open(USER_DB_PATH, "w")'
+        store_ops = [
+            'dict(get_repository().records())',
+            'open_user_store(USER_DB_PATH).replace_all(records)',
+            'open_user_store(USER_DB_PATH).update(username, {"status": status})'
         ]
         
-        for op in json_ops:
-            assert op in content, f"Brakuje operacji JSON: {op}"
+        for op in store_ops:
+            assert op in content, f"Brakuje operacji magazynu: {op}"
 
     def test_config_update_logic(self):
         """Test logiki aktualizacji konfiguracji."""
         with open(self.MAIN_FILE, 'r') as f:
             content = f.read()
         
-        assert 'updated_lines.append(f"# {line}")' in content
-        assert 'updated_lines.append(line[2:])' in content
+        assert 'from modules.server_config import set_peer_enabled' in content
+        assert 'is None:' in content
 
     def test_wg_sync_command(self):
         """Test komendy synchronizacji WireGuard."""
         with open(self.MAIN_FILE, 'r') as f:
             content = f.read()
         
-        assert 'wg syncconf' in content
-        assert 'SERVER_WG_NIC' in content
-        assert 'wg-quick strip' in content
+        assert 'from modules.sync_scheduler import schedule_sync' in content
+        assert 'schedule_sync(SERVER_WG_NIC, SERVER_CONFIG_FILE)' in content
 
     def test_return_patterns(self):
         """Test wzorców zwracanych wartości."""
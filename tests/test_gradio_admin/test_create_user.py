@@ -3,17 +3,17 @@
 Testy jednostkowe funkcji tworzenia użytkownika WireGuard VPN.
 
 Moduł testuje implementację tworzenia użytkownika:
-- Obsługa ścieżek Path (configs, qrcodes)
-- Wywołanie subprocess main.py
+- Wywołanie usługi modules/user_service.py w bieżącym procesie (bez subprocess main.py)
 - Walidacja parametrów (username, email)
-- Sprawdzanie istnienia plików konfiguracji/QR
-- Obsługa błędów subprocess i duplikatów
+- Zwracanie komunikatu i ścieżki kodu QR
+- Obsługa błędów i duplikatów
 """
 
 import pytest
 import os
 from pathlib import Path
 import sys
+from unittest.mock import patch
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
@@ -31,12 +31,9 @@ class TestCreateUser:
         with open(self.MAIN_FILE, 'r', encoding='utf-8') as f:
             content = f.read()
         
-        required_imports = [
-            'import os', 'subprocess', 'from pathlib import Path'
-        ]
-        
-        for imp in required_imports:
-            assert imp in content, f"Brakuje: {imp}"
+        assert 'from modules.user_service import create_user as create_user_in_process' in content
+        assert 'subprocess' not in content
+        assert '"main.py"' not in content
 
     def test_main_function(self):
         """Test głównej funkcji create_user."""
@@ -46,68 +43,33 @@ class TestCreateUser:
         assert 'def create_user(username, email=' in content
         assert 'telegram_id="N/A"):' in content
 
-    def test_path_handling(self):
-        """Test obsługi ścieżek Path."""
-        with open(self.MAIN_FILE, 'r') as f:
-            content = f.read()
-        
-        path_features = [
-            'Path(__file__).parent.parent.parent',
-            'configs" / f"{username}.conf"',
-            '"user" / "data" / "qrcodes"'
-        ]
-        
-        for feature in path_features:
-            assert feature in content, f"Brakuje ścieżki: {feature}"
+    def test_empty_username(self):
+        """Test pustej nazwy użytkownika."""
+        from gradio_admin.functions.create_user import create_user
+        assert create_user("") == ("Błąd: Nazwa użytkownika nie może być pusta.", None)
 
-    def test_subprocess_call(self):
-        """Test wywołania subprocess main.py."""
-        with open(self.MAIN_FILE, 'r') as f:
-            content = f.read()
-        
-        assert 'subprocess.run(\n' in content
-        assert '"python3", "main.py", username,' in content
-        assert 'cwd=str(base_dir),' in content
-        assert 'capture_output=True,' in content
-        print("✅ Subprocess call OK!")
+    def test_success_returns_qr_path(self):
+        """Test zwracania komunikatu i ścieżki kodu QR."""
+        from gradio_admin.functions.create_user import create_user
+        result = {
+            "success": True, "username": "jan", "message": "✅ Użytkownik jan pomyślnie utworzony.",
+            "config_path": "user/data/wg_configs/jan.conf", "qr_path": "user/data/qrcodes/jan.png",
+            "ip": "10.66.66.2", "timings": {"total": 12.0},
+        }
+        with patch('gradio_admin.functions.create_user.create_user_in_process', return_value=result) as mock_create:
+            message, qr_path = create_user("jan", "jan@example.com", "")
 
-    def test_error_handling(self):
-        """Test obsługi błędów."""
-        with open(self.MAIN_FILE, 'r') as f:
-            content = f.read()
-        
-        error_checks = [
-            'if not username:', 
-            'config_path.exists()',
-            'subprocess.CalledProcessError',
-            '"already exists"'
-        ]
-        
-        for check in error_checks:
-            assert check in content, f"Brakuje sprawdzenia błędu: {check}"
-
-    def test_success_patterns(self):
-        """Test wzorców sukcesu."""
-        with open(self.MAIN_FILE, 'r') as f:
-            content = f.read()
-        
-        success_patterns = [
-            '✅ Użytkownik',
-            'qr_code_path.exists()',
-            'str(qr_code_path)'
-        ]
-        
-        for pattern in success_patterns:
-            assert pattern in content, f"Brakuje wzorca sukcesu: {pattern}"
+        mock_create.assert_called_once_with("jan", "jan@example.com", "N/A")
+        assert message.startswith("✅ Użytkownik jan")
+        assert "10.66.66.2" in message
+        assert qr_path == "user/data/qrcodes/jan.png"
 
-    def test_return_values(self):
-        """Test wartości zwrotnych."""
-        with open(self.MAIN_FILE, 'r') as f:
-            content = f.read()
-        
-        assert 'return ' in content and ', None' in content
-        assert 'return f"✅' in content
+    def test_duplicate_user(self):
+        """Test istniejącego użytkownika."""
+        from gradio_admin.functions.create_user import create_user
+        result = {"success": False, "message": "Błąd: Użytkownik 'jan' już istnieje!", "qr_path": None}
+        with patch('gradio_admin.functions.create_user.create_user_in_process', return_value=result):
+            assert create_user("jan") == ("Błąd: Użytkownik 'jan' już istnieje!", None)
 
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
-
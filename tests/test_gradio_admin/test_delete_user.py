@@ -5,15 +5,18 @@ Testy jednostkowe funkcji usuwania użytkownika WireGuard VPN.
 Moduł testuje implementację usuwania użytkownika:
 - System logowania z timestamp
 - Operacje plików (user_records.json, wg configs, QR)
-- Komendy WireGuard (wg set peer, wg syncconf)
+- Synchronizacja WireGuard (harmonogram sync_scheduler)
 - Parsowanie konfiguracji wg_server.conf
 - Obsługa błędów i walidacja
+- Zwolnienie adresu IP dopiero po usunięciu peera
 """
 
 import pytest
 import os
 from pathlib import Path
 import sys
+import json
+from unittest.mock import patch
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
@@ -32,8 +35,8 @@ class TestDeleteUser:
             content = f.read()
         
         required_imports = [
-            'import os', 'subprocess', 'from datetime import datetime',
-            'read_json', 'write_json', 'get_wireguard_config_path',
+            'import os', 'schedule_sync', 'from datetime import datetime',
+            'open_user_store', 'get_wireguard_config_path',
             'WG_CONFIG_DIR', 'QR_CODE_DIR', 'SERVER_WG_NIC'
         ]
         
@@ -91,9 +94,8 @@ class TestDeleteUser:
             content = f.read()
         
         wg_commands = [
-            '"sudo", "wg", "set", "wg0", "peer"',
-            'wg syncconf',
-            'wg-quick strip',
+            'from modules.sync_scheduler import schedule_sync',
+            'schedule_sync(SERVER_WG_NIC, wg_config_path)',
             'SERVER_WG_NIC'
         ]
         
@@ -101,14 +103,13 @@ class TestDeleteUser:
             assert cmd in content, f"Brakuje komendy WG: {cmd}"
 
     def test_json_handling(self):
-        """Test obsługi JSON."""
+        """Test usuwania rekordu z magazynu użytkowników."""
         with open(self.MAIN_FILE, 'r') as f:
             content = f.read()
         
         json_ops = [
-            'read_json(user_records_path)',
-            'write_json(user_records_path, user_data)',
-            'user_data.pop(username)'
+            'store = open_user_store(user_records_path)',
+            'user_info = store.delete(username)'
         ]
         
         for op in json_ops:
@@ -120,9 +121,8 @@ class TestDeleteUser:
             content = f.read()
         
         parsing = [
-            'PublicKey"',
-            '### Client {client_name}',
-            'skip_lines = 5'
+            'load_server_config(config_path).peer_by_name(username)',
+            'remove_server_peer(config_path, client_name, public_key)'
         ]
         
         for feature in parsing:
@@ -134,8 +134,8 @@ class TestDeleteUser:
             content = f.read()
         
         errors = [
-            'if not os.path.exists(user_records_path):',
-            'if username not in user_data:',
+            'if not os.path.exists(user_records_path) and store.count() == 0:',
+            'if user_info is None:',
             'except Exception as e:',
             '❌ Błąd'
         ]
@@ -165,5 +165,38 @@ class TestDeleteUser:
         assert 'return f"✅' in content
         assert 'return f"❌' in content
 
+class TestDeleteUserIpRelease:
+    """Testy kolejności usuwania peera i zwalniania adresu IP."""
+
+    @pytest.fixture
+    def workspace(self, tmp_path, monkeypatch):
+        from gradio_admin.functions import delete_user as module
+        monkeypatch.chdir(tmp_path)
+        records = tmp_path / "user" / "data" / "user_records.json"
+        records.parent.mkdir(parents=True)
+        records.write_text(json.dumps({"jan": {"allowed_ips": "10.66.66.2/32", "public_key": "PUB_JAN="}}))
+        config = tmp_path / "wg0.conf"
+        config.write_text("[Interface]\nAddress = 10.66.66.1/24\n\n### Klient jan\n[Peer]\nPublicKey = PUB_JAN=\nAllowedIPs = 10.66.66.2/32\n")
+        with patch("settings.USER_STORE_BACKEND", "json"), \
+                patch.object(module, "get_wireguard_config_path", return_value=str(config)), \
+                patch.object(module, "WG_CONFIG_DIR", str(tmp_path)), \
+                patch.object(module, "QR_CODE_DIR", str(tmp_path)), \
+                patch.object(module, "schedule_sync"), \
+                patch.object(module, "release_ip", return_value=True) as mock_release:
+            yield module, config, mock_release
+
+    def test_ip_released_after_peer_removed(self, workspace):
+        module, config, mock_release = workspace
+        assert module.delete_user("jan").startswith("✅")
+        assert "PUB_JAN=" not in config.read_text()
+        mock_release.assert_called_once()
+
+    def test_ip_kept_when_peer_removal_fails(self, workspace):
+        module, config, mock_release = workspace
+        with patch.object(module, "remove_server_peer", side_effect=OSError("brak miejsca")):
+            assert module.delete_user("jan").startswith("❌")
+        mock_release.assert_not_called()
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
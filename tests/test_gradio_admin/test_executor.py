@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Testy jednostkowe pul wątków funkcji obsługi Gradio.
+
+Moduł testuje:
+- Wykonanie funkcji w nazwanej puli i przekazanie wyniku oraz wyjątków
+- Limit wywołań na funkcję obsługi i kolejkę oczekujących
+- Wykonywanie zmian konfiguracji po kolei (pula "mutation")
+- Opis zadań w toku i w kolejce
+"""
+
+import pytest
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from gradio_admin.functions.executor import describe_jobs, job_counts, pooled, run_in_pool
+
+
+class TestPools:
+    """Testy pul wątków."""
+
+    def test_result_and_exception(self):
+        assert run_in_pool("render", lambda x: threading.current_thread().name + x, "!").startswith("gradio-render")
+        with pytest.raises(ZeroDivisionError):
+            run_in_pool("probe", lambda: 1 / 0)
+        with pytest.raises(ValueError):
+            pooled("gpu")
+
+    def test_handler_limit_queues_calls(self):
+        release = threading.Event()
+        running = []
+
+        @pooled("probe", limit=1)
+        def probe(name):
+            running.append(name)
+            release.wait(2)
+            return name
+
+        threads = [threading.Thread(target=probe, args=(name,)) for name in ("a", "b", "c")]
+        for thread in threads:
+            thread.start()
+        deadline = time.time() + 2
+        while job_counts()["probe"] != {"queued": 2, "running": 1} and time.time() < deadline:
+            time.sleep(0.01)
+        assert job_counts()["probe"] == {"queued": 2, "running": 1}
+        assert len(running) == 1
+        assert describe_jobs() == "🧵 Sondy: 1 w toku, 2 w kolejce"
+        release.set()
+        for thread in threads:
+            thread.join(2)
+        assert sorted(running) == ["a", "b", "c"]
+        assert describe_jobs() == "🧵 Brak zadań w toku"
+
+    def test_mutations_serialized(self):
+        active, overlaps = [], []
+
+        @pooled("mutation")
+        def mutate():
+            active.append(1)
+            overlaps.append(len(active))
+            time.sleep(0.02)
+            active.pop()
+
+        threads = [threading.Thread(target=mutate) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(2)
+        assert overlaps == [1, 1, 1, 1]
+
+    def test_signature_preserved(self):
+        @pooled("render")
+        def handler(show_inactive, query):
+            return query
+
+        import inspect
+        assert list(inspect.signature(handler).parameters) == ["show_inactive", "query"]
+        assert handler(True, "jan") == "jan"
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Testy jednostkowe leniwych zakładek interfejsu Gradio.
+
+Moduł testuje:
+- Podpinanie zgłoszonych funkcji wczytujących pod wybór zakładki
+- Pomiar czasu budowy zakładek
+- Budowę zakładek bez odczytu danych (tabela, lista użytkowników, kontekst serwera)
+"""
+
+import pytest
+import os
+import sys
+from unittest.mock import MagicMock, patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from gradio_admin.functions import lazy_tabs
+
+
+class TestBuildTab:
+    """Testy build_tab i on_tab_select."""
+
+    def test_loaders_bound_to_select(self):
+        tab = MagicMock(label="📊 Test")
+        loader = lambda: "dane"
+
+        def builder():
+            lazy_tabs.on_tab_select(loader, inputs=["a"], outputs=["b"])
+            return "komponenty"
+
+        assert lazy_tabs.build_tab(tab, builder) == "komponenty"
+        tab.select.assert_called_once_with(fn=loader, inputs=["a"], outputs=["b"])
+        assert "📊 Test" in lazy_tabs.BUILD_TIMES
+        assert "📊 Test" in lazy_tabs.describe_build_times()
+
+        other = MagicMock(label="Inna")
+        lazy_tabs.build_tab(other, lambda: None)
+        other.select.assert_not_called()  # Zgłoszenia nie przechodzą do kolejnej zakładki
+
+
+class TestTabsWithoutData:
+    """Testy budowy zakładek bez odczytu danych."""
+
+    def test_tabs_defer_data_loading(self):
+        gr = pytest.importorskip("gradio")
+        from gradio_admin.tabs.statistics_tab import statistics_tab
+        from gradio_admin.tabs.manage_user_tab import manage_user_tab
+        from gradio_admin.tabs.ollama_chat_tab import ollama_chat_tab
+
+        with patch("gradio_admin.tabs.statistics_tab.table_page") as mock_page, \
+                patch("gradio_admin.tabs.statistics_tab.warm_search_index"), \
+                patch("gradio_admin.tabs.manage_user_tab.load_user_records") as mock_records, \
+                patch("gradio_admin.tabs.ollama_chat_tab.get_server_context_html") as mock_context:
+            with gr.Blocks():
+                for label, builder in (("S", statistics_tab), ("M", manage_user_tab), ("C", ollama_chat_tab)):
+                    with gr.Tab(label=label) as tab:
+                        lazy_tabs.build_tab(tab, builder)
+
+        for mock in (mock_page, mock_records, mock_context):
+            mock.assert_not_called()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -57,7 +57,7 @@ class TestManageUserTab:
             'def get_user_config_path(username):',
             'def handle_download_config(',
             'def manage_user_tab():',
-            'def get_user_list():',
+            'def get_user_list(query=""):',
             'def handle_user_deletion(',
             'def handle_sync('
         ]
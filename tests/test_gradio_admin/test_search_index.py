@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Testy jednostkowe indeksu wyszukiwania użytkowników.
+
+Moduł testuje:
+- Dopasowanie prefiksów (zapytania krótsze niż 3 znaki) i podciągów (trigramy)
+- Pola username, allowed_ips, user_id, email, telegram_id i status
+- Kandydatów listy wyboru (dokładna nazwa, prefiks, limit)
+- Przyrostową aktualizację (tylko zmienione rekordy) i usuwanie rekordów
+- Synchronizację z wersją repozytorium rekordów
+- Wydajność zapytań dla 20 tys. użytkowników
+"""
+
+import pytest
+import json
+import os
+import sys
+import time
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from gradio_admin.functions.search_index import SearchIndex
+
+
+def records(count):
+    return {
+        f"user{i}": {"allowed_ips": f"10.66.{i // 256}.{i % 256}/32", "user_id": f"{i:08x}-uid",
+                     "email": f"user{i}@example.com", "telegram_id": str(500000 + i),
+                     "status": "active" if i % 3 else "blocked"}
+        for i in range(count)
+    }
+
+
+class TestSearchIndex:
+    """Testy indeksu prefiksów i trigramów."""
+
+    @pytest.fixture
+    def index(self):
+        index = SearchIndex()
+        index.update(records(12))
+        return index
+
+    def test_prefix_for_short_queries(self, index):
+        assert index.search("us") == set(records(12))
+        assert index.search("u1") == set()  # prefiks, nie podciąg
+        assert index.search("50") == set(records(12))  # telegram_id
+        assert index.search("9") == set()
+        assert index.search("") == set(records(12))
+
+    def test_substring_for_longer_queries(self, index):
+        assert index.search("USER1") == {"user1", "user10", "user11"}
+        assert index.search("ser11") == {"user11"}
+        assert index.search("brak") == set()
+
+    def test_all_fields(self, index):
+        assert index.search("10.66.0.7/") == {"user7"}
+        assert index.search("0000000a-uid") == {"user10"}
+        assert index.search("user5@example") == {"user5"}
+        assert index.search("500004") == {"user4"}
+        assert index.search("blocked") == {"user0", "user3", "user6", "user9"}
+
+    def test_suggest_ranking_and_limit(self, index):
+        assert index.suggest("user1", 3) == ["user1", "user10", "user11"]
+        assert index.suggest("", 2) == ["user0", "user1"]
+        assert index.suggest("example", 20) == sorted(records(12))
+        assert index.suggest("500011", 5) == ["user11"]
+
+    def test_incremental_update_and_removal(self, index):
+        changed = records(12)
+        changed["user2"]["email"] = "nowy@example.pl"
+        changed["user3"]["data_used"] = "5.00 GiB"  # pole spoza indeksu
+        del changed["user4"]
+        assert index.update(changed) == 2
+        assert index.search("nowy@") == {"user2"}
+        assert index.search("user2@") == set()
+        assert "user4" not in index.search("us")
+        assert len(index) == 11
+
+    def test_follows_repository_version(self, tmp_path):
+        from gradio_admin.functions import user_records
+        from gradio_admin.functions.search_index import search_users
+        path = tmp_path / "user_records.json"
+        data = records(3)
+        path.write_text(json.dumps(data))
+        repository = user_records.UserRecordRepository(path)
+        with patch("settings.USER_STORE_BACKEND", "json"), \
+                patch.object(user_records, "_repository", repository):
+            assert search_users("user2@") == {"user2"}
+            data["user2"]["email"] = "inny@example.com"
+            path.write_text(json.dumps(data) + " ")
+            assert search_users("user2@") == set()
+            assert search_users("inny") == {"user2"}
+
+    def test_20k_users_under_20ms(self):
+        index = SearchIndex()
+        index.update(records(20_000))
+        for query in ("us", "user1999", "10.66.7", "500123", "0000abc"):
+            started = time.perf_counter()
+            index.search(query)
+            assert time.perf_counter() - started < 0.02, query
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
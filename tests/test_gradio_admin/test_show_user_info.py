@@ -3,7 +3,7 @@
 Testy jednostkowe funkcji wyświetlania informacji o użytkowniku WireGuard VPN.
 
 Moduł testuje funkcję show_user_info:
-- Importy (load_user_records, format_time)
+- Importy (get_repository, format_time)
 - Debug logging z prefixem [DEBUG]
 - Dostęp do rekordów użytkownika z user_records.json
 - Wyciąganie pól (created_at, expires_at, allowed_ips, status)
@@ -30,7 +30,7 @@ class TestShowUserInfo:
             content = f.read()
         
         required_imports = [
-            'load_user_records',
+            'get_repository',
             'format_time',
             'from gradio_admin.functions'
         ]
@@ -65,8 +65,7 @@ class TestShowUserInfo:
             content = f.read()
         
         records_access = [
-            'load_user_records()',
-            'records.get(username)',
+            'get_repository().get(username)',
             'if not user_data:'
         ]
         
@@ -2,13 +2,13 @@
 """
 Testy jednostkowe zakładki statystyk WireGuard VPN w interfejsie Gradio.
 
-Moduł testuje zakładkę statystyk z tabelą pandas:
-- Importy (pandas, load_user_records, format_user_info)
-- Definicja kolumn tabeli z emoji
+Moduł testuje zakładkę statystyk ze stronicowaną tabelą HTML:
+- Importy (table_page, user_choices, show_user_info)
+- Definicja kolumn tabeli z emoji (table_helpers.COLUMNS)
 - Komponenty Gradio (Checkbox, HTML tabela, Image)
 - Event handlers (refresh, search, user_selector)
-- HTML styling tabeli
-- 6 funkcji wewnętrznych (df_to_html, refresh_table)
+- Stronicowanie i sortowanie po stronie serwera (table_page, klasy CSS z TABLE_CSS)
+- Funkcje wewnętrzne (render_page, refresh_table) bez budowy pełnej tabeli przy odświeżeniu
 """
 
 import pytest
@@ -35,14 +35,11 @@ class TestStatisticsTab:
         
         required_imports = [
             'gradio as gr',
-            'pandas as pd', 
-            'load_user_records',
-            'format_time',
-            'update_table',
-            'format_user_info',
+            'table_page',
+            'user_choices',
             'show_user_info',
-            'update_traffic_data',
-            'USER_DB_PATH',
+            'describe_status',
+            'read_status',
             'QR_CODE_DIR'
         ]
         
@@ -57,10 +54,10 @@ class TestStatisticsTab:
 
     def test_columns_definition(self):
         """Test definicji kolumn tabeli."""
-        with open(self.MAIN_FILE, 'r') as f:
+        with open('gradio_admin/functions/table_helpers.py', 'r') as f:
             content = f.read()
         
-        pattern = r'columns\s*=\s*\[\s*"👤 Użytkownik",\s*"📊 Zużyto",\s*"📦 Limit",\s*"🌐 Adres IP",\s*"⚡ Stan",\s*"💳 Cena",\s*"UID'
+        pattern = r'COLUMNS\s*=\s*\[\s*"👤 Użytkownik",\s*"📊 Zużyto",\s*"📦 Limit",\s*"🌐 Adres IP",\s*"⚡ Stan",\s*"💳 Cena",\s*"UID'
         match = re.search(pattern, content, re.DOTALL)
         assert match is not None, "Brak definicji kolumn"
 
@@ -90,10 +87,14 @@ class TestStatisticsTab:
             assert event in content, f"Brakuje zdarzenia: {event}"
 
     def test_html_table_styling(self):
-        """Test stylizacji HTML tabeli."""
+        """Test stylizacji HTML tabeli (wspólne klasy CSS zamiast stylów w komórkach)."""
         with open(self.MAIN_FILE, 'r') as f:
             content = f.read()
-        
+        with open('gradio_admin/functions/table_helpers.py', 'r') as f:
+            helpers = f.read()
+
+        assert '<style>{TABLE_CSS}</style>' in content
+        assert '<td style=' not in content
         styles = [
             'background-color: #0f0f11',
             '#27272a', '#2d2d30', 
@@ -101,7 +102,15 @@ class TestStatisticsTab:
         ]
         
         for style in styles:
-            assert style in content, f"Brakuje stylu: {style}"
+            assert style in helpers, f"Brakuje stylu: {style}"
+
+    def test_pagination_controls(self):
+        """Test kontrolek stronicowania i sortowania."""
+        with open(self.MAIN_FILE, 'r') as f:
+            content = f.read()
+
+        for feature in ['table_page(', 'PAGE_SIZES', 'prev_button.click', 'next_button.click', 'sort_column']:
+            assert feature in content, f"Brakuje: {feature}"
 
     def test_functions_defined(self):
         """Test wewnętrznych funkcji."""
@@ -109,10 +118,9 @@ class TestStatisticsTab:
             content = f.read()
         
         functions = [
-            'def get_initial_data():',
-            'def df_to_html(df):', 
-            'def refresh_table(show_inactive):',
-            'def search_table(query):',
+            'def render_page(show_inactive, query, sort_by, descending, page, size):',
+            'def refresh_table(show_inactive, sort_by, descending, size):',
+            'def search_table(show_inactive, query, sort_by, descending, page, size):',
             'def find_qr_code(username):',
             'def display_user_info(selected_user):'
         ]
@@ -120,5 +128,22 @@ class TestStatisticsTab:
         for func in functions:
             assert func in content, f"Brakuje funkcji: {func}"
 
+    def test_refresh_renders_single_page(self):
+        """Test odświeżenia bez pełnej tabeli (update_table) i bez wypisywania jej do logu."""
+        with open(self.MAIN_FILE, 'r') as f:
+            content = f.read()
+
+        assert 'update_table' not in content
+        assert 'get_initial_data' not in content
+        assert 'Zaktualizowana tabela' not in content
+
+    def test_blocking_handlers_pooled(self):
+        """Test wykonania blokujących funkcji obsługi (tabela, kod QR) w puli "render"."""
+        with open(self.MAIN_FILE, 'r') as f:
+            content = f.read()
+
+        for func in ['def refresh_table(', 'def search_table(', 'def display_user_info(']:
+            assert re.search(r'@pooled\("render"\)[^\n]*\n\s*' + re.escape(func), content), f"Poza pulą: {func}"
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
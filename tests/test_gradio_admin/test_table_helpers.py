@@ -3,17 +3,24 @@
 Testy jednostkowe funkcji pomocniczych tabel WireGuard VPN.
 
 Moduł testuje funkcje table_helpers:
-- Importy (json, pandas, USER_DB_PATH)
-- Wczytywanie danych z user_records.json
+- Importy (pandas, repozytorium rekordów)
+- Wczytywanie danych ze współdzielonego repozytorium (widoki cache'owane wg wersji)
 - Filtrowanie nieaktywnych użytkowników
 - Struktura tabeli (7 kolumn z danymi transferu)
 - Pandas DataFrame z emoji nagłówkami
 - Wartości domyślne (N/A, 0.0 KiB, 100.0 GB)
+- Stronicowanie, filtrowanie i sortowanie po stronie serwera z cache stron
+- Renderowanie HTML kolumnami z klasami CSS i escapowaniem wartości
 """
 
 import pytest
+import json
 import os
+import sys
 from pathlib import Path
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
 class TestTableHelpers:
     """Testy jednostkowe table_helpers.py."""
@@ -30,8 +37,8 @@ class TestTableHelpers:
             content = f.read()
         
         required_imports = [
-            'import os', 'import json', 'pandas as pd',
-            'USER_DB_PATH'
+            'pandas as pd',
+            'from gradio_admin.functions.user_records import get_repository'
         ]
         
         for imp in required_imports:
@@ -51,13 +58,13 @@ class TestTableHelpers:
             assert func in content, f"Brakuje: {func}"
 
     def test_json_loading(self):
-        """Test wczytywania JSON."""
+        """Test wczytywania danych przez repozytorium."""
         with open(self.MAIN_FILE, 'r') as f:
             content = f.read()
         
         json_features = [
-            'os.path.exists(USER_DB_PATH)',
-            'json.load(f)',
+            'get_repository().derived(("table_rows", show_inactive)',
+            'get_repository().derived(("table_frame", show_inactive)',
             'for username, user_info in users.items():'
         ]
         
@@ -102,7 +109,8 @@ class TestTableHelpers:
         
         pandas_features = [
             'pd.DataFrame(',
-            'columns=["👤 Użytkownik"',
+            'COLUMNS = ["👤 Użytkownik"',
+            'columns=COLUMNS',
             '"📊 Zużyto"',
             '"🌐 Adres IP"'
         ]
@@ -144,5 +152,50 @@ class TestTableHelpers:
         for default in defaults:
             assert default in content, f"Brakuje domyślnej: {default}"
 
+class TestTablePage:
+    """Testy stronicowanej tabeli statystyk."""
+
+    @pytest.fixture
+    def repository(self, tmp_path):
+        from gradio_admin.functions import user_records
+        path = tmp_path / "user_records.json"
+        path.write_text(json.dumps({
+            f"user{i}": {"username": f"user{i}", "total_transfer": f"{i}.00 MiB odebrano, {i}.00 KiB wysłano",
+                         "status": "active" if i % 2 else "blocked", "user_id": str(i)}
+            for i in range(1, 13)
+        }))
+        repository = user_records.UserRecordRepository(path)
+        with patch("settings.USER_STORE_BACKEND", "json"), \
+                patch.object(user_records, "_repository", repository):
+            yield path
+
+    def test_pages_and_clamping(self, repository):
+        from gradio_admin.functions.table_helpers import table_page
+        html, page, pages, rows = table_page(page=2, page_size=5)
+        assert (page, pages, rows) == (2, 3, 12)
+        assert html.count("<tr>") == 1 + 5
+        assert table_page(page=99, page_size=5)[1] == 3
+        assert table_page(show_inactive=False, page_size=5)[3] == 6
+
+    def test_filter_and_size_sort(self, repository):
+        from gradio_admin.functions.table_helpers import table_view
+        view = table_view(query="USER1", sort_column="📊 Zużyto", descending=True)
+        assert view["👤 Użytkownik"].tolist() == ["user12", "user11", "user10", "user1"]
+        ascending = table_view(sort_column="📊 Zużyto")["👤 Użytkownik"].tolist()
+        assert ascending[:3] == ["user1", "user2", "user3"]  # wg bajtów, nie alfabetycznie
+
+    def test_page_cache_follows_data_version(self, repository):
+        from gradio_admin.functions.table_helpers import table_page
+        first = table_page(page_size=50)[0]
+        assert table_page(page_size=50)[0] is first
+        records = json.loads(repository.read_text())
+        records["user1"]["username"] = "<nowy>"
+        repository.write_text(json.dumps(records) + " ")
+        changed = table_page(page_size=50)[0]
+        assert "&lt;nowy&gt;" in changed
+        assert 'class="stats-table"' in changed
+        assert "style=" not in changed
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Testy jednostkowe wyboru użytkownika z wyszukiwaniem po stronie serwera.
+
+Moduł testuje:
+- Ograniczenie kandydatów do USER_PICKER_LIMIT
+- Pary (etykieta, user_id) i własne etykiety
+- Zamianę wartości listy (user_id lub nazwa) na nazwę użytkownika
+- Opcję trigger_mode zależną od wersji Gradio
+"""
+
+import pytest
+import json
+import os
+import sys
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+
+class TestUserPicker:
+    """Testy user_choices i resolve_user."""
+
+    @pytest.fixture(autouse=True)
+    def repository(self, tmp_path):
+        from gradio_admin.functions import user_records
+        path = tmp_path / "user_records.json"
+        records = {f"user{i}": {"user_id": f"uid-{i}", "status": "active"} for i in range(50)}
+        records["legacy"] = {"status": "blocked"}  # rekord bez user_id
+        path.write_text(json.dumps(records))
+        with patch("settings.USER_STORE_BACKEND", "json"), \
+                patch("settings.USER_PICKER_LIMIT", 5), \
+                patch.object(user_records, "_repository", user_records.UserRecordRepository(path)):
+            yield
+
+    def test_choices_limited_with_ids(self):
+        from gradio_admin.functions.user_picker import user_choices
+        assert user_choices("user4") == [("user4", "uid-4"), ("user40", "uid-40"), ("user41", "uid-41"),
+                                         ("user42", "uid-42"), ("user43", "uid-43")]
+        assert len(user_choices("")) == 5
+        assert user_choices("leg", describe=lambda name, record: f"{name} ({record['status']})") == \
+            [("legacy (blocked)", "legacy")]
+
+    def test_resolve_user(self):
+        from gradio_admin.functions.user_picker import resolve_user
+        assert resolve_user("uid-7") == "user7"
+        assert resolve_user(["uid-8"]) == "user8"
+        assert resolve_user("legacy") == "legacy"
+        assert resolve_user("user7") is None  # nazwa rekordu z user_id nie jest wartością listy
+        assert resolve_user("uid-999") is None
+        assert resolve_user(None) is None
+
+    def test_search_event_options_by_version(self):
+        import gradio as gr
+        from gradio_admin.functions.user_picker import search_event_options
+        with patch.object(gr, "__version__", "4.44.1"):
+            assert search_event_options() == {"trigger_mode": "always_last"}
+        with patch.object(gr, "__version__", "3.36.1"):
+            assert search_event_options() == {}
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -3,18 +3,23 @@
 Testy jednostkowe funkcji zarządzania rekordami użytkowników WireGuard VPN.
 
 Moduł testuje operacje user_records.json:
-- Importy (json, os)
+- Importy (os, magazyn użytkowników)
 - Stała USER_RECORDS_PATH z dynamiczną ścieżką
-- Funkcja load_user_records()
-- Wczytywanie JSON z obsługą błędów
+- Funkcja load_user_records() i współdzielone repozytorium rekordów
+- Unieważnianie po zmianie pliku (stat), licznik wersji i widoki pochodne
 - Debug komunikaty z prefixem [DEBUG]
 - Graceful fallback na pusty dict {}
 """
 
 import pytest
+import json
 import os
+import sys
 from pathlib import Path
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from gradio_admin.functions.user_records import UserRecordRepository
+
 class TestUserRecords:
     """Testy jednostkowe user_records.py."""
 
@@ -30,7 +35,7 @@ class TestUserRecords:
             content = f.read()
         
         required_imports = [
-            'import json', 'import os'
+            'import os', 'from modules.user_store import open_user_store'
         ]
         
         for imp in required_imports:
@@ -53,13 +58,13 @@ class TestUserRecords:
         assert 'def load_user_records():' in content
 
     def test_json_loading(self):
-        """Test wczytywania JSON."""
+        """Test wczytywania rekordów przez magazyn."""
         with open(self.MAIN_FILE, 'r') as f:
             content = f.read()
         
         json_ops = [
-            'with open(USER_RECORDS_PATH, "r")',
-            'json.load(f)'
+            'open_user_store(self.path).all()',
+            'return dict(get_repository().records())'
         ]
         
         for op in json_ops:
@@ -71,10 +76,10 @@ class TestUserRecords:
             content = f.read()
         
         error_patterns = [
-            'FileNotFoundError:',
-            'JSONDecodeError as e:',
+            'if all(entry[1] is None for entry in key):',
+            'ValueError as e:',
             'print(f"[DEBUG] Błąd dekodowania JSON',
-            'return {}'
+            'records = {}'
         ]
         
         for pattern in error_patterns:
@@ -93,5 +98,69 @@ class TestUserRecords:
         for msg in debug_msgs:
             assert msg in content, f"Brakuje debug: {msg}"
 
+
+class TestUserRecordRepository:
+    """Testy współdzielonego repozytorium rekordów."""
+
+    def write(self, path, records):
+        path.write_text(json.dumps(records))
+        # Wymuś inny mtime niezależnie od rozdzielczości zegara systemu plików
+        stat = path.stat()
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+    def test_reads_once_until_file_changes(self, tmp_path, monkeypatch):
+        path = tmp_path / "user_records.json"
+        self.write(path, {"Jan": {"public_key": "PUB", "user_id": 7}})
+        repo = UserRecordRepository(path)
+        calls = []
+        import gradio_admin.functions.user_records as user_records
+        original = user_records.open_user_store
+        monkeypatch.setattr(user_records, "open_user_store", lambda p: calls.append(p) or original(p))
+
+        version = repo.version
+        assert repo.get("Jan")["user_id"] == 7
+        assert repo.version == version
+        assert len(calls) == 1
+
+        self.write(path, {"Jan": {"public_key": "PUB"}, "ola": {}})
+        assert repo.version == version + 1
+        assert repo.exists("OLA")
+        assert len(calls) == 2
+
+    def test_indexes(self, tmp_path):
+        path = tmp_path / "user_records.json"
+        self.write(path, {"Jan": {"public_key": "PUB", "user_id": 7}})
+        repo = UserRecordRepository(path)
+        assert repo.exists("jan")
+        assert repo.find_by_public_key("PUB") == "Jan"
+        assert repo.find_by_user_id("7") == "Jan"
+        assert repo.find_by_public_key("BRAK") is None
+
+    def test_derived_views_follow_version(self, tmp_path):
+        path = tmp_path / "user_records.json"
+        self.write(path, {"Jan": {}})
+        repo = UserRecordRepository(path)
+        builds = []
+
+        def builder(records):
+            builds.append(1)
+            return sorted(records)
+
+        assert repo.derived("names", builder) == ["Jan"]
+        assert repo.derived("names", builder) == ["Jan"]
+        assert len(builds) == 1
+
+        self.write(path, {"Jan": {}, "ola": {}})
+        assert repo.derived("names", builder) == ["Jan", "ola"]
+        assert len(builds) == 2
+
+    def test_missing_and_invalid_file(self, tmp_path):
+        path = tmp_path / "user_records.json"
+        repo = UserRecordRepository(path)
+        assert repo.records() == {}
+        path.write_text("{niepoprawny")
+        assert repo.records() == {}
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
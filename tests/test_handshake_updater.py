@@ -4,7 +4,7 @@ Testy jednostkowe aktualizacji handshake'ów WireGuard.
 
 Moduł testuje zarządzanie handshake'ami:
 - Konwersję timestampów na czytelny format
-- Pobieranie danych z `wg show latest handshakes`
+- Pobieranie handshake'ów ze współdzielonej migawki `wg show all dump`
 - Aktualizację plików JSON z handshake'ami użytkowników
 - Obsługę błędów subprocess i plików JSON
 """
@@ -23,6 +23,7 @@ from modules.handshake_updater import (
     convert_handshake_timestamp, 
     update_handshakes
 )
+from modules.wg_snapshot import WgSnapshot, parse_dump
 
 
 class TestHandshakeUpdater:
@@ -39,40 +40,42 @@ class TestHandshakeUpdater:
         result = convert_handshake_timestamp(timestamp)
         assert "2024-11-23 06:00:00 UTC" in result
 
-    @patch('modules.handshake_updater.subprocess.check_output')
-    def test_get_latest_handshakes_success(self, mock_check_output):
-        """Test sukces - POPRAWIONY BYTES + text=True."""
-        mock_output = """ABC123xyz... 1732341600
-DEF456uvw... 1732339500"""
-        mock_check_output.return_value = mock_output  # text=True -> str
-        
-        result = get_latest_handshakes("wg0")
-        assert len(result) == 2
-        assert "ABC123xyz..." in result
-        mock_check_output.assert_called_once()
-
-    @patch('modules.handshake_updater.subprocess.check_output', side_effect=Exception("wg not found"))
-    def test_get_latest_handshakes_error(self, mock_check_output):
+    @staticmethod
+    def make_snapshot(dump):
+        """Migawka WireGuard z tekstu `wg show all dump`."""
+        return WgSnapshot(*parse_dump(dump.splitlines()))
+
+    def test_get_latest_handshakes_success(self):
+        """Test odczytu handshake'ów interfejsu z migawki."""
+        dump = (
+            "wg0\tPRIV=\tPUB=\t51820\toff\n"
+            "wg0\tABC123xyz...\t(none)\t(none)\t10.0.0.2/32\t1732341600\t0\t0\toff\n"
+            "wg0\tDEF456uvw...\t(none)\t(none)\t10.0.0.3/32\t0\t0\t0\toff\n"
+            "wg1\tOTHER...\t(none)\t(none)\t10.0.1.2/32\t1732339500\t0\t0\toff\n"
+        )
+        with patch('modules.handshake_updater.get_snapshot', return_value=self.make_snapshot(dump)) as mock_snapshot:
+            result = get_latest_handshakes("wg0")
+        assert result == {"ABC123xyz...": "2024-11-23 06:00:00 UTC", "DEF456uvw...": "Nigdy"}
+        mock_snapshot.assert_called_once()
+
+    @patch('modules.handshake_updater.get_snapshot', side_effect=Exception("wg not found"))
+    def test_get_latest_handshakes_error(self, mock_snapshot):
         """Test błędu subprocess."""
         result = get_latest_handshakes("wg0")
         assert result == {}
 
-    @patch('modules.handshake_updater.subprocess.check_output')
-    def test_get_latest_handshakes_empty(self, mock_check_output):
-        """Test pustego outputu."""
-        mock_check_output.return_value = ""
-        result = get_latest_handshakes("wg0")
+    def test_get_latest_handshakes_empty(self):
+        """Test interfejsu bez peerów."""
+        with patch('modules.handshake_updater.get_snapshot', return_value=self.make_snapshot("")):
+            result = get_latest_handshakes("wg0")
         assert result == {}
 
-    @patch('modules.handshake_updater.subprocess.check_output')
-    def test_get_latest_handshakes_malformed(self, mock_check_output):
+    def test_get_latest_handshakes_malformed(self):
         """Test malformed linii."""
-        mock_output = """ABC123xyz...
-DEF456uvw... 1732339500"""
-        mock_check_output.return_value = mock_output
-        
-        result = get_latest_handshakes("wg0")
-        assert isinstance(result, dict)
+        dump = "wg0\tABC123xyz...\n" + "wg0\tDEF456uvw...\t(none)\t(none)\t10.0.0.3/32\t1732339500\t0\t0\toff\n"
+        with patch('modules.handshake_updater.get_snapshot', return_value=self.make_snapshot(dump)):
+            result = get_latest_handshakes("wg0")
+        assert list(result) == ["DEF456uvw..."]
 
     def test_update_handshakes_file_not_exists(self, tmp_path):
         """Test nieistniejącego pliku."""
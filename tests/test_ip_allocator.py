@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Testy jednostkowe bitmapowej puli adresów IP.
+
+Moduł testuje przydział adresów klientów WireGuard:
+- Rezerwację adresu sieci, rozgłoszeniowego i serwera
+- Przydział/zwolnienie adresów (także w podsieciach /16 i IPv6)
+- Wyczerpanie puli i atomowość allocate_many
+- Odbudowę puli z wg0.conf i rekordów użytkowników (JSON lub SQLite)
+- Zapis/odczyt puli i zwalnianie adresu po usunięciu użytkownika
+- Uzgadnianie wczytanej puli ze źródłami i reset po wyczyszczeniu peerów
+"""
+
+import pytest
+import os
+import sys
+import json
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from modules.ip_allocator import (
+    IPPool,
+    rebuild_ip_pool,
+    load_ip_pool,
+    save_ip_pool,
+    release_ip,
+    reset_ip_pool,
+)
+
+
+class TestIPPool:
+    """Testy jednostkowe klasy IPPool."""
+
+    def test_reserved_addresses_v4(self):
+        """Test rezerwacji adresu sieci, serwera i rozgłoszeniowego."""
+        pool = IPPool("10.66.66.0/24")
+        assert pool.is_allocated("10.66.66.0")
+        assert pool.is_allocated("10.66.66.1")
+        assert pool.is_allocated("10.66.66.255")
+        assert pool.allocate() == "10.66.66.2"
+
+    def test_slash16_does_not_skip_dot_zero(self):
+        """Test podsieci /16 - adresy .0/.255 wewnątrz puli są przydzielane."""
+        pool = IPPool("10.66.0.0/16")
+        for offset in range(2, 256):
+            pool.reserve(f"10.66.0.{offset}")
+        assert pool.allocate() == "10.66.1.0"
+        assert pool.allocated_count() == 258
+
+    def test_ipv6_pool(self):
+        """Test puli IPv6 (przyciętej do MAX_POOL_SIZE)."""
+        pool = IPPool("fd42:42:42::/64")
+        assert pool.allocate() == "fd42:42:42::2"
+        assert pool.allocate() == "fd42:42:42::3"
+
+    def test_release_and_reuse(self):
+        """Test zwolnienia i ponownego przydziału adresu."""
+        pool = IPPool("10.66.66.0/24")
+        first, second, third = pool.allocate_many(3)
+        pool.release(second)
+        assert not pool.is_allocated(second)
+        assert pool.allocate() == second
+        assert pool.allocate() == "10.66.66.5"
+
+    def test_exhaustion_is_atomic(self):
+        """Test wyczerpania puli - allocate_many nic nie przydziela."""
+        pool = IPPool("10.66.66.0/29")  # hosty .2-.6 wolne
+        with pytest.raises(ValueError):
+            pool.allocate_many(6)
+        assert pool.allocate_many(5) == [f"10.66.66.{i}" for i in range(2, 7)]
+        with pytest.raises(ValueError):
+            pool.allocate()
+
+    def test_address_outside_subnet(self):
+        """Test adresu spoza podsieci."""
+        pool = IPPool("10.66.66.0/24")
+        assert pool.reserve("192.168.1.5") is False
+        with pytest.raises(ValueError):
+            pool.release("192.168.1.5")
+
+    def test_serialization_roundtrip(self):
+        """Test serializacji to_dict/from_dict."""
+        pool = IPPool("10.66.66.0/24")
+        pool.allocate_many(10)
+        restored = IPPool.from_dict(pool.to_dict())
+        assert restored.allocated_count() == pool.allocated_count()
+        assert restored.allocate() == "10.66.66.12"
+
+
+class TestPoolPersistence:
+    """Testy odbudowy i zapisu puli."""
+
+    def test_rebuild_from_config_and_records(self, tmp_path):
+        """Test odbudowy z wg0.conf (także zablokowanych peerów) i user_records.json."""
+        config = tmp_path / "wg0.conf"
+        config.write_text(
+            "[Interface]\nAddress = 10.66.66.1/24\n\n"
+            "### Client a\n[Peer]\nAllowedIPs = 10.66.66.2/32,fd42:42:42::2/128\n\n"
+            "### Client b\n# [Peer]\n# AllowedIPs = 10.66.66.3/32\n"
+        )
+        records = tmp_path / "users.json"
+        records.write_text(json.dumps({"c": {"allowed_ips": "10.66.66.4"}, "d": {"allowed_ips": "N/A"}}))
+
+        pool = rebuild_ip_pool("10.66.66.0/24", str(config), str(records))
+        assert pool.allocate() == "10.66.66.5"
+
+    def test_rebuild_from_sqlite_records(self, tmp_path):
+        """Test odbudowy z rekordów backendu SQLite (plik JSON nie jest czytany)."""
+        from modules.user_store import open_user_store
+        records = tmp_path / "users.json"
+        with patch("settings.USER_STORE_BACKEND", "sqlite"):
+            open_user_store(str(records)).put("c", {"allowed_ips": "10.66.66.2/32"})
+            pool = rebuild_ip_pool("10.66.66.0/24", user_records_path=str(records))
+        assert not records.exists()
+        assert pool.allocate() == "10.66.66.3"
+
+    def test_load_creates_and_reuses_pool(self, tmp_path):
+        """Test wczytania zapisanej puli i przebudowy przy zmianie podsieci."""
+        pool_path = str(tmp_path / "ip_pool.json")
+        pool = load_ip_pool("10.66.66.0/24", pool_path)
+        assert os.path.exists(pool_path)
+        pool.allocate()
+        save_ip_pool(pool, pool_path)
+
+        assert load_ip_pool("10.66.66.0/24", pool_path).allocate() == "10.66.66.3"
+        assert load_ip_pool("10.77.0.0/16", pool_path).allocate() == "10.77.0.2"
+
+    def test_release_ip_persists(self, tmp_path):
+        """Test zwolnienia adresu w zapisanej puli."""
+        pool_path = str(tmp_path / "ip_pool.json")
+        pool = IPPool("10.66.66.0/24")
+        ip = pool.allocate()
+        save_ip_pool(pool, pool_path)
+
+        assert release_ip(f"{ip}/32", pool_path) is True
+        assert load_ip_pool("10.66.66.0/24", pool_path).allocate() == ip
+
+    def test_release_ip_missing_pool(self, tmp_path):
+        """Test zwolnienia bez zapisanej puli."""
+        assert release_ip("10.66.66.2", str(tmp_path / "none.json")) is False
+        assert release_ip(None, str(tmp_path / "none.json")) is False
+
+    def test_load_reconciles_with_sources(self, tmp_path):
+        """Test rezerwacji adresu używanego w wg0.conf, a wolnego w zapisanej puli."""
+        pool_path = str(tmp_path / "ip_pool.json")
+        pool = IPPool("10.66.66.0/24")
+        in_flight = pool.allocate()  # 10.66.66.2 - tylko w puli (tworzony użytkownik)
+        save_ip_pool(pool, pool_path)
+        config = tmp_path / "wg0.conf"
+        config.write_text("[Interface]\nAddress = 10.66.66.1/24\n\n### Client a\n[Peer]\nAllowedIPs = 10.66.66.3/32\n")
+
+        pool = load_ip_pool("10.66.66.0/24", pool_path, str(config))
+        assert pool.is_allocated("10.66.66.3") and pool.is_allocated(in_flight)
+        assert load_ip_pool("10.66.66.0/24", pool_path).allocate() == "10.66.66.4"  # zapisane
+
+    def test_clear_peers_resets_pool(self, tmp_path):
+        """Test odbudowy puli po wyczyszczeniu peerów."""
+        from modules.server_config import clear_server_peers
+        pool_path = str(tmp_path / "ip_pool.json")
+        config = tmp_path / "wg0.conf"
+        config.write_text("[Interface]\nAddress = 10.66.66.1/24\n\n### Client a\n[Peer]\nAllowedIPs = 10.66.66.2/32\n")
+        load_ip_pool("10.66.66.0/24", pool_path, str(config))
+
+        assert clear_server_peers(str(config), pool_path) == 1
+        assert not os.path.exists(pool_path)
+        assert load_ip_pool("10.66.66.0/24", pool_path, str(config)).allocate() == "10.66.66.2"
+        assert reset_ip_pool(str(tmp_path / "none.json")) is False
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -6,16 +6,22 @@ Moduł testuje funkcje generowania kluczy:
 - Kluczy prywatnych (generate_private_key)
 - Kluczy publicznych z prywatnych (generate_public_key) 
 - Kluczy preshared (generate_preshared_key)
+- Generowania wsadowego par kluczy (generate_keypairs)
+- Wyboru backendu (native/wg)
 
 Sprawdzane aspekty:
 - Poprawność generowania (nie None)
 - Typ bajtowy (bytes)
 - Długość base64 (~44 znaki WireGuard)
+- Zgodność z wektorem RFC 7748 i clamping jak w `wg genkey`
 """
 
 import pytest
 import sys
 import os
+import base64
+import shutil
+import subprocess
 
 # Dodajemy ścieżkę do projektu
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -23,7 +29,9 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from pyWGgen.modules.keygen import (
     generate_private_key, 
     generate_public_key, 
-    generate_preshared_key
+    generate_preshared_key,
+    generate_keypairs,
+    resolve_backend
 )
 
 def test_generate_private_key():
@@ -50,3 +58,50 @@ def test_generate_preshared_key():
     assert preshared_key is not None
     assert isinstance(preshared_key, bytes)
     assert len(preshared_key) > 40
+
+# Wektor testowy z RFC 7748 (sekcja 6.1) - klucz Alicji
+RFC7748_PRIVATE = bytes.fromhex("77076d0a7318a57d3c16c17251b26645df4c2f87ebc0992ab177fba51db92c2a")
+RFC7748_PUBLIC = bytes.fromhex("8520f0098930a754748b7ddcb43ef75a0dbf3a0d26381af4eba4a98eaa9b4e6a")
+
+def test_native_public_key_rfc7748_vector():
+    """Test zgodności klucza publicznego z wektorem RFC 7748."""
+    public_key = generate_public_key(base64.b64encode(RFC7748_PRIVATE), backend="native")
+    assert public_key == base64.b64encode(RFC7748_PUBLIC)
+
+def test_native_private_key_clamped():
+    """Test clampingu klucza prywatnego jak w `wg genkey`."""
+    raw = base64.b64decode(generate_private_key(backend="native"))
+    assert len(raw) == 32
+    assert raw[0] & 7 == 0
+    assert raw[31] & 128 == 0
+    assert raw[31] & 64 == 64
+
+def test_native_encoding_format():
+    """Test formatu base64 (44 znaki, bez nowej linii)."""
+    for key in (generate_private_key(backend="native"), generate_preshared_key(backend="native")):
+        assert len(key) == 44
+        assert not key.endswith(b"\n")
+
+def test_generate_keypairs_batch():
+    """Test generowania wielu par kluczy w jednym wywołaniu."""
+    keypairs = generate_keypairs(5, backend="native")
+    assert len(keypairs) == 5
+    assert len({private for private, _ in keypairs}) == 5
+    for private_key, public_key in keypairs:
+        assert generate_public_key(private_key, backend="native") == public_key
+
+def test_resolve_backend_invalid():
+    """Test nieznanego backendu."""
+    with pytest.raises(ValueError):
+        resolve_backend("openssl")
+
+def test_resolve_backend_auto():
+    """Test automatycznego wyboru backendu."""
+    assert resolve_backend("auto") in ("native", "wg")
+
+@pytest.mark.skipif(shutil.which("wg") is None, reason="Brak narzędzia wg")
+def test_native_matches_wg_pubkey():
+    """Test identyczności kodowania z `wg pubkey`."""
+    private_key = generate_private_key(backend="native")
+    expected = subprocess.check_output(["wg", "pubkey"], input=private_key).strip()
+    assert generate_public_key(private_key, backend="native") == expected
@@ -7,6 +7,9 @@ Moduł testuje kluczowe funkcje:
 - Generowanie następnego wolnego IP z konfiguracji wg0.conf
 - Ładowanie istniejących użytkowników
 - Sprawdzanie obecności użytkownika w konfiguracji serwera
+- Tryb wsadowy (wczytywanie CSV/JSONL, walidacja, jeden zapis i jedna synchronizacja)
+- Wycofanie przerwanego trybu wsadowego (adresy IP, pliki klientów, bloki [Peer])
+- Import modułu bez zmiany konfiguracji logowania procesu
 """
 
 import pytest
@@ -15,6 +18,7 @@ import os
 from unittest.mock import Mock, patch
 import tempfile
 import ipaddress
+import logging
 
 # Dodajemy korzeń projektu
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -47,6 +51,7 @@ class TestMain:
     def test_generate_next_ip_skip_used(self, tmp_path):
         """Test pomijania zajetego IP."""
         import main
+        sys.modules['settings'].SERVER_CONFIG_LAYOUT = "single"
         config_path = str(tmp_path / "wg0.conf")
         with open(config_path, "w") as f:
             f.write("[Peer]\nAllowedIPs = 10.66.66.2/32")
@@ -57,6 +62,7 @@ class TestMain:
     def test_load_existing_users_empty(self):
         """Test pustej bazy użytkowników."""
         import main
+        sys.modules['settings'].USER_STORE_BACKEND = "json"
         with patch('main.os.path.exists', return_value=False):
             result = main.load_existing_users()
         assert result == {}
@@ -65,8 +71,146 @@ class TestMain:
     def test_is_user_in_server_config(self, tmp_path):
         """Test wyszukiwania użytkownika w konfiguracji serwera."""
         import main
+        sys.modules['settings'].SERVER_CONFIG_LAYOUT = "single"
         config_path = str(tmp_path / "wg0.conf")
         with open(config_path, "w") as f:
-            f.write("testuser\n[Peer]")
-        result = main.is_user_in_server_config("testuser", config_path)
-        assert result == True
+            f.write("[Interface]\nAddress = 10.66.66.1/24\n\n### Klient TestUser\n[Peer]\nPublicKey = testuser_key=\n")
+        assert main.is_user_in_server_config("testuser", config_path) == True
+        # Nazwa musi pochodzić z komentarza klienta, nie z dowolnej linii pliku
+        assert main.is_user_in_server_config("testuser_key", config_path) == False
+
+    @patch.dict(sys.modules, {'qrcode': Mock(), 'settings': Mock()})
+    def test_generate_next_ips_single_pass(self, tmp_path):
+        """Test przydziału wielu adresów IP w jednym przebiegu."""
+        import main
+        sys.modules['settings'].SERVER_CONFIG_LAYOUT = "single"
+        config_path = str(tmp_path / "wg0.conf")
+        with open(config_path, "w") as f:
+            f.write("[Peer]\nAllowedIPs = 10.66.66.3/32\n")
+        result = main.generate_next_ips(config_path, "10.66.66.0/24", 3)
+        assert result == ["10.66.66.2", "10.66.66.4", "10.66.66.5"]
+
+    @patch.dict(sys.modules, {'qrcode': Mock(), 'settings': Mock()})
+    def test_load_batch_file_csv_and_jsonl(self, tmp_path):
+        """Test wczytywania pliku wsadowego CSV i JSONL."""
+        import main
+        csv_path = tmp_path / "users.csv"
+        csv_path.write_text("nickname,email,telegram_id\nalice,a@x.pl,\nbob,,123\n")
+        jsonl_path = tmp_path / "users.jsonl"
+        jsonl_path.write_text('{"username": "carol", "telegram_id": 42}\n\n')
+
+        entries = main.load_batch_file(str(csv_path))
+        assert entries == [
+            {"nickname": "alice", "email": "a@x.pl", "telegram_id": "N/A"},
+            {"nickname": "bob", "email": "N/A", "telegram_id": "123"},
+        ]
+        assert main.load_batch_file(str(jsonl_path)) == [
+            {"nickname": "carol", "email": "N/A", "telegram_id": "42"}
+        ]
+
+    @patch.dict(sys.modules, {'qrcode': Mock(), 'settings': Mock()})
+    def test_validate_batch(self):
+        """Test walidacji nazw względem zbioru w pamięci."""
+        import main
+        entries = [{"nickname": n} for n in ["alice", "Bob", "bob", "", "new"]]
+        valid, rejected = main.validate_batch(entries, {"alice"})
+        assert [e["nickname"] for e in valid] == ["Bob", "new"]
+        assert [name for name, _ in rejected] == ["alice", "bob", ""]
+
+    @patch.dict(sys.modules, {'qrcode': Mock(), 'settings': Mock()})
+    def test_validate_batch_rejects_unsafe_names(self):
+        """Test odrzucania nazw spoza [A-Za-z0-9_.-] i zaczynających się kropką."""
+        import main
+        names = ["../x", "/", "a/b", "new\nline", "x]", ".hidden", "ok_1.a-b"]
+        valid, rejected = main.validate_batch([{"nickname": n} for n in names], set())
+        assert [e["nickname"] for e in valid] == ["ok_1.a-b"]
+        assert [name for name, _ in rejected] == names[:-1]
+
+    @patch.dict(sys.modules, {'qrcode': Mock(), 'settings': Mock()})
+    def test_generate_configs_batch_single_write_and_sync(self, tmp_path):
+        """Test trybu wsadowego: jeden zapis konfiguracji, bazy i jedna synchronizacja."""
+        sys.modules['settings'].KEYGEN_BACKEND = "native"
+        sys.modules['settings'].SERVER_CONFIG_LAYOUT = "single"
+        import main
+        main.settings.WG_CONFIG_DIR = str(tmp_path / "configs")
+        main.settings.QR_CODE_DIR = str(tmp_path / "qr")
+        config_path = tmp_path / "wg0.conf"
+        config_path.write_text("[Interface]\nAddress = 10.66.66.1/24\n\n### Klient old\n[Peer]\nAllowedIPs = 10.66.66.2/32\n")
+        params = {
+            "SERVER_PUB_KEY": "serverkey", "SERVER_PUB_IP": "1.2.3.4", "SERVER_PORT": "51820",
+            "CLIENT_DNS_1": "1.1.1.1", "CLIENT_DNS_2": "8.8.8.8", "SERVER_WG_IPV4": "10.66.66.1",
+        }
+        entries = [
+            {"nickname": "u1", "email": "N/A", "telegram_id": "N/A"},
+            {"nickname": "OLD", "email": "N/A", "telegram_id": "N/A"},
+            {"nickname": "u2", "email": "N/A", "telegram_id": "N/A"},
+        ]
+        with patch('main.load_existing_users', return_value={}), \
+             patch('main.generate_qr_code') as mock_qr, \
+             patch('main.save_user_records') as mock_save, \
+             patch('main.get_server_wg_nic', return_value="wg0"), \
+             patch('main.sync_wireguard') as mock_sync:
+            created, rejected = main.generate_configs_batch(entries, params, str(config_path))
+
+        assert [name for name, _, _ in created] == ["u1", "u2"]
+        assert rejected == [("OLD", "użytkownik już istnieje")]
+        assert mock_qr.call_count == 2
+        mock_save.assert_called_once()
+        records = mock_save.call_args[0][0]
+        assert records["u1"]["allowed_ips"] == "10.66.66.3"
+        assert records["u2"]["allowed_ips"] == "10.66.66.4"
+        mock_sync.assert_called_once_with("wg0")
+        content = config_path.read_text()
+        assert content.count("[Peer]") == 3
+        assert "### Klient u2" in content
+
+    @patch.dict(sys.modules, {'qrcode': Mock(), 'settings': Mock()})
+    def test_generate_configs_batch_rolls_back_on_error(self, tmp_path):
+        """Test wycofania: błąd zapisu bazy zwalnia adresy w puli, usuwa pliki i bloki [Peer]."""
+        from concurrent.futures import Future
+        sys.modules['settings'].KEYGEN_BACKEND = "native"
+        sys.modules['settings'].SERVER_CONFIG_LAYOUT = "single"
+        sys.modules['settings'].USER_DB_PATH = str(tmp_path / "user_records.json")
+        sys.modules['settings'].USER_STORE_BACKEND = "json"
+        import main
+        main.settings.WG_CONFIG_DIR = str(tmp_path / "configs")
+        main.settings.QR_CODE_DIR = str(tmp_path / "qr")
+        main.settings.USER_DB_PATH = str(tmp_path / "user_records.json")
+        config_path = tmp_path / "wg0.conf"
+        original = "[Interface]\nAddress = 10.66.66.1/24\n\n### Klient old\n[Peer]\nAllowedIPs = 10.66.66.2/32\n"
+        config_path.write_text(original)
+        pool_path = str(tmp_path / "ip_pool.json")
+        params = {
+            "SERVER_PUB_KEY": "serverkey", "SERVER_PUB_IP": "1.2.3.4", "SERVER_PORT": "51820",
+            "CLIENT_DNS_1": "1.1.1.1", "CLIENT_DNS_2": "8.8.8.8", "SERVER_WG_IPV4": "10.66.66.1",
+        }
+        entries = [{"nickname": n, "email": "N/A", "telegram_id": "N/A"} for n in ("u1", "u2")]
+
+        def fake_qr(data, path):
+            open(path, "w").close()
+            future = Future()
+            future.set_result(path)
+            return future
+
+        with patch('main.load_existing_users', return_value={}), \
+             patch('main.generate_qr_code', side_effect=fake_qr), \
+             patch('main.save_user_records', side_effect=OSError("dysk pełny")), \
+             patch('main.sync_wireguard') as mock_sync:
+            with pytest.raises(OSError):
+                main.generate_configs_batch(entries, params, str(config_path), pool_path)
+
+        mock_sync.assert_not_called()
+        assert config_path.read_text().rstrip("\n") == original.rstrip("\n")
+        assert os.listdir(tmp_path / "configs") == []
+        assert os.listdir(tmp_path / "qr") == []
+        assert main.generate_next_ips(str(config_path), "10.66.66.0/24", 2, pool_path) == ["10.66.66.3", "10.66.66.4"]
+
+    def test_import_keeps_root_logger(self):
+        """Import main (np. w panelu Gradio) nie ustawia poziomu DEBUG loggera głównego."""
+        import subprocess
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        code = "import logging, main; root = logging.getLogger(); print(root.level, len(root.handlers))"
+        env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [root, os.environ.get("PYTHONPATH")]))}
+        result = subprocess.run([sys.executable, "-c", code], cwd=root, capture_output=True, text=True, env=env)
+        assert result.returncode == 0, result.stderr
+        assert result.stdout.strip().splitlines()[-1] == f"{logging.WARNING} 0"
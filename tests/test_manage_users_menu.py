@@ -5,8 +5,8 @@ Testy jednostkowe modułu zarządzania użytkownikami.
 Moduł testuje operacje na użytkownikach WireGuard:
 - Tworzenie katalogów dla plików konfiguracyjnych
 - Wczytywanie bazy danych użytkowników
-- Wyodrębnianie kluczy publicznych z konfiguracji wg0.conf
-- Usuwanie sekcji Peer z konfiguracji serwera
+- Usuwanie peera po dokładnej nazwie klienta (bez dopasowania podciągów)
+- Usuwanie obrazu QR użytkownika z pamięci podręcznej
 - Pełny flow usuwania użytkownika z systemem
 """
 
@@ -19,10 +19,7 @@ from pathlib import Path
 
 # Import testowanego modułu
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from modules.manage_users_menu import (
-    ensure_directory_exists, load_user_records, extract_public_key, 
-    remove_peer_from_config
-)
+from modules.manage_users_menu import ensure_directory_exists, load_user_records
 
 
 class TestManageUsersMenu:
@@ -44,126 +41,126 @@ class TestManageUsersMenu:
         ensure_directory_exists(str(filepath))
         assert filepath.parent.exists()
 
-    @patch('modules.manage_users_menu.read_json')
-    def test_load_user_records_empty(self, mock_read_json):
+    @patch('modules.manage_users_menu.open_user_store')
+    def test_load_user_records_empty(self, mock_open_store):
         """Test wczytywania pustej bazy danych."""
-        mock_read_json.return_value = {}
+        mock_open_store.return_value.all.return_value = {}
         result = load_user_records()
         assert result == {}
 
-    @patch('modules.manage_users_menu.read_json')
-    def test_load_user_records_valid(self, mock_read_json, sample_user_data):
+    @patch('modules.manage_users_menu.open_user_store')
+    def test_load_user_records_valid(self, mock_open_store, sample_user_data):
         """Test wczytywania poprawnej bazy danych."""
-        mock_read_json.return_value = sample_user_data
+        mock_open_store.return_value.all.return_value = sample_user_data
         result = load_user_records()
         assert "testuser" in result
         assert result["testuser"]["allowed_ips"] == "10.66.66.5/32"
 
-    def test_extract_public_key_found(self, tmp_path):
-        """Test wyodrębniania klucza publicznego - znaleziono."""
+    @pytest.fixture
+    def server_files(self, tmp_path):
+        """Konfiguracja serwera z klientami o wspólnym prefiksie nazwy."""
         config_path = tmp_path / "wg0.conf"
-        config_content = """[Interface]
+        config_path.write_text("""[Interface]
 PrivateKey = server_private_key
-Address = 10.0.0.1/24
+Address = 10.66.66.1/24
 ListenPort = 51820
 
-### Klient testuser
-PublicKey = ABC123xyz...=
-AllowedIPs = 10.66.66.5/32
+### Klient janek
+[Peer]
+PublicKey = PUB_JANEK=
+PresharedKey = PSK_JANEK=
+AllowedIPs = 10.66.66.3/32
 PersistentKeepalive = 25
 
-### Inny klient
-PublicKey = DEF456uvw...=
-AllowedIPs = 10.66.66.6/32"""
-        config_path.write_text(config_content)
-        
-        result = extract_public_key("testuser", str(config_path))
-        assert result == "ABC123xyz...="
+### Klient jan
+[Peer]
+PublicKey = PUB_JAN=
+PresharedKey = PSK_JAN=
+AllowedIPs = 10.66.66.2/32
+
+### Klient ola
+[Peer]
+PublicKey = PUB_OLA=
+AllowedIPs = 10.66.66.4/32
+""")
+        users_path = tmp_path / "user_records.json"
+        users_path.write_text(json.dumps({
+            "janek": {"allowed_ips": "10.66.66.3/32"},
+            "jan": {"allowed_ips": "10.66.66.2/32"},
+            "ola": {"allowed_ips": "10.66.66.4/32"},
+        }))
+        module = "modules.manage_users_menu"
+        with patch(f"{module}.SERVER_CONFIG_FILE", str(config_path)), \
+             patch(f"{module}.USER_DB_PATH", str(users_path)), \
+             patch(f"{module}.WG_CONFIG_DIR", tmp_path), \
+             patch(f"{module}.QR_CODE_DIR", tmp_path), \
+             patch(f"{module}.SERVER_WG_NIC", "wg0"), \
+             patch(f"{module}.IP_POOL_PATH", str(tmp_path / "ip_pool.json")), \
+             patch(f"{module}.remove_peers") as mock_remove_peers:
+            yield config_path, users_path, mock_remove_peers
+
+    def test_delete_user_exact_name_only(self, server_files):
+        """Usunięcie 'jan' nie narusza klienta 'janek' (ani pól kolejnych bloków)."""
+        config_path, users_path, mock_remove_peers = server_files
+        (config_path.parent / "jan.conf").write_text("[Interface]")
+
+        from modules.manage_users_menu import delete_user
+        with patch("builtins.input", return_value="jan"):
+            delete_user()
 
-    def test_extract_public_key_not_found(self, tmp_path):
-        """Test wyodrębniania klucza - nie znaleziono."""
-        config_path = tmp_path / "wg0.conf"
-        config_content = """[Interface]
-PrivateKey = server_private_key
+        content = config_path.read_text()
+        assert "### Klient jan\n" not in content
+        assert "PUB_JAN=" not in content
+        assert "### Klient janek" in content and "PUB_JANEK=" in content
+        assert "PersistentKeepalive = 25" in content
+        assert "### Klient ola" in content and "AllowedIPs = 10.66.66.4/32" in content
+        mock_remove_peers.assert_called_once_with("wg0", ["PUB_JAN="], str(config_path))
+        assert sorted(json.loads(users_path.read_text())) == ["janek", "ola"]
+        assert not (config_path.parent / "jan.conf").exists()
+
+    def test_delete_user_discards_cached_qr(self, server_files):
+        """Usunięcie użytkownika usuwa obraz QR z pamięci podręcznej (zawiera klucz prywatny)."""
+        config_path, _, _ = server_files
+        (config_path.parent / "jan.conf").write_text("[Interface]\nPrivateKey = JAN_PRIV=\n")
+
+        from modules.manage_users_menu import delete_user
+        with patch("builtins.input", return_value="jan"), \
+             patch("modules.manage_users_menu.discard_cached_qr") as mock_discard:
+            delete_user()
 
-### Klient testuser
-PublicKey = ABC123xyz...=
-AllowedIPs = 10.66.66.5/32"""
-        config_path.write_text(config_content)
-        
-        result = extract_public_key("nonexistent", str(config_path))
-        assert result is None
+        mock_discard.assert_called_once_with("[Interface]\nPrivateKey = JAN_PRIV=\n")
 
-    def test_remove_peer_from_config(self, tmp_path):
-        """Test usuwania sekcji Peer z konfiguracji."""
-        config_path = tmp_path / "wg0.conf"
-        original_content = """[Interface]
-PrivateKey = server_private_key
-Address = 10.0.0.1/24
-ListenPort = 51820
+    def test_delete_user_without_peer(self, server_files):
+        """Rekord bez peera w wg0.conf jest usuwany, a konfiguracja pozostaje bez zmian."""
+        config_path, users_path, mock_remove_peers = server_files
+        data = json.loads(users_path.read_text())
+        data["ewa"] = {"allowed_ips": "10.66.66.9/32"}
+        users_path.write_text(json.dumps(data))
+        before = config_path.read_text()
 
-### Klient testuser
-PublicKey = ABC123xyz...=
-AllowedIPs = 10.66.66.5/32
-PersistentKeepalive = 25
+        from modules.manage_users_menu import delete_user
+        with patch("builtins.input", return_value="ewa"):
+            delete_user()
+
+        assert config_path.read_text() == before
+        mock_remove_peers.assert_not_called()
+        assert "ewa" not in json.loads(users_path.read_text())
 
-### Inny klient
-PublicKey = DEF456uvw...=
-AllowedIPs = 10.66.66.6/32"""
-        
-        config_path.write_text(original_content)
-        
-        # Sprawdź PRZED
-        assert "### Klient testuser" in config_path.read_text()
-        assert "### Inny klient" in config_path.read_text()
-        
-        # Usuń testuser
-        remove_peer_from_config("ABC123xyz...=", str(config_path), "testuser")
-        
-        # Sprawdź PO - pozostałe sekcje muszą zostać
-        updated_content = config_path.read_text()
-        assert "### Klient testuser" not in updated_content
-        assert "ABC123xyz...=" not in updated_content
-        assert "PersistentKeepalive = 25" not in updated_content
-        
-        # Te 2 MUSZĄ ZOSTAĆ:
-        assert "PublicKey = DEF456uvw...=" in updated_content
-        assert "AllowedIPs = 10.66.66.6/32" in updated_content
-
-    @patch('builtins.input', side_effect=["testuser"])
-    @patch('modules.manage_users_menu.subprocess.run')
-    @patch('modules.manage_users_menu.os.path.exists')
-    @patch('pathlib.Path.exists')
-    @patch('pathlib.Path.unlink')
-    @patch('modules.manage_users_menu.write_json')
-    @patch('modules.manage_users_menu.read_json')
-    @patch('modules.manage_users_menu.extract_public_key')
-    def test_delete_user_complete_flow(
-        self, mock_extract_key, mock_read_json, mock_write_json,
-        mock_unlink, mock_path_exists, mock_os_exists, mock_subprocess, mock_input,
-        tmp_path, sample_user_data
-    ):
-        """Test pełnego przepływu usuwania użytkownika."""
-        mock_read_json.return_value = sample_user_data
-        mock_extract_key.return_value = "ABC123xyz...="
-        mock_os_exists.return_value = True
-        mock_path_exists.return_value = True
-        mock_subprocess.return_value = Mock(returncode=0)
-        
-        with patch('settings.USER_DB_PATH', '/tmp/test_users.json'), \
-             patch('settings.SERVER_CONFIG_FILE', '/tmp/wg0.conf'), \
-             patch('settings.WG_CONFIG_DIR', Path('/tmp/wg')), \
-             patch('settings.QR_CODE_DIR', Path('/tmp/qr')), \
-             patch('settings.SERVER_WG_NIC', 'wg0'):
+    def test_delete_user_sqlite_backend(self, server_files):
+        """Przy backendzie SQLite rekord jest usuwany z bazy, a nie z pliku JSON."""
+        config_path, users_path, _ = server_files
+        from modules.user_store import open_user_store
+        with patch("settings.USER_STORE_BACKEND", "sqlite"):
+            store = open_user_store(str(users_path))
+            assert sorted(store.all()) == ["jan", "janek", "ola"]  # import przy pierwszym otwarciu
 
             from modules.manage_users_menu import delete_user
-            delete_user()
+            with patch("builtins.input", return_value="ola"):
+                delete_user()
 
-        mock_read_json.assert_called_once()
-        mock_write_json.assert_called_once()
-        mock_extract_key.assert_called_once()
-        mock_subprocess.assert_called()
-        mock_unlink.assert_called()
+            assert sorted(store.all()) == ["jan", "janek"]
+        assert "ola" in json.loads(users_path.read_text())
+        assert "PUB_OLA=" not in config_path.read_text()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Testy jednostkowe przyrostowego stosowania zmian peerów WireGuard.
+
+Moduł testuje:
+- Parsowanie aktywnych bloków [Peer] z wg0.conf (z pominięciem zablokowanych)
+- Parsowanie wyjścia `wg show <nic> dump`
+- Wyznaczanie minimalnego zestawu zmian (add/update/remove)
+- Budowę jednego polecenia `wg set` i fallback na `wg syncconf`
+"""
+
+import pytest
+import os
+import sys
+import subprocess
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from modules.peer_apply import (
+    parse_config_peers,
+    get_live_peers,
+    diff_peers,
+    run_wg_set,
+    apply_peer_changes,
+    remove_peers
+)
+
+CONFIG = """[Interface]
+Address = 10.66.66.1/24
+PrivateKey = SERVERKEY=
+
+### Client alice
+[Peer]
+PublicKey = ALICE=
+PresharedKey = PSKA=
+AllowedIPs = 10.66.66.2/32,fd42:42:42::2/128
+
+### Client bob
+# [Peer]
+# PublicKey = BOB=
+# AllowedIPs = 10.66.66.3/32
+
+### Client carol
+[Peer]
+PublicKey = CAROL=
+AllowedIPs = 10.66.66.4/32
+"""
+
+DUMP = (
+    "SERVERKEY=\tSERVERPUB=\t51820\toff\n"
+    "ALICE=\tPSKA=\t(none)\tfd42:42:42::2/128,10.66.66.2/32\t0\t0\t0\toff\n"
+    "BOB=\t(none)\t1.2.3.4:5000\t10.66.66.3/32\t1700000000\t10\t20\toff\n"
+)
+
+
+@pytest.fixture
+def config_file(tmp_path):
+    path = tmp_path / "wg0.conf"
+    path.write_text(CONFIG)
+    return str(path)
+
+
+class TestParsing:
+    """Testy parsowania konfiguracji i stanu interfejsu."""
+
+    def test_parse_config_skips_blocked_peers(self, config_file):
+        """Test pominięcia zakomentowanego (zablokowanego) peera."""
+        peers = parse_config_peers(config_file)
+        assert set(peers) == {"ALICE=", "CAROL="}
+        assert peers["ALICE="]["preshared_key"] == "PSKA="
+        assert peers["ALICE="]["allowed_ips"] == ("10.66.66.2/32", "fd42:42:42::2/128")
+        assert peers["CAROL="]["preshared_key"] is None
+
+    def test_get_live_peers(self):
+        """Test parsowania `wg show <nic> dump`."""
+        with patch("modules.peer_apply.subprocess.check_output", return_value=DUMP):
+            peers = get_live_peers("wg0")
+        assert set(peers) == {"ALICE=", "BOB="}
+        assert peers["BOB="]["preshared_key"] is None
+        assert peers["BOB="]["endpoint"] == "1.2.3.4:5000"
+
+
+class TestDiff:
+    """Testy wyznaczania zmian."""
+
+    def test_minimal_changes(self, config_file):
+        """Test: alice bez zmian, carol dodana, bob usunięty."""
+        with patch("modules.peer_apply.subprocess.check_output", return_value=DUMP):
+            changes = diff_peers(parse_config_peers(config_file), get_live_peers("wg0"))
+        assert list(changes["add"]) == ["CAROL="]
+        assert changes["update"] == {}
+        assert changes["remove"] == ["BOB="]
+
+    def test_allowed_ips_change_is_update(self):
+        """Test zmiany AllowedIPs jako aktualizacji."""
+        peer = {"preshared_key": None, "allowed_ips": ("10.0.0.2/32",), "persistent_keepalive": 0, "endpoint": None}
+        live = dict(peer, allowed_ips=("10.0.0.9/32",), endpoint="1.2.3.4:1")
+        changes = diff_peers({"K=": peer}, {"K=": live})
+        assert list(changes["update"]) == ["K="]
+        assert not changes["add"] and not changes["remove"]
+
+
+class TestApply:
+    """Testy wykonywania zmian."""
+
+    def test_single_wg_set_command(self, config_file):
+        """Test jednego polecenia `wg set` z PSK przekazanym przez plik."""
+        with patch("modules.peer_apply.subprocess.check_output", return_value=DUMP), \
+             patch("modules.peer_apply.subprocess.run") as mock_run:
+            summary = apply_peer_changes("wg0", config_file, mode="incremental")
+
+        assert summary == {"mode": "incremental", "added": 1, "updated": 0, "removed": 1}
+        mock_run.assert_called_once()
+        command = mock_run.call_args[0][0]
+        assert command[:3] == ["wg", "set", "wg0"]
+        assert command[3:6] == ["peer", "BOB=", "remove"]
+        assert "CAROL=" in command
+        assert command[command.index("preshared-key") + 1] == "/dev/null"
+        assert "PSKA=" not in command
+
+    def test_no_changes_no_command(self, config_file):
+        """Test braku polecenia gdy stan jest zgodny."""
+        assert run_wg_set("wg0", {"add": {}, "update": {}, "remove": []}) == 0
+
+    def test_fallback_to_syncconf(self, config_file):
+        """Test fallbacku na `wg syncconf` po błędzie `wg show`."""
+        with patch("modules.peer_apply.subprocess.check_output",
+                   side_effect=subprocess.CalledProcessError(1, "wg show")), \
+             patch("modules.peer_apply.subprocess.run") as mock_run:
+            summary = apply_peer_changes("wg0", config_file, mode="incremental")
+
+        assert summary["mode"] == "syncconf"
+        assert "wg syncconf" in mock_run.call_args[0][0]
+
+    def test_remove_peers_fallback(self, config_file):
+        """Test fallbacku usuwania peerów."""
+        with patch("modules.peer_apply.subprocess.run",
+                   side_effect=[subprocess.CalledProcessError(1, "wg set"), None]) as mock_run:
+            assert remove_peers("wg0", ["BOB="], config_file) == 1
+        assert "wg syncconf" in mock_run.call_args[0][0]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Testy jednostkowe usługi kodów QR.
+
+Moduł testuje:
+- Rejestr backendów (qrcode, pyqrcode, svg, terminal)
+- Wybór backendu (jawny, "auto" na podstawie pomiaru, "auto" przy niezgodnym formacie)
+- Poprawność plików PNG/SVG i wyjścia terminalowego
+- Benchmark backendów
+"""
+
+import pytest
+import os
+import sys
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import modules.qr_service as qr_service
+from modules.qr_service import (
+    BACKENDS,
+    SAMPLE_CONFIG,
+    available_backends,
+    benchmark_backends,
+    select_backend,
+    render_qr,
+    render_terminal
+)
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+class TestBackends:
+    """Testy renderowania backendów."""
+
+    @pytest.mark.parametrize("name", ["qrcode", "pyqrcode"])
+    def test_png_backends(self, name, tmp_path):
+        """Test backendów PNG."""
+        if name not in available_backends():
+            pytest.skip(f"Backend {name} niedostępny")
+        output = tmp_path / "qr.png"
+        assert render_qr(SAMPLE_CONFIG, str(output), backend=name) == name
+        assert output.read_bytes()[:8] == PNG_SIGNATURE
+
+    def test_svg_backend(self, tmp_path):
+        """Test backendu SVG (wybierany po rozszerzeniu pliku)."""
+        output = tmp_path / "qr.svg"
+        assert render_qr(SAMPLE_CONFIG, str(output)) == "svg"
+        content = output.read_text()
+        assert content.startswith("<svg") and "<path" in content
+
+    def test_terminal_output(self):
+        """Test wyjścia terminalowego (bez i z kodami ANSI)."""
+        text = render_terminal("test", ansi=False)
+        lines = text.splitlines()
+        assert len({len(line) for line in lines}) == 1
+        assert set(text) <= {"█", "▀", "▄", " ", "\n"}
+        assert render_terminal("test").startswith("\033[")
+
+
+class TestSelection:
+    """Testy wyboru backendu."""
+
+    def test_explicit_backend(self):
+        """Test jawnie wskazanego backendu."""
+        assert select_backend("png", "qrcode") == "qrcode"
+        with pytest.raises(ValueError):
+            select_backend("png", "nieznany")
+
+    def test_unavailable_backend(self):
+        """Test niedostępnego backendu."""
+        with patch.object(qr_service, "PYQRCODE_AVAILABLE", False):
+            with pytest.raises(RuntimeError):
+                select_backend("png", "pyqrcode")
+
+    def test_format_mismatch_falls_back_to_auto(self, capsys):
+        """Test backendu innego formatu niż wymagany (wybór automatyczny z ostrzeżeniem)."""
+        with patch.object(qr_service, "_format_warnings", set()), \
+             patch("modules.qr_service.available_backends", return_value=["qrcode"]):
+            assert select_backend("png", "svg") == "qrcode"
+            assert select_backend("png", "terminal") == "qrcode"
+            assert select_backend("png", "svg") == "qrcode"
+        assert capsys.readouterr().out.count("⚠️ Backend QR 'svg'") == 1
+        assert select_backend("svg", "svg") == "svg"
+
+    def test_auto_picks_fastest(self):
+        """Test wyboru najszybszego backendu na podstawie pomiaru."""
+        results = [{"backend": "pyqrcode", "format": "png", "avg_ms": 1.0, "size_bytes": 1},
+                   {"backend": "qrcode", "format": "png", "avg_ms": 2.0, "size_bytes": 1}]
+        with patch.dict(qr_service._fastest, clear=True), \
+             patch("modules.qr_service.available_backends", return_value=["qrcode", "pyqrcode"]), \
+             patch("modules.qr_service.benchmark_backends", return_value=results) as mock_bench:
+            assert select_backend("png", "auto") == "pyqrcode"
+            assert select_backend("png", "auto") == "pyqrcode"
+        mock_bench.assert_called_once()
+
+
+class TestBenchmark:
+    """Testy benchmarku backendów."""
+
+    def test_benchmark_reports_time_and_size(self):
+        """Test raportu czasu i rozmiaru dla każdego backendu."""
+        results = benchmark_backends(iterations=1, backends=["svg", "terminal"])
+        assert {r["backend"] for r in results} == {"svg", "terminal"}
+        for row in results:
+            assert row["avg_ms"] > 0
+            assert row["size_bytes"] > 0
+            assert row["format"] == BACKENDS[row["backend"]].format
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Testy jednostkowe asynchronicznego generatora kodów QR.
+
+Moduł testuje:
+- Klucz pamięci podręcznej (SHA-256 konfiguracji)
+- Renderowanie tylko przy braku wpisu w pamięci podręcznej
+- Zlecanie zadań do puli procesów i obsługę trafień bez puli
+- Start procesów roboczych bez fork (forkserver lub spawn)
+- Generowanie brakującego kodu QR użytkownika na żądanie
+"""
+
+import pytest
+import os
+import sys
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import modules.qr_worker as qr_worker
+from modules.qr_worker import (
+    config_hash,
+    cache_path,
+    ensure_qr,
+    submit_qr,
+    ensure_user_qr,
+    discard_cached_qr
+)
+from modules.qr_service import select_backend
+
+CONFIG = "[Interface]\nPrivateKey = testkey\n\n[Peer]\nPublicKey = testpub\n"
+
+
+class TestCache:
+    """Testy pamięci podręcznej kodów QR."""
+
+    def test_hash_depends_on_content(self):
+        """Test klucza pamięci podręcznej."""
+        assert config_hash(CONFIG) == config_hash(CONFIG)
+        assert config_hash(CONFIG) != config_hash(CONFIG + " ")
+        assert len(config_hash(CONFIG)) == 64
+
+    def test_unchanged_config_rendered_once(self, tmp_path):
+        """Test: niezmieniona konfiguracja nie jest renderowana ponownie."""
+        cache_dir = tmp_path / "cache"
+        with patch("modules.qr_worker.render_qr_png",
+                   side_effect=lambda data, path, backend=None: open(path, "wb").write(b"PNG")) as mock_render:
+            ensure_qr(CONFIG, str(tmp_path / "a.png"), cache_dir)
+            ensure_qr(CONFIG, str(tmp_path / "b.png"), cache_dir)
+
+        mock_render.assert_called_once()
+        assert (tmp_path / "a.png").read_bytes() == b"PNG"
+        assert (tmp_path / "b.png").read_bytes() == b"PNG"
+        assert os.path.exists(cache_path(CONFIG, cache_dir, select_backend("png")))
+
+    def test_real_png_render(self, tmp_path):
+        """Test rzeczywistego renderowania PNG."""
+        pytest.importorskip("qrcode")
+        output = tmp_path / "user.png"
+        ensure_qr(CONFIG, str(output), tmp_path / "cache")
+        assert output.read_bytes()[:8] == b"\x89PNG\r\n\x1a\n"
+
+    def test_discard_cached_qr(self, tmp_path):
+        """Test usunięcia wpisu pamięci podręcznej."""
+        cached = cache_path(CONFIG, tmp_path, select_backend("png"))
+        open(cached, "wb").close()
+        assert discard_cached_qr(CONFIG, tmp_path) is True
+        assert discard_cached_qr(CONFIG, tmp_path) is False
+
+
+class TestSubmit:
+    """Testy zlecania zadań."""
+
+    def test_cache_hit_does_not_use_pool(self, tmp_path):
+        """Test trafienia w pamięć podręczną bez udziału puli procesów."""
+        cached = cache_path(CONFIG, tmp_path, select_backend("png"))
+        with open(cached, "wb") as f:
+            f.write(b"PNG")
+        with patch("modules.qr_worker._get_executor") as mock_executor:
+            future = submit_qr(CONFIG, str(tmp_path / "out.png"), tmp_path)
+        assert future.result() == str(tmp_path / "out.png")
+        mock_executor.assert_not_called()
+
+    def test_miss_is_rendered_in_process_pool(self, tmp_path):
+        """Test renderowania w puli procesów."""
+        pytest.importorskip("qrcode")
+        output = tmp_path / "pool.png"
+        try:
+            assert submit_qr(CONFIG, str(output), tmp_path / "cache").result(timeout=60) == str(output)
+        finally:
+            qr_worker.shutdown_pool()
+        assert output.exists()
+
+    def test_pool_workers_not_forked(self):
+        """Test kontekstu startu procesów roboczych (forkserver lub spawn zamiast fork)."""
+        with patch.object(qr_worker, "_executor", None), \
+                patch("modules.qr_worker.ProcessPoolExecutor") as mock_pool:
+            qr_worker._get_executor()
+        assert mock_pool.call_args.kwargs["mp_context"].get_start_method() in ("forkserver", "spawn")
+
+    def test_ensure_user_qr_on_demand(self, tmp_path):
+        """Test generowania brakującego kodu QR użytkownika z pliku konfiguracyjnego."""
+        config_dir = tmp_path / "configs"
+        config_dir.mkdir()
+        (config_dir / "jan.conf").write_text(CONFIG)
+        with patch.object(qr_worker, "WG_CONFIG_DIR", str(config_dir)), \
+             patch.object(qr_worker, "QR_CODE_DIR", str(tmp_path / "qr")), \
+             patch.object(qr_worker, "QR_CACHE_DIR", str(tmp_path / "cache")), \
+             patch("modules.qr_worker.render_qr_png",
+                   side_effect=lambda data, path, backend=None: open(path, "wb").write(b"PNG")), \
+             patch("modules.qr_worker._get_executor", side_effect=RuntimeError("brak procesów")):
+            assert ensure_user_qr("jan") == str(tmp_path / "qr" / "jan.png")
+            assert ensure_user_qr("nieznany") is None
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Testy jednostkowe egzekwowania limitów danych.
+
+Moduł testuje:
+- Parsowanie napisów limitów (jednostki SI i IEC, brak limitu)
+- Limit z rekordu, z planu subskrypcji i domyślny
+- Zużycie z przyrostów liczników (punkt odniesienia, restart interfejsu)
+- Progi ostrzeżeń zgłaszane raz na okres i zerowanie okresu
+- Blokadę wszystkich peerów ponad limit jednym zapisem i jednym `wg set`
+- Odblokowanie peerów zablokowanych za limit w nowym okresie
+- Wydajność dla 20 tys. peerów
+"""
+
+import pytest
+import json
+import os
+import sys
+import time
+from unittest.mock import patch
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from modules.quota import QUOTA_BLOCK_REASON, QuotaEngine, enforce_quotas, limit_for, parse_limit
+from modules.wg_snapshot import WgPeer
+
+OCTOBER = 1_760_000_000    # 2025-10-09 UTC
+NOVEMBER = 1_762_000_000   # 2025-11-01 UTC
+
+
+def peer(public_key, rx, tx=0):
+    return WgPeer("wg0", public_key, None, None, (), 0, rx, tx, None)
+
+
+class TestLimits:
+    """Testy limitów danych."""
+
+    @pytest.mark.parametrize("text, expected", [
+        ("100.0 GB", 100 * 1000 ** 3),
+        ("1.5 GiB", 3 * 1024 ** 3 // 2),
+        ("512 kB", 512_000),
+        ("10,5 MB", 10_500_000),
+        ("N/A", 0),
+        ("unlimited", 0),
+        (None, 0),
+    ])
+    def test_parse_limit(self, text, expected):
+        assert parse_limit(text) == expected
+
+    def test_parse_limit_invalid(self):
+        with pytest.raises(ValueError):
+            parse_limit("dużo")
+
+    def test_record_plan_and_default(self):
+        plans = {"premium": "1 TB"}
+        assert limit_for({"data_limit": "5 GB", "subscription_plan": "premium"}, plans) == 5 * 1000 ** 3
+        assert limit_for({"data_limit": "N/A", "subscription_plan": "premium"}, plans) == 1000 ** 4
+        assert limit_for({"subscription_plan": "darmowy"}, plans, default_limit="1 GB") == 1000 ** 3
+        assert limit_for({"data_limit": "unlimited", "subscription_plan": "premium"}, plans) == 0
+
+
+class TestQuotaEngine:
+    """Testy wektorowego liczenia zużycia."""
+
+    def test_deltas_baseline_and_reset(self):
+        engine = QuotaEngine()
+        keys = ["A=", "B="]
+        engine.evaluate(keys, [1000, 50], [500, 0], [0, 0])  # punkt odniesienia
+        result = engine.evaluate(keys, [1600, 20], [700, 5], [0, 0])  # B: restart interfejsu
+        assert result["delta"].tolist() == [800, 25]
+        assert (engine.usage("A="), engine.usage("B="), engine.usage("C=")) == (800, 25, 0)
+
+    def test_over_and_warnings_once(self):
+        engine = QuotaEngine()
+        engine.evaluate(["A="], [0], [0], [1000], (0.8, 0.9))
+        assert engine.evaluate(["A="], [850], [0], [1000], (0.8, 0.9))["warn"].tolist() == [1]
+        assert engine.evaluate(["A="], [860], [0], [1000], (0.8, 0.9))["warn"].tolist() == [0]
+        result = engine.evaluate(["A="], [1000], [0], [1000], (0.8, 0.9))
+        assert result["over"].tolist() == [True]
+        assert engine.evaluate(["B="], [10 ** 12], [0], [0])["over"].tolist() == [False]  # bez limitu
+
+    def test_new_period_resets_usage(self):
+        engine = QuotaEngine()
+        assert not engine.start_period(OCTOBER, "month")
+        engine.evaluate(["A="], [0], [0], [1000])
+        engine.evaluate(["A="], [900], [0], [1000])
+        assert not engine.start_period(OCTOBER + 3600, "month")
+        assert engine.start_period(NOVEMBER, "month")
+        assert engine.usage("A=") == 0
+        assert engine.evaluate(["A="], [950], [0], [1000])["delta"].tolist() == [50]
+
+    def test_state_survives_reopen(self, tmp_path):
+        engine = QuotaEngine(tmp_path / "quota_state.npz")
+        engine.start_period(OCTOBER, "month")
+        engine.evaluate(["A="], [100], [0], [0])
+        engine.evaluate(["A="], [300], [0], [0])
+        engine.save()
+        reopened = QuotaEngine(tmp_path / "quota_state.npz")
+        assert reopened.period == "2025-10"
+        assert reopened.evaluate(["A="], [400], [0], [0])["used"].tolist() == [300]
+
+    def test_20k_peers_under_a_second(self):
+        engine = QuotaEngine()
+        keys = [f"{i:043d}=" for i in range(20_000)]
+        counters = np.arange(20_000, dtype=np.uint64)
+        limits = np.full(20_000, 10 ** 9, dtype=np.uint64)
+        engine.evaluate(keys, counters, counters, limits, (0.8, 0.9))
+        started = time.perf_counter()
+        engine.evaluate(keys, counters * 2, counters, limits, (0.8, 0.9))
+        assert time.perf_counter() - started < 0.5
+
+
+class TestEnforceQuotas:
+    """Testy blokowania peerów ponad limit."""
+
+    @pytest.fixture
+    def records_path(self, tmp_path):
+        path = tmp_path / "user_records.json"
+        path.write_text(json.dumps({
+            "alice": {"public_key": "A=", "data_limit": "1 kB", "status": "active"},
+            "bob": {"public_key": "B=", "data_limit": "1 kB", "status": "active"},
+            "carol": {"public_key": "C=", "data_limit": "N/A", "subscription_plan": "darmowy", "status": "active"},
+        }))
+        return path
+
+    @pytest.fixture(autouse=True)
+    def quota_settings(self):
+        with patch("settings.USER_STORE_BACKEND", "json"), \
+                patch("settings.QUOTA_ENFORCE", True), \
+                patch("settings.QUOTA_PERIOD", "month"), \
+                patch("settings.QUOTA_WARN_THRESHOLDS", (0.8,)), \
+                patch("settings.QUOTA_PLAN_LIMITS", {"darmowy": "100 B"}):
+            yield
+
+    def run(self, records_path, engine, counters, now=OCTOBER):
+        peers = {key: peer(key, rx) for key, rx in counters.items()}
+        return enforce_quotas(peers, records_path, "wg0", "/etc/wireguard/wg0.conf", now=now, engine=engine)
+
+    def test_batch_block(self, records_path):
+        engine = QuotaEngine()
+        self.run(records_path, engine, {"A=": 0, "B=": 0, "C=": 0})
+        with patch("modules.server_config.set_peers_enabled") as mock_config, \
+                patch("modules.peer_apply.remove_peers") as mock_remove:
+            summary = self.run(records_path, engine, {"A=": 2000, "B=": 1500, "C=": 85})
+
+        assert sorted(summary["blocked"]) == ["alice", "bob"]
+        assert summary["warned"] == ["carol"]
+        mock_config.assert_called_once()
+        assert sorted(mock_config.call_args.args[1]) == ["alice", "bob"]
+        mock_remove.assert_called_once()
+        assert sorted(mock_remove.call_args.args[1]) == ["A=", "B="]
+
+        records = json.loads(records_path.read_text())
+        assert records["alice"]["status"] == "blocked"
+        assert records["alice"]["blocked_reason"] == QUOTA_BLOCK_REASON
+        assert records["alice"]["data_used"] == "1.95 KiB"
+        assert records["carol"]["status"] == "active"
+
+    def test_warn_only_mode(self, records_path):
+        engine = QuotaEngine()
+        self.run(records_path, engine, {"A=": 0})
+        with patch("settings.QUOTA_ENFORCE", False), \
+                patch("modules.peer_apply.remove_peers") as mock_remove:
+            summary = self.run(records_path, engine, {"A=": 5000})
+        assert summary["blocked"] == []
+        mock_remove.assert_not_called()
+        assert json.loads(records_path.read_text())["alice"]["status"] == "active"
+
+    def test_new_period_restores_quota_blocked(self, records_path):
+        records = json.loads(records_path.read_text())
+        records["alice"].update(status="blocked", blocked_reason=QUOTA_BLOCK_REASON)
+        records["bob"].update(status="blocked", blocked_reason="admin")
+        records_path.write_text(json.dumps(records))
+        engine = QuotaEngine()
+        self.run(records_path, engine, {"C=": 0})
+        with patch("modules.server_config.set_peers_enabled") as mock_config, \
+                patch("modules.peer_apply.apply_peer_changes") as mock_apply:
+            summary = self.run(records_path, engine, {"C=": 10}, now=NOVEMBER)
+
+        assert summary["restored"] == ["alice"]
+        mock_config.assert_called_once_with("/etc/wireguard/wg0.conf", ["alice"], True)
+        mock_apply.assert_called_once()
+        records = json.loads(records_path.read_text())
+        assert (records["alice"]["status"], records["bob"]["status"]) == ("active", "blocked")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Testy jednostkowe modelu konfiguracji serwera WireGuard (wg0.conf).
+
+Moduł testuje:
+- Bezstratny zapis (render identyczny z wczytanym plikiem)
+- Indeksy peerów po nazwie klienta i kluczu publicznym
+- Rozpoznawanie zablokowanych (zakomentowanych) peerów
+- Edycje w miejscu: blokowanie, zmiana pól, dodawanie i usuwanie peerów
+- Atomowy zapis i współdzieloną kopię unieważnianą po zmianie pliku
+"""
+
+import pytest
+import os
+import stat
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from modules.server_config import ServerConfig, edit_server_config, load_server_config
+
+CONFIG = """[Interface]
+Address = 10.66.66.1/24,fd42:42:42::1/64
+ListenPort = 51820
+PrivateKey = SERVERKEY=
+PostUp = iptables -A FORWARD -i wg0 -j ACCEPT # NAT
+
+### Client alice
+[Peer]
+PublicKey = ALICE=
+PresharedKey = PSKA=
+AllowedIPs = 10.66.66.2/32,fd42:42:42::2/128
+
+### Client bob
+# [Peer]
+# PublicKey = BOB=
+# AllowedIPs = 10.66.66.3/32
+
+### Klient Carol
+[Peer]
+PublicKey = CAROL=
+# PersistentKeepalive = 25
+AllowedIPs = 10.66.66.4/32
+"""
+
+
+@pytest.fixture
+def config():
+    return ServerConfig.parse(CONFIG)
+
+
+class TestParsing:
+    """Testy parsowania i bezstratnego zapisu."""
+
+    @pytest.mark.parametrize("text", [
+        CONFIG,
+        CONFIG.rstrip("\n"),
+        CONFIG.replace("\n", "\r\n"),
+        "",
+        "# tylko komentarz\n\n",
+        "[Peer]\nPublicKey = X=\n[Peer]\nPublicKey = Y=",
+    ])
+    def test_round_trip(self, text):
+        assert ServerConfig.parse(text).render() == text
+
+    def test_indexes(self, config):
+        assert config.client_names() == ["alice", "bob", "Carol"]
+        assert config.peer_by_name("CAROL").public_key == "CAROL="
+        assert config.peer_by_public_key("ALICE=").name == "alice"
+        assert config.peer_by_name("dave") is None
+        assert config.has_client("Bob")
+
+    def test_blocked_peer(self, config):
+        bob = config.peer_by_name("bob")
+        assert not bob.enabled
+        assert bob.public_key == "BOB="
+        assert [peer.name for peer in config.peers(include_disabled=False)] == ["alice", "Carol"]
+
+    def test_commented_option_in_active_peer(self, config):
+        carol = config.peer_by_name("carol")
+        assert carol.enabled
+        assert carol.persistent_keepalive is None
+
+    def test_interface_and_subnet(self, config):
+        assert config.interface.get("ListenPort") == "51820"
+        assert config.subnet() == "10.66.66.1/24"
+        assert ServerConfig.parse("[Interface]\nAddress = fd42::1/64\n").subnet() is None
+
+    def test_allowed_ips_include_blocked(self, config):
+        assert "10.66.66.3/32" in config.allowed_ips()
+        assert "10.66.66.3/32" not in config.allowed_ips(include_disabled=False)
+
+    def test_peer_without_client_comment(self):
+        config = ServerConfig.parse("[Interface]\nAddress = 10.0.0.1/24\n\n[Peer]\nPublicKey = X=\n")
+        assert config.peer_by_public_key("X=").name is None
+
+
+class TestEditing:
+    """Testy edycji w miejscu."""
+
+    def test_block_and_unblock_restores_text(self, config):
+        config.set_enabled("alice", False)
+        assert "# PublicKey = ALICE=" in config.render()
+        assert "### Client alice\n" in config.render()
+        assert not config.peer_by_public_key("ALICE=").enabled
+        config.set_enabled("alice", True)
+        assert config.render() == CONFIG
+
+    def test_unblock_blocked_peer(self, config):
+        config.set_enabled("bob", True)
+        assert "[Peer]\nPublicKey = BOB=\nAllowedIPs = 10.66.66.3/32\n" in config.render()
+        assert config.peer_by_name("bob").enabled
+
+    def test_update_peer_in_place(self, config):
+        config.update_peer("alice", AllowedIPs="10.66.66.9/32", PersistentKeepalive=25)
+        alice = config.peer_by_name("alice")
+        assert alice.allowed_ips == "10.66.66.9/32"
+        assert alice.persistent_keepalive == "25"
+        assert config.render().count("\n") == CONFIG.count("\n") + 1
+
+    def test_update_public_key_reindexes(self, config):
+        config.update_peer("alice", PublicKey="ALICE2=")
+        assert config.peer_by_public_key("ALICE=") is None
+        assert config.peer_by_public_key("ALICE2=").name == "alice"
+
+    def test_remove_peer(self, config):
+        removed = config.remove_peer("bob")
+        assert removed.public_key == "BOB="
+        assert "BOB=" not in config.render()
+        assert "### Client alice\n[Peer]" in config.render()
+        assert "### Klient Carol\n" in config.render()
+        assert config.peer_by_name("bob") is None
+        assert config.remove_peer(public_key="NIEZNANY=") is None
+
+    def test_remove_peer_by_public_key(self, config):
+        assert config.remove_peer(public_key="CAROL=").name == "Carol"
+        assert config.render().endswith("AllowedIPs = 10.66.66.3/32\n\n")
+
+    def test_add_peer(self, config):
+        config.add_peer("dave", "DAVE=", "PSKD=", "10.66.66.5/32")
+        assert config.render().endswith(
+            "AllowedIPs = 10.66.66.4/32\n\n### Klient dave\n[Peer]\nPublicKey = DAVE=\n"
+            "PresharedKey = PSKD=\nAllowedIPs = 10.66.66.5/32\n"
+        )
+        assert config.peer_by_public_key("DAVE=").name == "dave"
+
+    def test_add_peer_without_trailing_newline(self):
+        config = ServerConfig.parse("[Interface]\nAddress = 10.0.0.1/24")
+        config.add_peer("x", "X=")
+        assert config.render() == "[Interface]\nAddress = 10.0.0.1/24\n\n### Klient x\n[Peer]\nPublicKey = X=\n"
+
+    def test_clear_peers(self, config):
+        assert config.clear_peers() == 3
+        assert config.render().startswith("[Interface]\n")
+        assert "[Peer]" not in config.render()
+        assert config.peers() == []
+
+
+class TestFileOperations:
+    """Testy zapisu i współdzielonej kopii."""
+
+    def test_edit_saves_atomically_and_keeps_mode(self, tmp_path):
+        path = tmp_path / "wg0.conf"
+        path.write_text(CONFIG)
+        os.chmod(path, 0o600)
+        with edit_server_config(path) as config:
+            config.remove_peer("bob")
+        assert "BOB=" not in path.read_text()
+        assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+        assert [name for name in os.listdir(tmp_path) if not name.endswith(".lock")] == ["wg0.conf"]
+
+    def test_edit_not_saved_on_error(self, tmp_path):
+        path = tmp_path / "wg0.conf"
+        path.write_text(CONFIG)
+        with pytest.raises(RuntimeError):
+            with edit_server_config(path) as config:
+                config.clear_peers()
+                raise RuntimeError("błąd")
+        assert path.read_text() == CONFIG
+
+    def test_edit_missing_file(self, tmp_path):
+        path = tmp_path / "wg0.conf"
+        with pytest.raises(FileNotFoundError):
+            with edit_server_config(path):
+                pass
+        with edit_server_config(path, create=True) as config:
+            config.add_peer("x", "X=")
+        assert path.read_text() == "### Klient x\n[Peer]\nPublicKey = X=\n"
+
+    def test_shared_copy_reparsed_after_change(self, tmp_path):
+        path = tmp_path / "wg0.conf"
+        path.write_text(CONFIG)
+        first = load_server_config(path)
+        assert load_server_config(path) is first
+
+        with open(path, "a") as f:
+            f.write("\n### Klient dave\n[Peer]\nPublicKey = DAVE=\n")
+        assert load_server_config(path).has_client("dave")
+
+        with edit_server_config(path) as config:
+            config.remove_peer("dave")
+        assert not load_server_config(path).has_client("dave")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Testy jednostkowe kolektora statystyk WireGuard.
+
+Moduł testuje:
+- Pojedynczy pomiar: zapis ruchu i handshake'ów do magazynu (jeden zapis) oraz plik stanu
+- Opis świeżości danych dla interfejsu
+- Pętlę asyncio: stały rytm, zatrzymanie i obsługę błędu pomiaru
+- Rollup historii ruchu w tle bez wstrzymywania pomiarów
+- Jednostkę systemd
+"""
+
+import pytest
+import asyncio
+import json
+import os
+import sys
+import time
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from modules import stats_daemon
+from modules.stats_daemon import collect_once, describe_status, read_status, run_collector, write_status
+from modules.quota import QuotaEngine
+from modules.traffic_series import TrafficSeries
+from modules.wg_snapshot import WgSnapshot, parse_dump
+
+
+def make_snapshot(now):
+    return WgSnapshot(*parse_dump([
+        f"wg0\tPUB_A=\t(none)\t1.2.3.4:51820\t10.0.0.2/32\t{int(now) - 10}\t{2 * 1024 ** 2}\t{1024 ** 2}\toff\n",
+        "wg0\tPUB_B=\t(none)\t(none)\t10.0.0.3/32\t0\t0\t0\toff\n",
+    ]))
+
+
+class TestCollectOnce:
+    """Testy pojedynczego pomiaru."""
+
+    def test_persists_records_and_status(self, tmp_path):
+        db_path = tmp_path / "user_records.json"
+        db_path.write_text(json.dumps({
+            "alice": {"public_key": "PUB_A="},
+            "bob": {"public_key": "PUB_B="},
+        }))
+        status_path = tmp_path / "stats_status.json"
+        snapshot = make_snapshot(time.time())
+        from modules.user_store import JsonUserStore
+        with patch("modules.wg_snapshot.get_snapshot", return_value=snapshot), \
+                patch("settings.USER_STORE_BACKEND", "json"), \
+                patch.object(JsonUserStore, "_save", autospec=True, side_effect=JsonUserStore._save) as mock_save:
+            status = collect_once(db_path, "wg0", status_path, TrafficSeries(tmp_path / "series"),
+                                  QuotaEngine(tmp_path / "quota_state.npz"))
+
+        assert mock_save.call_count == 1  # Ruch, handshake'i i limity jednym zapisem magazynu
+
+        records = json.loads(db_path.read_text())
+        assert records["alice"]["transfer"] == "2.00 MiB odebrano, 1.00 MiB wysłano"
+        assert records["bob"]["last_handshake"] == "Nigdy"
+        assert (status["peers"], status["active"], status["quota_blocked"]) == (2, 1, 0)
+        assert read_status(status_path) == status
+
+    def test_missing_status(self, tmp_path):
+        assert read_status(tmp_path / "brak.json") is None
+
+
+class TestDescribeStatus:
+    """Testy opisu stanu dla interfejsu."""
+
+    def test_no_data(self):
+        assert "Brak danych" in describe_status(None)
+
+    def test_age_and_error(self):
+        text = describe_status({"collected_at": 1000, "peers": 5, "active": 2, "error": "wg"}, now=1042)
+        assert "42 s temu" in text
+        assert "peerów: 5, aktywnych: 2" in text
+        assert "Ostatni błąd: wg" in text
+
+
+class TestRunCollector:
+    """Testy pętli asyncio."""
+
+    def test_runs_until_stopped(self):
+        calls = []
+
+        async def scenario():
+            stop = asyncio.Event()
+
+            def collect():
+                calls.append(time.monotonic())
+                if len(calls) == 3:
+                    stop.set()
+
+            return await run_collector(0.02, stop, collect)
+
+        assert asyncio.run(scenario()) == 3
+        assert calls[2] - calls[0] >= 0.03
+
+    def test_error_recorded_and_loop_continues(self, tmp_path):
+        status_path = tmp_path / "stats_status.json"
+        write_status({"collected_at": 1000, "peers": 1}, status_path)
+        calls = []
+
+        async def scenario():
+            stop = asyncio.Event()
+
+            def collect():
+                calls.append(1)
+                if len(calls) == 2:
+                    stop.set()
+                raise RuntimeError("brak wg")
+
+            return await run_collector(0.01, stop, collect)
+
+        with patch("settings.STATS_STATUS_PATH", status_path):
+            assert asyncio.run(scenario()) == 2
+        status = read_status(status_path)
+        assert status["error"] == "brak wg"
+        assert status["collected_at"] == 1000
+
+    def test_maintenance_runs_in_background(self):
+        calls = []
+
+        async def scenario():
+            stop = asyncio.Event()
+
+            def maintain():
+                time.sleep(0.1)
+                calls.append("maintain")
+
+            def collect():
+                calls.append("collect")
+                if calls.count("collect") == 4:
+                    stop.set()
+
+            return await run_collector(0.01, stop, collect, maintain, maintenance_interval=0.001)
+
+        assert asyncio.run(scenario()) == 4
+        # Pomiary nie czekały na trwający rollup, a kolejny rollup nie startował równolegle
+        assert calls.count("maintain") == 1
+        assert calls[-1] == "maintain"
+
+
+class TestService:
+    """Testy jednostki systemd."""
+
+    def test_unit_runs_collector_module(self):
+        unit = stats_daemon.UNIT_TEMPLATE.format(nic="wg0", project_dir="/opt/pyWGgen", python="/usr/bin/python3")
+        assert "ExecStart=/usr/bin/python3 -m modules.stats_daemon" in unit
+        assert "WorkingDirectory=/opt/pyWGgen" in unit
+        assert "After=network-online.target wg-quick@wg0.service" in unit
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Testy jednostkowe harmonogramu synchronizacji WireGuard.
+
+Moduł testuje:
+- Łączenie żądań z jednego okna w jedną synchronizację na interfejs
+- Powiadamianie każdego żądania o wyniku lub błędzie
+- Metryki głębokości kolejki i opóźnienia flush
+"""
+
+import pytest
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from modules.sync_scheduler import SyncScheduler
+
+
+class RecordingSync:
+    """Funkcja synchronizacji zapisująca wywołania."""
+
+    def __init__(self, error=None):
+        self.calls = []
+        self.error = error
+        self.lock = threading.Lock()
+
+    def __call__(self, nic, config_file):
+        with self.lock:
+            self.calls.append((nic, config_file))
+        if self.error:
+            raise self.error
+        return {"mode": "incremental", "added": 0, "updated": 0, "removed": 0}
+
+
+class TestSyncScheduler:
+    """Testy klasy SyncScheduler."""
+
+    def test_requests_in_window_are_coalesced(self):
+        """Test: wiele żądań w oknie -> jedna synchronizacja."""
+        sync = RecordingSync()
+        scheduler = SyncScheduler(window_ms=100, sync_func=sync)
+        requests = [scheduler.submit("wg0", "/etc/wireguard/wg0.conf") for _ in range(5)]
+
+        for request in requests:
+            assert request.wait(5)["mode"] == "incremental"
+        assert sync.calls == [("wg0", "/etc/wireguard/wg0.conf")]
+
+        metrics = scheduler.get_metrics()
+        assert metrics["requests"] == 5
+        assert metrics["flushes"] == 1
+        assert metrics["coalesced"] == 4
+        assert metrics["queue_depth"] == 0
+        assert metrics["max_queue_depth"] == 5
+        assert metrics["last_wait_ms"] >= 100
+
+    def test_separate_interfaces_synced_separately(self):
+        """Test: różne interfejsy w jednym oknie."""
+        sync = RecordingSync()
+        scheduler = SyncScheduler(window_ms=50, sync_func=sync)
+        first = scheduler.submit("wg0", "a.conf")
+        second = scheduler.submit("wg1", "b.conf")
+        first.wait(5)
+        second.wait(5)
+        assert sorted(sync.calls) == [("wg0", "a.conf"), ("wg1", "b.conf")]
+
+    def test_error_is_reported_to_each_request(self):
+        """Test przekazania błędu synchronizacji do wszystkich żądań."""
+        scheduler = SyncScheduler(window_ms=20, sync_func=RecordingSync(error=RuntimeError("wg")))
+        requests = [scheduler.submit("wg0", "a.conf") for _ in range(2)]
+        for request in requests:
+            with pytest.raises(RuntimeError):
+                request.wait(5)
+        assert scheduler.get_metrics()["errors"] == 1
+
+    def test_later_window_triggers_new_flush(self):
+        """Test: żądanie po zakończonym oknie uruchamia kolejną synchronizację."""
+        sync = RecordingSync()
+        scheduler = SyncScheduler(window_ms=10, sync_func=sync)
+        scheduler.submit("wg0", "a.conf").wait(5)
+        scheduler.submit("wg0", "a.conf").wait(5)
+        assert len(sync.calls) == 2
+        assert scheduler.get_metrics()["flushes"] == 2
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Testy jednostkowe szeregów czasowych ruchu peerów.
+
+Moduł testuje:
+- Zapis przyrostów liczników i handshake'ów w rekordach stałej szerokości
+- Pomijanie pomiarów bez zmian i pierwszy pomiar jako punkt odniesienia
+- Obsługę wyzerowania liczników po restarcie interfejsu
+- Podział przyrostu przekraczającego zakres u32
+- Zapytania o zakres czasu zwracające tablice NumPy
+- Odtworzenie stanu po ponownym otwarciu katalogu
+- Przyrostowe rollupy (5 min, 1 h, 1 dzień, miesiąc) z sumą i maksymalną prędkością
+- Retencję poziomów i kompaktowanie bez utraty dopisanych rekordów
+"""
+
+import pytest
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from modules.traffic_series import MAX_DELTA, RECORD, TrafficSeries, bucket_starts
+
+T0 = 1_760_000_000
+
+
+@pytest.fixture
+def series(tmp_path):
+    return TrafficSeries(tmp_path / "series")
+
+
+class TestAppend:
+    """Testy zapisu pomiarów."""
+
+    def test_deltas_and_handshakes(self, series):
+        series.append(T0, [("A=", 1000, 500, T0 - 5)])
+        assert series.append(T0 + 60, [("A=", 1600, 700, T0 + 50)]) == 1
+        series.append(T0 + 120, [("A=", 1600, 900, T0 + 50)])
+
+        data = series.query("A=")
+        assert data["t"].tolist() == [T0 + 60, T0 + 120]
+        assert data["rx"].tolist() == [600, 0]
+        assert data["tx"].tolist() == [200, 200]
+        assert data["handshake"].tolist() == [T0 + 50, T0 + 50]
+        assert isinstance(data["rx"], np.ndarray)
+
+    def test_unchanged_sample_not_stored(self, series):
+        series.append(T0, [("A=", 10, 10, 0)])
+        assert series.append(T0 + 60, [("A=", 10, 10, 0)]) == 0
+        assert not os.path.exists(os.path.join(series.peers_dir, "0.bin"))
+
+    def test_fixed_width_file(self, series):
+        series.append(T0, [("A=", 0, 0, 0)])
+        series.append(T0 + 60, [("A=", 1, 1, 0)])
+        series.append(T0 + 120, [("A=", 2, 2, 0)])
+        assert os.path.getsize(os.path.join(series.peers_dir, "0.bin")) == 2 * RECORD.itemsize == 32
+
+    def test_counter_reset(self, series):
+        series.append(T0, [("A=", 5000, 4000, 0)])
+        series.append(T0 + 60, [("A=", 300, 100, 0)])  # restart interfejsu
+        assert series.totals("A=") == (300, 100)
+
+    def test_delta_above_u32_split(self, series):
+        series.append(T0, [("A=", 0, 0, 0)])
+        series.append(T0 + 60, [("A=", MAX_DELTA + 10, 1, 0)])
+        data = series.query("A=")
+        assert data["t"].tolist() == [T0 + 60, T0 + 60]
+        assert series.totals("A=") == (MAX_DELTA + 10, 1)
+
+
+class TestQuery:
+    """Testy zapytań o zakres."""
+
+    def test_range(self, series):
+        series.append(T0, [("A=", 0, 0, 0), ("B=", 0, 0, 0)])
+        for minute in range(1, 11):
+            series.append(T0 + minute * 60, [("A=", minute * 100, 0, 0), ("B=", minute, minute, 0)])
+        data = series.query("A=", start=T0 + 180, end=T0 + 360)
+        assert data["t"].tolist() == [T0 + 180, T0 + 240, T0 + 300]
+        assert series.totals("B=", start=T0 + 600) == (1, 1)
+
+    def test_unknown_peer(self, series):
+        data = series.query("BRAK=")
+        assert data["t"].size == 0
+        assert series.totals("BRAK=") == (0, 0)
+
+    def test_state_survives_reopen(self, tmp_path):
+        first = TrafficSeries(tmp_path / "series")
+        first.append(T0, [("A=", 100, 100, 0)])
+        reopened = TrafficSeries(tmp_path / "series")
+        reopened.append(T0 + 60, [("A=", 150, 120, 0)])
+        assert reopened.totals("A=") == (50, 20)
+        assert reopened.peers() == ["A="]
+
+
+class TestRollups:
+    """Testy rollupów i retencji."""
+
+    @staticmethod
+    def fill(series, minutes, start=T0, step=60, per_minute=600):
+        series.append(start, [("A=", 0, 0, 0)])
+        for minute in range(1, minutes + 1):
+            series.append(start + minute * step, [("A=", minute * per_minute, minute, 0)])
+
+    def test_bucket_starts(self):
+        # 2025-10-09 08:53:20 UTC
+        assert bucket_starts([T0], "1h").tolist() == [T0 - T0 % 3600]
+        assert bucket_starts([T0], "1mo").tolist() == [1759276800]  # 2025-10-01 00:00 UTC
+
+    def test_tiers_sum_and_max_rate(self, series):
+        start = T0 - T0 % 3600
+        self.fill(series, 120, start=start)
+        assert series.rollup(sample_interval=60) == 120
+        hourly = series.query_rollup("A=", "1h")
+        assert hourly["start"].tolist() == [start, start + 3600, start + 7200]
+        assert hourly["rx"].tolist() == [59 * 600, 60 * 600, 600]
+        assert hourly["max_rx_rate"].max() == pytest.approx(10.0)
+        five = series.query_rollup("A=", "5m", start=start, end=start + 600)
+        assert five["rx"].tolist() == [4 * 600, 5 * 600]
+        assert series.query_rollup("A=", "1mo")["tx"].sum() == 120
+
+    def test_incremental_rollup_updates_open_bucket(self, series):
+        start = T0 - T0 % 3600
+        self.fill(series, 10, start=start)
+        series.rollup(sample_interval=60)
+        series.append(start + 11 * 60, [("A=", 11 * 600 + 600, 11, 0)])
+        assert series.rollup(sample_interval=60) == 1
+        hourly = series.query_rollup("A=", "1h")
+        assert hourly["start"].tolist() == [start]
+        assert hourly["rx"].tolist() == [12 * 600]
+        assert series.rollup(sample_interval=60) == 0
+
+    def test_idle_gap_does_not_lower_rate(self, series):
+        series.append(T0, [("A=", 0, 0, 0)])
+        series.append(T0 + 60, [("A=", 600, 0, 0)])
+        series.append(T0 + 7200, [("A=", 1200, 0, 0)])
+        series.rollup(sample_interval=60)
+        assert series.query_rollup("A=", "1d")["max_rx_rate"].tolist() == [pytest.approx(10.0)]
+
+    def test_retention_keeps_unrolled_raw(self, series):
+        start = T0 - T0 % 86400
+        self.fill(series, 5, start=start, step=86400)
+        now = start + 5 * 86400
+        assert series.compact(now=now, retention_days={"raw": 2}) == 0  # nic jeszcze nie zagregowano
+        series.rollup(sample_interval=60)
+        removed = series.compact(now=now, retention_days={"raw": 2, "1d": 3, "5m": None, "1h": None})
+        assert series.query("A=")["t"].tolist() == [start + day * 86400 for day in (3, 4, 5)]
+        assert series.query_rollup("A=", "1d")["start"].tolist() == [start + 2 * 86400 + i * 86400 for i in range(4)]
+        assert removed == 2 + 1
+        series.append(now + 60, [("A=", 6 * 600, 6, 0)])
+        assert series.rollup(sample_interval=60) == 1
+        assert series.totals("A=", start=now + 1) == (600, 1)
+
+    def test_unknown_tier(self, series):
+        with pytest.raises(ValueError):
+            series.query_rollup("A=", "1w")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Testy jednostkowe aktualizacji danych o ruchu użytkowników WireGuard.
+
+Moduł testuje:
+- Dopasowanie peerów migawki `wg show all dump` do użytkowników przez indeks kluczy publicznych
+- Zapis pól transfer/total_transfer
+- Obsługę błędów polecenia wg i brakującego pliku
+"""
+
+import pytest
+import json
+import os
+import sys
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from modules.traffic_updater import update_traffic_data
+from modules.wg_snapshot import WgSnapshot, parse_dump
+
+
+def make_snapshot(rows):
+    """Migawka interfejsu wg0 z krotek (klucz, odebrano, wysłano)."""
+    dump = [f"wg0\t{key}\t(none)\t(none)\t10.0.0.2/32\t0\t{rx}\t{tx}\toff" for key, rx, tx in rows]
+    return WgSnapshot(*parse_dump(dump))
+
+
+class TestUpdateTrafficData:
+    """Testy funkcji update_traffic_data."""
+
+    @patch('modules.traffic_updater.SERVER_WG_NIC', "wg0")
+    @patch('modules.traffic_updater.get_snapshot')
+    def test_updates_matching_users(self, mock_snapshot, tmp_path):
+        db_path = tmp_path / "user_records.json"
+        db_path.write_text(json.dumps({
+            "jan": {"public_key": "PUB_JAN"},
+            "ola": {"public_key": "PUB_OLA"},
+        }))
+        mock_snapshot.return_value = make_snapshot([("PUB_JAN", 2 * 1024 ** 2, 1024 ** 2), ("NIEZNANY", 1, 1)])
+
+        update_traffic_data(str(db_path))
+
+        result = json.loads(db_path.read_text())
+        assert result["jan"]["transfer"] == "2.00 MiB odebrano, 1.00 MiB wysłano"
+        assert result["jan"]["total_transfer"] == result["jan"]["transfer"]
+        assert "transfer" not in result["ola"]
+        assert "NIEZNANY" not in result
+
+    @patch('modules.traffic_updater.SERVER_WG_NIC', "wg0")
+    @patch('modules.traffic_updater.get_snapshot')
+    def test_uses_public_key_index(self, mock_snapshot, tmp_path):
+        db_path = tmp_path / "user_records.json"
+        db_path.write_text(json.dumps({f"user{i}": {"public_key": f"PUB{i}"} for i in range(50)}))
+        mock_snapshot.return_value = make_snapshot([(f"PUB{i}", 0, 0) for i in range(50)])
+
+        with patch('modules.user_store.JsonUserStore.find_by_public_key') as mock_find:
+            update_traffic_data(str(db_path))
+        mock_find.assert_not_called()
+        assert all("transfer" in record for record in json.loads(db_path.read_text()).values())
+
+    @patch('modules.traffic_updater.get_snapshot', side_effect=FileNotFoundError("wg"))
+    def test_wg_error_keeps_file(self, mock_snapshot, tmp_path):
+        db_path = tmp_path / "user_records.json"
+        db_path.write_text(json.dumps({"jan": {"public_key": "PUB_JAN"}}))
+        update_traffic_data(str(db_path))
+        assert json.loads(db_path.read_text()) == {"jan": {"public_key": "PUB_JAN"}}
+
+    def test_missing_file(self, tmp_path, capsys):
+        update_traffic_data(str(tmp_path / "brak.json"))
+        assert "nie istnieje" in capsys.readouterr().out
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
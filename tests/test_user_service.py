@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Testy jednostkowe usługi tworzenia użytkowników w bieżącym procesie.
+
+Moduł testuje:
+- Pamięć podręczną parametrów serwera (odświeżanie po zmianie pliku)
+- Strukturalny wynik (ścieżki, adres IP, czasy)
+- Wykrywanie duplikatów i błędy synchronizacji
+- Bezpieczeństwo wywołań z wielu wątków
+"""
+
+import pytest
+import os
+import sys
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import modules.user_service as user_service
+
+
+def fake_entry(created):
+    """Zwraca atrapę main.create_user_entry zapisującą utworzonych użytkowników."""
+    lock = threading.Lock()
+
+    def create_user_entry(nickname, params, config_file, email, telegram_id):
+        with lock:
+            ip = f"10.66.66.{len(created) + 2}"
+            created[nickname.lower()] = ip
+        future = Future()
+        future.set_result(f"/tmp/{nickname}.png")
+        return {"config_path": f"/tmp/{nickname}.conf", "qr_path": f"/tmp/{nickname}.png",
+                "ip": ip, "qr_future": future}
+    return create_user_entry
+
+
+@pytest.fixture
+def service(tmp_path):
+    """Atrapy funkcji main.py używanych przez usługę."""
+    created = {}
+    params_file = tmp_path / "params"
+    params_file.write_text("[server]\nSERVER_PUB_IP = 1.2.3.4\n")
+    with patch.object(user_service.settings, "PARAMS_FILE", params_file), \
+         patch.object(user_service, "_directories_ready", True), \
+         patch("modules.user_service.main.load_existing_users", side_effect=lambda: dict(created)), \
+         patch("modules.user_service.main.load_server_config_names", return_value=set()), \
+         patch("modules.user_service.main.create_user_entry", side_effect=fake_entry(created)), \
+         patch("modules.user_service.main.get_server_wg_nic", return_value="wg0"), \
+         patch("modules.user_service.main.sync_wireguard") as mock_sync:
+        yield created, mock_sync, params_file
+
+
+class TestUserService:
+    """Testy funkcji create_user."""
+
+    def test_structured_result(self, service):
+        """Test strukturalnego wyniku."""
+        result = user_service.create_user("jan", "jan@example.com")
+        assert result["success"] is True
+        assert result["config_path"] == "/tmp/jan.conf"
+        assert result["qr_path"] == "/tmp/jan.png"
+        assert result["ip"] == "10.66.66.2"
+        assert set(result["timings"]) == {"create", "sync", "qr", "total"}
+
+    def test_duplicate_and_empty(self, service):
+        """Test duplikatu (bez rozróżniania wielkości liter) i pustej nazwy."""
+        assert user_service.create_user("jan")["success"] is True
+        duplicate = user_service.create_user("JAN")
+        assert duplicate["success"] is False
+        assert "już istnieje" in duplicate["message"]
+        assert user_service.create_user("  ")["success"] is False
+
+    def test_sync_error_keeps_user(self, service):
+        """Test błędu synchronizacji po zapisaniu użytkownika."""
+        _, mock_sync, _ = service
+        mock_sync.side_effect = RuntimeError("wg niedostępny")
+        result = user_service.create_user("jan")
+        assert result["success"] is True
+        assert result["message"].startswith("⚠️")
+
+    def test_params_cached(self, service):
+        """Test wczytania parametrów raz i odświeżenia po zmianie pliku."""
+        _, _, params_file = service
+        with patch("modules.user_service.load_params", return_value={"a": 1}) as mock_load:
+            user_service.get_params()
+            user_service.get_params()
+            assert mock_load.call_count == 1
+            params_file.write_text("[server]\nSERVER_PUB_IP = 5.6.7.8\nSERVER_PORT = 51820\n")
+            user_service.get_params()
+            assert mock_load.call_count == 2
+
+    def test_concurrent_calls(self, service):
+        """Test równoległych wywołań z wielu wątków."""
+        created, _, _ = service
+        names = [f"user{i}" for i in range(20)] + ["user0"] * 5
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(user_service.create_user, names))
+
+        assert sum(r["success"] for r in results) == 20
+        assert len(set(created.values())) == 20
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Testy jednostkowe magazynu rekordów użytkowników.
+
+Moduł testuje:
+- Wspólny interfejs backendów JSON i SQLite (odczyt, zapis, aktualizacja, usuwanie)
+- Wyszukiwanie bez rozróżniania wielkości liter i po kluczu publicznym
+- Indeks kluczy publicznych (aktualizacja przyrostowa i po zmianie pliku)
+- Transakcje wsadowe (jeden zapis, wycofanie przy błędzie)
+- Import/eksport dotychczasowego pliku user_records.json
+- Wybór backendu przez open_user_store
+- Atomowy zapis pliku JSON i blokadę między procesami
+"""
+
+import pytest
+import json
+import os
+import sys
+import threading
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from modules.user_store import JsonUserStore, SqliteUserStore, export_json, import_json, open_user_store
+
+RECORDS = {
+    "Jan": {"username": "Jan", "public_key": "PUB_JAN", "user_id": "1", "status": "active", "expires_at": "2026-01-01"},
+    "ola": {"username": "ola", "public_key": "PUB_OLA", "user_id": "2", "status": "blocked", "expires_at": "2026-02-01"},
+}
+
+
+def _increment(path, times):
+    """Zwiększa licznik w osobnym procesie (odczyt-modyfikacja-zapis pod blokadą)."""
+    from modules.file_lock import file_lock
+    store = JsonUserStore(path)
+    for _ in range(times):
+        with file_lock(path):
+            value = store.get("licznik")["value"]
+            store.update("licznik", {"value": value + 1})
+
+
+@pytest.fixture(params=["json", "sqlite"])
+def store(request, tmp_path):
+    """Magazyn każdego backendu z dwoma rekordami."""
+    if request.param == "json":
+        store = JsonUserStore(tmp_path / "user_records.json")
+    else:
+        store = SqliteUserStore(tmp_path / "user_records.db")
+    store.put_many(json.loads(json.dumps(RECORDS)))
+    return store
+
+
+class TestUserStoreBackends:
+    """Testy wspólnego interfejsu backendów."""
+
+    def test_all_and_get(self, store):
+        assert store.all() == RECORDS
+        assert store.get("ola")["status"] == "blocked"
+        assert store.get("brak") is None
+        assert store.count() == 2
+
+    def test_exists_case_insensitive(self, store):
+        assert store.exists("jan")
+        assert store.exists("OLA")
+        assert not store.exists("ewa")
+
+    def test_find_by_public_key(self, store):
+        username, record = store.find_by_public_key("PUB_OLA")
+        assert username == "ola"
+        assert record["user_id"] == "2"
+        assert store.find_by_public_key("NIEZNANY") is None
+
+    def test_update_single_record(self, store):
+        assert store.update("Jan", {"status": "blocked", "transfer": "1 MiB"})
+        assert store.get("Jan")["status"] == "blocked"
+        assert store.get("Jan")["transfer"] == "1 MiB"
+        assert store.get("ola") == RECORDS["ola"]
+        assert not store.update("brak", {"status": "active"})
+
+    def test_update_many(self, store):
+        updated = store.update_many({"Jan": {"last_handshake": "a"}, "ola": {"last_handshake": "b"}, "brak": {}})
+        assert updated == 2
+        assert store.get("ola")["last_handshake"] == "b"
+
+    def test_delete(self, store):
+        assert store.delete("ola")["public_key"] == "PUB_OLA"
+        assert store.delete("ola") is None
+        assert list(store.all()) == ["Jan"]
+
+    def test_replace_all(self, store):
+        store.replace_all({"ewa": {"public_key": "PUB_EWA"}})
+        assert store.all() == {"ewa": {"public_key": "PUB_EWA"}}
+
+    def test_public_key_index(self, store):
+        assert store.public_key_index() == {"PUB_JAN": "Jan", "PUB_OLA": "ola"}
+
+    def test_public_key_index_follows_changes(self, store):
+        store.public_key_index()
+        store.put("ewa", {"public_key": "PUB_EWA"})
+        store.update("Jan", {"public_key": "PUB_JAN2"})
+        store.delete("ola")
+        assert store.public_key_index() == {"PUB_JAN2": "Jan", "PUB_EWA": "ewa"}
+        assert store.find_by_public_key("PUB_EWA")[0] == "ewa"
+
+    def test_batch_rollback(self, store):
+        with pytest.raises(RuntimeError):
+            with store.batch():
+                store.update("Jan", {"status": "blocked"})
+                raise RuntimeError("błąd")
+        assert store.get("Jan")["status"] == "active"
+
+
+class TestJsonBackend:
+    """Testy zgodności z dotychczasowym formatem pliku."""
+
+    def test_legacy_format(self, tmp_path):
+        path = tmp_path / "user_records.json"
+        JsonUserStore(path).put("jan", {"status": "active"})
+        assert path.read_text() == json.dumps({"jan": {"status": "active"}}, indent=4)
+
+    def test_missing_file_is_empty(self, tmp_path):
+        assert JsonUserStore(tmp_path / "brak.json").all() == {}
+
+    def test_batch_writes_once(self, tmp_path):
+        store = JsonUserStore(tmp_path / "user_records.json")
+        store.put_many(dict(RECORDS))
+        with patch.object(JsonUserStore, "_save", wraps=store._save) as mock_save:
+            with store.batch():
+                store.update("Jan", {"status": "blocked"})
+                store.update("ola", {"status": "active"})
+        assert mock_save.call_count == 3  # dwie zmiany w pamięci + jeden zapis pliku
+        assert JsonUserStore(store.path).get("ola")["status"] == "active"
+
+    def test_index_updated_incrementally(self, tmp_path):
+        store = JsonUserStore(tmp_path / "user_records.json")
+        store.put_many(dict(RECORDS))
+        store.public_key_index()
+        with patch("modules.user_store.build_public_key_index") as mock_build:
+            store.put("ewa", {"public_key": "PUB_EWA"})
+            assert store.public_key_index()["PUB_EWA"] == "ewa"
+        mock_build.assert_not_called()
+
+    def test_index_rebuilt_after_external_change(self, tmp_path):
+        path = tmp_path / "user_records.json"
+        store = JsonUserStore(path)
+        store.put_many(dict(RECORDS))
+        assert "PUB_JAN" in store.public_key_index()
+        path.write_text(json.dumps({"obcy": {"public_key": "PUB_X"}}, indent=2))
+        assert store.public_key_index() == {"PUB_X": "obcy"}
+
+    def test_save_is_atomic(self, tmp_path):
+        path = tmp_path / "user_records.json"
+        store = JsonUserStore(path)
+        store.put_many(dict(RECORDS))
+        before = path.read_text()
+        with patch("modules.user_store.json.dump", side_effect=OSError("brak miejsca")):
+            with pytest.raises(OSError):
+                store.put("ewa", {"status": "active"})
+        assert path.read_text() == before
+        assert sorted(os.listdir(tmp_path)) == ["user_records.json", "user_records.json.lock"]
+
+    def test_updates_from_processes_not_lost(self, tmp_path):
+        import multiprocessing
+        path = tmp_path / "user_records.json"
+        JsonUserStore(path).put("licznik", {"value": 0})
+        context = multiprocessing.get_context("fork")
+        workers = [context.Process(target=_increment, args=(str(path), 20)) for _ in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join(10)
+        assert JsonUserStore(path).get("licznik")["value"] == 80
+
+    def test_lock_not_inherited_by_fork(self, tmp_path):
+        import multiprocessing
+        from modules.file_lock import file_lock
+        path = tmp_path / "user_records.json"
+        JsonUserStore(path).put("licznik", {"value": 0})
+        context = multiprocessing.get_context("fork")
+        with file_lock(path):
+            worker = context.Process(target=_increment, args=(str(path), 1))
+            worker.start()
+            worker.join(0.5)
+            assert worker.is_alive()  # Potomek czeka na blokadę rodzica
+        worker.join(10)
+        assert JsonUserStore(path).get("licznik")["value"] == 1
+
+
+class TestSqliteBackend:
+    """Testy backendu SQLite."""
+
+    def test_wal_mode_and_indexes(self, tmp_path):
+        store = SqliteUserStore(tmp_path / "users.db")
+        conn = store._connection()
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        indexes = {row[1] for row in conn.execute("PRAGMA index_list(users)")}
+        for name in ("idx_users_username_nocase", "idx_users_public_key", "idx_users_user_id",
+                     "idx_users_status", "idx_users_expires_at"):
+            assert name in indexes
+
+    def test_indexed_columns_follow_updates(self, tmp_path):
+        store = SqliteUserStore(tmp_path / "users.db")
+        store.put_many(dict(RECORDS))
+        store.update("Jan", {"public_key": "NOWY"})
+        assert store.find_by_public_key("NOWY")[0] == "Jan"
+        assert store.find_by_public_key("PUB_JAN") is None
+
+    def test_concurrent_updates(self, tmp_path):
+        store = SqliteUserStore(tmp_path / "users.db")
+        store.put_many({f"user{i}": {"counter": 0} for i in range(20)})
+
+        def worker(i):
+            store.update(f"user{i}", {"counter": i})
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert all(store.get(f"user{i}")["counter"] == i for i in range(20))
+
+
+class TestMigration:
+    """Testy importu/eksportu i wyboru backendu."""
+
+    def test_import_export_roundtrip(self, tmp_path):
+        json_path = tmp_path / "user_records.json"
+        json_path.write_text(json.dumps(RECORDS, indent=4))
+        store = SqliteUserStore(tmp_path / "user_records.db")
+        assert import_json(json_path, store) == 2
+
+        export_path = tmp_path / "export.json"
+        assert export_json(store, export_path) == 2
+        assert json.loads(export_path.read_text()) == RECORDS
+
+    def test_open_user_store_json(self, tmp_path):
+        store = open_user_store(tmp_path / "user_records.json", backend="json")
+        assert isinstance(store, JsonUserStore)
+
+    def test_open_user_store_sqlite_imports_json(self, tmp_path):
+        json_path = tmp_path / "user_records.json"
+        json_path.write_text(json.dumps(RECORDS))
+        store = open_user_store(json_path, backend="sqlite")
+        assert isinstance(store, SqliteUserStore)
+        assert store.path == str(tmp_path / "user_records.db")
+        assert store.count() == 2
+        assert open_user_store(json_path, backend="sqlite") is store
+
+    def test_unknown_backend(self, tmp_path):
+        with pytest.raises(ValueError):
+            open_user_store(tmp_path / "user_records.json", backend="redis")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
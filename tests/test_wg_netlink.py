@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Testy jednostkowe backendu netlink dla statystyk WireGuard.
+
+Moduł testuje (z nagranym responderem zamiast modułu jądra):
+- Ustalanie identyfikatora rodziny generic netlink "wireguard"
+- Dekodowanie interfejsu i peerów do rekordów WgInterface/WgPeer
+- Dump stronicowany na wiele wiadomości i scalanie peera podzielonego między strony
+- Zgodność rekordów z parsowaniem `wg show all dump`
+- Błędy jądra (brak rodziny, brak uprawnień)
+- Wykrywanie interfejsów WireGuard w /sys/class/net
+"""
+
+import pytest
+import base64
+import errno
+import os
+import socket
+import struct
+import sys
+from collections import deque
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from modules import wg_netlink as nl
+from modules.wg_snapshot import parse_dump
+
+FAMILY_ID = 0x1F
+KEY_A = base64.b64encode(b"A" * 32).decode()
+KEY_B = base64.b64encode(b"B" * 32).decode()
+SERVER_KEY = base64.b64encode(b"S" * 32).decode()
+
+
+def allowed_ip(address, cidr):
+    ip = socket.inet_pton(socket.AF_INET6 if ":" in address else socket.AF_INET, address)
+    family = socket.AF_INET6 if ":" in address else socket.AF_INET
+    return nl.pack_nested(0, [
+        nl.pack_attr(nl.WGALLOWEDIP_A_FAMILY, struct.pack("=H", family)),
+        nl.pack_attr(nl.WGALLOWEDIP_A_IPADDR, ip),
+        nl.pack_attr(nl.WGALLOWEDIP_A_CIDR_MASK, bytes([cidr])),
+    ])
+
+
+def peer_attr(key, ips, endpoint=None, handshake=0, rx=0, tx=0, keepalive=0, psk=bytes(32), continuation=False):
+    attrs = [nl.pack_attr(nl.WGPEER_A_PUBLIC_KEY, base64.b64decode(key))]
+    if not continuation:
+        attrs += [
+            nl.pack_attr(nl.WGPEER_A_PRESHARED_KEY, psk),
+            nl.pack_attr(nl.WGPEER_A_LAST_HANDSHAKE_TIME, struct.pack("=qq", handshake, 0)),
+            nl.pack_attr(nl.WGPEER_A_RX_BYTES, struct.pack("=Q", rx)),
+            nl.pack_attr(nl.WGPEER_A_TX_BYTES, struct.pack("=Q", tx)),
+            nl.pack_attr(nl.WGPEER_A_PERSISTENT_KEEPALIVE_INTERVAL, struct.pack("=H", keepalive)),
+        ]
+        if endpoint:
+            attrs.append(nl.pack_attr(nl.WGPEER_A_ENDPOINT, endpoint))
+    attrs.append(nl.pack_nested(nl.WGPEER_A_ALLOWEDIPS, [allowed_ip(*ip) for ip in ips]))
+    return nl.pack_nested(0, attrs)
+
+
+def sockaddr_in(address, port):
+    return struct.pack("=H", socket.AF_INET) + struct.pack("!H", port) + socket.inet_aton(address) + bytes(8)
+
+
+def sockaddr_in6(address, port):
+    return (struct.pack("=H", socket.AF_INET6) + struct.pack("!H", port) + bytes(4)
+            + socket.inet_pton(socket.AF_INET6, address) + bytes(4))
+
+
+def device_page(seq, peers, ifname="wg0"):
+    attrs = [
+        nl.pack_attr(nl.WGDEVICE_A_IFNAME, ifname.encode() + b"\0"),
+        nl.pack_attr(nl.WGDEVICE_A_PRIVATE_KEY, b"P" * 32),
+        nl.pack_attr(nl.WGDEVICE_A_PUBLIC_KEY, base64.b64decode(SERVER_KEY)),
+        nl.pack_attr(nl.WGDEVICE_A_LISTEN_PORT, struct.pack("=H", 51820)),
+        nl.pack_attr(nl.WGDEVICE_A_FWMARK, struct.pack("=I", 0)),
+        nl.pack_nested(nl.WGDEVICE_A_PEERS, peers),
+    ]
+    return nl.pack_message(FAMILY_ID, nl.NLM_F_MULTI, seq, nl.WG_CMD_GET_DEVICE, attrs)
+
+
+class FakeNetlink:
+    """Responder odtwarzający nagrane odpowiedzi jądra."""
+
+    def __init__(self, pages=None, family_error=None, device_error=None):
+        self.pages = pages or {}
+        self.family_error = family_error
+        self.device_error = device_error
+        self.sent = []
+        self.replies = deque()
+        self.closed = False
+
+    def send(self, data):
+        self.sent.append(data)
+        _, msg_type, _, seq, _ = struct.unpack_from("=IHHII", data)
+        if msg_type == nl.GENL_ID_CTRL:
+            if self.family_error:
+                self.replies.append(nl.pack_error(seq, self.family_error))
+            else:
+                family = nl.pack_attr(nl.CTRL_ATTR_FAMILY_ID, struct.pack("=H", FAMILY_ID))
+                self.replies.append(nl.pack_message(nl.GENL_ID_CTRL, 0, seq, 1, [family], version=2))
+            return len(data)
+        if self.device_error:
+            self.replies.append(nl.pack_error(seq, self.device_error))
+            return len(data)
+        ifname = dict(nl.parse_attrs(data[20:]))[nl.WGDEVICE_A_IFNAME].rstrip(b"\0").decode()
+        # Każda strona dumpu przychodzi w osobnym recv, DONE w ostatnim
+        for page in self.pages[ifname]:
+            self.replies.append(device_page(seq, page, ifname))
+        self.replies.append(nl.pack_done(seq))
+        return len(data)
+
+    def recv(self, size):
+        return self.replies.popleft()
+
+    def close(self):
+        self.closed = True
+
+
+class TestNetlinkDecoding:
+    """Testy dekodowania odpowiedzi WG_CMD_GET_DEVICE."""
+
+    def test_device_and_peers(self):
+        fake = FakeNetlink({"wg0": [[
+            peer_attr(KEY_A, [("10.0.0.2", 32), ("fd42::2", 128)], sockaddr_in("1.2.3.4", 51820),
+                      handshake=1732341600, rx=1024, tx=2048, keepalive=25, psk=b"K" * 32),
+            peer_attr(KEY_B, [("10.0.0.3", 32)]),
+        ]]})
+        snapshot = nl.read_netlink_snapshot(["wg0"], sock=fake)
+
+        interface = snapshot.interfaces["wg0"]
+        assert interface.public_key == SERVER_KEY
+        assert interface.listen_port == 51820
+        assert interface.fwmark is None
+
+        peer = snapshot.peer(KEY_A)
+        assert peer.endpoint == "1.2.3.4:51820"
+        assert peer.allowed_ips == ("10.0.0.2/32", "fd42::2/128")
+        assert peer.latest_handshake == 1732341600
+        assert (peer.rx_bytes, peer.tx_bytes) == (1024, 2048)
+        assert peer.persistent_keepalive == 25
+        assert peer.preshared_key == base64.b64encode(b"K" * 32).decode()
+
+        other = snapshot.peer(KEY_B)
+        assert other.endpoint is None
+        assert other.preshared_key is None
+        assert other.persistent_keepalive is None
+        assert fake.closed
+
+    def test_matches_cli_records(self):
+        fake = FakeNetlink({"wg0": [[
+            peer_attr(KEY_A, [("10.0.0.2", 32)], sockaddr_in6("2001:db8::1", 51820), handshake=5, rx=7, tx=9),
+        ]]})
+        netlink_peer = nl.read_netlink_snapshot(["wg0"], sock=fake).peer(KEY_A)
+        _, peers = parse_dump([f"wg0\t{KEY_A}\t(none)\t[2001:db8::1]:51820\t10.0.0.2/32\t5\t7\t9\toff"])
+        assert netlink_peer == peers["wg0"][KEY_A]
+
+    def test_paged_dump(self):
+        def key(i):
+            return base64.b64encode(i.to_bytes(32, "big")).decode()
+
+        pages = [[peer_attr(key(i), [(f"10.0.{i // 250}.{i % 250 + 2}", 32)]) for i in range(start, start + 100)]
+                 for start in range(0, 500, 100)]
+        fake = FakeNetlink({"wg0": pages})
+        snapshot = nl.read_netlink_snapshot(["wg0"], sock=fake)
+        assert len(snapshot.peers_of("wg0")) == 500
+
+    def test_peer_split_between_pages(self):
+        fake = FakeNetlink({"wg0": [
+            [peer_attr(KEY_A, [("10.0.0.2", 32)], rx=100)],
+            [peer_attr(KEY_A, [("10.0.1.0", 24)], continuation=True), peer_attr(KEY_B, [("10.0.0.3", 32)])],
+        ]})
+        snapshot = nl.read_netlink_snapshot(["wg0"], sock=fake)
+        peer = snapshot.peer(KEY_A)
+        assert peer.allowed_ips == ("10.0.0.2/32", "10.0.1.0/24")
+        assert peer.rx_bytes == 100
+        assert len(snapshot.peers_of("wg0")) == 2
+
+    def test_family_resolved_once(self):
+        fake = FakeNetlink({"wg0": [[]], "wg1": [[]]})
+        nl.read_netlink_snapshot(["wg0", "wg1"], sock=fake)
+        controller = [data for data in fake.sent if struct.unpack_from("=H", data, 4)[0] == nl.GENL_ID_CTRL]
+        assert len(controller) == 1
+        assert len(fake.sent) == 3
+
+
+class TestNetlinkErrors:
+    """Testy błędów zgłaszanych przez jądro."""
+
+    def test_missing_family(self):
+        with pytest.raises(nl.NetlinkError) as excinfo:
+            nl.read_netlink_snapshot([], sock=FakeNetlink(family_error=errno.ENOENT))
+        assert excinfo.value.errno == errno.ENOENT
+
+    def test_permission_denied(self):
+        with pytest.raises(OSError) as excinfo:
+            nl.read_netlink_snapshot(["wg0"], sock=FakeNetlink(device_error=errno.EPERM))
+        assert excinfo.value.errno == errno.EPERM
+
+
+class TestInterfaceDiscovery:
+    """Testy wykrywania interfejsów WireGuard."""
+
+    def test_lists_wireguard_devices(self, tmp_path):
+        for name, devtype in (("wg0", "DEVTYPE=wireguard"), ("eth0", ""), ("wg1", "DEVTYPE=wireguard")):
+            (tmp_path / name).mkdir()
+            (tmp_path / name / "uevent").write_text(f"INTERFACE={name}\n{devtype}\n")
+        assert nl.list_wireguard_interfaces(str(tmp_path)) == ["wg0", "wg1"]
+
+    def test_missing_directory(self, tmp_path):
+        assert nl.list_wireguard_interfaces(str(tmp_path / "brak")) == []
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Testy jednostkowe współdzielonej migawki WireGuard.
+
+Moduł testuje:
+- Parsowanie `wg show all dump` do rekordów interfejsów i peerów
+- Pomijanie klucza prywatnego interfejsu
+- Współdzielenie migawki w oknie TTL, wymuszone odświeżenie i unieważnienie
+- Jeden odczyt przy równoczesnych wywołaniach
+- Obsługę błędu polecenia wg
+- Wybór backendu (netlink/cli) i powrót do `wg show all dump`
+"""
+
+import pytest
+import os
+import subprocess
+import sys
+import threading
+import time
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from modules import wg_snapshot
+from modules.wg_snapshot import SnapshotProvider, WgSnapshot, format_bytes, parse_dump, read_snapshot, read_wg_snapshot
+
+DUMP = [
+    "wg0\tPRIVATE_KEY=\tSERVER_PUB=\t51820\toff\n",
+    "wg0\tPUB_A=\tPSK_A=\t1.2.3.4:51820\t10.0.0.2/32,fd42::2/128\t1732341600\t1024\t2048\t25\n",
+    "wg0\tPUB_B=\t(none)\t(none)\t10.0.0.3/32\t0\t0\t0\toff\n",
+    "wg1\tPRIVATE_KEY2=\tSERVER_PUB2=\t51821\t0x1234\n",
+    "wg1\tPUB_C=\t(none)\t(none)\t(none)\t0\t5\t6\toff\n",
+]
+
+
+class TestParseDump:
+    """Testy parsowania wyjścia `wg show all dump`."""
+
+    def test_interfaces(self):
+        interfaces, _ = parse_dump(DUMP)
+        assert set(interfaces) == {"wg0", "wg1"}
+        assert interfaces["wg0"].public_key == "SERVER_PUB="
+        assert interfaces["wg0"].listen_port == 51820
+        assert interfaces["wg0"].fwmark is None
+        assert interfaces["wg1"].fwmark == "0x1234"
+
+    def test_private_key_not_kept(self):
+        interfaces, _ = parse_dump(DUMP)
+        assert "PRIVATE_KEY=" not in repr(interfaces)
+
+    def test_peers(self):
+        _, peers = parse_dump(DUMP)
+        peer = peers["wg0"]["PUB_A="]
+        assert peer.preshared_key == "PSK_A="
+        assert peer.endpoint == "1.2.3.4:51820"
+        assert peer.allowed_ips == ("10.0.0.2/32", "fd42::2/128")
+        assert peer.latest_handshake == 1732341600
+        assert (peer.rx_bytes, peer.tx_bytes) == (1024, 2048)
+        assert peer.persistent_keepalive == 25
+
+    def test_optional_fields(self):
+        _, peers = parse_dump(DUMP)
+        peer = peers["wg0"]["PUB_B="]
+        assert peer.preshared_key is None
+        assert peer.endpoint is None
+        assert peer.persistent_keepalive is None
+        assert peers["wg1"]["PUB_C="].allowed_ips == ()
+
+    def test_snapshot_lookup(self):
+        snapshot = WgSnapshot(*parse_dump(DUMP))
+        assert set(snapshot.peers_of("wg0")) == {"PUB_A=", "PUB_B="}
+        assert snapshot.peers_of("wg9") == {}
+        assert set(snapshot.peers()) == {"PUB_A=", "PUB_B=", "PUB_C="}
+        assert snapshot.peer("PUB_C=").interface == "wg1"
+        assert snapshot.peer("PUB_C=", interface="wg0") is None
+
+    def test_format_bytes(self):
+        assert format_bytes(512) == "512.00 B"
+        assert format_bytes(1536) == "1.50 KiB"
+        assert format_bytes(3 * 1024 ** 3) == "3.00 GiB"
+
+
+class TestSnapshotProvider:
+    """Testy pamięci podręcznej migawki."""
+
+    @staticmethod
+    def reader():
+        return WgSnapshot(*parse_dump(DUMP))
+
+    def test_shared_within_ttl(self):
+        provider = SnapshotProvider(ttl=60, reader=self.reader)
+        assert provider.get() is provider.get()
+        assert provider.reads == 1
+
+    def test_max_age_zero_forces_refresh(self):
+        provider = SnapshotProvider(ttl=60, reader=self.reader)
+        first = provider.get()
+        assert provider.get(max_age=0) is not first
+        assert provider.reads == 2
+
+    def test_invalidate(self):
+        provider = SnapshotProvider(ttl=60, reader=self.reader)
+        provider.get()
+        provider.invalidate()
+        provider.get()
+        assert provider.reads == 2
+
+    def test_expired_snapshot_reread(self):
+        provider = SnapshotProvider(ttl=0.01, reader=self.reader)
+        provider.get()
+        time.sleep(0.02)
+        provider.get()
+        assert provider.reads == 2
+
+    def test_concurrent_calls_single_read(self):
+        def slow_reader():
+            time.sleep(0.05)
+            return self.reader()
+
+        provider = SnapshotProvider(ttl=60, reader=slow_reader)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(provider.get())) for _ in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert provider.reads == 1
+        assert all(result is results[0] for result in results)
+
+    def test_reader_error_not_cached(self):
+        calls = []
+
+        def failing_reader():
+            calls.append(1)
+            raise FileNotFoundError("wg")
+
+        provider = SnapshotProvider(ttl=60, reader=failing_reader)
+        for _ in range(2):
+            with pytest.raises(FileNotFoundError):
+                provider.get()
+        assert len(calls) == 2
+
+
+class TestReadSnapshot:
+    """Testy odczytu migawki z procesu."""
+
+    def test_streams_command_output(self):
+        snapshot = read_snapshot(["printf", "wg0\\tPUB=\\t(none)\\t(none)\\t10.0.0.2/32\\t0\\t1\\t2\\toff\\n"])
+        assert snapshot.peer("PUB=").tx_bytes == 2
+
+    def test_nonzero_exit_raises(self):
+        with pytest.raises(subprocess.CalledProcessError):
+            read_snapshot(["sh", "-c", "exit 1"])
+
+
+class TestBackendSelection:
+    """Testy wyboru backendu odczytu."""
+
+    @pytest.fixture(autouse=True)
+    def reset_fallback(self):
+        wg_snapshot._netlink_unavailable = False
+        yield
+        wg_snapshot._netlink_unavailable = False
+
+    def test_cli_backend(self):
+        with patch("modules.wg_snapshot.read_snapshot", return_value="cli") as mock_cli:
+            assert read_wg_snapshot("cli") == "cli"
+        mock_cli.assert_called_once()
+
+    def test_netlink_backend_errors_propagate(self):
+        with patch("modules.wg_netlink.read_netlink_snapshot", side_effect=PermissionError("EPERM")):
+            with pytest.raises(PermissionError):
+                read_wg_snapshot("netlink")
+
+    def test_auto_falls_back_once(self):
+        with patch("modules.wg_netlink.read_netlink_snapshot", side_effect=OSError("brak")) as mock_netlink, \
+                patch("modules.wg_snapshot.read_snapshot", return_value="cli"):
+            assert read_wg_snapshot("auto") == "cli"
+            assert read_wg_snapshot("auto") == "cli"
+        mock_netlink.assert_called_once()
+
+    def test_auto_without_kernel_interfaces_uses_cli(self):
+        with patch("modules.wg_netlink.read_netlink_snapshot", return_value=WgSnapshot({}, {})), \
+                patch("modules.wg_snapshot.read_snapshot", return_value="cli"):
+            assert read_wg_snapshot("auto") == "cli"
+
+    def test_unknown_backend(self):
+        with pytest.raises(ValueError):
+            read_wg_snapshot("ebpf")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])